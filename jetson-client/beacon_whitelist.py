@@ -1,13 +1,24 @@
 """
 信标白名单管理模块 - 从云端API获取和管理信标白名单
+
+同步方式（尽量减少4G流量和CPU）：
+- 条件请求：携带 If-None-Match / If-Modified-Since，无变化时服务端返回304，不传输白名单
+- 增量同步：服务端在响应头 X-Whitelist-Cursor 中返回游标时，后续请求
+  GET /api/beacons/changes?since=<游标> 只获取变化的条目
+- 只对变化的条目更新按MAC索引的白名单，并记录变更日志供BeaconFilter增量应用
+- 最近一次有效白名单持久化到磁盘，启动时立即可用
 """
 
+import json
 import logging
+import os
+import threading
 import time
 import re
+from collections import deque
 from datetime import datetime
-from typing import Dict, Optional, List
-from dataclasses import dataclass
+from typing import Dict, Optional, List, Iterable, Tuple
+from dataclasses import dataclass, asdict
 
 import requests
 
@@ -58,7 +69,11 @@ class BeaconEntry:
 class BeaconWhitelistManager:
     """信标白名单管理器 - 从云端API获取白名单"""
     
-    def __init__(self, api_base_url: str, api_key: str, update_interval: int = 300):
+    CURSOR_HEADER = "X-Whitelist-Cursor"
+    
+    def __init__(self, api_base_url: str, api_key: str, update_interval: int = 300,
+                 cache_path: Optional[str] = None, use_delta: bool = True,
+                 changelog_size: int = 64):
         """
         初始化白名单管理器
         
@@ -66,6 +81,9 @@ class BeaconWhitelistManager:
             api_base_url: 云端API地址
             api_key: API密钥
             update_interval: 更新间隔（秒），默认5分钟
+            cache_path: 本地缓存文件路径（None表示不持久化）
+            use_delta: 服务端支持时是否使用增量同步
+            changelog_size: 保留的变更批次数（超出后BeaconFilter需全量重建）
         """
         self.api_base_url = api_base_url.rstrip("/")
         self.api_key = api_key
@@ -74,6 +92,31 @@ class BeaconWhitelistManager:
         self.last_update_time: Optional[datetime] = None
         self.last_update_success: bool = False
         
+        # 条件请求/增量同步状态
+        self.cache_path = cache_path
+        self.use_delta = use_delta
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.delta_cursor: Optional[str] = None
+        self.loaded_from_cache = False
+        
+        # 索引与变更日志
+        self.lock = threading.Lock()
+        self.version = 0  # 白名单内容每变化一次递增
+        self._mac_by_id: Dict[int, str] = {}
+        self._dict_view: Dict[str, Dict] = {}  # MAC -> to_dict()，只在条目变化时重新生成
+        self._changelog = deque(maxlen=changelog_size)  # (version, {mac: dict或None})
+        self.last_changed_count = 0  # 最近一次同步变化的条目数
+        
+        # 同步统计
+        self.stats = {
+            "requests": 0,
+            "not_modified": 0,
+            "full_updates": 0,
+            "delta_updates": 0,
+            "bytes_received": 0,
+        }
+        
         # 创建HTTP会话
         self.session = requests.Session()
         self.session.headers.update({
@@ -81,63 +124,35 @@ class BeaconWhitelistManager:
             "Content-Type": "application/json"
         })
         
+        if self.cache_path:
+            self._load_cache()
+        
         logger.info(f"BeaconWhitelistManager initialized: API={self.api_base_url}, update_interval={update_interval}s")
     
     def fetch_whitelist(self, max_retries: int = 3, retry_delay: float = 5.0) -> bool:
         """
-        从云端获取信标白名单
+        从云端获取信标白名单（条件请求/增量同步，只应用变化的条目）
         
         Args:
             max_retries: 最大重试次数
             retry_delay: 重试延迟（秒）
         
         Returns:
-            bool: 是否成功
+            bool: 是否成功（包括服务端返回无变化）
         """
         for attempt in range(max_retries):
             try:
-                response = self.session.get(
-                    f"{self.api_base_url}/api/beacons",
-                    timeout=10
-                )
-                response.raise_for_status()
-                
-                beacons_data = response.json()
-                
-                # 验证数据格式
-                if not isinstance(beacons_data, list):
-                    logger.error(f"Invalid response format: expected list, got {type(beacons_data)}")
-                    return False
-                
-                new_whitelist = {}
-                valid_count = 0
-                
-                for beacon_data in beacons_data:
-                    # 验证必需字段
-                    if not self._validate_beacon_data(beacon_data):
-                        continue
-                    
-                    try:
-                        entry = BeaconEntry(
-                            id=beacon_data["id"],
-                            beacon_number=beacon_data["beacon_number"],
-                            mac_address=beacon_data["mac_address"],
-                            machine_type=beacon_data["machine_type"],
-                            environment_code=beacon_data["environment_code"],
-                            registration_date=beacon_data["registration_date"],
-                            equipment_owner=beacon_data.get("equipment_owner")
-                        )
-                        new_whitelist[entry.mac_address] = entry
-                        valid_count += 1
-                    except Exception as e:
-                        logger.warning(f"Failed to create BeaconEntry from data: {beacon_data}, error: {e}")
-                        continue
+                changed = None
+                if self.use_delta and self.delta_cursor:
+                    changed = self._fetch_delta()
+                if changed is None:
+                    changed = self._fetch_full()
+                    if changed is None:
+                        return False
                 
-                self.whitelist = new_whitelist
+                self.last_changed_count = changed
                 self.last_update_time = datetime.now()
                 self.last_update_success = True
-                
-                logger.info(f"Beacon whitelist updated: {valid_count} entries (from {len(beacons_data)} total)")
                 return True
                 
             except requests.exceptions.RequestException as e:
@@ -155,6 +170,235 @@ class BeaconWhitelistManager:
         
         return False
     
+    def _fetch_full(self) -> Optional[int]:
+        """
+        条件请求完整白名单
+        
+        Returns:
+            int: 变化的条目数（304时为0），响应格式错误时返回None
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        
+        response = self.session.get(f"{self.api_base_url}/api/beacons", headers=headers, timeout=10)
+        self.stats["requests"] += 1
+        if response.status_code == 304:
+            self.stats["not_modified"] += 1
+            logger.debug("Beacon whitelist not modified")
+            return 0
+        response.raise_for_status()
+        self.stats["bytes_received"] += len(response.content)
+        
+        beacons_data = response.json()
+        
+        # 验证数据格式
+        if not isinstance(beacons_data, list):
+            logger.error(f"Invalid response format: expected list, got {type(beacons_data)}")
+            return None
+        
+        new_whitelist = {}
+        for beacon_data in beacons_data:
+            entry = self._parse_entry(beacon_data)
+            if entry is not None:
+                new_whitelist[entry.mac_address] = entry
+        
+        # 与当前白名单比较，只应用变化的条目
+        upserts = {mac: entry for mac, entry in new_whitelist.items() if self.whitelist.get(mac) != entry}
+        removed = [mac for mac in self.whitelist if mac not in new_whitelist]
+        changed = self._apply_changes(upserts, removed)
+        
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        self.delta_cursor = response.headers.get(self.CURSOR_HEADER)
+        self.stats["full_updates"] += 1
+        self._save_cache()
+        
+        logger.info(f"Beacon whitelist updated: {len(new_whitelist)} entries (from {len(beacons_data)} total), {changed} changed")
+        return changed
+    
+    def _fetch_delta(self) -> Optional[int]:
+        """
+        增量获取自游标以来的变化
+        
+        Returns:
+            int: 变化的条目数；服务端不支持或要求全量同步时返回None
+        """
+        response = self.session.get(
+            f"{self.api_base_url}/api/beacons/changes",
+            params={"since": self.delta_cursor},
+            timeout=10
+        )
+        self.stats["requests"] += 1
+        if response.status_code in (404, 405, 501):
+            logger.info("Server does not support beacon whitelist delta sync, using conditional full fetch")
+            self.use_delta = False
+            return None
+        if response.status_code == 410:
+            logger.info("Beacon whitelist delta cursor expired, doing full fetch")
+            self.delta_cursor = None
+            return None
+        response.raise_for_status()
+        self.stats["bytes_received"] += len(response.content)
+        
+        delta = response.json()
+        if not isinstance(delta, dict) or delta.get("full_resync"):
+            self.delta_cursor = None
+            return None
+        
+        upserts = {}
+        for beacon_data in delta.get("changes", []):
+            entry = self._parse_entry(beacon_data)
+            if entry is not None:
+                upserts[entry.mac_address] = entry
+        removed = []
+        for item in delta.get("deleted", []):
+            if isinstance(item, dict):
+                mac = item.get("mac_address") or self._mac_by_id.get(item.get("id"))
+            elif isinstance(item, int):
+                mac = self._mac_by_id.get(item)
+            else:
+                mac = item
+            if mac:
+                removed.append(BeaconEntry._normalize_mac(mac))
+        
+        changed = self._apply_changes(upserts, removed)
+        cursor = delta.get("cursor", self.delta_cursor)
+        cursor_moved = cursor != self.delta_cursor
+        self.delta_cursor = cursor
+        self.stats["delta_updates"] += 1
+        if changed:
+            logger.info(f"Beacon whitelist delta applied: {len(upserts)} updated, {len(removed)} removed")
+        if changed or cursor_moved:
+            self._save_cache()
+        return changed
+    
+    def _parse_entry(self, beacon_data: Dict) -> Optional[BeaconEntry]:
+        """校验并创建白名单条目（无效数据返回None）"""
+        # 验证必需字段
+        if not self._validate_beacon_data(beacon_data):
+            return None
+        try:
+            return BeaconEntry(
+                id=beacon_data["id"],
+                beacon_number=beacon_data["beacon_number"],
+                mac_address=beacon_data["mac_address"],
+                machine_type=beacon_data["machine_type"],
+                environment_code=beacon_data["environment_code"],
+                registration_date=beacon_data["registration_date"],
+                equipment_owner=beacon_data.get("equipment_owner")
+            )
+        except Exception as e:
+            logger.warning(f"Failed to create BeaconEntry from data: {beacon_data}, error: {e}")
+            return None
+    
+    def _apply_changes(self, upserts: Dict[str, BeaconEntry], removed: Iterable[str]) -> int:
+        """
+        将变化的条目应用到索引并记录变更日志
+        
+        Args:
+            upserts: MAC -> 新增或修改的条目
+            removed: 删除的MAC列表
+        
+        Returns:
+            int: 实际变化的条目数
+        """
+        with self.lock:
+            changes: Dict[str, Optional[Dict]] = {}
+            for mac in removed:
+                entry = self.whitelist.pop(mac, None)
+                if entry is not None:
+                    self._mac_by_id.pop(entry.id, None)
+                    self._dict_view.pop(mac, None)
+                    changes[mac] = None
+            for mac, entry in upserts.items():
+                if self.whitelist.get(mac) == entry:
+                    continue
+                # 同一条目更换了MAC时移除旧MAC
+                old_mac = self._mac_by_id.get(entry.id)
+                if old_mac and old_mac != mac and old_mac in self.whitelist:
+                    del self.whitelist[old_mac]
+                    self._dict_view.pop(old_mac, None)
+                    changes[old_mac] = None
+                self.whitelist[mac] = entry
+                self._mac_by_id[entry.id] = mac
+                self._dict_view[mac] = entry.to_dict()
+                changes[mac] = self._dict_view[mac]
+            
+            if changes:
+                self.version += 1
+                self._changelog.append((self.version, changes))
+            return len(changes)
+    
+    def get_changes(self, since_version: Optional[int]) -> Tuple[int, Optional[Dict[str, Optional[Dict]]]]:
+        """
+        获取自某版本以来的白名单变化（供BeaconFilter增量应用）
+        
+        Args:
+            since_version: 调用方已应用的版本
+        
+        Returns:
+            tuple: (当前版本, {MAC: 信息字典或None(已删除)})；
+                   变更日志已不足以覆盖时第二项为None，调用方需全量重建
+        """
+        with self.lock:
+            if since_version is None or since_version > self.version:
+                return self.version, None
+            if since_version == self.version:
+                return self.version, {}
+            if not self._changelog or self._changelog[0][0] > since_version + 1:
+                return self.version, None
+            merged: Dict[str, Optional[Dict]] = {}
+            for version, changes in self._changelog:
+                if version > since_version:
+                    merged.update(changes)
+            return self.version, merged
+    
+    def _load_cache(self):
+        """从磁盘加载上次有效的白名单"""
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            entries = {}
+            for beacon_data in cache.get("beacons", []):
+                entry = self._parse_entry(beacon_data)
+                if entry is not None:
+                    entries[entry.mac_address] = entry
+            self._apply_changes(entries, [])
+            self.etag = cache.get("etag")
+            self.last_modified = cache.get("last_modified")
+            self.delta_cursor = cache.get("cursor")
+            self.loaded_from_cache = True
+            logger.info(f"Beacon whitelist loaded from cache: {len(entries)} entries ({self.cache_path})")
+        except Exception as e:
+            logger.warning(f"Failed to load beacon whitelist cache {self.cache_path}: {e}")
+    
+    def _save_cache(self):
+        """将当前白名单及同步状态写入磁盘（原子替换）"""
+        if not self.cache_path:
+            return
+        try:
+            with self.lock:
+                cache = {
+                    "saved_at": datetime.now().isoformat(),
+                    "etag": self.etag,
+                    "last_modified": self.last_modified,
+                    "cursor": self.delta_cursor,
+                    "beacons": [asdict(entry) for entry in self.whitelist.values()],
+                }
+            cache_dir = os.path.dirname(os.path.abspath(self.cache_path))
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.warning(f"Failed to save beacon whitelist cache {self.cache_path}: {e}")
+    
     def _validate_beacon_data(self, beacon_data: Dict) -> bool:
         """
         验证信标数据格式
@@ -261,7 +505,8 @@ class BeaconWhitelistManager:
         if force_update or self.should_update():
             self.fetch_whitelist()
         
-        return {mac: entry.to_dict() for mac, entry in self.whitelist.items()}
+        with self.lock:
+            return dict(self._dict_view)
     
     def get_stats(self) -> Dict:
         """
@@ -274,6 +519,10 @@ class BeaconWhitelistManager:
             "total_beacons": len(self.whitelist),
             "last_update_time": self.last_update_time.isoformat() if self.last_update_time else None,
             "last_update_success": self.last_update_success,
-            "update_interval": self.update_interval
+            "update_interval": self.update_interval,
+            "version": self.version,
+            "delta_sync": bool(self.use_delta and self.delta_cursor),
+            "loaded_from_cache": self.loaded_from_cache,
+            **self.stats
         }
 
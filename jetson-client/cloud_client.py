@@ -368,7 +368,41 @@ class CloudClient:
                 else:
                     logger.error(f"Failed to send alert after {self.config.retry_attempts} attempts")
         return None
-    
+
+    def send_alert_json(self, body: bytes, track_id: Optional[int] = None) -> Optional[int]:
+        """
+        发送已序列化的警报请求体（AlertEvent.cloud_body，字段规则与 send_alert 一致）
+
+        Args:
+            body: UTF-8编码的JSON请求体
+            track_id: 跟踪ID（仅用于日志）
+
+        Returns:
+            警报 ID（如果成功），否则返回 None
+        """
+        if not self.config.enable_alert_upload:
+            logger.debug("Alert upload is disabled")
+            return None
+
+        for attempt in range(self.config.retry_attempts):
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/api/alerts",
+                    data=body,
+                    timeout=10
+                )
+                response.raise_for_status()
+                alert_id = response.json().get("id")
+                logger.info(f"Alert sent successfully, ID: {alert_id} (track {track_id})")
+                return alert_id
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Failed to send alert (attempt {attempt + 1}/{self.config.retry_attempts}): {e}")
+                if attempt < self.config.retry_attempts - 1:
+                    time.sleep(self.config.retry_delay * (attempt + 1))
+                else:
+                    logger.error(f"Failed to send alert after {self.config.retry_attempts} attempts")
+        return None
+
     def upload_image(
         self,
         image_path: str,
@@ -309,30 +309,36 @@ class SentinelIntegration:
                         }) + '\n')
                 except: pass
                 # #endregion
-                alert_id = self.cloud_client.send_alert(
-                    vehicle_type=detection.vehicle_type,
-                    timestamp=detection.timestamp,
-                    detected_class=detection.detected_class,
-                    status=detection.status,
-                    plate_number=detection.plate_number,
-                    confidence=detection.confidence,
-                    distance=detection.distance,
-                    is_registered=detection.is_registered,
-                    track_id=detection.track_id,
-                    bbox={
-                        "x1": detection.bbox[0],
-                        "y1": detection.bbox[1],
-                        "x2": detection.bbox[2],
-                        "y2": detection.bbox[3]
-                    } if detection.bbox and len(detection.bbox) >= 4 else None,
-                    beacon_mac=detection.beacon_mac,
-                    company=detection.company,
-                    environment_code=detection.environment_code,  # 添加环境编码
-                    metadata=detection.metadata,
-                    snapshot_path=None,  # 必须为null（文档要求）
-                    snapshot_url=snapshot_url,  # 使用上传接口返回的相对路径（格式：YYYY-MM-DD/filename）
-                    image_path=None  # 必须为null（文档要求）
-                )
+                if hasattr(detection, 'cloud_body'):
+                    # AlertEvent：请求体已序列化，只补充snapshot_url
+                    alert_id = self.cloud_client.send_alert_json(
+                        detection.cloud_body(snapshot_url), track_id=detection.track_id
+                    )
+                else:
+                    alert_id = self.cloud_client.send_alert(
+                        vehicle_type=detection.vehicle_type,
+                        timestamp=detection.timestamp,
+                        detected_class=detection.detected_class,
+                        status=detection.status,
+                        plate_number=detection.plate_number,
+                        confidence=detection.confidence,
+                        distance=detection.distance,
+                        is_registered=detection.is_registered,
+                        track_id=detection.track_id,
+                        bbox={
+                            "x1": detection.bbox[0],
+                            "y1": detection.bbox[1],
+                            "x2": detection.bbox[2],
+                            "y2": detection.bbox[3]
+                        } if detection.bbox and len(detection.bbox) >= 4 else None,
+                        beacon_mac=detection.beacon_mac,
+                        company=detection.company,
+                        environment_code=detection.environment_code,  # 添加环境编码
+                        metadata=detection.metadata,
+                        snapshot_path=None,  # 必须为null（文档要求）
+                        snapshot_url=snapshot_url,  # 使用上传接口返回的相对路径（格式：YYYY-MM-DD/filename）
+                        image_path=None  # 必须为null（文档要求）
+                    )
                 
                 # #region agent log
                 try:
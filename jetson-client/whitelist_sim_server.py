@@ -0,0 +1,241 @@
+"""
+信标白名单模拟服务器 - 在本地模拟云端 /api/beacons 接口
+
+支持：
+- ETag / Last-Modified 条件请求（无变化返回304）
+- 响应头 X-Whitelist-Cursor 返回增量游标
+- GET /api/beacons/changes?since=<游标> 增量接口（游标过旧时返回 full_resync）
+- add_beacon / update_beacon / delete_beacon 修改白名单，用于离线测试同步逻辑和流量
+
+用法:
+    python whitelist_sim_server.py --port 8000 --beacons 200 --churn 30
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+
+class WhitelistSimServer:
+    """模拟云端信标白名单API的本地HTTP服务器"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, api_key: Optional[str] = None,
+                 delta_enabled: bool = True, changelog_size: int = 1000):
+        """
+        初始化模拟服务器
+
+        Args:
+            host: 监听地址
+            port: 监听端口（0表示自动分配）
+            api_key: 校验的X-API-Key（None表示不校验）
+            delta_enabled: 是否提供增量接口
+            changelog_size: 保留的变更记录数（超出后增量请求返回full_resync）
+        """
+        self.api_key = api_key
+        self.delta_enabled = delta_enabled
+        self.lock = threading.Lock()
+        self.beacons: Dict[int, Dict] = {}
+        self.version = 0
+        self.modified_at = time.time()
+        self.changelog = deque(maxlen=changelog_size)  # (version, 'upsert'/'delete', beacon)
+        self.request_counts = {"full": 0, "not_modified": 0, "delta": 0}
+        self.bytes_sent = 0
+        self._next_id = 1
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    @property
+    def etag(self) -> str:
+        return f'"wl-{self.version}"'
+
+    def _record(self, kind: str, beacon: Dict):
+        self.version += 1
+        self.modified_at = time.time()
+        self.changelog.append((self.version, kind, dict(beacon)))
+
+    def add_beacon(self, mac_address: str, machine_type: str = "excavator",
+                   environment_code: str = "ENV01", equipment_owner: Optional[str] = None) -> Dict:
+        """新增信标，返回条目"""
+        with self.lock:
+            beacon_id = self._next_id
+            self._next_id += 1
+            beacon = {
+                "id": beacon_id,
+                "beacon_number": beacon_id,
+                "mac_address": mac_address,
+                "machine_type": machine_type,
+                "environment_code": environment_code,
+                "registration_date": time.strftime("%Y-%m-%d"),
+                "equipment_owner": equipment_owner,
+            }
+            self.beacons[beacon_id] = beacon
+            self._record("upsert", beacon)
+            return dict(beacon)
+
+    def update_beacon(self, beacon_id: int, **fields) -> Dict:
+        """修改信标字段"""
+        with self.lock:
+            beacon = self.beacons[beacon_id]
+            beacon.update(fields)
+            self._record("upsert", beacon)
+            return dict(beacon)
+
+    def delete_beacon(self, beacon_id: int):
+        """删除信标"""
+        with self.lock:
+            beacon = self.beacons.pop(beacon_id)
+            self._record("delete", beacon)
+
+    def _full_response(self):
+        with self.lock:
+            return self.version, self.etag, self.modified_at, list(self.beacons.values())
+
+    def _delta_response(self, since: int) -> Dict:
+        with self.lock:
+            if since > self.version or (self.changelog and self.changelog[0][0] > since + 1):
+                return {"full_resync": True, "cursor": str(self.version)}
+            changes, deleted = {}, {}
+            for version, kind, beacon in self.changelog:
+                if version <= since:
+                    continue
+                if kind == "upsert":
+                    changes[beacon["id"]] = beacon
+                    deleted.pop(beacon["id"], None)
+                else:
+                    changes.pop(beacon["id"], None)
+                    deleted[beacon["id"]] = {"id": beacon["id"], "mac_address": beacon["mac_address"]}
+            return {
+                "cursor": str(self.version),
+                "changes": list(changes.values()),
+                "deleted": list(deleted.values()),
+            }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # 避免刷屏
+
+            def _send(self, status, body=None, headers=None):
+                payload = json.dumps(body).encode() if body is not None else b""
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                if body is not None:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with server.lock:
+                    server.bytes_sent += len(payload)
+
+            def do_GET(self):
+                if server.api_key and self.headers.get("X-API-Key") != server.api_key:
+                    self._send(401, {"detail": "Invalid API key"})
+                    return
+
+                parsed = urlparse(self.path)
+                if parsed.path == "/api/beacons":
+                    self._handle_full()
+                elif parsed.path == "/api/beacons/changes" and server.delta_enabled:
+                    try:
+                        since = int(parse_qs(parsed.query).get("since", ["0"])[0])
+                    except ValueError:
+                        self._send(400, {"detail": "invalid cursor"})
+                        return
+                    with server.lock:
+                        server.request_counts["delta"] += 1
+                    self._send(200, server._delta_response(since))
+                else:
+                    self._send(404, {"detail": "Not Found"})
+
+            def _handle_full(self):
+                version, etag, modified_at, beacons = server._full_response()
+                headers = {
+                    "ETag": etag,
+                    "Last-Modified": formatdate(modified_at, usegmt=True),
+                }
+                if server.delta_enabled:
+                    headers["X-Whitelist-Cursor"] = str(version)
+
+                if_none_match = self.headers.get("If-None-Match")
+                if_modified_since = self.headers.get("If-Modified-Since")
+                not_modified = False
+                if if_none_match:
+                    not_modified = if_none_match == etag
+                elif if_modified_since:
+                    try:
+                        not_modified = int(modified_at) <= parsedate_to_datetime(if_modified_since).timestamp()
+                    except (TypeError, ValueError):
+                        pass
+                if not_modified:
+                    with server.lock:
+                        server.request_counts["not_modified"] += 1
+                    self._send(304, headers=headers)
+                    return
+
+                with server.lock:
+                    server.request_counts["full"] += 1
+                self._send(200, beacons, headers)
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+
+    parser = argparse.ArgumentParser(description="信标白名单模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--beacons", type=int, default=50, help="初始信标数量")
+    parser.add_argument("--churn", type=float, default=0, help="每隔N秒随机修改一个信标（0表示不修改）")
+    parser.add_argument("--no-delta", action="store_true", help="不提供增量接口")
+    args = parser.parse_args()
+
+    server = WhitelistSimServer(args.host, args.port, api_key=args.api_key, delta_enabled=not args.no_delta)
+    for i in range(args.beacons):
+        server.add_beacon(f"AC:23:3F:00:{i >> 8 & 0xFF:02X}:{i & 0xFF:02X}",
+                          machine_type=random.choice(["excavator", "bulldozer", "dump-truck", "loader"]))
+    server.start()
+    print(f"✓ 白名单模拟服务器已启动: {server.url}/api/beacons （{args.beacons} 个信标）")
+
+    try:
+        while True:
+            time.sleep(args.churn if args.churn > 0 else 1.0)
+            if args.churn > 0:
+                beacon_id = random.choice(list(server.beacons))
+                server.update_beacon(beacon_id, equipment_owner=f"owner-{random.randint(1, 99)}")
+                print(f"  修改信标 #{beacon_id}（版本 {server.version}）")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"\n已停止：{server.request_counts}, 发送 {server.bytes_sent} 字节")
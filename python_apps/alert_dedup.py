@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+警报去重索引（按时间分桶的空间哈希）
+
+原实现每次检查都重建最近警报列表，再用纯Python逐个计算IoU，每辆车每帧
+在社会车辆和工程车辆两条路径上各调用一次，开销随最近警报数线性增长。
+这里把最近警报按时间分桶，并按 (类别, 框中心所在网格) 做空间哈希：
+- 过期时整桶丢弃，不再每次重建列表
+- IoU超过阈值时两框中心距离受查询框尺寸约束，查询只访问该范围内网格的候选
+- 同一track_id的检查走字典
+查询开销与最近警报总数基本无关。判定规则与原实现一致。
+"""
+
+import math
+from collections import deque
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+def bbox_iou(box1, box2) -> float:
+    """
+    计算两个bbox的IoU
+
+    Args:
+        box1: [x1, y1, x2, y2]
+        box2: [x1, y1, x2, y2]
+
+    Returns:
+        float: IoU值
+    """
+    inter_x_min = max(box1[0], box2[0])
+    inter_y_min = max(box1[1], box2[1])
+    inter_x_max = min(box1[2], box2[2])
+    inter_y_max = min(box1[3], box2[3])
+    if inter_x_max < inter_x_min or inter_y_max < inter_y_min:
+        return 0.0
+    inter_area = (inter_x_max - inter_x_min) * (inter_y_max - inter_y_min)
+    union_area = ((box1[2] - box1[0]) * (box1[3] - box1[1]) +
+                  (box2[2] - box2[0]) * (box2[3] - box2[1]) - inter_area)
+    return inter_area / union_area if union_area > 0 else 0.0
+
+
+class _AlertEntry:
+    """一条最近警报记录"""
+
+    __slots__ = ('track_id', 'bbox', 'timestamp', 'class_name', 'cell')
+
+    def __init__(self, track_id, bbox, timestamp, class_name, cell):
+        self.track_id = track_id
+        self.bbox = bbox
+        self.timestamp = timestamp
+        self.class_name = class_name
+        self.cell = cell  # (类别, 中心点网格x, 中心点网格y)
+
+
+class AlertDedupIndex:
+    """最近警报的时间分桶空间哈希索引"""
+
+    def __init__(self, time_window: float = 30.0, position_time_window: float = 10.0,
+                 iou_threshold: float = 0.5, cell_size: float = 128.0, bucket_seconds: float = 1.0):
+        """
+        初始化索引
+
+        Args:
+            time_window: 去重时间窗口（秒），超过后记录过期
+            position_time_window: 位置重叠检查的时间窗口（秒）
+            iou_threshold: 位置重叠判定的IoU阈值
+            cell_size: 空间哈希网格单元边长（像素）
+            bucket_seconds: 时间桶长度（秒）
+        """
+        self.time_window = time_window
+        self.position_time_window = position_time_window
+        self.iou_threshold = iou_threshold
+        self.cell_size = max(1.0, float(cell_size))
+        self.bucket_seconds = max(1e-3, float(bucket_seconds))
+        self._buckets = deque()  # (bucket_id, [entry, ...])，按bucket_id递增
+        self._cells: Dict[Tuple, deque] = {}  # (类别, cx, cy) -> 按加入顺序的entry
+        self._tracks: Dict[Hashable, _AlertEntry] = {}  # track_id -> 最近一条记录
+        self._classes: Dict[Optional[str], int] = {}  # 类别 -> 记录数（查询类别为None时遍历）
+        self._size = 0
+
+        self.queries = 0
+        self.candidates_checked = 0
+        self.expired_buckets = 0
+
+    def _cell_of(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _search_cells(self, bbox) -> Optional[List[Tuple[int, int]]]:
+        """
+        可能与bbox的IoU超过阈值的记录中心点所在网格单元
+
+        IoU > t 时交集宽度 >= t * 两框宽度的较大者，而交集宽度 <= 两框宽度均值 - 中心距，
+        因此中心横向距离 <= w/2 + w * max(0, 0.5 - t) / t（w为查询框宽度），纵向同理。
+
+        Returns:
+            list: 网格单元列表，阈值<=0（任意重叠即命中）时返回None表示需遍历全部单元
+        """
+        t = self.iou_threshold
+        if t <= 0:
+            return None
+        w = bbox[2] - bbox[0]
+        h = bbox[3] - bbox[1]
+        factor = 0.5 + max(0.0, 0.5 - t) / t
+        cx = (bbox[0] + bbox[2]) / 2
+        cy = (bbox[1] + bbox[3]) / 2
+        x_min, y_min = self._cell_of(cx - w * factor, cy - h * factor)
+        x_max, y_max = self._cell_of(cx + w * factor, cy + h * factor)
+        return [(gx, gy) for gx in range(x_min, x_max + 1) for gy in range(y_min, y_max + 1)]
+
+    def expire(self, now: float) -> int:
+        """
+        整桶丢弃已完全过期的时间桶
+
+        Args:
+            now: 当前时间戳
+
+        Returns:
+            int: 丢弃的记录数
+        """
+        removed = 0
+        # 桶内最晚的记录早于 (bucket_id + 1) * bucket_seconds
+        while self._buckets and (self._buckets[0][0] + 1) * self.bucket_seconds <= now - self.time_window:
+            _, entries = self._buckets.popleft()
+            for entry in entries:
+                # 桶按加入顺序过期，网格内最早加入的记录就是本条
+                cell = self._cells[entry.cell]
+                cell.popleft()
+                if not cell:
+                    del self._cells[entry.cell]
+                if self._tracks.get(entry.track_id) is entry:
+                    del self._tracks[entry.track_id]
+                count = self._classes[entry.class_name] - 1
+                if count:
+                    self._classes[entry.class_name] = count
+                else:
+                    del self._classes[entry.class_name]
+            removed += len(entries)
+            self.expired_buckets += 1
+        self._size -= removed
+        return removed
+
+    def add(self, track_id, bbox, timestamp: float, class_name: Optional[str] = None):
+        """
+        记录一条已成功创建的警报
+
+        Args:
+            track_id: 跟踪ID
+            bbox: 边界框 [x1, y1, x2, y2]
+            timestamp: 警报时间戳
+            class_name: 车辆类别（可选）
+        """
+        self.expire(timestamp)
+        bucket_id = math.floor(timestamp / self.bucket_seconds)
+        if self._buckets and bucket_id <= self._buckets[-1][0]:
+            # 时间戳乱序时并入最新的桶（过期判定仍按记录自身时间戳）
+            entries = self._buckets[-1][1]
+        else:
+            entries = []
+            self._buckets.append((bucket_id, entries))
+
+        bbox = tuple(bbox)
+        cell = (class_name,) + self._cell_of((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+        entry = _AlertEntry(track_id, bbox, timestamp, class_name, cell)
+        entries.append(entry)
+        self._cells.setdefault(cell, deque()).append(entry)
+        self._tracks[track_id] = entry
+        self._classes[class_name] = self._classes.get(class_name, 0) + 1
+        self._size += 1
+
+    def find_duplicate(self, track_id, bbox, now: float,
+                       class_name: Optional[str] = None) -> Optional[Tuple[_AlertEntry, float]]:
+        """
+        查找与当前车辆重复的最近警报
+
+        规则：时间窗口内同一track_id视为重复；类别相同（或任一方无类别）、
+        IoU超过阈值且时间差小于位置检查窗口时视为跟踪ID切换导致的重复。
+
+        Args:
+            track_id: 当前track ID
+            bbox: 边界框 [x1, y1, x2, y2]
+            now: 当前时间戳
+            class_name: 当前类别（可选）
+
+        Returns:
+            tuple: (重复的记录, IoU)，同一track_id时IoU为1.0；不重复返回None
+        """
+        self.expire(now)
+        self.queries += 1
+        if not self._size:
+            return None
+
+        entry = self._tracks.get(track_id)
+        if entry is not None and now - entry.timestamp < self.time_window:
+            return entry, 1.0
+
+        if class_name:
+            classes = (class_name, None) if None in self._classes else (class_name,)
+        else:
+            classes = tuple(self._classes)
+        cells = self._search_cells(bbox)
+        if cells is None:
+            keys = [key for key in self._cells if key[0] in classes]
+        else:
+            keys = [(cls,) + cell for cls in classes for cell in cells]
+
+        window = min(self.position_time_window, self.time_window)
+        for key in keys:
+            for entry in self._cells.get(key, ()):
+                if now - entry.timestamp >= window:
+                    continue
+                self.candidates_checked += 1
+                iou = bbox_iou(bbox, entry.bbox)
+                if iou > self.iou_threshold:
+                    return entry, iou
+        return None
+
+    def is_duplicate(self, track_id, bbox, now: float, class_name: Optional[str] = None) -> bool:
+        """是否为重复警报（见find_duplicate）"""
+        return self.find_duplicate(track_id, bbox, now, class_name) is not None
+
+    def clear(self):
+        """清空索引"""
+        self._buckets.clear()
+        self._cells.clear()
+        self._tracks.clear()
+        self._classes.clear()
+        self._size = 0
+
+    def get_stats(self) -> dict:
+        """
+        获取索引统计
+
+        Returns:
+            dict: size, buckets, cells, queries, candidates_per_query, expired_buckets
+        """
+        return {
+            'size': self._size,
+            'buckets': len(self._buckets),
+            'cells': len(self._cells),
+            'queries': self.queries,
+            'candidates_per_query': self.candidates_checked / self.queries if self.queries else 0.0,
+            'expired_buckets': self.expired_buckets,
+        }
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def create_alert_dedup_index(config: Optional[dict] = None) -> AlertDedupIndex:
+    """
+    从配置创建去重索引
+
+    Args:
+        config: alert_dedup 配置字典
+
+    Returns:
+        AlertDedupIndex实例
+    """
+    config = config or {}
+    return AlertDedupIndex(
+        time_window=config.get('time_window', 30.0),
+        position_time_window=config.get('position_time_window', 10.0),
+        iou_threshold=config.get('iou_threshold', 0.5),
+        cell_size=config.get('cell_size', 128.0),
+        bucket_seconds=config.get('bucket_seconds', 1.0),
+    )
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+报警事件记录与扇出投递
+
+原先每条报警在 run() 的四处（社会车辆、多目标工程车辆、单目标工程车辆、
+无信标工程车辆）各手工拼一份数据库字典，_save_snapshot_and_upload 再拼一个
+DetectionResult，上传线程又展开成 CloudClient.send_alert 的关键字参数并重新
+序列化，每条报警至少复制四次。这里：
+- AlertEvent 是带 __slots__ 的紧凑记录，由报警字典构造一次；字段名与
+  DetectionResult 一致，上传线程可直接使用
+- 云端请求体（同时作为本地报警日志和API事件流的内容）只序列化一次并缓存，
+  上传时只在末尾补充快照URL
+- AlertSink 把同一个事件依次投递给数据库、云端上传队列、本地JSON报警日志和
+  API事件流文件，单个目标失败不影响其他目标
+"""
+
+import json
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+# API事件流文件默认路径（相对路径按项目根目录解析，API服务读取同一配置项）
+DEFAULT_EVENT_STREAM_PATH = 'logs/alert_events.json'
+
+# 云端接口要求即使为空也保留的字段
+_KEEP_NULL_FIELDS = ('snapshot_path', 'image_path', 'status', 'detected_class')
+
+
+def _number(value) -> Optional[float]:
+    """numpy标量等转为Python float（None保持None）"""
+    return None if value is None else float(value)
+
+
+class AlertEvent:
+    """单条报警事件（紧凑记录，序列化结果缓存）"""
+
+    __slots__ = (
+        'track_id', 'vehicle_type', 'detected_class', 'status', 'plate_number',
+        'confidence', 'distance', 'bbox', 'beacon_mac', 'company', 'environment_code',
+        'rssi', 'match_cost', 'timestamp', 'image_path', 'db_id', '_json',
+    )
+
+    def __init__(
+        self,
+        track_id: Optional[int],
+        vehicle_type: str,
+        detected_class: Optional[str] = None,
+        status: Optional[str] = None,
+        plate_number: Optional[str] = None,
+        confidence: float = 0.0,
+        distance: Optional[float] = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        beacon_mac: Optional[str] = None,
+        company: Optional[str] = None,
+        environment_code: Optional[str] = None,
+        rssi: Optional[float] = None,
+        match_cost: Optional[float] = None,
+        timestamp: Optional[datetime] = None,
+        image_path: Optional[str] = None,
+    ):
+        self.track_id = None if track_id is None else int(track_id)
+        self.vehicle_type = vehicle_type
+        self.detected_class = detected_class
+        self.status = status
+        self.plate_number = plate_number
+        self.confidence = _number(confidence) or 0.0
+        self.distance = _number(distance)
+        self.bbox = None if bbox is None else tuple(float(v) for v in bbox[:4])
+        self.beacon_mac = beacon_mac
+        self.company = company
+        self.environment_code = environment_code
+        self.rssi = _number(rssi)
+        self.match_cost = _number(match_cost)
+        self.timestamp = timestamp or datetime.now()
+        self.image_path = image_path
+        self.db_id = None
+        self._json = None
+
+    @classmethod
+    def from_alert(cls, alert: dict, bbox, image_path: Optional[str] = None) -> 'AlertEvent':
+        """
+        从主程序的报警字典构造事件
+
+        Args:
+            alert: 报警字典
+            bbox: 边界框 (x1, y1, x2, y2)
+            image_path: 快照路径（可选）
+
+        Returns:
+            AlertEvent实例
+        """
+        return cls(
+            track_id=alert.get('track_id'),
+            vehicle_type=alert.get('type', 'Unknown'),
+            # 报警字典中可能使用detected_class、detected_type或class_name字段
+            detected_class=(alert.get('detected_class') or alert.get('detected_type')
+                            or alert.get('class_name') or 'unknown'),
+            status=alert.get('status'),
+            plate_number=alert.get('plate_number') or alert.get('plate'),
+            confidence=alert.get('confidence', 0.0),
+            distance=alert.get('distance'),
+            bbox=bbox,
+            beacon_mac=alert.get('beacon_mac'),
+            company=alert.get('company'),
+            environment_code=alert.get('environment_code'),
+            rssi=alert.get('rssi'),
+            match_cost=alert.get('match_cost'),
+            image_path=image_path,
+        )
+
+    @property
+    def is_registered(self) -> bool:
+        return self.status == 'registered'
+
+    @property
+    def metadata(self) -> Optional[dict]:
+        """信标匹配元数据（rssi, match_cost），均为空时为None"""
+        if self.rssi is None and self.match_cost is None:
+            return None
+        return {'rssi': self.rssi, 'match_cost': self.match_cost}
+
+    def to_dict(self) -> dict:
+        """
+        云端报警接口的请求体（规则与 CloudClient.send_alert 一致）
+
+        Returns:
+            dict: 请求体字典
+        """
+        timestamp = self.timestamp
+        # 无时区信息的时间按UTC处理（与send_alert一致），ISO 8601带Z后缀
+        timestamp = timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp.astimezone(timezone.utc)
+        data = {
+            'timestamp': timestamp.isoformat().replace('+00:00', 'Z'),
+            'vehicle_type': self.vehicle_type,
+            'detected_class': self.detected_class or 'unknown',
+            # 无状态时按未备案上报（is_registered由状态得出，与原上传路径一致）
+            'status': self.status or 'unregistered',
+            'plate_number': self.plate_number,
+            'confidence': self.confidence,
+            'distance': self.distance,
+            'is_registered': self.is_registered,
+            'track_id': self.track_id,
+            'bbox': dict(zip(('x1', 'y1', 'x2', 'y2'), self.bbox)) if self.bbox else None,
+            'beacon_mac': self.beacon_mac,
+            'company': self.company,
+            'environment_code': self.environment_code,
+            'metadata': self.metadata,
+            'snapshot_path': None,  # 云端要求为null
+            'image_path': None,  # 云端要求为null
+        }
+        return {k: v for k, v in data.items() if v is not None or k in _KEEP_NULL_FIELDS}
+
+    def to_json(self) -> str:
+        """序列化结果（只计算一次）"""
+        if self._json is None:
+            self._json = json.dumps(self.to_dict(), ensure_ascii=False)
+        return self._json
+
+    def cloud_body(self, snapshot_url: Optional[str] = None) -> bytes:
+        """
+        云端报警接口请求体：复用缓存的序列化结果，只在末尾补充快照URL
+
+        Args:
+            snapshot_url: 图片上传接口返回的相对路径
+
+        Returns:
+            bytes: UTF-8编码的JSON
+        """
+        body = self.to_json()
+        if snapshot_url is not None:
+            body = f'{body[:-1]}, "snapshot_url": {json.dumps(snapshot_url, ensure_ascii=False)}}}'
+        return body.encode('utf-8')
+
+
+class DatabaseTarget:
+    """写入检测结果数据库，并记录数据库ID"""
+
+    def __init__(self, database):
+        self.database = database
+
+    def __call__(self, event: AlertEvent):
+        event.db_id = self.database.insert_event(event)
+
+
+class CloudQueueTarget:
+    """放入云端上传队列（SentinelIntegration.on_detection）"""
+
+    def __init__(self, integration):
+        self.integration = integration
+
+    def __call__(self, event: AlertEvent):
+        self.integration.on_detection(event)
+
+
+class JsonLogTarget:
+    """追加到本地报警日志（每行一条JSON）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, event: AlertEvent):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(event.to_json() + '\n')
+
+
+class EventStreamTarget:
+    """
+    API事件流：保留最近N条事件，每次投递后整体写入JSON文件（先写临时文件再替换），
+    由API服务 /api/events?since=<seq> 读取增量。序号在检测程序重启后从1重新开始，
+    文件中的stream_id随之变化，客户端据此把since重置为0
+    """
+
+    def __init__(self, path: str, size: int = 100):
+        self.path = path
+        self.events = deque(maxlen=max(1, int(size)))  # [(seq, json), ...]
+        self.seq = 0
+        self.stream_id = uuid.uuid4().hex
+        self.started_at = time.time()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, event: AlertEvent):
+        self.seq += 1
+        self.events.append((self.seq, event.to_json()))
+        # 事件已是JSON文本，直接拼接，不再重新序列化
+        items = ','.join(f'{{"seq": {seq}, "event": {body}}}' for seq, body in self.events)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(f'{{"stream_id": "{self.stream_id}", "started_at": {self.started_at}, '
+                    f'"updated_at": {time.time()}, "last_seq": {self.seq}, "events": [{items}]}}')
+        os.replace(tmp_path, self.path)
+
+
+class AlertSink:
+    """把同一个报警事件扇出投递到所有目标"""
+
+    def __init__(self):
+        self.targets: List[Tuple[str, Callable[[AlertEvent], None]]] = []
+        self.published = 0
+        self.errors: Dict[str, int] = {}
+
+    def add_target(self, name: str, target: Callable[[AlertEvent], None]):
+        """
+        添加投递目标（按添加顺序投递）
+
+        Args:
+            name: 目标名（用于统计和日志）
+            target: 可调用对象 target(event)
+        """
+        self.targets.append((name, target))
+        self.errors[name] = 0
+
+    def publish(self, event: AlertEvent):
+        """
+        投递事件（单个目标失败不影响其他目标）
+
+        Args:
+            event: 报警事件
+        """
+        self.published += 1
+        for name, target in self.targets:
+            try:
+                target(event)
+            except Exception as e:
+                self.errors[name] += 1
+                print(f"⚠ 报警投递失败 ({name}, track {event.track_id}): {e}")
+
+    def get_stats(self) -> dict:
+        """
+        获取投递统计
+
+        Returns:
+            dict: published, targets, errors
+        """
+        return {
+            'published': self.published,
+            'targets': [name for name, _ in self.targets],
+            'errors': dict(self.errors),
+        }
+
+
+def create_alert_sink(
+    config: Optional[dict] = None,
+    database=None,
+    cloud_integration=None,
+    base_dir: Optional[str] = None,
+) -> AlertSink:
+    """
+    从配置创建报警扇出投递
+
+    Args:
+        config: 完整配置字典（读取 paths.alert_log_file 与 alert.event_stream）
+        database: DetectionDatabase实例（可选）
+        cloud_integration: SentinelIntegration实例（可选）
+        base_dir: 事件流相对路径的基础目录（项目根目录，与API服务一致），None表示当前目录
+
+    Returns:
+        AlertSink实例
+    """
+    config = config or {}
+    sink = AlertSink()
+    if database is not None:
+        sink.add_target('database', DatabaseTarget(database))
+    if cloud_integration is not None:
+        sink.add_target('cloud', CloudQueueTarget(cloud_integration))
+    alert_log_file = config.get('paths', {}).get('alert_log_file')
+    if alert_log_file:
+        sink.add_target('alert_log', JsonLogTarget(alert_log_file))
+    stream_cfg = config.get('alert', {}).get('event_stream', {})
+    if stream_cfg.get('enabled', True):
+        stream_path = stream_cfg.get('path', DEFAULT_EVENT_STREAM_PATH)
+        if base_dir and not os.path.isabs(stream_path):
+            stream_path = os.path.join(base_dir, stream_path)
+        sink.add_target('event_stream', EventStreamTarget(stream_path, size=stream_cfg.get('size', 100)))
+    return sink
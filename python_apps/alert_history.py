@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+有界的内存报警历史
+
+原先主程序把每条报警追加到 self.alerts 列表，只用于结束统计和统计回调里的
+len(self.alerts)，列表随运行时间无限增长，长期运行的Jetson进程会持续占用内存。
+这里内存中只保留最近N条报警（环形缓冲），同时维护按类型、按状态的累计计数器；
+更早的报警只能通过 DetectionDatabase 查询（每条报警生成时已写入数据库）。
+内存占用与运行时长无关，统计数字与完整列表计算的结果一致。
+"""
+
+from collections import Counter, deque
+from typing import Dict, Iterator, List, Optional
+
+
+class AlertHistory:
+    """最近报警环形缓冲 + 累计计数器"""
+
+    def __init__(self, capacity: int = 200):
+        """
+        初始化报警历史
+
+        Args:
+            capacity: 内存中保留的最近报警条数
+        """
+        self.capacity = max(1, int(capacity))
+        self.recent = deque(maxlen=self.capacity)
+        self.total = 0
+        self.by_type: Counter = Counter()
+        self.by_status: Counter = Counter()
+        self.by_type_status: Counter = Counter()
+
+    def add(self, alert: dict):
+        """
+        记录一条报警（超出容量时最旧的一条从内存中丢弃，计数器不变）
+
+        Args:
+            alert: 报警字典（含type、status）
+        """
+        alert_type = alert.get('type')
+        status = alert.get('status')
+        self.recent.append(alert)
+        self.total += 1
+        self.by_type[alert_type] += 1
+        self.by_status[status] += 1
+        self.by_type_status[(alert_type, status)] += 1
+
+    def set_status(self, alert: dict, status: str):
+        """
+        更新已记录报警的状态，并同步调整状态计数器
+
+        Args:
+            alert: 已通过add记录的报警字典
+            status: 新状态
+        """
+        old_status = alert.get('status')
+        if old_status == status:
+            return
+        alert_type = alert.get('type')
+        self._decrement(self.by_status, old_status)
+        self._decrement(self.by_type_status, (alert_type, old_status))
+        self.by_status[status] += 1
+        self.by_type_status[(alert_type, status)] += 1
+        alert['status'] = status
+
+    @staticmethod
+    def _decrement(counter: Counter, key):
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
+
+    def count(self, alert_type: Optional[str] = None, status: Optional[str] = None) -> int:
+        """
+        累计报警数（包括已移出内存的报警）
+
+        Args:
+            alert_type: 报警类型（None表示不限）
+            status: 报警状态（None表示不限）
+
+        Returns:
+            int: 报警数
+        """
+        if alert_type is None and status is None:
+            return self.total
+        if status is None:
+            return self.by_type.get(alert_type, 0)
+        if alert_type is None:
+            return self.by_status.get(status, 0)
+        return self.by_type_status.get((alert_type, status), 0)
+
+    def get_recent(self, limit: Optional[int] = None) -> List[dict]:
+        """
+        最近的报警（新的在前）；更早的记录请通过 DetectionDatabase.query_detections 查询
+
+        Args:
+            limit: 返回条数（None表示内存中全部）
+
+        Returns:
+            list: 报警字典列表
+        """
+        alerts = list(reversed(self.recent))
+        return alerts if limit is None else alerts[:limit]
+
+    def get_stats(self) -> Dict[str, object]:
+        """
+        获取统计
+
+        Returns:
+            dict: total, by_type, by_status, in_memory, capacity
+        """
+        return {
+            'total': self.total,
+            'by_type': dict(self.by_type),
+            'by_status': dict(self.by_status),
+            'in_memory': len(self.recent),
+            'capacity': self.capacity,
+        }
+
+    def __len__(self) -> int:
+        # 累计总数，与原 len(self.alerts) 语义一致
+        return self.total
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.recent)
+
+
+def create_alert_history(config: Optional[dict] = None) -> AlertHistory:
+    """
+    从配置创建报警历史
+
+    Args:
+        config: alert.history 配置字典
+
+    Returns:
+        AlertHistory实例
+    """
+    config = config or {}
+    return AlertHistory(capacity=config.get('memory_size', 200))
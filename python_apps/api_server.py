@@ -18,12 +18,18 @@ from urllib.parse import urlparse, parse_qs
 import threading
 import subprocess
 
+from alert_event import DEFAULT_EVENT_STREAM_PATH
+from config_loader import ConfigLoader
+
 
 class APIHandler(BaseHTTPRequestHandler):
     """API 请求处理器"""
     
-    def __init__(self, *args, project_root: str = None, **kwargs):
+    def __init__(self, *args, project_root: str = None, heatmap_path: str = None, events_path: str = None,
+                 **kwargs):
         self.project_root = project_root or os.getcwd()
+        self.heatmap_path = heatmap_path or os.path.join(self.project_root, 'logs', 'occupancy_heatmap.json')
+        self.events_path = events_path or os.path.join(self.project_root, DEFAULT_EVENT_STREAM_PATH)
         super().__init__(*args, **kwargs)
     
     def log_message(self, format: str, *args: Any) -> None:
@@ -46,6 +52,10 @@ class APIHandler(BaseHTTPRequestHandler):
                 self.handle_logs(query_params)
             elif path == '/api/stats':
                 self.handle_stats(query_params)
+            elif path == '/api/heatmap':
+                self.handle_heatmap()
+            elif path == '/api/events':
+                self.handle_events(query_params)
             elif path == '/':
                 self.handle_index()
             else:
@@ -91,6 +101,16 @@ class APIHandler(BaseHTTPRequestHandler):
                 <p>获取统计信息</p>
                 <code>curl http://localhost:8080/api/stats</code>
             </div>
+            <div class="endpoint">
+                <h3>GET /api/heatmap</h3>
+                <p>获取场地停留时间热力图（占用网格）</p>
+                <code>curl http://localhost:8080/api/heatmap</code>
+            </div>
+            <div class="endpoint">
+                <h3>GET /api/events?since=0</h3>
+                <p>获取最近的报警事件（按序号增量拉取；stream_id变化表示检测程序已重启，序号从1重新开始）</p>
+                <code>curl http://localhost:8080/api/events?since=0</code>
+            </div>
         </body>
         </html>
         """
@@ -189,20 +209,66 @@ class APIHandler(BaseHTTPRequestHandler):
         self.send_header('Content-type', 'application/json; charset=utf-8')
         self.end_headers()
         self.wfile.write(json.dumps(stats, ensure_ascii=False, indent=2).encode('utf-8'))
+    
+    def handle_heatmap(self) -> None:
+        """处理热力图查询（读取检测程序定期写入的占用网格快照）"""
+        heatmap_path = self.heatmap_path
+        
+        if os.path.exists(heatmap_path):
+            try:
+                with open(heatmap_path, 'r', encoding='utf-8') as f:
+                    heatmap = json.load(f)
+                updated_at = heatmap.get('updated_at')
+                heatmap['age_seconds'] = round(time.time() - updated_at, 1) if updated_at else None
+            except Exception as e:
+                heatmap = {"error": f"Failed to read heatmap: {e}"}
+        else:
+            heatmap = {"message": "Heatmap not found", "heatmap_path": heatmap_path}
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(json.dumps(heatmap, ensure_ascii=False).encode('utf-8'))
 
+    
+    def handle_events(self, query_params: Dict[str, list]) -> None:
+        """处理报警事件流查询（读取检测程序写入的最近报警事件，?since=<seq> 只返回之后的事件）"""
+        events_path = self.events_path
+        try:
+            since = int(query_params.get('since', ['0'])[0])
+        except ValueError:
+            self.send_error(400, "Bad Request: 'since' must be an integer")
+            return
+        
+        if os.path.exists(events_path):
+            try:
+                with open(events_path, 'r', encoding='utf-8') as f:
+                    stream = json.load(f)
+                stream['events'] = [item for item in stream.get('events', []) if item.get('seq', 0) > since]
+            except Exception as e:
+                stream = {"error": f"Failed to read alert events: {e}"}
+        else:
+            stream = {"message": "Alert events not found", "events_path": events_path, "events": []}
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(json.dumps(stream, ensure_ascii=False).encode('utf-8'))
 
-def create_handler(project_root: str):
-    """创建带项目根目录的处理器类"""
+def create_handler(project_root: str, heatmap_path: str = None, events_path: str = None):
+    """创建带项目根目录（及检测程序输出文件路径）的处理器类"""
     class Handler(APIHandler):
         def __init__(self, *args, **kwargs):
-            super().__init__(*args, project_root=project_root, **kwargs)
+            super().__init__(*args, project_root=project_root, heatmap_path=heatmap_path,
+                             events_path=events_path, **kwargs)
     return Handler
 
 
 class APIServer:
     """API 服务器"""
     
-    def __init__(self, host: str = '0.0.0.0', port: int = 8080, project_root: str = None):
+    def __init__(self, host: str = '0.0.0.0', port: int = 8080, project_root: str = None,
+                 config_path: str = None):
         """
         初始化 API 服务器
         
@@ -210,16 +276,23 @@ class APIServer:
             host: 监听地址
             port: 监听端口
             project_root: 项目根目录
+            config_path: 配置文件路径（默认 <project_root>/config.yaml），
+                         检测程序输出文件的路径从中读取，相对路径按项目根目录解析
         """
         self.host = host
         self.port = port
         self.project_root = project_root or os.getcwd()
+        config = ConfigLoader(config_path or os.path.join(self.project_root, 'config.yaml'))
+        self.heatmap_path = config.resolve_path('alert.loitering.heatmap.path', base_dir=self.project_root,
+                                                default='logs/occupancy_heatmap.json')
+        self.events_path = config.resolve_path('alert.event_stream.path', base_dir=self.project_root,
+                                               default=DEFAULT_EVENT_STREAM_PATH)
         self.server = None
         self.thread = None
     
     def start(self, daemon: bool = True) -> None:
         """启动服务器"""
-        Handler = create_handler(self.project_root)
+        Handler = create_handler(self.project_root, self.heatmap_path, self.events_path)
         self.server = HTTPServer((self.host, self.port), Handler)
         
         if daemon:
@@ -252,11 +325,12 @@ if __name__ == '__main__':
     parser.add_argument('--host', type=str, default='0.0.0.0', help='监听地址')
     parser.add_argument('--port', type=int, default=8080, help='监听端口')
     parser.add_argument('--project-root', type=str, default=None, help='项目根目录')
+    parser.add_argument('--config', type=str, default=None, help='配置文件路径（默认 <项目根目录>/config.yaml）')
     
     args = parser.parse_args()
     
     project_root = args.project_root or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     
-    server = APIServer(host=args.host, port=args.port, project_root=project_root)
+    server = APIServer(host=args.host, port=args.port, project_root=project_root, config_path=args.config)
     server.start(daemon=False)
 
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+异步车牌识别处理器
+
+主循环为社会车辆提交车辆ROI，由线程池或多进程识别池在后台识别，
+主循环每帧非阻塞地读取结果。同一track的多次识别结果经多帧融合后更新报警，
+融合结果确定前主循环按频率限制继续为该track提交新的ROI。
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from best_frame_lpr import calculate_frame_quality
+from bounded_cache import create_bounded_cache
+from lpr_engine import LPRBatchDispatcher, recognize_plate_batch
+from plate_fusion import create_plate_fusion
+from roi_quality import roi_sharpness
+
+# 异步识别路径创建的社会车辆报警类型（'civilian'为同步路径的旧类型）
+CIVILIAN_ALERT_TYPES = ('social_vehicle', 'civilian')
+
+
+class AsyncLPRProcessor:
+    """异步车牌识别处理器"""
+    
+    def __init__(self, lpr_detector, max_workers=2, max_queue_size=10, engine=None,
+                 strategy='full', fallback_full=False, batch_config=None, scheduler_config=None,
+                 cache_config=None, fusion_config=None, quality_scorer=None):
+        """
+        初始化异步LPR处理器
+        
+        Args:
+            lpr_detector: HyperLPR检测器（使用多进程识别池时可为None）
+            max_workers: 线程池最大工作线程数
+            max_queue_size: 任务队列最大大小
+            engine: 多进程识别池LPRProcessPool（可选，提供时不再使用线程池；需以raise_errors=True创建）
+            strategy: 线程池识别策略 full/plate_first（多进程识别池使用自身配置）
+            fallback_full: plate_first未识别出车牌时是否按full再识别
+            batch_config: 微批配置 {'max_batch_size', 'max_wait'}
+            scheduler_config: 调度配置 {'deadline', 'max_retries', 'retry_delay', 'removed_track_ttl'}
+            cache_config: 按track保存状态的缓存配置 {'capacity', 'ttl'}
+            fusion_config: 多帧车牌融合配置（lpr.fusion）
+            quality_scorer: 统一ROI质量评分器RoiQualityScorer（可选）
+        """
+        self.lpr_detector = lpr_detector
+        self.quality_scorer = quality_scorer
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(max_workers=max_workers) if engine is None else None
+        # 按track_id保存的状态使用有界缓存，长期运行时内存不随历史车辆数增长
+        self.pending_tasks = create_bounded_cache(cache_config, 'LPR待处理任务',
+                                                  on_evict=self._on_pending_evicted)  # {track_id: (Future, 帧质量)}
+        self.last_recognition_time = create_bounded_cache(cache_config, 'LPR识别时间')  # {track_id: timestamp}
+        self.recognition_results = create_bounded_cache(cache_config, 'LPR识别结果')  # {track_id: (plate_number, confidence)}
+        # 多帧融合：同一track的多次识别结果按字符投票，结果确定后不再安排识别
+        self.fusion = create_plate_fusion(fusion_config, cache_config)
+        self.lock = threading.Lock()
+        
+        # 配置
+        scheduler_config = scheduler_config or {}
+        self.min_recognition_interval = 1.0  # 每个track_id最小识别间隔（秒）
+        self.max_retries = scheduler_config.get('max_retries', 3)  # 最大重试次数
+        self.retry_delay = scheduler_config.get('retry_delay', 0.5)  # 重试延迟（秒）
+        # 跟踪器移除track时仍有识别在排队/执行：保留任务直到结果被读取或超时（{track_id: 移除时间}）
+        self.retiring = {}
+        self.removed_track_ttl = scheduler_config.get('removed_track_ttl', 10.0)
+        self.strategy = strategy
+        self.fallback_full = fallback_full
+        
+        # 调度：按帧质量优先、带截止时间，失败后延迟重新入队（不在工作线程中sleep），
+        # 同一时间窗口内多个track的ROI合并为一次后端调用
+        batch_config = batch_config or {}
+        max_batch_size = batch_config.get('max_batch_size', 1)
+        if engine is not None:
+            max_batch_size = min(max_batch_size, engine.num_slots)
+        self.scheduler = LPRBatchDispatcher(
+            engine.submit_batch if engine is not None else self._submit_batch_to_executor,
+            max_batch_size=max_batch_size,
+            max_wait=batch_config.get('max_wait', 0.02),
+            max_pending=max_queue_size,
+            deadline=scheduler_config.get('deadline', 3.0),
+            max_retries=self.max_retries,
+            retry_delay=self.retry_delay,
+            max_inflight=engine.num_workers if engine is not None else max_workers
+        )
+        
+    def _check_roi_quality(self, roi):
+        """
+        检查ROI质量（清晰度）
+        
+        Args:
+            roi: 车辆ROI图像
+            
+        Returns:
+            bool: 是否通过质量检查
+        """
+        if roi is None or roi.size == 0:
+            return False
+        
+        # 全分辨率uint8灰度图上的拉普拉斯方差（门限与原先float64计算同一尺度）
+        if self.quality_scorer is not None:
+            return self.quality_scorer.is_sharp(roi)
+        
+        # 清晰度阈值（可调整）
+        clarity_threshold = 100.0
+        
+        return roi_sharpness(roi) > clarity_threshold
+    
+    def _on_pending_evicted(self, track_id, task, reason):
+        """待处理任务被淘汰时取消其调度请求"""
+        future, _ = task
+        if not future.done():
+            self.scheduler.cancel(track_id)
+    
+    def _submit_batch_to_executor(self, rois):
+        """线程池后端的批处理函数（重试由调度器负责）"""
+        return self.executor.submit(recognize_plate_batch, self.lpr_detector, rois, 0, 0.0,
+                                    self.strategy, self.fallback_full, True)
+    
+    def _needs_recognition_locked(self, track_id, current_time):
+        """频率限制、待处理任务和融合结果检查（调用方持锁）"""
+        # 检查识别频率限制
+        last_time = self.last_recognition_time.get(track_id)
+        if last_time is not None and current_time - last_time < self.min_recognition_interval:
+            return False  # 频率限制
+        
+        # 检查是否已有待处理任务
+        if track_id in self.pending_tasks:
+            return False  # 已有待处理任务
+        
+        # 融合结果已确定，不再识别
+        if self.fusion is not None and self.fusion.is_settled(track_id):
+            return False
+        return True
+    
+    def needs_recognition(self, track_id):
+        """
+        track是否应再提交一次识别（融合结果未确定、无待处理任务且超过频率限制间隔），
+        主循环据此决定是否为已报警的track裁剪新的ROI
+        
+        Args:
+            track_id: 跟踪ID
+            
+        Returns:
+            bool: 是否需要识别
+        """
+        with self.lock:
+            return self._needs_recognition_locked(track_id, time.time())
+    
+    def submit_recognition(self, track_id, roi_bgr, class_name, priority=0.0):
+        """
+        提交车牌识别任务
+        
+        Args:
+            track_id: 跟踪ID
+            roi_bgr: 车辆ROI（BGR格式）
+            class_name: 车辆类别名称
+            priority: 优先级（帧质量分数，越高越先识别）
+            
+        Returns:
+            bool: 是否成功提交
+        """
+        # 仅对特定车型触发（car和truck）
+        if class_name not in ['car', 'truck']:
+            return False
+        
+        current_time = time.time()
+        with self.lock:
+            if not self._needs_recognition_locked(track_id, current_time):
+                return False
+        
+        # 检查ROI质量（不持锁）
+        if not self._check_roi_quality(roi_bgr):
+            return False  # ROI质量不足
+        
+        with self.lock:
+            if track_id in self.pending_tasks:
+                return False  # 检查质量期间已有任务提交
+            
+            # 提交任务
+            try:
+                # 队列已满时本次不提交
+                future = self.scheduler.submit(track_id, roi_bgr, priority=priority)
+                if future is None:
+                    return False
+                self.pending_tasks[track_id] = (future, priority)
+                self.last_recognition_time[track_id] = current_time
+                return True
+            except Exception as e:
+                print(f"  ⚠ 提交LPR任务失败: {e}")
+                return False
+    
+    def get_result(self, track_id):
+        """
+        获取识别结果（非阻塞）
+        
+        Args:
+            track_id: 跟踪ID
+            
+        Returns:
+            tuple: (plate_number, confidence) 或 (None, None) 如果未完成；
+                   启用多帧融合时返回融合后的结果
+        """
+        with self.lock:
+            task = self.pending_tasks.get(track_id)
+            if task is None:
+                # 检查是否有缓存结果
+                return self.recognition_results.get(track_id, (None, None))
+            
+            future, quality = task
+            if future.done():
+                try:
+                    plate_number, confidence = future.result()
+                    if self.fusion is not None:
+                        plate_number, confidence = self.fusion.add(track_id, plate_number, confidence, quality)
+                    # 缓存结果
+                    self.recognition_results[track_id] = (plate_number, confidence)
+                    # 移除待处理任务
+                    self.pending_tasks.pop(track_id)
+                    return plate_number, confidence
+                except Exception as e:
+                    print(f"  ⚠ LPR任务执行失败: {e}")
+                    self.pending_tasks.pop(track_id)
+                    if self.fusion is not None:
+                        self.fusion.add(track_id, None, 0.0)  # 计入识别次数上限
+                    return None, None
+            else:
+                # 任务还在执行中
+                return None, None
+    
+    def cancel(self, track_id):
+        """
+        取消track的识别任务（track结束时调用）
+        
+        Args:
+            track_id: 跟踪ID
+        """
+        with self.lock:
+            task = self.pending_tasks.pop(track_id)
+            if task is not None and not task[0].done():
+                self.scheduler.cancel(track_id)
+            self.last_recognition_time.pop(track_id, None)
+    
+    def on_track_removed(self, track_id):
+        """
+        track被跟踪器移除时的处理：仍有识别在排队/执行时保留任务（跟踪器丢失一帧即移除track，
+        已提交的识别结果仍应参与融合），由collect_retired在结果读取后或超时时结束；
+        否则立即取消，并清除过期的识别结果
+        
+        Args:
+            track_id: 跟踪ID
+        """
+        with self.lock:
+            if track_id in self.pending_tasks:
+                self.retiring[track_id] = time.time()
+                return
+        self.cancel(track_id)
+        self.recognition_results.purge_expired()
+        if self.fusion is not None:
+            self.fusion.tracks.purge_expired()
+    
+    def is_retiring(self, track_id):
+        """
+        track是否已被跟踪器移除但识别仍在进行
+        
+        Args:
+            track_id: 跟踪ID
+            
+        Returns:
+            bool: 是否等待识别结束
+        """
+        with self.lock:
+            return track_id in self.retiring
+    
+    def collect_retired(self, current_time=None):
+        """
+        结束已移除track的等待：识别结果已被get_result读取，或超过removed_track_ttl（取消仍未完成的任务）
+        
+        Args:
+            current_time: 当前时间（默认time.time()）
+            
+        Returns:
+            list: 本次结束等待的track ID
+        """
+        current_time = time.time() if current_time is None else current_time
+        with self.lock:
+            done = [track_id for track_id, removed_at in self.retiring.items()
+                    if track_id not in self.pending_tasks
+                    or current_time - removed_at >= self.removed_track_ttl]
+            for track_id in done:
+                del self.retiring[track_id]
+        for track_id in done:
+            self.cancel(track_id)
+        return done
+    
+    def cleanup(self, active_track_ids):
+        """
+        取消已结束track的未完成任务（已得到的结果保留，供警报更新）
+        
+        Args:
+            active_track_ids: 当前活跃的track ID集合
+        """
+        with self.lock:
+            ended = [track_id for track_id in set(self.pending_tasks) | set(self.last_recognition_time)
+                     if track_id not in active_track_ids and track_id not in self.retiring]
+        for track_id in ended:
+            self.cancel(track_id)
+        self.recognition_results.purge_expired()
+        if self.fusion is not None:
+            self.fusion.tracks.purge_expired()
+    
+    def is_settled(self, track_id):
+        """
+        track的车牌结果是否已确定（未启用融合时，有识别结果即视为确定）
+        
+        Args:
+            track_id: 跟踪ID
+            
+        Returns:
+            bool: 是否已确定
+        """
+        if self.fusion is not None:
+            return self.fusion.is_settled(track_id)
+        return self.recognition_results.get(track_id, (None, None))[0] is not None
+    
+    def get_cache_stats(self):
+        """
+        获取按track缓存的统计
+        
+        Returns:
+            dict: {缓存名称: 统计字典}
+        """
+        return {cache.name: cache.get_stats()
+                for cache in (self.recognition_results, self.last_recognition_time, self.pending_tasks)}
+    
+    def shutdown(self):
+        """关闭处理器"""
+        self.scheduler.shutdown()
+        if self.engine is not None:
+            self.engine.shutdown(wait=True)
+        else:
+            self.executor.shutdown(wait=True)
+
+
+def submit_track_roi(async_lpr, track_id, frame_ring, frame_seq, bbox, class_name, roi_quality=None,
+                     detection_confidence=0.0, best_frame=None):
+    """
+    为track提交异步识别，像素只在确定提交时才从共享帧缓冲区裁剪
+
+    启用最佳帧选择时每帧只记录候选 (帧序号, bbox, 分数)，可以识别（无待处理任务、
+    超过频率限制间隔）且最佳帧达到质量阈值或等待超时后，裁剪最佳帧提交。
+
+    Args:
+        async_lpr: AsyncLPRProcessor实例
+        track_id: 跟踪ID
+        frame_ring: 共享帧缓冲区FrameRing（帧为RGB）
+        frame_seq: 当前帧序号
+        bbox: 原图坐标边界框 (x1, y1, x2, y2)
+        class_name: 车辆类别名称
+        roi_quality: 本帧统一ROI质量评分（可选）
+        detection_confidence: 检测置信度（无质量评分时用于计算优先级）
+        best_frame: BestFrameLPR实例（可选）
+
+    Returns:
+        bool: 是否成功提交
+    """
+    if roi_quality is not None:
+        quality = roi_quality.total
+    else:
+        frame = frame_ring.get(frame_seq)
+        if frame is None:
+            return False
+        quality = calculate_frame_quality(bbox, detection_confidence, frame.shape)
+    if best_frame is not None:
+        ready = best_frame.update(track_id, frame_seq, bbox, quality)
+        if not ready or not async_lpr.needs_recognition(track_id):
+            return False
+        vehicle_roi_bgr, quality = best_frame.take_best_roi(track_id)
+        if vehicle_roi_bgr is None:
+            # 最佳帧已被丢弃，使用当前帧
+            vehicle_roi_bgr = frame_ring.crop(frame_seq, bbox, convert=cv2.COLOR_RGB2BGR)
+    else:
+        if not async_lpr.needs_recognition(track_id):
+            return False
+        vehicle_roi_bgr = frame_ring.crop(frame_seq, bbox, convert=cv2.COLOR_RGB2BGR)
+    if vehicle_roi_bgr is None:
+        return False
+    return async_lpr.submit_recognition(track_id, vehicle_roi_bgr, class_name, priority=quality)
+
+
+def awaiting_plate(async_lpr, track_id, alert):
+    """
+    已报警的社会车辆是否仍在等待车牌：报警仍在识别中且融合结果未确定
+
+    Args:
+        async_lpr: AsyncLPRProcessor实例
+        track_id: 跟踪ID
+        alert: 该track的报警字典（可为None）
+
+    Returns:
+        bool: 是否仍需要识别结果
+    """
+    return (alert is not None and alert.get('type') in CIVILIAN_ALERT_TYPES
+            and alert.get('status') in ('identifying', 'identified')
+            and not async_lpr.is_settled(track_id))
+
+
+def apply_plate_results(async_lpr, alerts_dict, alert_history, best_frame_lpr=None):
+    """
+    读取异步识别（融合）结果并更新社会车辆报警
+
+    融合结果确定前报警保持 identifying/identified 状态，车牌号随投票更新；
+    只有融合结果确定（识别次数用尽）仍无车牌时才标记为识别失败。
+
+    Args:
+        async_lpr: AsyncLPRProcessor实例
+        alerts_dict: {track_id: alert} 当前活跃报警
+        alert_history: AlertHistory实例（更新状态计数）
+        best_frame_lpr: BestFrameLPR实例（可选，结果确定后记录供复用）
+
+    Returns:
+        list: 车牌号或状态发生变化的track ID
+    """
+    changed = []
+    for track_id in list(alerts_dict.keys()):
+        alert = alerts_dict.get(track_id)
+        if not alert or alert.get('type') not in CIVILIAN_ALERT_TYPES:
+            continue
+        if alert.get('status') not in ('identifying', 'identified'):
+            continue
+        plate_number, confidence = async_lpr.get_result(track_id)
+        if plate_number:
+            # 融合结果确定后更新最佳帧选择器状态（供复用；已移除的track不再需要）
+            if best_frame_lpr and async_lpr.is_settled(track_id) and not async_lpr.is_retiring(track_id):
+                best_frame_lpr.on_lpr_complete(track_id, plate_number, confidence)
+            if alert.get('plate') != plate_number:
+                alert_history.set_status(alert, 'identified')
+                alert['plate'] = plate_number
+                alert['plate_number'] = plate_number
+                alert['message'] = f"社会车辆 {plate_number}"
+                changed.append(track_id)
+                print(f"  ✅ Track#{track_id} 车牌识别完成: {plate_number}")
+        elif confidence is None or alert.get('status') == 'identified':
+            # 任务还在执行中（或已有车牌），继续等待
+            pass
+        elif async_lpr.fusion is None or async_lpr.is_settled(track_id):
+            # 识别失败（启用融合时为识别次数用尽）
+            alert_history.set_status(alert, 'failed')
+            alert['message'] = f"社会车辆（未识别车牌）"
+            changed.append(track_id)
+    # 已移除track的识别结果读取后（或超时）结束等待并移除其报警；不会再有新的识别，仍无车牌即为识别失败
+    for track_id in async_lpr.collect_retired():
+        alert = alerts_dict.pop(track_id, None)
+        if alert and alert.get('type') in CIVILIAN_ALERT_TYPES and alert.get('status') == 'identifying':
+            alert_history.set_status(alert, 'failed')
+            alert['message'] = "社会车辆（未识别车牌）"
+            changed.append(track_id)
+    return changed
+
+
+def release_track(async_lpr, alerts_dict, track_id):
+    """
+    track被跟踪器移除时处理其报警和识别任务：识别仍在排队/执行时保留报警，
+    由apply_plate_results在读取结果（或超时）后移除；否则取消识别并立即移除报警
+
+    Args:
+        async_lpr: AsyncLPRProcessor实例（可为None）
+        alerts_dict: {track_id: alert} 当前活跃报警
+        track_id: 被移除的跟踪ID
+    """
+    if async_lpr is not None:
+        async_lpr.on_track_removed(track_id)
+        if async_lpr.is_retiring(track_id):
+            return
+    alerts_dict.pop(track_id, None)
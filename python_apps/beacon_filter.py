@@ -10,6 +10,8 @@ from collections import defaultdict
 import os
 import numpy as np
 
+from beacon_stats import BeaconStatsTable
+
 
 class BeaconFilter:
     """BLE信标智能过滤器"""
@@ -70,13 +72,23 @@ class BeaconFilter:
         self.match_cost_threshold = multi_target_cfg.get('match_cost_threshold', 5.0)
         self.time_stability_weight = multi_target_cfg.get('time_stability_weight', 0.3)
         self.stability_window = multi_target_cfg.get('stability_window', 3.0)
+        # 分配结果缓存：输入（深度/信标距离/稳定度代价）变化不超过容差时复用上次分配
+        self.assignment_cache_tolerance = multi_target_cfg.get('cache_tolerance', 0.5)
+        self._assignment_cache = {}  # {车辆类型: 上次分配}（只在检测线程中读写）
+        self._assignment_whitelist = None  # 分配缓存对应的白名单字典
+        self.assignment_cache_hits = 0
+        self.assignment_cache_misses = 0
+        # (白名单字典, {MAC: 标准化车辆类型})，一次赋值整体替换。白名单字典发布后不再原地修改：
+        # 更新线程在副本上应用变化后替换引用，检测线程取一次引用即可一致读取，无需加锁
+        self._type_index_state = None
+        self._cloud_whitelist_version = None  # 已应用的云端白名单版本（用于增量刷新）
         
         # 白名单（激活的信标MAC地址集合）
         self.whitelist = self._build_whitelist()
         
-        # 信标历史记录（用于时间窗口过滤）
-        # {mac: [(timestamp, rssi, distance), ...]}
-        self.beacon_history = defaultdict(list)
+        # 信标历史记录（用于时间窗口过滤和稳定度统计）
+        # 每个MAC一个环形缓冲区，入队时增量更新窗口内RSSI/距离的均值和方差
+        self.beacon_history = BeaconStatsTable(self.history_size, self.stability_window)
         
         print(f"✅ 信标过滤器初始化成功")
         print(f"   📹 摄像头: {self.camera_config.get('name', camera_id)}")
@@ -104,8 +116,10 @@ class BeaconFilter:
         if self.use_cloud_whitelist and self.cloud_whitelist_manager:
             try:
                 # 获取白名单字典（如果force_update=True，会强制从云端获取最新）
+                version = getattr(self.cloud_whitelist_manager, 'version', None)
                 cloud_whitelist = self.cloud_whitelist_manager.get_whitelist_dict(force_update=force_update)
                 if cloud_whitelist:
+                    self._cloud_whitelist_version = version
                     print(f"  ✅ 从云端获取白名单: {len(cloud_whitelist)} 个信标")
                     return cloud_whitelist
                 else:
@@ -114,6 +128,7 @@ class BeaconFilter:
                 print(f"  ⚠️  获取云端白名单失败: {e}，使用本地配置")
         
         # 使用本地配置文件
+        self._cloud_whitelist_version = None
         whitelist = {}
         beacons = self.camera_config.get('beacons', [])
         
@@ -144,10 +159,49 @@ class BeaconFilter:
                     print(f"  📡 已从云端获取最新白名单")
                 else:
                     print(f"  ⚠️  从云端获取白名单失败，使用缓存数据")
-            # 重新构建白名单字典
+            # 只应用云端变化的条目；变更日志不足时重新构建白名单字典
+            if self._apply_cloud_changes():
+                return
             self.whitelist = self._build_whitelist(force_update=False)  # 已经fetch了，不需要再次fetch
             print(f"  ✅ 白名单已刷新: {len(self.whitelist)} 个信标")
     
+    def _apply_cloud_changes(self) -> bool:
+        """
+        增量应用云端白名单变化（只更新变化的MAC及其类型索引）
+        
+        Returns:
+            bool: 是否已增量应用（False表示需要全量重建）
+        """
+        get_changes = getattr(self.cloud_whitelist_manager, 'get_changes', None)
+        if get_changes is None or self._cloud_whitelist_version is None:
+            return False
+        version, changes = get_changes(self._cloud_whitelist_version)
+        if changes is None:
+            return False
+        if not changes:
+            return True
+        
+        # 在副本上应用变化再整体替换（检测线程可能正在读取旧字典）；分配缓存由检测线程自行失效
+        whitelist = dict(self.whitelist)
+        state = self._type_index_state
+        type_index = dict(state[1]) if state is not None and state[0] is self.whitelist else None
+        for mac, info in changes.items():
+            mac = mac.upper()
+            if info is None:
+                whitelist.pop(mac, None)
+                if type_index is not None:
+                    type_index.pop(mac, None)
+            else:
+                whitelist[mac] = info
+                if type_index is not None:
+                    type_index[mac] = self._normalize_type(info.get('vehicle_type', 'unknown'))
+        if type_index is not None:
+            self._type_index_state = (whitelist, type_index)
+        self.whitelist = whitelist
+        self._cloud_whitelist_version = version
+        print(f"  ✅ 白名单增量更新: {len(changes)} 个信标变化，共 {len(self.whitelist)} 个")
+        return True
+    
     def filter_beacons(
         self, 
         scanned_beacons: List[Dict],
@@ -218,12 +272,14 @@ class BeaconFilter:
     
     def _filter_by_whitelist(self, beacons: List[Dict]) -> List[Dict]:
         """白名单过滤"""
+        whitelist = self.whitelist  # 本次过滤使用同一个白名单快照
         filtered = []
         for beacon in beacons:
             mac = beacon.get('mac', '').upper()
-            if mac in self.whitelist:
+            info = whitelist.get(mac)
+            if info is not None:
                 # 添加车辆信息
-                beacon_info = self.whitelist[mac].copy()
+                beacon_info = info.copy()
                 beacon_info.update(beacon)
                 filtered.append(beacon_info)
         return filtered
@@ -245,21 +301,12 @@ class BeaconFilter:
         return filtered
     
     def _update_history(self, beacons: List[Dict], current_time: float):
-        """更新信标历史记录"""
+        """更新信标历史记录（环形缓冲区自动淘汰最旧记录）"""
         for beacon in beacons:
-            mac = beacon['mac']
-            history = self.beacon_history[mac]
-            
-            # 添加新记录
-            history.append({
-                'timestamp': current_time,
-                'rssi': beacon['rssi'],
-                'distance': beacon.get('distance', 0)
-            })
-            
-            # 限制历史记录大小
-            if len(history) > self.history_size:
-                history.pop(0)
+            distance = beacon.get('distance', 0)
+            if not isinstance(distance, (int, float)):
+                distance = 0
+            self.beacon_history.add(beacon['mac'], current_time, beacon['rssi'], distance)
     
     def _filter_by_time_window(self, beacons: List[Dict], current_time: float) -> List[Dict]:
         """时间窗口过滤：只保留持续出现的信标"""
@@ -267,13 +314,13 @@ class BeaconFilter:
         
         for beacon in beacons:
             mac = beacon['mac']
-            history = self.beacon_history.get(mac, [])
+            history = self.beacon_history.get(mac)
             
             if not history:
                 continue
             
             # 计算持续时间
-            first_seen = history[0]['timestamp']
+            first_seen = history.first_seen
             duration = current_time - first_seen
             
             if duration >= self.min_duration:
@@ -358,77 +405,20 @@ class BeaconFilter:
         
         return scored
     
-    def _calculate_time_stability_penalty(self, beacon: Dict) -> float:
+    def _calculate_time_stability_penalty(self, beacon: Dict, current_time: Optional[float] = None) -> float:
         """
-        计算时间稳定度惩罚
+        计算时间稳定度惩罚（O(1)查询滚动统计）
         
         Args:
             beacon: 信标信息
+            current_time: 当前时间（默认time.time()）
             
         Returns:
             惩罚值（0.0-1.0），波动越大惩罚越高
         """
-        mac = beacon.get('mac', '')
-        if mac not in self.beacon_history:
-            return 0.0  # 无历史数据，不惩罚
-        
-        history = self.beacon_history[mac]
-        if len(history) < 2:
-            return 0.0  # 历史数据不足，不惩罚
-        
-        # 获取时间窗口内的数据
-        import time
-        current_time = time.time()
-        
-        # 处理历史记录格式（可能是字典或元组）
-        window_data = []
-        for record in history:
-            if isinstance(record, dict):
-                # 字典格式: {'timestamp': t, 'rssi': rssi, 'distance': dist}
-                t = record.get('timestamp', 0)
-                rssi = record.get('rssi', -100)
-                dist = record.get('distance', 0)
-            elif isinstance(record, (list, tuple)) and len(record) >= 3:
-                # 元组格式: (t, rssi, dist)
-                t, rssi, dist = record[0], record[1], record[2]
-            else:
-                continue  # 跳过无效格式
-            
-            # 确保时间戳是数值类型
-            if isinstance(t, str):
-                try:
-                    t = float(t)
-                except (ValueError, TypeError):
-                    continue  # 跳过无效时间戳
-            
-            # 检查是否在时间窗口内
-            if isinstance(t, (int, float)) and current_time - t <= self.stability_window:
-                window_data.append((t, rssi, dist))
-        
-        if len(window_data) < 2:
-            return 0.0  # 窗口内数据不足
-        
-        # 计算RSSI标准差
-        rssi_values = [rssi for _, rssi, _ in window_data]
-        if len(rssi_values) > 1:
-            rssi_std = np.std(rssi_values)
-            # RSSI标准差 > 10dBm 认为不稳定
-            rssi_penalty = min(1.0, rssi_std / 10.0)
-        else:
-            rssi_penalty = 0.0
-        
-        # 计算距离标准差（如果有距离信息）
-        dist_values = [dist for _, _, dist in window_data if isinstance(dist, (int, float)) and dist > 0]
-        if len(dist_values) > 1:
-            dist_std = np.std(dist_values)
-            # 距离标准差 > 2m 认为不稳定
-            dist_penalty = min(1.0, dist_std / 2.0)
-        else:
-            dist_penalty = 0.0
-        
-        # 综合惩罚（取较大值）
-        penalty = max(rssi_penalty, dist_penalty)
-        return penalty
+        if current_time is None:
+            current_time = time.time()
+        return self.beacon_history.penalty(beacon.get('mac', ''), current_time)
     
     def get_best_match(
         self, 
@@ -494,209 +484,209 @@ class BeaconFilter:
                 })
             return results
         
-        # 过滤信标（只保留白名单中的）
-        filtered_beacons = []
+        # 过滤信标（只保留白名单中的），按白名单车辆类型分组
+        whitelist, type_index = self._get_type_index()
+        beacons_by_type = defaultdict(list)
         for beacon in scanned_beacons:
             mac = beacon.get('mac', '').upper()
-            if mac in self.whitelist:
-                # 添加白名单中的车辆类型信息
-                beacon_info = self.whitelist[mac].copy()
-                beacon_info.update(beacon)
-                filtered_beacons.append(beacon_info)
+            beacon_type = type_index.get(mac)
+            if beacon_type is not None:
+                beacons_by_type[beacon_type].append((mac, beacon))
         
-        if len(filtered_beacons) == 0:
+        if len(beacons_by_type) == 0:
             # 无有效信标，返回未匹配
             print(f"  ⚠️  [匹配] 无有效信标，所有车辆标记为未备案")
-            return [{
-                'track_id': v.get('track_id'),
-                'beacon_info': None,
-                'cost': None,
-                'matched': False
-            } for v in vehicles]
-        
-        # 按车辆类型分组
-        from collections import defaultdict
+            self._assignment_cache.clear()
+            return [self._unmatched_result(v) for v in vehicles]
+        
+        # 按车辆类型分组（excavator, loader, dump-truck等）
         vehicles_by_type = defaultdict(list)
         for i, vehicle in enumerate(vehicles):
-            detected_class = vehicle.get('detected_class', 'unknown')
-            # 标准化车辆类型名称（excavator, loader, dump-truck等）
-            normalized_type = detected_class.replace('-', '_').lower()
-            vehicles_by_type[normalized_type].append((i, vehicle))
+            normalized_type = self._normalize_type(vehicle.get('detected_class', 'unknown'))
+            vehicles_by_type[normalized_type].append(i)
         
-        beacons_by_type = defaultdict(list)
-        for j, beacon in enumerate(filtered_beacons):
-            beacon_type = beacon.get('vehicle_type', 'unknown')
-            # 标准化信标类型名称
-            normalized_type = beacon_type.replace('-', '_').lower()
-            beacons_by_type[normalized_type].append((j, beacon))
-        
-        # 打印统计信息
-        print(f"\n  📊 [匹配] 车辆与信标统计:")
-        for vtype in set(list(vehicles_by_type.keys()) + list(beacons_by_type.keys())):
-            vehicle_count = len(vehicles_by_type.get(vtype, []))
-            beacon_count = len(beacons_by_type.get(vtype, []))
-            if vehicle_count > 0 or beacon_count > 0:
-                print(f"    {vtype}: {vehicle_count} 辆车, {beacon_count} 个信标")
-                if vehicle_count > beacon_count:
-                    print(f"      ⚠️  车辆数量({vehicle_count}) > 信标数量({beacon_count})，将标记 {vehicle_count - beacon_count} 辆车为未备案")
-        
-        # 按类型分组匹配
         all_results = [None] * len(vehicles)  # 预分配结果列表
-        used_beacon_indices = set()  # 记录已使用的信标索引（全局）
+        current_time = time.time()
         
-        for vtype, vehicle_list in vehicles_by_type.items():
+        for vtype, vehicle_indices in vehicles_by_type.items():
             type_beacons = beacons_by_type.get(vtype, [])
             
             if len(type_beacons) == 0:
                 # 该类型无信标，所有车辆标记为未备案
-                print(f"  ⚠️  [匹配] {vtype} 类型无信标，{len(vehicle_list)} 辆车标记为未备案")
-                for orig_idx, vehicle in vehicle_list:
-                    all_results[orig_idx] = {
-                        'track_id': vehicle.get('track_id'),
-                        'beacon_info': None,
-                        'cost': None,
-                        'matched': False
-                    }
+                print(f"  ⚠️  [匹配] {vtype} 类型无信标，{len(vehicle_indices)} 辆车标记为未备案")
+                for orig_idx in vehicle_indices:
+                    all_results[orig_idx] = self._unmatched_result(vehicles[orig_idx])
+                self._assignment_cache.pop(vtype, None)
                 continue
             
-            # 该类型有信标，进行匹配
-            type_vehicles = [v for _, v in vehicle_list]
-            type_beacon_list = [b for _, b in type_beacons]
+            # 如果车辆数量 > 信标数量，只匹配前N个车辆（N=信标数量），其余标记为未备案
+            num_beacons = len(type_beacons)
+            match_indices = vehicle_indices[:num_beacons]
+            for orig_idx in vehicle_indices[num_beacons:]:
+                all_results[orig_idx] = self._unmatched_result(vehicles[orig_idx])
             
-            # 如果车辆数量 > 信标数量，只匹配信标数量个车辆
-            if len(type_vehicles) > len(type_beacon_list):
-                print(f"  ⚠️  [匹配] {vtype} 类型: {len(type_vehicles)} 辆车 > {len(type_beacon_list)} 个信标")
-                print(f"      只能匹配 {len(type_beacon_list)} 辆车，其余标记为未备案")
-                # 只匹配前N个车辆（N=信标数量）
-                vehicles_to_match = type_vehicles[:len(type_beacon_list)]
-                vehicles_unmatched = type_vehicles[len(type_beacon_list):]
-            else:
-                vehicles_to_match = type_vehicles
-                vehicles_unmatched = []
+            # 构建该类型的代价矩阵（NumPy数组，向量化）
+            # 代价 = |相机深度 - 信标距离| + 稳定度惩罚 × 稳定窗口，无深度信息的车辆整行为inf
+            vehicle_depths = np.array(
+                [np.nan if vehicles[i].get('camera_depth') is None else vehicles[i]['camera_depth']
+                 for i in match_indices],
+                dtype=np.float64
+            )
+            macs = tuple(mac for mac, _ in type_beacons)
+            beacon_distances = np.array([b.get('distance', 0) for _, b in type_beacons], dtype=np.float64)
+            stability_costs = self.beacon_history.penalties(
+                (b.get('mac', '') for _, b in type_beacons), current_time
+            ) * self.stability_window
+            cost_matrix = np.abs(vehicle_depths[:, None] - beacon_distances[None, :]) + stability_costs[None, :]
+            cost_matrix[np.isnan(vehicle_depths)] = np.inf
             
-            # 对需要匹配的车辆构建代价矩阵
-            num_vehicles = len(vehicles_to_match)
-            num_beacons = len(type_beacon_list)
-            cost_matrix = np.full((num_vehicles, num_beacons), np.inf)
+            # 输入变化不超过容差时复用上次分配，否则重新求解
+            track_ids = tuple(vehicles[i].get('track_id') for i in match_indices)
+            assignment = self._lookup_assignment(vtype, track_ids, macs, vehicle_depths,
+                                                 beacon_distances, stability_costs)
+            if assignment is None:
+                self.assignment_cache_misses += 1
+                print(f"\n  📊 [匹配] {vtype}: {len(vehicle_indices)} 辆车, {num_beacons} 个信标")
+                if len(vehicle_indices) > num_beacons:
+                    print(f"      ⚠️  车辆数量({len(vehicle_indices)}) > 信标数量({num_beacons})，"
+                          f"将标记 {len(vehicle_indices) - num_beacons} 辆车为未备案")
+                assignment = self._solve_assignment(cost_matrix)
+                self._assignment_cache[vtype] = {
+                    'track_ids': track_ids,
+                    'macs': macs,
+                    'depths': vehicle_depths,
+                    'distances': beacon_distances,
+                    'stability': stability_costs,
+                    'assignment': assignment,
+                }
+                verbose = True
+            else:
+                self.assignment_cache_hits += 1
+                verbose = False
             
-            for i, vehicle in enumerate(vehicles_to_match):
-                vehicle_depth = vehicle.get('camera_depth')
-                if vehicle_depth is None:
-                    continue  # 无深度信息，跳过
-                
-                for j, beacon in enumerate(type_beacon_list):
-                    # 计算距离代价
-                    beacon_distance = beacon.get('distance', 0)
-                    distance_cost = abs(vehicle_depth - beacon_distance)
-                    
-                    # 计算时间稳定度惩罚
-                    stability_penalty = self._calculate_time_stability_penalty(beacon)
-                    stability_cost = stability_penalty * self.stability_window
-                    
-                    # 总代价
-                    total_cost = distance_cost + stability_cost
-                    cost_matrix[i, j] = total_cost
+            # 根据分配构建结果（代价使用当前输入，超过阈值视为不匹配）
+            matched_rows = {}
+            for i, j in assignment:
+                cost = cost_matrix[i, j]
+                if cost <= self.match_cost_threshold:
+                    matched_rows[i] = (j, cost)
             
-            # 使用匈牙利算法进行最优匹配
-            try:
-                from scipy.optimize import linear_sum_assignment
-                row_indices, col_indices = linear_sum_assignment(cost_matrix)
-                
-                # 构建匹配结果
-                matched_pairs = {}
-                for i, j in zip(row_indices, col_indices):
-                    cost = cost_matrix[i, j]
-                    # 检查代价是否超过阈值
-                    if cost <= self.match_cost_threshold:
-                        matched_pairs[i] = (j, cost)
-                
-                # 处理匹配成功的车辆
-                for i, vehicle in enumerate(vehicles_to_match):
-                    orig_idx = vehicle_list[i][0]  # 获取原始索引
-                    if i in matched_pairs:
-                        j, cost = matched_pairs[i]
-                        beacon_info = type_beacon_list[j].copy()
-                        beacon_info['match_cost'] = cost
-                        all_results[orig_idx] = {
-                            'track_id': vehicle.get('track_id'),
-                            'beacon_info': beacon_info,
-                            'cost': cost,
-                            'matched': True
-                        }
+            for i, orig_idx in enumerate(match_indices):
+                vehicle = vehicles[orig_idx]
+                if i in matched_rows:
+                    j, cost = matched_rows[i]
+                    mac, beacon = type_beacons[j]
+                    beacon_info = whitelist[mac].copy()
+                    beacon_info.update(beacon)
+                    beacon_info['match_cost'] = cost
+                    all_results[orig_idx] = {
+                        'track_id': vehicle.get('track_id'),
+                        'beacon_info': beacon_info,
+                        'cost': cost,
+                        'matched': True
+                    }
+                    if verbose:
                         print(f"    ✅ [匹配] Track {vehicle.get('track_id')} -> {vtype} (信标: {beacon_info.get('mac', 'Unknown')}, 代价: {cost:.2f})")
-                    else:
-                        all_results[orig_idx] = {
-                            'track_id': vehicle.get('track_id'),
-                            'beacon_info': None,
-                            'cost': None,
-                            'matched': False
-                        }
+                else:
+                    all_results[orig_idx] = self._unmatched_result(vehicle)
+                    if verbose:
                         print(f"    ❌ [匹配] Track {vehicle.get('track_id')} -> {vtype} (无匹配，代价过高)")
-                
-                # 处理未匹配的车辆（车辆数量 > 信标数量的情况）
-                for vehicle in vehicles_unmatched:
-                    # 找到原始索引
-                    orig_idx = None
-                    for idx, (orig_i, v) in enumerate(vehicle_list):
-                        if v.get('track_id') == vehicle.get('track_id'):
-                            orig_idx = orig_i
-                            break
-                    if orig_idx is not None:
-                        all_results[orig_idx] = {
-                            'track_id': vehicle.get('track_id'),
-                            'beacon_info': None,
-                            'cost': None,
-                            'matched': False
-                        }
-                        print(f"    ⚠️  [匹配] Track {vehicle.get('track_id')} -> {vtype} (未匹配，信标数量不足)")
-                
-            except ImportError:
-                # scipy不可用，回退到贪心算法
-                print(f"  ⚠️  [匹配] scipy不可用，使用贪心算法进行匹配")
-                matched_results = self._greedy_match(vehicles_to_match, type_beacon_list, cost_matrix)
-                # 将结果映射回原始索引
-                for idx, result in enumerate(matched_results):
-                    orig_idx = vehicle_list[idx][0]
-                    all_results[orig_idx] = result
-                # 处理未匹配的车辆
-                for vehicle in vehicles_unmatched:
-                    orig_idx = None
-                    for idx, (orig_i, v) in enumerate(vehicle_list):
-                        if v.get('track_id') == vehicle.get('track_id'):
-                            orig_idx = orig_i
-                            break
-                    if orig_idx is not None:
-                        all_results[orig_idx] = {
-                            'track_id': vehicle.get('track_id'),
-                            'beacon_info': None,
-                            'cost': None,
-                            'matched': False
-                        }
+        
+        # 清理本次未出现的类型缓存
+        for vtype in list(self._assignment_cache.keys()):
+            if vtype not in vehicles_by_type:
+                del self._assignment_cache[vtype]
         
         # 确保所有车辆都有结果
         for i, vehicle in enumerate(vehicles):
             if all_results[i] is None:
-                all_results[i] = {
-                    'track_id': vehicle.get('track_id'),
-                    'beacon_info': None,
-                    'cost': None,
-                    'matched': False
-                }
+                all_results[i] = self._unmatched_result(vehicle)
         
         return all_results
     
-    def _greedy_match(
-        self,
-        vehicles: List[Dict],
-        beacons: List[Dict],
-        cost_matrix: np.ndarray
-    ) -> List[Dict]:
+    @staticmethod
+    def _normalize_type(type_name: Optional[str]) -> str:
+        """标准化车辆类型名称（dump-truck -> dump_truck）"""
+        return (type_name or 'unknown').replace('-', '_').lower()
+    
+    @staticmethod
+    def _unmatched_result(vehicle: Dict) -> Dict:
+        """未匹配结果"""
+        return {
+            'track_id': vehicle.get('track_id'),
+            'beacon_info': None,
+            'cost': None,
+            'matched': False
+        }
+    
+    def _get_type_index(self) -> Tuple[Dict[str, dict], Dict[str, str]]:
+        """
+        当前白名单及其 MAC -> 标准化车辆类型索引（检测线程调用，白名单替换后重建）
+        
+        Returns:
+            (白名单字典, 类型索引)，两者对应同一个白名单；白名单变化时清空分配缓存
+        """
+        whitelist = self.whitelist
+        state = self._type_index_state
+        if state is None or state[0] is not whitelist:
+            state = (whitelist, {
+                mac.upper(): self._normalize_type(info.get('vehicle_type', 'unknown'))
+                for mac, info in whitelist.items()
+            })
+            self._type_index_state = state
+        if self._assignment_whitelist is not whitelist:
+            self._assignment_cache.clear()
+            self._assignment_whitelist = whitelist
+        return state
+    
+    def _lookup_assignment(self, vtype, track_ids, macs, depths, distances, stability):
+        """
+        查询可复用的分配结果
+        
+        Returns:
+            上次的分配 [(row, col), ...]；车辆/信标集合变化或输入变化超过容差时返回None
+        """
+        cached = self._assignment_cache.get(vtype)
+        if cached is None or cached['track_ids'] != track_ids or cached['macs'] != macs:
+            return None
+        tolerance = self.assignment_cache_tolerance
+        if tolerance <= 0:
+            return None
+        for old, new in ((cached['depths'], depths),
+                         (cached['distances'], distances),
+                         (cached['stability'], stability)):
+            old_nan = np.isnan(old)
+            if not np.array_equal(old_nan, np.isnan(new)):
+                return None
+            valid = ~old_nan
+            if valid.any() and np.max(np.abs(old[valid] - new[valid])) > tolerance:
+                return None
+        return cached['assignment']
+    
+    def _solve_assignment(self, cost_matrix: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        求解最优分配（匈牙利算法，scipy不可用时回退到贪心）
+        
+        Returns:
+            [(row, col), ...]
+        """
+        # 无深度信息的行用大代价替代inf，保证可解（阈值过滤后仍为不匹配）
+        finite_matrix = np.where(np.isfinite(cost_matrix), cost_matrix, self.match_cost_threshold * 1e3 + 1e6)
+        try:
+            from scipy.optimize import linear_sum_assignment
+            row_indices, col_indices = linear_sum_assignment(finite_matrix)
+            return list(zip(row_indices.tolist(), col_indices.tolist()))
+        except ImportError:
+            # scipy不可用，回退到贪心算法
+            print(f"  ⚠️  [匹配] scipy不可用，使用贪心算法进行匹配")
+            return self._greedy_match(cost_matrix)
+    
+    def _greedy_match(self, cost_matrix: np.ndarray) -> List[Tuple[int, int]]:
         """贪心匹配算法（scipy不可用时的回退方案）"""
-        num_vehicles = len(vehicles)
-        num_beacons = len(beacons)
+        num_vehicles, num_beacons = cost_matrix.shape
         matched_vehicles = set()
         matched_beacons = set()
-        results = []
+        pairs = []
         
         # 按代价排序所有可能的匹配
         matches = []
@@ -713,26 +703,9 @@ class BeaconFilter:
             if i not in matched_vehicles and j not in matched_beacons:
                 matched_vehicles.add(i)
                 matched_beacons.add(j)
-                beacon_info = beacons[j].copy()
-                beacon_info['match_cost'] = cost
-                results.append({
-                    'track_id': vehicles[i].get('track_id'),
-                    'beacon_info': beacon_info,
-                    'cost': cost,
-                    'matched': True
-                })
-        
-        # 添加未匹配的车辆
-        for i, vehicle in enumerate(vehicles):
-            if i not in matched_vehicles:
-                results.append({
-                    'track_id': vehicle.get('track_id'),
-                    'beacon_info': None,
-                    'cost': None,
-                    'matched': False
-                })
+                pairs.append((i, j))
         
-        return results
+        return pairs
     
     def get_whitelist_info(self) -> Dict:
         """获取白名单信息"""
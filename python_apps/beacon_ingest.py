@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Cassia SSE信标数据接入层
+工地现场每秒可收到数百条广播，逐条json.loads并加锁更新、每次get_beacons
+再为每个信标重新计算距离开销较大。这里将SSE事件先入队，按批解析后一次性
+加锁写入：每个MAC维护RSSI环形缓冲区并做EMA/卡尔曼平滑，距离在更新时预先算好，
+get_beacons返回带版本号的快照，数据未变化时直接复用。
+"""
+
+import json
+import time
+from collections import deque
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 可选的快速JSON解析器
+try:
+    import orjson
+    FAST_JSON_AVAILABLE = True
+except ImportError:
+    FAST_JSON_AVAILABLE = False
+
+
+def _loads(raw):
+    """解析JSON（优先使用orjson）"""
+    if FAST_JSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def parse_cassia_event(data) -> Optional[Tuple[str, float, str]]:
+    """
+    从Cassia本地API事件中提取信标字段
+
+    Args:
+        data: 已解析的SSE事件字典
+
+    Returns:
+        tuple: (mac, rssi, name)，非广播事件返回None
+    """
+    if not isinstance(data, dict):
+        return None
+    bdaddrs = data.get('bdaddrs')
+    if not bdaddrs or 'rssi' not in data:
+        return None
+    try:
+        return bdaddrs[0]['bdaddr'], float(data['rssi']), data.get('name', 'Unknown')
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+
+
+def parse_event_batch(raws: List[str]) -> List[Optional[dict]]:
+    """
+    批量解析SSE事件数据
+
+    先拼成一个JSON数组一次解析；批内有无法解析的事件（keep-alive等）时
+    退回逐条解析，无法解析的事件返回None。
+
+    Args:
+        raws: SSE事件data字符串列表
+
+    Returns:
+        list: 与输入一一对应的解析结果
+    """
+    if not raws:
+        return []
+    try:
+        parsed = _loads('[' + ','.join(raws) + ']')
+        if len(parsed) == len(raws):
+            return parsed
+    except ValueError:
+        pass
+
+    results = []
+    for raw in raws:
+        try:
+            results.append(_loads(raw))
+        except ValueError:
+            results.append(None)
+    return results
+
+
+class _BeaconTrack:
+    """单个信标的RSSI环形缓冲区与平滑状态"""
+
+    __slots__ = ('ring', 'head', 'count', 'smoothed', 'variance',
+                 'distance', 'name', 'last_update')
+
+    def __init__(self, ring_size: int):
+        self.ring = [0.0] * ring_size
+        self.head = 0
+        self.count = 0
+        self.smoothed = None
+        self.variance = 0.0
+        self.distance = 0.0
+        self.name = 'Unknown'
+        self.last_update = 0.0
+
+    def push(self, rssi: float):
+        self.ring[self.head] = rssi
+        self.head = (self.head + 1) % len(self.ring)
+        if self.count < len(self.ring):
+            self.count += 1
+
+    @property
+    def raw_rssi(self) -> float:
+        """最近一次原始RSSI"""
+        return self.ring[self.head - 1]
+
+    def rssi_std(self) -> float:
+        """环形缓冲区内原始RSSI的标准差"""
+        if self.count < 2:
+            return 0.0
+        values = self.ring[:self.count] if self.count < len(self.ring) else self.ring
+        mean = sum(values) / self.count
+        return (sum((v - mean) ** 2 for v in values) / self.count) ** 0.5
+
+
+class BeaconIngest:
+    """信标数据接入：批量解析、按MAC平滑、版本化快照"""
+
+    METHODS = ('ema', 'kalman', 'none')
+
+    def __init__(self, tx_power: float = -59, path_loss_exponent: float = 2.5,
+                 method: str = 'kalman', alpha: float = 0.3, ring_size: int = 16,
+                 process_noise: float = 0.5, measurement_noise: float = 16.0,
+                 batch_size: int = 64, batch_interval: float = 0.05,
+                 retention: float = 60.0):
+        """
+        初始化接入层
+
+        Args:
+            tx_power: 信标1米处RSSI（dBm）
+            path_loss_exponent: 路径衰减指数
+            method: 平滑方法 ema/kalman/none
+            alpha: EMA平滑系数（新值权重）
+            ring_size: 每个MAC保留的原始RSSI条数
+            process_noise: 卡尔曼过程噪声（dBm²/次）
+            measurement_noise: 卡尔曼观测噪声（dBm²）
+            batch_size: 待处理事件达到该数量时立即入库
+            batch_interval: 待处理事件最长滞留时间（秒）
+            retention: 超过该时间未更新的信标从表中移除（秒）
+        """
+        if method not in self.METHODS:
+            print(f"⚠ 未知RSSI平滑方法 {method}，使用 kalman")
+            method = 'kalman'
+        self.tx_power = tx_power
+        self.path_loss_exponent = path_loss_exponent
+        self.method = method
+        self.alpha = alpha
+        self.ring_size = max(1, int(ring_size))
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.batch_size = max(1, int(batch_size))
+        self.batch_interval = batch_interval
+        self.retention = retention
+
+        self.tracks: Dict[str, _BeaconTrack] = {}
+        self.lock = Lock()
+        self._flush_lock = Lock()  # SSE线程与查询线程都可能触发入库，保证批次顺序
+        self.version = 0  # 每次入库有变化时递增
+        self._pending = deque()  # (timestamp, raw) 待解析事件，append/popleft线程安全
+        self._last_flush = time.time()
+        self._clock = None  # 观测时钟：已写入观测的最大时间戳（回放时为录制时间）
+        self._last_prune = None
+        self._snapshots = {}  # max_age -> (version, valid_until, beacons)
+        self.batch_listeners = []  # 每批原始事件 [(timestamp, raw), ...] 的回调（如扫描录制）
+
+        self.events_received = 0
+        self.events_parsed = 0
+        self.batches = 0
+
+    def rssi_to_distance(self, rssi: float) -> float:
+        """
+        RSSI转距离（对数距离路径损耗模型）
+
+        公式: d = 10^((TxPower - RSSI) / (10 * n))
+        """
+        return 10 ** ((self.tx_power - rssi) / (10 * self.path_loss_exponent))
+
+    def submit(self, raw: str, timestamp: Optional[float] = None) -> bool:
+        """
+        提交一条原始SSE事件（不解析、不加锁）
+
+        Args:
+            raw: SSE事件data字符串
+            timestamp: 接收时间戳（None表示当前时间）
+
+        Returns:
+            bool: 是否触发了批量入库
+        """
+        now = time.time()
+        self._pending.append((now if timestamp is None else timestamp, raw))
+        self.events_received += 1
+        if len(self._pending) >= self.batch_size or now - self._last_flush >= self.batch_interval:
+            self.flush()
+            return True
+        return False
+
+    def flush(self) -> int:
+        """
+        解析并写入所有待处理事件
+
+        Returns:
+            int: 成功写入的信标观测数
+        """
+        with self._flush_lock:
+            self._last_flush = time.time()
+            count = len(self._pending)
+            if count == 0:
+                return 0
+            items = [self._pending.popleft() for _ in range(count)]
+            for listener in self.batch_listeners:
+                try:
+                    listener(items)
+                except Exception as e:
+                    print(f"⚠ 信标批次回调异常: {e}")
+            raws = [raw for _, raw in items if raw and raw.strip()]
+            if len(raws) == len(items):
+                timestamps = [ts for ts, _ in items]
+            else:
+                timestamps = [ts for ts, raw in items if raw and raw.strip()]
+
+            observations = []
+            for ts, data in zip(timestamps, parse_event_batch(raws)):
+                fields = parse_cassia_event(data)
+                if fields is not None:
+                    observations.append((fields[0], fields[1], fields[2], ts))
+            return self.ingest(observations)
+
+    def ingest(self, observations: Iterable[Tuple[str, float, str, float]]) -> int:
+        """
+        批量写入已解析的观测（一次加锁）
+
+        Args:
+            observations: (mac, rssi, name, timestamp) 序列，按时间顺序
+
+        Returns:
+            int: 写入的观测数
+        """
+        count = 0
+        with self.lock:
+            touched = {}
+            for mac, rssi, name, timestamp in observations:
+                track = self.tracks.get(mac)
+                if track is None:
+                    track = _BeaconTrack(self.ring_size)
+                    self.tracks[mac] = track
+                track.push(rssi)
+                self._smooth(track, rssi)
+                track.name = name
+                if timestamp > track.last_update:
+                    track.last_update = timestamp
+                if self._clock is None or timestamp > self._clock:
+                    self._clock = timestamp
+                touched[mac] = track
+                count += 1
+
+            # 距离在入库时每个MAC只算一次
+            for track in touched.values():
+                track.distance = self.rssi_to_distance(track.smoothed)
+
+            # 按观测时钟清理（回放时last_update是录制时间，不能与墙钟比较）
+            if self._clock is not None:
+                if self._last_prune is None:
+                    self._last_prune = self._clock
+                elif self._clock - self._last_prune >= self.retention:
+                    self._prune_locked(self._clock)
+
+            if count:
+                self.version += 1
+                self.events_parsed += count
+                self.batches += 1
+        return count
+
+    def _smooth(self, track: _BeaconTrack, rssi: float):
+        """更新平滑RSSI"""
+        if track.smoothed is None or self.method == 'none':
+            track.smoothed = rssi
+            track.variance = self.measurement_noise
+            return
+        if self.method == 'ema':
+            track.smoothed = self.alpha * rssi + (1 - self.alpha) * track.smoothed
+            return
+        # 一维卡尔曼（常值模型）
+        variance = track.variance + self.process_noise
+        gain = variance / (variance + self.measurement_noise)
+        track.smoothed += gain * (rssi - track.smoothed)
+        track.variance = (1 - gain) * variance
+
+    def _prune_locked(self, now: float):
+        """移除相对观测时钟now长时间未更新的信标（调用方持锁）"""
+        self._last_prune = now
+        stale = [mac for mac, track in self.tracks.items() if now - track.last_update > self.retention]
+        for mac in stale:
+            del self.tracks[mac]
+        if stale:
+            self.version += 1
+
+    def get_beacons(self, max_age: float = 5.0, now: Optional[float] = None) -> List[dict]:
+        """
+        获取最近的信标快照
+
+        数据版本未变化且没有信标过期时直接返回缓存的快照。返回的字典在
+        多个调用方之间共享，只读使用（BeaconFilter白名单过滤时会复制）。
+
+        Args:
+            max_age: 最大数据年龄（秒）
+            now: 当前时间（None表示time.time()）
+
+        Returns:
+            list of {'mac', 'rssi'(平滑后), 'raw_rssi', 'rssi_std', 'name', 'distance', 'last_update'}
+        """
+        if self._pending and time.time() - self._last_flush >= self.batch_interval:
+            self.flush()
+        now = time.time() if now is None else now
+
+        cached = self._snapshots.get(max_age)
+        if cached is not None and cached[0] == self.version and now < cached[1]:
+            return list(cached[2])
+
+        with self.lock:
+            version = self.version
+            beacons = []
+            valid_until = float('inf')
+            for mac, track in self.tracks.items():
+                if now - track.last_update < max_age:
+                    beacons.append({
+                        'mac': mac,
+                        'rssi': round(track.smoothed, 1),
+                        'raw_rssi': track.raw_rssi,
+                        'rssi_std': track.rssi_std(),
+                        'name': track.name,
+                        'distance': track.distance,
+                        'last_update': track.last_update,
+                    })
+                    # 最早过期的信标决定快照有效期（过期信标无新数据时不会重新出现）
+                    valid_until = min(valid_until, track.last_update + max_age)
+        self._snapshots[max_age] = (version, valid_until, beacons)
+        return list(beacons)
+
+    def clear(self):
+        """清空所有信标数据"""
+        self._pending.clear()
+        with self.lock:
+            self.tracks.clear()
+            self.version += 1
+        self._snapshots.clear()
+
+    def __len__(self):
+        return len(self.tracks)
+
+
+def create_beacon_ingest(config: Optional[dict] = None) -> BeaconIngest:
+    """
+    从配置创建信标接入层
+
+    Args:
+        config: network.cassia_ingest 配置字典
+
+    Returns:
+        BeaconIngest实例
+    """
+    config = config or {}
+    smoothing = config.get('smoothing', {})
+    return BeaconIngest(
+        tx_power=config.get('tx_power', -59),
+        path_loss_exponent=config.get('path_loss_exponent', 2.5),
+        method=smoothing.get('method', 'kalman'),
+        alpha=smoothing.get('alpha', 0.3),
+        ring_size=smoothing.get('ring_size', 16),
+        process_noise=smoothing.get('process_noise', 0.5),
+        measurement_noise=smoothing.get('measurement_noise', 16.0),
+        batch_size=config.get('batch_size', 64),
+        batch_interval=config.get('batch_interval', 0.05),
+        retention=config.get('retention', 60.0),
+    )
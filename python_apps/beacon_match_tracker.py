@@ -221,4 +221,14 @@ class BeaconMatchTracker:
         expired_tracks = set(self.track_matches.keys()) - active_track_ids
         for track_id in expired_tracks:
             self.reset(track_id)
+    
+    def on_track_removed(self, track_id: int) -> None:
+        """
+        track被跟踪器移除时清理其匹配历史（跟踪生命周期事件回调）
+        
+        Args:
+            track_id: 跟踪ID
+        """
+        if self.reset_on_track_end:
+            self.reset(track_id)
 
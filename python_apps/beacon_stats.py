@@ -0,0 +1,181 @@
+"""
+信标滚动统计模块
+每个MAC维护一个定长环形缓冲区，并在入队/出窗时用Welford算法增量更新
+时间窗口内RSSI与距离的均值和方差，稳定度查询为O(1)，无需每次遍历历史。
+"""
+
+import math
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+
+class _RunningMoments:
+    """支持增删样本的Welford均值/方差"""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value: float):
+        if self.count <= 1:
+            self.count = 0
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        self.count -= 1
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (value - self.mean)
+        if self.m2 < 0.0:
+            self.m2 = 0.0  # 浮点误差保护
+
+    def std(self) -> float:
+        """总体标准差（与np.std默认ddof=0一致）"""
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self.m2 / self.count)
+
+
+class BeaconRollingStats:
+    """单个信标的历史环形缓冲区与时间窗口滚动统计"""
+
+    def __init__(self, history_size: int = 100, stability_window: float = 3.0):
+        """
+        初始化
+
+        Args:
+            history_size: 历史记录最大条数（用于持续时间判断）
+            stability_window: 稳定度统计时间窗口（秒）
+        """
+        self.capacity = max(1, int(history_size))
+        self.stability_window = stability_window
+        self.timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self.rssi = np.zeros(self.capacity, dtype=np.float64)
+        self.distance = np.zeros(self.capacity, dtype=np.float64)
+        self.start = 0  # 最旧记录位置
+        self.size = 0  # 有效记录数
+        self.window_start = 0  # 时间窗口内最旧记录距start的偏移
+        self.rssi_moments = _RunningMoments()
+        self.distance_moments = _RunningMoments()  # 只统计有效距离（>0）
+
+    def __len__(self):
+        return self.size
+
+    def _index(self, offset: int) -> int:
+        return (self.start + offset) % self.capacity
+
+    def _drop_from_window(self, offset: int):
+        idx = self._index(offset)
+        self.rssi_moments.remove(self.rssi[idx])
+        dist = self.distance[idx]
+        if dist > 0:
+            self.distance_moments.remove(dist)
+
+    def add(self, timestamp: float, rssi: float, distance: float):
+        """
+        加入一条记录（入队时更新一次统计）
+
+        Args:
+            timestamp: 时间戳（秒）
+            rssi: RSSI（dBm）
+            distance: 估算距离（米），<=0表示无效
+        """
+        if self.size == self.capacity:
+            # 缓冲区已满，淘汰最旧记录（若仍在窗口内需同时移出统计）
+            if self.window_start == 0:
+                self._drop_from_window(0)
+            else:
+                self.window_start -= 1
+            self.start = (self.start + 1) % self.capacity
+            self.size -= 1
+
+        idx = self._index(self.size)
+        self.timestamps[idx] = timestamp
+        self.rssi[idx] = rssi
+        self.distance[idx] = distance
+        self.size += 1
+
+        self.rssi_moments.add(rssi)
+        if distance > 0:
+            self.distance_moments.add(distance)
+
+        self.expire(timestamp)
+
+    def expire(self, current_time: float):
+        """将超出时间窗口的记录移出统计（均摊O(1)）"""
+        while self.window_start < self.size:
+            if current_time - self.timestamps[self._index(self.window_start)] <= self.stability_window:
+                break
+            self._drop_from_window(self.window_start)
+            self.window_start += 1
+
+    @property
+    def first_seen(self) -> Optional[float]:
+        """历史中最旧记录的时间戳"""
+        if self.size == 0:
+            return None
+        return float(self.timestamps[self.start])
+
+    def window_count(self) -> int:
+        """时间窗口内的记录数"""
+        return self.size - self.window_start
+
+    def stability_penalty(self, current_time: float) -> float:
+        """
+        时间稳定度惩罚（0.0-1.0），波动越大惩罚越高
+
+        RSSI标准差 > 10dBm 或 距离标准差 > 2m 视为完全不稳定，取两者较大值。
+        """
+        self.expire(current_time)
+        if self.window_count() < 2:
+            return 0.0
+        rssi_penalty = min(1.0, self.rssi_moments.std() / 10.0)
+        dist_penalty = min(1.0, self.distance_moments.std() / 2.0)
+        return max(rssi_penalty, dist_penalty)
+
+
+class BeaconStatsTable:
+    """按MAC索引的信标滚动统计表"""
+
+    def __init__(self, history_size: int = 100, stability_window: float = 3.0):
+        self.history_size = history_size
+        self.stability_window = stability_window
+        self.stats: Dict[str, BeaconRollingStats] = {}
+
+    def __contains__(self, mac: str) -> bool:
+        return mac in self.stats
+
+    def get(self, mac: str) -> Optional[BeaconRollingStats]:
+        return self.stats.get(mac)
+
+    def add(self, mac: str, timestamp: float, rssi: float, distance: float):
+        """记录一条信标观测"""
+        stats = self.stats.get(mac)
+        if stats is None:
+            stats = BeaconRollingStats(self.history_size, self.stability_window)
+            self.stats[mac] = stats
+        stats.add(timestamp, rssi, distance)
+
+    def penalty(self, mac: str, current_time: float) -> float:
+        """单个信标的稳定度惩罚（无历史返回0）"""
+        stats = self.stats.get(mac)
+        if stats is None:
+            return 0.0
+        return stats.stability_penalty(current_time)
+
+    def penalties(self, macs: Iterable[str], current_time: float) -> np.ndarray:
+        """批量获取稳定度惩罚（用于向量化构建代价矩阵）"""
+        return np.array([self.penalty(mac, current_time) for mac in macs], dtype=np.float64)
+
+    def clear(self):
+        self.stats.clear()
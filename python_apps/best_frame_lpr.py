@@ -2,21 +2,26 @@
 LPR最佳帧选取模块 (Phase 2优化)
 
 实现帧质量评分机制，等待最佳帧出现后再触发识别，提升识别成功率。
+每个track只记录最佳帧的 (帧序号, bbox, 分数)，像素保存在共享帧缓冲区中，
+触发识别时才裁剪。
 """
 
+import cv2
 import numpy as np
 from typing import Optional, Tuple, Dict
 from dataclasses import dataclass
-from collections import defaultdict
+
+from bounded_cache import create_bounded_cache
+from frame_ring import FrameRing
 
 
 @dataclass
 class TrackInfo:
     """跟踪信息"""
     best_quality: float = 0.0
-    best_frame_data: Optional[Tuple] = None  # (roi_bgr, bbox, distance, frame_shape)
-    best_frame_id: int = 0
-    frame_count: int = 0
+    best_frame_seq: Optional[int] = None  # 最佳帧在共享帧缓冲区中的序号（持有一次引用）
+    best_bbox: Optional[Tuple[float, float, float, float]] = None  # 最佳帧中的边界框（原图坐标）
+    frame_count: int = 0  # 本轮（上次触发后）已比较的帧数
     recognition_done: bool = False  # 是否已完成识别
 
 
@@ -83,9 +88,11 @@ class BestFrameLPR:
     最佳帧LPR选择器
     
     为每个track维护帧质量历史，等待最佳帧出现后再触发识别。
+    每次触发后开始新一轮比较，多帧融合的每次识别都使用上次识别以来的最佳帧。
     """
     
-    def __init__(self, quality_threshold=0.6, max_wait_frames=30, reuse_result=True):
+    def __init__(self, quality_threshold=0.6, max_wait_frames=30, reuse_result=True, cache_config=None,
+                 frame_ring=None, roi_convert=cv2.COLOR_RGB2BGR):
         """
         初始化最佳帧选择器
         
@@ -93,82 +100,122 @@ class BestFrameLPR:
             quality_threshold: 质量分数阈值，达到此值后立即触发
             max_wait_frames: 最多等待帧数，超时后使用当前最佳帧
             reuse_result: 识别成功后是否复用结果
+            cache_config: 识别结果缓存配置 {'capacity', 'ttl'}
+            frame_ring: 共享帧缓冲区FrameRing（主循环放入每帧；None时创建私有缓冲区，由调用方传入帧）
+            roi_convert: 裁剪ROI时的cv2颜色转换码（默认RGB帧转BGR，None表示不转换）
         """
         self.quality_threshold = quality_threshold
         self.max_wait_frames = max_wait_frames
         self.reuse_result = reuse_result
+        self.frame_ring = frame_ring if frame_ring is not None else FrameRing()
+        self.roi_convert = roi_convert
         self.track_queue: Dict[int, TrackInfo] = {}
-        self.recognition_results: Dict[int, Tuple[str, float]] = {}  # {track_id: (plate_number, confidence)}
+        # 有界缓存：长期运行时不随历史车辆数增长，命中率反映结果复用效果
+        self.recognition_results = create_bounded_cache(cache_config, '最佳帧识别结果')  # {track_id: (plate_number, confidence)}
+    
+    def update(
+        self,
+        track_id: int,
+        frame_seq: int,
+        bbox: Tuple[float, float, float, float],
+        quality: float
+    ) -> bool:
+        """
+        记录track在一帧中的候选（只引用帧序号，不复制像素）
+        
+        Args:
+            track_id: 跟踪ID
+            frame_seq: 帧在共享帧缓冲区中的序号
+            bbox: 边界框（原图坐标）
+            quality: 帧质量分数
+        
+        Returns:
+            bool: 是否应触发识别（最佳帧质量达到阈值或等待超时）
+        """
+        info = self.track_queue.get(track_id)
+        if info is None:
+            info = self.track_queue[track_id] = TrackInfo()
+        if info.best_frame_seq is None or quality > info.best_quality:
+            if self.frame_ring.acquire(frame_seq):
+                if info.best_frame_seq is not None:
+                    self.frame_ring.release(info.best_frame_seq)
+                info.best_frame_seq = frame_seq
+                info.best_bbox = tuple(bbox)
+                info.best_quality = quality
+        info.frame_count += 1
+        return info.best_frame_seq is not None and (
+            info.best_quality >= self.quality_threshold or info.frame_count >= self.max_wait_frames)
+    
+    def take_best_roi(self, track_id: int) -> Tuple[Optional[np.ndarray], float]:
+        """
+        裁剪track的最佳帧ROI并开始新一轮比较（释放对最佳帧的引用）
+        
+        Args:
+            track_id: 跟踪ID
+        
+        Returns:
+            (best_roi, best_quality): 最佳帧ROI（帧已被丢弃时为None）及其质量分数
+        """
+        info = self.track_queue.get(track_id)
+        if info is None or info.best_frame_seq is None:
+            return None, 0.0
+        best_roi = self.frame_ring.crop(info.best_frame_seq, info.best_bbox, convert=self.roi_convert)
+        best_quality = info.best_quality
+        self.frame_ring.release(info.best_frame_seq)
+        info.best_frame_seq = None
+        info.best_bbox = None
+        info.best_quality = 0.0
+        info.frame_count = 0
+        info.recognition_done = True
+        return best_roi, best_quality
     
     def should_trigger_lpr(
         self,
         track_id: int,
+        frame_seq: int,
         bbox: Tuple[float, float, float, float],
-        roi_bgr: np.ndarray,
         confidence: float,
         frame_shape: Tuple[int, int, int],
-        distance: Optional[float] = None
+        distance: Optional[float] = None,
+        quality: Optional[float] = None,
+        frame: Optional[np.ndarray] = None
     ) -> Tuple[bool, Optional[np.ndarray]]:
         """
         判断是否应该触发LPR识别
         
         Args:
             track_id: 跟踪ID
+            frame_seq: 当前帧序号
             bbox: 边界框
-            roi_bgr: 车辆ROI（BGR格式）
             confidence: 检测置信度
             frame_shape: 帧形状
             distance: 距离（米），可选
+            quality: 统一ROI质量评分给出的分数（None表示按几何计算）
+            frame: 当前帧（可选，帧缓冲区中没有该序号时放入）
         
         Returns:
-            (should_trigger, best_roi): 是否触发，最佳帧的ROI
+            (should_trigger, best_roi): 是否触发，最佳帧的ROI（触发时才裁剪）
         """
         # 如果已完成识别且启用结果复用，直接返回False
-        if self.reuse_result and track_id in self.recognition_results:
+        if self.reuse_result and self.recognition_results.get(track_id) is not None:
             return False, None
         
-        # 计算当前帧质量
-        quality = calculate_frame_quality(bbox, confidence, frame_shape, distance)
-        
-        if track_id not in self.track_queue:
-            # 新track，加入队列
-            self.track_queue[track_id] = TrackInfo()
-            self.track_queue[track_id].best_frame_data = (roi_bgr.copy(), bbox, distance, frame_shape)
-            self.track_queue[track_id].best_quality = quality
-            self.track_queue[track_id].frame_count = 1
-            self.track_queue[track_id].best_frame_id = 0
-        else:
-            # 更新队列中的最佳帧
-            info = self.track_queue[track_id]
-            
-            if quality > info.best_quality:
-                info.best_quality = quality
-                info.best_frame_data = (roi_bgr.copy(), bbox, distance, frame_shape)
-                info.best_frame_id = info.frame_count
-            
-            info.frame_count += 1
+        if frame is not None and frame_seq not in self.frame_ring:
+            self.frame_ring.put(frame_seq, frame)
         
-        info = self.track_queue[track_id]
+        # 计算当前帧质量
+        if quality is None:
+            quality = calculate_frame_quality(bbox, confidence, frame_shape, distance)
         
-        # 触发条件
-        if info.best_quality >= self.quality_threshold:
-            # 质量达到阈值，使用最佳帧
-            best_roi = info.best_frame_data[0]
-            info.recognition_done = True
-            return True, best_roi
-        elif info.frame_count >= self.max_wait_frames:
-            # 超时，使用当前最佳帧
-            if info.best_frame_data:
-                best_roi = info.best_frame_data[0]
-                info.recognition_done = True
-                return True, best_roi
-            else:
-                # 没有最佳帧，使用当前帧
-                info.recognition_done = True
-                return True, roi_bgr.copy()
+        if not self.update(track_id, frame_seq, bbox, quality):
+            # 继续等待
+            return False, None
         
-        # 继续等待
-        return False, None
+        # 质量达到阈值或等待超时，使用最佳帧（最佳帧已被丢弃时使用当前帧）
+        best_roi, _ = self.take_best_roi(track_id)
+        if best_roi is None:
+            best_roi = self.frame_ring.crop(frame_seq, bbox, convert=self.roi_convert)
+        return best_roi is not None, best_roi
     
     def on_lpr_complete(self, track_id: int, plate_number: Optional[str], confidence: float):
         """
@@ -199,11 +246,21 @@ class BestFrameLPR:
         return self.recognition_results.get(track_id)
     
     def reset(self, track_id: int):
-        """重置指定track"""
-        if track_id in self.track_queue:
-            del self.track_queue[track_id]
-        if track_id in self.recognition_results:
-            del self.recognition_results[track_id]
+        """重置指定track（释放对最佳帧的引用）"""
+        info = self.track_queue.pop(track_id, None)
+        if info is not None and info.best_frame_seq is not None:
+            self.frame_ring.release(info.best_frame_seq)
+        self.recognition_results.pop(track_id)
+    
+    def clear_frames(self):
+        """丢弃所有track记录的最佳帧（帧缓冲区清空、帧序号重新开始前调用），识别结果保留"""
+        for info in self.track_queue.values():
+            if info.best_frame_seq is not None:
+                self.frame_ring.release(info.best_frame_seq)
+            info.best_frame_seq = None
+            info.best_bbox = None
+            info.best_quality = 0.0
+            info.frame_count = 0
     
     def cleanup(self, active_track_ids: set):
         """清理已结束的track"""
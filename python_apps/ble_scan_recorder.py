@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+BLE扫描录制与回放模块
+信标匹配原本只能在现场实时复现。录制器把Cassia SSE原始事件连同接收时间戳
+追加写入紧凑的二进制文件（默认gzip压缩，与相机录像放在同一目录）；回放客户端
+按原始节奏（可加速）重新送入信标接入层，实现与CassiaLocalClient相同的
+get_beacons接口，BeaconFilter、BeaconMatchTracker乃至完整实时循环都可在工作站上
+用现场数据复现和做性能分析。
+
+文件格式：
+    头部  b'BLESCAN1\\n'
+    记录  <d 时间戳（秒，time.time()）> <I 数据长度> <UTF-8原始事件data>
+
+用法:
+    python ble_scan_recorder.py info recordings/ble_scan_20250101_120000.blescan.gz
+    python ble_scan_recorder.py bench recordings/ble_scan_20250101_120000.blescan.gz --fps 15
+"""
+
+import gzip
+import os
+import struct
+import time
+from datetime import datetime
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Iterator, List, Optional, Tuple
+
+from beacon_ingest import create_beacon_ingest
+
+SCAN_FILE_MAGIC = b'BLESCAN1\n'
+_RECORD_HEADER = struct.Struct('<dI')
+
+
+def _open_scan_file(path, mode):
+    """按文件内容/扩展名选择gzip或普通文件"""
+    path = str(path)
+    if 'r' in mode:
+        with open(path, 'rb') as f:
+            is_gzip = f.read(2) == b'\x1f\x8b'
+    else:
+        is_gzip = path.endswith('.gz')
+    return gzip.open(path, mode) if is_gzip else open(path, mode)
+
+
+def iter_scan_records(path) -> Iterator[Tuple[float, str]]:
+    """
+    逐条读取扫描录制文件
+
+    录制进程异常退出导致末尾记录不完整时，读到最后一条完整记录为止。
+
+    Args:
+        path: 录制文件路径
+
+    Yields:
+        tuple: (timestamp, raw)
+    """
+    with _open_scan_file(path, 'rb') as f:
+        if f.read(len(SCAN_FILE_MAGIC)) != SCAN_FILE_MAGIC:
+            raise ValueError(f"不是BLE扫描录制文件: {path}")
+        while True:
+            try:
+                header = f.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    return
+                timestamp, length = _RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+            except (EOFError, OSError):
+                return  # gzip末尾被截断
+            if len(payload) < length:
+                return
+            yield timestamp, payload.decode('utf-8', errors='replace')
+
+
+class BleScanRecorder:
+    """BLE扫描录制器：作为信标接入层的批次回调，每批一次写入"""
+
+    def __init__(self, output_dir: str = "recordings", compress: bool = True,
+                 path: Optional[str] = None, flush_interval: float = 2.0):
+        """
+        初始化录制器
+
+        Args:
+            output_dir: 输出目录（与相机录像相同目录便于按时间对齐）
+            compress: 是否gzip压缩
+            path: 指定输出文件路径（None表示按时间戳自动命名）
+            flush_interval: 刷新到磁盘的间隔（秒），异常退出最多丢失该时间段的数据
+        """
+        if path is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            suffix = '.blescan.gz' if compress else '.blescan'
+            path = Path(output_dir) / f"ble_scan_{timestamp}{suffix}"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = _open_scan_file(self.path, 'ab')
+        if is_new:
+            self._file.write(SCAN_FILE_MAGIC)
+        self.lock = Lock()
+        self.flush_interval = flush_interval
+        self._last_flush = time.time()
+        self.records = 0
+        self.bytes_written = 0
+
+    def write_batch(self, items: List[Tuple[float, str]]):
+        """
+        写入一批原始事件
+
+        Args:
+            items: [(timestamp, raw), ...]
+        """
+        chunks = []
+        for timestamp, raw in items:
+            if not raw:
+                continue
+            payload = raw.encode('utf-8')
+            chunks.append(_RECORD_HEADER.pack(timestamp, len(payload)))
+            chunks.append(payload)
+        if not chunks:
+            return
+        data = b''.join(chunks)
+        with self.lock:
+            if self._file is None:
+                return
+            self._file.write(data)
+            self.records += len(chunks) // 2
+            self.bytes_written += len(data)
+            now = time.time()
+            if now - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._last_flush = now
+
+    def attach(self, client):
+        """
+        挂到信标客户端的接入层上（客户端重建后需重新挂载）
+
+        Args:
+            client: 带ingest属性的信标客户端
+        """
+        listeners = client.ingest.batch_listeners
+        if self.write_batch not in listeners:
+            listeners.append(self.write_batch)
+
+    def flush(self):
+        """刷新到磁盘"""
+        with self.lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        """关闭文件"""
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        print(f"✓ BLE扫描录制已保存: {self.path} ({self.records} 条事件)")
+
+
+class BleReplayClient:
+    """
+    BLE扫描回放客户端（接口与CassiaLocalClient一致）
+
+    - speed > 0: 后台线程按录制节奏回放，speed=2.0表示2倍速
+    - speed <= 0: 手动模式，由调用方调用advance()推进回放时间（用于确定性基准测试）
+
+    信标年龄按回放时间计算，因此加速回放时max_age仍对应录制时的秒数。
+    """
+
+    def __init__(self, path, speed: float = 1.0, loop: bool = False, ingest_config=None):
+        """
+        初始化回放客户端
+
+        Args:
+            path: 录制文件路径
+            speed: 回放倍速（<=0为手动模式）
+            loop: 播放结束后是否从头循环
+            ingest_config: 信标接入配置（与实时客户端相同）
+        """
+        self.path = str(path)
+        self.speed = speed
+        self.loop = loop
+        self.ingest = create_beacon_ingest(ingest_config)
+        self.tx_power = self.ingest.tx_power
+        self.path_loss_exponent = self.ingest.path_loss_exponent
+
+        self.running = False
+        self.finished = False
+        self.replay_thread = None
+        self.events_replayed = 0
+
+        # 回放时钟：录制时间 = origin + (monotonic - wall_origin) * speed
+        self._origin = None
+        self._wall_origin = None
+        self._offset = 0.0  # 循环回放时累加的时间偏移
+        self._current = None  # 手动模式下的当前回放时间
+        self._records = None
+        self._lookahead = None
+
+    def start(self):
+        """启动回放"""
+        self.running = True
+        self.finished = False
+        if self.speed > 0:
+            self.replay_thread = Thread(target=self._replay_loop, daemon=True)
+            self.replay_thread.start()
+        print(f"✓ BLE扫描回放已启动: {self.path} "
+              f"({'手动推进' if self.speed <= 0 else f'{self.speed:g}x'})")
+
+    def stop(self):
+        """停止回放"""
+        self.running = False
+        if self.replay_thread:
+            self.replay_thread.join(timeout=2)
+
+    def _replay_loop(self):
+        """按录制节奏将事件送入接入层"""
+        while self.running:
+            first_ts = last_ts = None
+            for timestamp, raw in iter_scan_records(self.path):
+                if not self.running:
+                    return
+                if first_ts is None:
+                    first_ts = timestamp
+                    if self._origin is None:
+                        self._origin = timestamp
+                        self._wall_origin = time.monotonic()
+                replay_ts = timestamp + self._offset
+                # 未到该事件的回放时间则等待（期间先写入已到达的事件）
+                while self.running:
+                    delay = (replay_ts - self._origin) / self.speed - (time.monotonic() - self._wall_origin)
+                    if delay <= 0:
+                        break
+                    self.ingest.flush()
+                    time.sleep(min(delay, 0.05))
+                self.ingest.submit(raw, timestamp=replay_ts)
+                self.events_replayed += 1
+                last_ts = timestamp
+            self.ingest.flush()
+
+            if not self.loop or first_ts is None:
+                break
+            # 循环回放：时间轴接在上一轮之后
+            self._offset += (last_ts - first_ts) + 1.0
+        self.finished = True
+
+    def virtual_time(self) -> Optional[float]:
+        """当前回放时间（录制时钟），尚未开始时返回None"""
+        if self.speed <= 0:
+            return self._current
+        if self._origin is None:
+            return None
+        return self._origin + (time.monotonic() - self._wall_origin) * self.speed
+
+    def advance(self, seconds: float) -> int:
+        """
+        手动模式：回放时间前进指定秒数，写入期间的所有事件
+
+        Args:
+            seconds: 前进的录制时间（秒）
+
+        Returns:
+            int: 本次写入的事件数
+        """
+        if self.speed > 0:
+            raise RuntimeError("advance() 仅用于手动模式（speed<=0）")
+        if self._records is None:
+            self._records = iter_scan_records(self.path)
+            self._lookahead = next(self._records, None)
+            if self._lookahead is None:
+                self.finished = True
+                return 0
+            self._current = self._lookahead[0]
+
+        self._current += seconds
+        count = 0
+        while self._lookahead is not None and self._lookahead[0] <= self._current:
+            timestamp, raw = self._lookahead
+            self.ingest.submit(raw, timestamp=timestamp)
+            count += 1
+            self._lookahead = next(self._records, None)
+        self.ingest.flush()
+        self.events_replayed += count
+        if self._lookahead is None:
+            self.finished = True
+        return count
+
+    def get_beacons(self, max_age=5.0):
+        """
+        获取回放时间点上的信标数据
+
+        Args:
+            max_age: 最大数据年龄（秒，录制时钟）
+        Returns:
+            list of {'mac': x, 'rssi': x(平滑后), 'raw_rssi': x, 'name': x, 'distance': x}
+        """
+        now = self.virtual_time()
+        if now is None:
+            return []
+        self.ingest.flush()
+        return self.ingest.get_beacons(max_age, now=now)
+
+    def rssi_to_distance(self, rssi):
+        """RSSI转距离（与实时客户端一致）"""
+        return self.ingest.rssi_to_distance(rssi)
+
+    def find_nearest_beacon(self, target_distance, tolerance=2.0):
+        """查找距离最接近的信标（与实时客户端一致）"""
+        candidates = [b for b in self.get_beacons() if abs(b['distance'] - target_distance) < tolerance]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda b: abs(b['distance'] - target_distance))
+        return dict(best, distance_diff=abs(best['distance'] - target_distance))
+
+    def is_connection_healthy(self):
+        """回放未结束视为连接正常"""
+        return self.running and not self.finished
+
+    def get_connection_stats(self):
+        """回放进度"""
+        return {
+            'connected': self.is_connection_healthy(),
+            'events': self.events_replayed,
+            'virtual_time': self.virtual_time(),
+        }
+
+
+def summarize_scan_file(path) -> dict:
+    """
+    统计录制文件
+
+    Returns:
+        dict: 事件数、时长、平均速率、信标数量
+    """
+    from beacon_ingest import parse_event_batch, parse_cassia_event
+
+    count = 0
+    first_ts = last_ts = None
+    macs = set()
+    batch = []
+    for timestamp, raw in iter_scan_records(path):
+        count += 1
+        first_ts = timestamp if first_ts is None else first_ts
+        last_ts = timestamp
+        batch.append(raw)
+        if len(batch) >= 1024:
+            macs.update(f[0] for f in map(parse_cassia_event, parse_event_batch(batch)) if f)
+            batch = []
+    macs.update(f[0] for f in map(parse_cassia_event, parse_event_batch(batch)) if f)
+
+    duration = (last_ts - first_ts) if count else 0.0
+    return {
+        'events': count,
+        'start': first_ts,
+        'duration': duration,
+        'rate': count / duration if duration > 0 else 0.0,
+        'beacons': len(macs),
+        'file_size': os.path.getsize(path),
+    }
+
+
+def _bench(path, whitelist, camera_id, fps, camera_depth):
+    """手动模式回放整份录制，按帧调用BeaconFilter并统计耗时"""
+    from beacon_filter import BeaconFilter
+    from beacon_match_tracker import BeaconMatchTracker
+
+    replay = BleReplayClient(path, speed=0)
+    replay.start()
+    beacon_filter = BeaconFilter(whitelist, camera_id=camera_id)
+    match_tracker = BeaconMatchTracker()
+
+    frame_dt = 1.0 / fps
+    get_times, match_times = [], []
+    frames = matched = 0
+    while not replay.finished:
+        replay.advance(frame_dt)
+        start = time.perf_counter()
+        beacons = replay.get_beacons()
+        get_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        vehicles = [{'track_id': 1, 'camera_depth': camera_depth, 'detected_class': 'excavator'}]
+        results = beacon_filter.match_multiple_targets(vehicles, beacons) if beacons else []
+        for result in results:
+            mac = result['beacon_info']['mac'] if result.get('matched') else None
+            if match_tracker.update_match(result['track_id'], mac, camera_depth, result.get('cost')):
+                matched += 1
+        match_times.append(time.perf_counter() - start)
+        frames += 1
+
+    def _fmt(samples):
+        if not samples:
+            return "n/a"
+        ordered = sorted(samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return f"平均 {sum(ordered) / len(ordered) * 1000:.3f}ms, P99 {p99 * 1000:.3f}ms"
+
+    print(f"\n📊 回放 {frames} 帧（{replay.events_replayed} 条事件）")
+    print(f"  get_beacons: {_fmt(get_times)}")
+    print(f"  匹配+一致性跟踪: {_fmt(match_times)}（锁定帧 {matched}）")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='BLE扫描录制文件工具')
+    sub = parser.add_subparsers(dest='command', required=True)
+    info_parser = sub.add_parser('info', help='查看录制文件统计')
+    info_parser.add_argument('path')
+    bench_parser = sub.add_parser('bench', help='回放录制文件并测量信标匹配耗时')
+    bench_parser.add_argument('path')
+    bench_parser.add_argument('--whitelist', default=os.path.join(os.path.dirname(__file__), '..', 'beacon_whitelist.yaml'))
+    bench_parser.add_argument('--camera-id', default='camera_01')
+    bench_parser.add_argument('--fps', type=float, default=15.0, help='模拟帧率')
+    bench_parser.add_argument('--depth', type=float, default=8.0, help='模拟车辆深度（米）')
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        info = summarize_scan_file(args.path)
+        start = datetime.fromtimestamp(info['start']).isoformat() if info['start'] else '-'
+        print(f"文件: {args.path} ({info['file_size'] / 1024:.1f} KB)")
+        print(f"开始时间: {start}")
+        print(f"事件数: {info['events']}, 时长: {info['duration']:.1f}s, "
+              f"速率: {info['rate']:.1f} 条/秒, 信标: {info['beacons']} 个")
+    else:
+        _bench(args.path, args.whitelist, args.camera_id, args.fps, args.depth)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+有界缓存（容量 + TTL + LRU淘汰）
+
+按track_id保存的识别结果、识别时间、待处理任务等状态如果用普通字典，
+会随着系统运行过的每一辆车无限增长。BoundedCache提供类字典接口，
+超过容量时淘汰最久未使用的条目，超过TTL的条目在访问/写入时清除，
+并可注册淘汰回调（如取消被淘汰的待处理任务）。命中/未命中统计用于
+评估结果复用的实际效果。
+"""
+
+import time
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, Callable, Hashable, List, Optional
+
+
+_MISSING = object()
+
+
+class BoundedCache:
+    """线程安全的有界TTL/LRU缓存"""
+
+    def __init__(self, capacity: int = 256, ttl: Optional[float] = None,
+                 on_evict: Optional[Callable[[Hashable, Any, str], None]] = None,
+                 name: str = 'cache'):
+        """
+        初始化缓存
+
+        Args:
+            capacity: 最大条目数，超出时淘汰最久未使用的条目
+            ttl: 条目存活时间（秒，自写入起计算），None表示不过期
+            on_evict: 淘汰回调 (key, value, reason)，reason为'capacity'或'expired'；
+                      主动删除（pop/del/clear）不触发回调
+            name: 缓存名称（用于统计输出）
+        """
+        self.capacity = max(1, int(capacity))
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.name = name
+        self.listeners: List[Callable[[Hashable, Any, str], None]] = [on_evict] if on_evict else []
+        self._data = OrderedDict()  # key -> (value, expire_at)
+        self._lock = RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expire_at(self, now: float) -> float:
+        return now + self.ttl if self.ttl is not None else float('inf')
+
+    def _collect_expired_locked(self, now: float, evicted: list):
+        """移除所有过期条目（调用方持锁）"""
+        if self.ttl is None:
+            return
+        # 写入顺序不因读取改变过期时间，但LRU会移动条目，因此需遍历全部条目
+        expired = [key for key, (_, expire_at) in self._data.items() if expire_at <= now]
+        for key in expired:
+            value, _ = self._data.pop(key)
+            self.expirations += 1
+            evicted.append((key, value, 'expired'))
+
+    def _notify(self, evicted: list):
+        """在锁外调用淘汰回调"""
+        for key, value, reason in evicted:
+            for listener in self.listeners:
+                try:
+                    listener(key, value, reason)
+                except Exception as e:
+                    print(f"⚠ {self.name}淘汰回调异常: {e}")
+
+    def _lookup_locked(self, key, now: float):
+        """查找未过期条目（调用方持锁），过期条目被移除"""
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING, None
+        if entry[1] <= now:
+            del self._data[key]
+            self.expirations += 1
+            return _MISSING, (key, entry[0], 'expired')
+        return entry[0], None
+
+    def get(self, key, default=None):
+        """
+        读取条目（计入命中统计，并刷新LRU顺序）
+
+        Args:
+            key: 键
+            default: 不存在或已过期时的返回值
+
+        Returns:
+            缓存值或default
+        """
+        evicted = []
+        with self._lock:
+            value, expired = self._lookup_locked(key, time.monotonic())
+            if expired:
+                evicted.append(expired)
+            if value is _MISSING:
+                self.misses += 1
+                value = default
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+        self._notify(evicted)
+        return value
+
+    def set(self, key, value):
+        """
+        写入条目（重置TTL），超出容量时淘汰最久未使用的条目
+
+        Args:
+            key: 键
+            value: 值
+        """
+        evicted = []
+        with self._lock:
+            now = time.monotonic()
+            self._data[key] = (value, self._expire_at(now))
+            self._data.move_to_end(key)
+            self._collect_expired_locked(now, evicted)
+            while len(self._data) > self.capacity:
+                old_key, (old_value, _) = self._data.popitem(last=False)
+                self.evictions += 1
+                evicted.append((old_key, old_value, 'capacity'))
+        self._notify(evicted)
+
+    def pop(self, key, default=None):
+        """移除并返回条目（不触发淘汰回调）"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is None or entry[1] <= time.monotonic():
+            return default
+        return entry[0]
+
+    def purge_expired(self) -> int:
+        """
+        清除所有过期条目
+
+        Returns:
+            int: 清除的条目数
+        """
+        evicted = []
+        with self._lock:
+            self._collect_expired_locked(time.monotonic(), evicted)
+        self._notify(evicted)
+        return len(evicted)
+
+    def clear(self):
+        """清空缓存（不触发淘汰回调）"""
+        with self._lock:
+            self._data.clear()
+
+    def keys(self) -> list:
+        """未过期键的快照"""
+        now = time.monotonic()
+        with self._lock:
+            return [key for key, (_, expire_at) in self._data.items() if expire_at > now]
+
+    def items(self) -> list:
+        """未过期条目的快照"""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (value, expire_at) in self._data.items() if expire_at > now]
+
+    def get_stats(self) -> dict:
+        """
+        获取缓存统计
+
+        Returns:
+            dict: size, capacity, ttl, hits, misses, hit_rate, evictions, expirations
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'capacity': self.capacity,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def __contains__(self, key) -> bool:
+        """成员判断（不计入命中统计、不刷新LRU顺序）"""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+def create_bounded_cache(config: Optional[dict] = None, name: str = 'cache',
+                         on_evict: Optional[Callable[[Hashable, Any, str], None]] = None) -> BoundedCache:
+    """
+    从配置创建有界缓存
+
+    Args:
+        config: {'capacity', 'ttl'} 配置字典
+        name: 缓存名称
+        on_evict: 淘汰回调
+
+    Returns:
+        BoundedCache实例
+    """
+    config = config or {}
+    return BoundedCache(
+        capacity=config.get('capacity', 256),
+        ttl=config.get('ttl', 600.0),
+        on_evict=on_evict,
+        name=name,
+    )
@@ -10,6 +10,9 @@ import numpy as np
 from collections import defaultdict
 from typing import List, Tuple, Dict, Optional
 
+from track_events import TRACK_CONFIRMED, TRACK_CREATED, TRACK_LOST, TRACK_REMOVED, TrackEventBus, emit_event
+from track_state_store import TrackStateStore, TrackTable
+
 
 class STrack:
     """单个跟踪目标"""
@@ -62,7 +65,10 @@ class ByteTracker:
                  high_thresh: float = 0.6,
                  match_thresh: float = 0.8,
                  frame_rate: int = 30,
-                 track_buffer: int = 30):
+                 track_buffer: int = 30,
+                 confirm_hits: int = 3,
+                 event_bus: Optional[TrackEventBus] = None,
+                 store: Optional[TrackStateStore] = None):
         """
         初始化ByteTrack跟踪器
         
@@ -72,12 +78,18 @@ class ByteTracker:
             match_thresh: IoU匹配阈值
             frame_rate: 帧率（用于时间相关计算）
             track_buffer: 跟踪缓冲区大小（最大消失帧数）
+            confirm_hits: 发布confirmed事件所需的匹配次数
+            event_bus: 跟踪生命周期事件总线（可选）
+            store: 按track的结构数组状态存储（默认新建）
         """
         self.track_thresh = track_thresh
         self.high_thresh = high_thresh
         self.match_thresh = match_thresh
         self.frame_rate = frame_rate
         self.track_buffer = track_buffer
+        self.confirm_hits = confirm_hits
+        self.event_bus = event_bus
+        self.store = store if store is not None else TrackStateStore()
         
         self.tracked_stracks: List[STrack] = []  # 正在跟踪的目标
         self.lost_stracks: List[STrack] = []      # 丢失的目标
@@ -233,9 +245,10 @@ class ByteTracker:
             frame_id: 帧ID
         
         Returns:
-            tracks字典 {track_id: {'bbox': ..., 'class': ..., 'processed': ...}}
+            TrackTable {track_id: TrackView}，视图支持 'bbox', 'class', 'score', 'hits', 'last_seen', 'processed' 等键
         """
         self.frame_id = frame_id
+        events = []  # 本帧的生命周期事件，跟踪列表更新后统一发布
         
         # 分离高置信度和低置信度检测
         high_mask = scores >= self.high_thresh
@@ -288,6 +301,8 @@ class ByteTracker:
                         frame_id
                     )
                     new_tracked_stracks.append(class_tracks[track_idx])
+                    if class_tracks[track_idx].hits == self.confirm_hits:
+                        events.append((TRACK_CONFIRMED, class_tracks[track_idx].track_id))
                 
                 # 未匹配的跟踪和检测
                 unmatched_tracks_list = [class_tracks[i] for i in unmatched_tracks]
@@ -310,6 +325,8 @@ class ByteTracker:
                         frame_id
                     )
                     new_tracked_stracks.append(unmatched_tracks_list[track_idx])
+                    if unmatched_tracks_list[track_idx].hits == self.confirm_hits:
+                        events.append((TRACK_CONFIRMED, unmatched_tracks_list[track_idx].track_id))
                 
                 # 剩余的未匹配跟踪
                 unmatched_tracks_list = [unmatched_tracks_list[i] for i in unmatched_tracks]
@@ -317,53 +334,62 @@ class ByteTracker:
             # 处理未匹配的跟踪（标记为丢失或移除）
             for track in unmatched_tracks_list:
                 track.mark_lost()
+                events.append((TRACK_LOST, track.track_id))
                 if track.time_since_update < self.track_buffer:
                     new_lost_stracks.append(track)
                 else:
                     track.mark_removed()
                     self.removed_stracks.append(track)
+                    events.append((TRACK_REMOVED, track.track_id))
             
             # 为未匹配的高置信度检测创建新跟踪
             for det in unmatched_dets_high:
                 det.track_id = self.next_id
                 det.processed = False  # 新track未处理
+                self.store.allocate(det.track_id)
                 self.next_id += 1
                 new_tracked_stracks.append(det)
+                events.append((TRACK_CREATED, det.track_id))
+        
+        # 上一帧丢失的目标不参与匹配，本帧起不再保留
+        for track in self.lost_stracks:
+            events.append((TRACK_REMOVED, track.track_id))
         
         # 更新跟踪列表
         self.tracked_stracks = new_tracked_stracks
         self.lost_stracks = new_lost_stracks
+        for event, track_id in events:
+            if event == TRACK_REMOVED:
+                self.store.release(track_id)
         
-        # 转换为字典格式（兼容原有接口）
-        tracks_dict = {}
-        for track in self.tracked_stracks:
-            tracks_dict[track.track_id] = {
-                'bbox': track.bbox,
-                'class': track.class_id,
-                'last_seen': track.frame_id,
-                'processed': track.processed,
-                'score': track.score,
-                'hits': track.hits
-            }
-        
-        return tracks_dict
+        # 本帧所有跟踪目标按槽位批量写入状态存储
+        tracks = self._write_store(frame_id)
+        for event, track_id in events:
+            emit_event(self.event_bus, event, track_id)
+        return tracks
+    
+    def _write_store(self, frame_id: int) -> TrackTable:
+        """把正在跟踪的目标批量写入状态存储，返回本帧的TrackTable"""
+        track_ids = [track.track_id for track in self.tracked_stracks]
+        slots = self.store.slots(track_ids)
+        if len(slots):
+            store = self.store
+            store.bbox[slots] = np.stack([track.bbox for track in self.tracked_stracks])
+            store.score[slots] = [track.score for track in self.tracked_stracks]
+            store.class_id[slots] = [track.class_id for track in self.tracked_stracks]
+            store.hits[slots] = [track.hits for track in self.tracked_stracks]
+            store.last_seen[slots] = frame_id
+        self.store.set_active(slots)
+        return TrackTable(self.store, track_ids, slots)
     
-    def get_tracks(self) -> Dict[int, Dict]:
+    def get_tracks(self) -> TrackTable:
         """获取当前所有跟踪（兼容接口）"""
-        tracks_dict = {}
-        for track in self.tracked_stracks:
-            tracks_dict[track.track_id] = {
-                'bbox': track.bbox,
-                'class': track.class_id,
-                'last_seen': track.frame_id,
-                'processed': track.processed,
-                'score': track.score,
-                'hits': track.hits
-            }
-        return tracks_dict
+        track_ids = [track.track_id for track in self.tracked_stracks]
+        return TrackTable(self.store, track_ids, self.store.slots(track_ids))
     
     def mark_processed(self, track_id: int):
         """标记track为已处理（兼容接口）"""
+        self.store.update(track_id, processed=True)
         for track in self.tracked_stracks:
             if track.track_id == track_id:
                 track.processed = True
@@ -6,23 +6,26 @@ Cassia蓝牙信标客户端
 
 import asyncio
 import aiohttp
-from aiohttp_sse_client import client as sse_client_async
-import json
 import time
-from threading import Thread, Lock
-import math
+from threading import Thread
+
+from beacon_ingest import create_beacon_ingest
+from cassia_connection import create_connection_manager
 
 
 class CassiaBeaconClient:
     """Cassia蓝牙信标客户端"""
     
-    def __init__(self, ac_url, developer_key, developer_secret, router_mac):
+    def __init__(self, ac_url, developer_key, developer_secret, router_mac,
+                 ingest_config=None, connection_config=None):
         """
         Args:
             ac_url: AC控制器地址，如 'http://192.168.1.100'
             developer_key: 开发者密钥
             developer_secret: 开发者密码
             router_mac: 路由器MAC地址
+            ingest_config: 可选，信标接入配置（批量解析、RSSI平滑）
+            connection_config: 可选，连接配置（退避重连、空闲超时）
         """
         self.ac_url = ac_url
         self.ac_host = f'{ac_url}/api'
@@ -33,17 +36,24 @@ class CassiaBeaconClient:
         self.token = None
         self.token_expire_time = 0
         
-        # 信标数据缓存 {mac: {'rssi': x, 'name': x, 'last_update': timestamp}}
-        self.beacons = {}
-        self.beacons_lock = Lock()
+        # 信标数据接入层（批量解析 + 按MAC平滑 + 版本化快照）
+        self.ingest = create_beacon_ingest(ingest_config)
+        
+        # SSE长连接（会话复用、退避重连、停滞检测），token随每次连接刷新
+        self.connection = create_connection_manager(
+            f"{self.ac_host}/gap/nodes",
+            config=connection_config,
+            params=self._scan_params,
+            name='Cassia AC'
+        )
         
         # 后台扫描线程
         self.scan_thread = None
         self.running = False
         
-        # RSSI转距离参数
-        self.tx_power = -59  # 信标发射功率（需要根据实际信标调整）
-        self.path_loss_exponent = 2.5  # 路径衰减指数（室外2-3，室内2.5-4）
+        # RSSI转距离参数（信标发射功率需根据实际信标调整；路径衰减指数室外2-3，室内2.5-4）
+        self.tx_power = self.ingest.tx_power
+        self.path_loss_exponent = self.ingest.path_loss_exponent
     
     def start(self):
         """启动后台扫描"""
@@ -65,74 +75,54 @@ class CassiaBeaconClient:
         loop.run_until_complete(self._scan_loop())
     
     async def _scan_loop(self):
-        """异步扫描循环"""
-        while self.running:
-            try:
-                # 认证
-                if not self.token or time.time() > self.token_expire_time:
-                    await self._authenticate()
-                
-                # 扫描
-                await self._scan_beacons()
-            except Exception as e:
-                print(f"⚠ 信标扫描错误: {e}")
-                await asyncio.sleep(5)
-    
-    async def _authenticate(self):
-        """认证获取token"""
+        """异步扫描循环（断线和停滞由连接管理器按退避策略重连）"""
+        try:
+            await self.connection.stream(self.ingest.submit, lambda: self.running,
+                                         prepare=self._ensure_token)
+        finally:
+            self.ingest.flush()
+    
+    async def _ensure_token(self, session):
+        """连接前检查token，过期则重新认证"""
+        if not self.token or time.time() > self.token_expire_time:
+            await self._authenticate(session)
+    
+    async def _authenticate(self, session):
+        """认证获取token（复用连接管理器的会话）"""
         url = f"{self.ac_host}/oauth2/token"
         auth = aiohttp.BasicAuth(self.developer_key, self.developer_secret)
         data = {"grant_type": "client_credentials"}
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, auth=auth, json=data) as resp:
-                if resp.status != 200:
-                    error = await resp.text()
-                    raise Exception(f"认证失败: {error}")
-                result = await resp.json()
-                self.token = result.get('access_token')
-                self.token_expire_time = time.time() + 3500  # 提前100秒刷新
-                print(f"✓ Cassia认证成功")
-    
-    async def _scan_beacons(self):
-        """扫描信标（SSE流）"""
-        params = {
+        async with session.post(url, auth=auth, json=data) as resp:
+            if resp.status != 200:
+                error = await resp.text()
+                raise Exception(f"认证失败: {error}")
+            result = await resp.json()
+            self.token = result.get('access_token')
+            self.token_expire_time = time.time() + 3500  # 提前100秒刷新
+            print(f"✓ Cassia认证成功")
+    
+    def _scan_params(self):
+        """扫描参数（每次连接时生成，携带最新token）"""
+        return {
             'filter_rssi': -90,  # RSSI阈值
             'active': 1,         # 主动扫描
             'mac': self.router_mac,
             'access_token': self.token,
             'event': 1
         }
-        
-        url = f"{self.ac_host}/gap/nodes"
-        timeout = aiohttp.ClientTimeout(total=None)
-        
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            try:
-                async with sse_client_async.EventSource(url, params=params, session=session) as evts:
-                    async for event in evts:
-                        if not self.running:
-                            break
-                        
-                        try:
-                            data = json.loads(event.data)
-                            device_mac = data['bdaddrs'][0]['bdaddr']
-                            rssi = data['rssi']
-                            name = data.get('name', 'Unknown')
-                            
-                            # 更新信标数据
-                            with self.beacons_lock:
-                                self.beacons[device_mac] = {
-                                    'rssi': rssi,
-                                    'name': name,
-                                    'last_update': time.time()
-                                }
-                        except Exception as e:
-                            pass
-                        
-            except Exception as e:
-                if self.running:
-                    print(f"⚠ SSE连接错误: {e}")
+    
+    def is_connection_healthy(self):
+        """SSE连接是否正常（已连接且空闲超时内有数据）"""
+        return self.running and self.connection.is_healthy()
+    
+    def connection_down_for(self):
+        """SSE连接已断开的时长（秒），客户端未运行时返回None"""
+        return self.connection.disconnected_for() if self.running else None
+    
+    def get_connection_stats(self):
+        """连接与重连耗时指标"""
+        return self.connection.metrics.summary()
     
     def get_beacons(self, max_age=5.0):
         """
@@ -140,23 +130,10 @@ class CassiaBeaconClient:
         Args:
             max_age: 最大数据年龄（秒）
         Returns:
-            list of {'mac': x, 'rssi': x, 'name': x, 'distance': x}
+            list of {'mac': x, 'rssi': x(平滑后), 'raw_rssi': x, 'name': x, 'distance': x}
+            （字典为共享快照，只读使用）
         """
-        current_time = time.time()
-        beacons = []
-        
-        with self.beacons_lock:
-            for mac, info in self.beacons.items():
-                if current_time - info['last_update'] < max_age:
-                    distance = self.rssi_to_distance(info['rssi'])
-                    beacons.append({
-                        'mac': mac,
-                        'rssi': info['rssi'],
-                        'name': info['name'],
-                        'distance': distance
-                    })
-        
-        return beacons
+        return self.ingest.get_beacons(max_age)
     
     def rssi_to_distance(self, rssi):
         """
@@ -169,8 +146,7 @@ class CassiaBeaconClient:
         Returns:
             distance: 距离（米）
         """
-        distance = 10 ** ((self.tx_power - rssi) / (10 * self.path_loss_exponent))
-        return distance
+        return self.ingest.rssi_to_distance(rssi)
     
     def find_nearest_beacon(self, target_distance, tolerance=2.0):
         """
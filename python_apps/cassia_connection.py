@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Cassia SSE连接管理模块
+CassiaLocalClient与CassiaBeaconClient共用：复用同一个aiohttp会话，断线后按
+指数退避+随机抖动重连（避免多台设备同时重连），按空闲超时检测“连接未断但
+不再有数据”的停滞流，并记录重连耗时等指标供网络恢复判断连通性。
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Callable, Optional
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+class StreamStalled(Exception):
+    """SSE流在空闲超时内没有收到任何数据（含keep-alive）"""
+    pass
+
+
+class ReconnectBackoff:
+    """指数退避 + 随机抖动"""
+
+    def __init__(self, initial: float = 0.5, maximum: float = 30.0,
+                 multiplier: float = 2.0, jitter: float = 0.5, rng: Optional[random.Random] = None):
+        """
+        初始化退避策略
+
+        Args:
+            initial: 首次重连等待时间（秒）
+            maximum: 最长等待时间（秒）
+            multiplier: 每次失败后的放大倍数
+            jitter: 抖动比例（0-1），实际等待在 [delay*(1-jitter), delay] 之间随机
+            rng: 随机数生成器（测试时可固定种子）
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.jitter = min(max(jitter, 0.0), 1.0)
+        self.rng = rng or random.Random()
+        self.attempt = 0
+
+    def next_delay(self) -> float:
+        """获取下一次重连前的等待时间（秒），并递增失败次数"""
+        delay = min(self.maximum, self.initial * (self.multiplier ** self.attempt))
+        self.attempt += 1
+        return delay * (1.0 - self.jitter * self.rng.random())
+
+    def reset(self):
+        """连接成功后重置"""
+        self.attempt = 0
+
+
+class ConnectionMetrics:
+    """SSE连接状态与重连指标"""
+
+    def __init__(self, history_size: int = 100):
+        self.connected = False
+        self.connects = 0
+        self.disconnects = 0
+        self.stalls = 0
+        self.failures = 0  # 连接失败次数（含HTTP错误）
+        self.events = 0
+        self.last_activity = None  # 最近收到任何数据（含keep-alive）的时间
+        self.last_event_time = None  # 最近收到事件的时间
+        self.disconnected_at = None
+        self.reconnect_latencies = deque(maxlen=history_size)  # 断线→重新连上耗时（秒）
+
+    def on_connected(self, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        if self.disconnected_at is not None:
+            self.reconnect_latencies.append(now - self.disconnected_at)
+            self.disconnected_at = None
+        self.connected = True
+        self.connects += 1
+        self.last_activity = now
+
+    def on_disconnected(self, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        if self.connected:
+            self.disconnects += 1
+        if self.disconnected_at is None:
+            self.disconnected_at = now
+        self.connected = False
+
+    def on_activity(self, now: float):
+        self.last_activity = now
+
+    def on_event(self, now: float):
+        self.events += 1
+        self.last_activity = now
+        self.last_event_time = now
+
+    def summary(self) -> dict:
+        """指标汇总"""
+        latencies = list(self.reconnect_latencies)
+        return {
+            'connected': self.connected,
+            'connects': self.connects,
+            'disconnects': self.disconnects,
+            'stalls': self.stalls,
+            'failures': self.failures,
+            'events': self.events,
+            'last_event_time': self.last_event_time,
+            'reconnect_latency_last': latencies[-1] if latencies else None,
+            'reconnect_latency_avg': sum(latencies) / len(latencies) if latencies else None,
+            'reconnect_latency_max': max(latencies) if latencies else None,
+        }
+
+
+class SSEParser:
+    """按行解析text/event-stream，事件以空行结束"""
+
+    def __init__(self):
+        self._data = []
+
+    def feed_line(self, line: str) -> Optional[str]:
+        """
+        输入一行
+
+        Args:
+            line: 一行文本（可带换行符）
+
+        Returns:
+            str: 事件完整时返回data内容，否则返回None
+        """
+        line = line.rstrip('\r\n')
+        if not line:
+            if not self._data:
+                return None
+            data = '\n'.join(self._data)
+            self._data = []
+            return data
+        if line.startswith(':'):
+            return None  # 注释行（keep-alive）
+        field, _, value = line.partition(':')
+        if field == 'data':
+            self._data.append(value[1:] if value.startswith(' ') else value)
+        return None
+
+
+class CassiaConnectionManager:
+    """Cassia SSE长连接管理：会话复用、退避重连、停滞检测"""
+
+    def __init__(self, url: str, params=None, auth=None, idle_timeout: float = 15.0,
+                 connect_timeout: float = 5.0, backoff: Optional[ReconnectBackoff] = None,
+                 name: str = 'Cassia'):
+        """
+        初始化连接管理器
+
+        Args:
+            url: SSE地址（如 http://192.168.40.1/gap/nodes）
+            params: 查询参数字典，或返回参数字典的函数（如需携带动态token）
+            auth: aiohttp.BasicAuth（可选）
+            idle_timeout: 空闲超时（秒），期间未收到任何数据视为流停滞并重连
+            connect_timeout: 建立TCP连接超时（秒）
+            backoff: 重连退避策略
+            name: 日志中显示的名称
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("aiohttp未安装，无法连接Cassia SSE")
+        self.url = url
+        self.params = params
+        self.auth = auth
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.backoff = backoff or ReconnectBackoff()
+        self.name = name
+        self.metrics = ConnectionMetrics()
+        self._session = None
+
+    @property
+    def session(self):
+        """共享的aiohttp会话（首次使用时创建，重连时复用）"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=4, keepalive_timeout=30),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout),
+            )
+        return self._session
+
+    def is_healthy(self, now: Optional[float] = None) -> bool:
+        """连接已建立且空闲超时内有数据"""
+        if not self.metrics.connected or self.metrics.last_activity is None:
+            return False
+        now = time.time() if now is None else now
+        return now - self.metrics.last_activity < self.idle_timeout
+
+    def disconnected_for(self, now: Optional[float] = None) -> float:
+        """已断开的时长（秒），连接中或尚未断开过返回0"""
+        if self.metrics.connected or self.metrics.disconnected_at is None:
+            return 0.0
+        now = time.time() if now is None else now
+        return max(0.0, now - self.metrics.disconnected_at)
+
+    async def stream(self, on_event: Callable[[str], None], is_running: Callable[[], bool],
+                     prepare: Optional[Callable] = None):
+        """
+        持续读取SSE流，断线或停滞后按退避策略重连，直到is_running()返回False
+
+        Args:
+            on_event: 收到事件时的回调，参数为事件data字符串
+            is_running: 是否继续运行
+            prepare: 每次连接前调用的协程函数（参数为会话，如刷新token）
+        """
+        try:
+            while is_running():
+                try:
+                    if prepare is not None:
+                        await prepare(self.session)
+                    await self._read_stream(on_event, is_running)
+                except asyncio.CancelledError:
+                    raise
+                except StreamStalled:
+                    self.metrics.stalls += 1
+                    print(f"⚠ {self.name} SSE流 {self.idle_timeout:.1f}s 无数据，重新连接")
+                except Exception as e:
+                    self.metrics.failures += 1
+                    if is_running():
+                        print(f"⚠ {self.name} SSE连接错误: {e}")
+                self.metrics.on_disconnected()
+
+                if is_running():
+                    await self._sleep(self.backoff.next_delay(), is_running)
+        finally:
+            await self.close()
+
+    async def _read_stream(self, on_event, is_running):
+        """建立一次SSE连接并读取到断开"""
+        params = self.params() if callable(self.params) else self.params
+        async with self.session.get(
+            self.url, params=params, auth=self.auth,
+            headers={'Accept': 'text/event-stream'}
+        ) as resp:
+            if resp.status != 200:
+                raise ConnectionError(f"HTTP {resp.status}")
+            self.metrics.on_connected()
+            parser = SSEParser()
+            received = False
+            while is_running():
+                try:
+                    line = await asyncio.wait_for(resp.content.readline(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    raise StreamStalled()
+                if not line:
+                    break  # 服务端关闭连接
+                now = time.time()
+                data = parser.feed_line(line.decode('utf-8', errors='replace'))
+                if data is None:
+                    self.metrics.on_activity(now)
+                    continue
+                if not received:
+                    # 收到首个事件才算真正恢复，避免“连上即断”时退避失效
+                    received = True
+                    self.backoff.reset()
+                self.metrics.on_event(now)
+                on_event(data)
+
+    @staticmethod
+    async def _sleep(delay, is_running, step=0.2):
+        """可被停止信号打断的等待"""
+        deadline = time.monotonic() + delay
+        while is_running():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(step, remaining))
+
+    async def close(self):
+        """关闭共享会话"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self.metrics.connected = False
+
+
+def create_backoff(config: Optional[dict] = None) -> ReconnectBackoff:
+    """
+    从配置创建退避策略
+
+    Args:
+        config: network.cassia_connection 配置字典
+    """
+    backoff_cfg = (config or {}).get('backoff', {})
+    return ReconnectBackoff(
+        initial=backoff_cfg.get('initial', 0.5),
+        maximum=backoff_cfg.get('max', 30.0),
+        multiplier=backoff_cfg.get('multiplier', 2.0),
+        jitter=backoff_cfg.get('jitter', 0.5),
+    )
+
+
+def create_connection_manager(url: str, config: Optional[dict] = None, params=None,
+                              auth=None, name: str = 'Cassia') -> CassiaConnectionManager:
+    """
+    从配置创建连接管理器
+
+    Args:
+        url: SSE地址
+        config: network.cassia_connection 配置字典
+        params: 查询参数（字典或函数）
+        auth: aiohttp.BasicAuth（可选）
+        name: 日志名称
+    """
+    config = config or {}
+    return CassiaConnectionManager(
+        url, params=params, auth=auth,
+        idle_timeout=config.get('idle_timeout', 15.0),
+        connect_timeout=config.get('connect_timeout', 5.0),
+        backoff=create_backoff(config),
+        name=name,
+    )
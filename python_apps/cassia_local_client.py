@@ -6,39 +6,55 @@ Cassia本地路由器客户端（Standalone模式）
 
 import asyncio
 import aiohttp
-from aiohttp_sse_client import client as sse_client_async
-import json
 import time
-from threading import Thread, Lock
-import math
+from threading import Thread
+
+from beacon_ingest import create_beacon_ingest
+from cassia_connection import create_connection_manager
 
 
 class CassiaLocalClient:
     """Cassia本地路由器客户端（Standalone模式）"""
     
-    def __init__(self, router_ip, username=None, password=None):
+    def __init__(self, router_ip, username=None, password=None, ingest_config=None,
+                 connection_config=None):
         """
         Args:
             router_ip: 路由器IP地址，如 '192.168.40.1'
             username: 可选，路由器用户名（如果需要认证）
             password: 可选，路由器密码
+            ingest_config: 可选，信标接入配置（network.cassia_ingest：批量解析、RSSI平滑）
+            connection_config: 可选，连接配置（network.cassia_connection：退避重连、空闲超时）
         """
         self.router_ip = router_ip
         self.base_url = f'http://{router_ip}'
         self.username = username
         self.password = password
         
-        # 信标数据缓存 {mac: {'rssi': x, 'name': x, 'last_update': timestamp}}
-        self.beacons = {}
-        self.beacons_lock = Lock()
+        # 信标数据接入层（批量解析 + 按MAC平滑 + 版本化快照）
+        self.ingest = create_beacon_ingest(ingest_config)
+        
+        # SSE长连接（会话复用、退避重连、停滞检测）
+        auth = aiohttp.BasicAuth(username, password) if username and password else None
+        self.connection = create_connection_manager(
+            f"{self.base_url}/gap/nodes",
+            config=connection_config,
+            params={
+                'filter_rssi': -90,  # RSSI阈值
+                'active': 1,         # 主动扫描
+                'event': 1           # SSE模式
+            },
+            auth=auth,
+            name='Cassia'
+        )
         
         # 后台扫描线程
         self.scan_thread = None
         self.running = False
         
-        # RSSI转距离参数
-        self.tx_power = -59  # 信标发射功率（需要根据实际信标调整）
-        self.path_loss_exponent = 2.5  # 路径衰减指数（室外2-3，室内2.5-4）
+        # RSSI转距离参数（信标发射功率需根据实际信标调整；路径衰减指数室外2-3，室内2.5-4）
+        self.tx_power = self.ingest.tx_power
+        self.path_loss_exponent = self.ingest.path_loss_exponent
     
     def start(self):
         """启动后台扫描"""
@@ -60,68 +76,25 @@ class CassiaLocalClient:
         loop.run_until_complete(self._scan_loop())
     
     async def _scan_loop(self):
-        """异步扫描循环"""
-        while self.running:
-            try:
-                await self._scan_beacons()
-            except Exception as e:
-                print(f"⚠ 信标扫描错误: {e}")
-                await asyncio.sleep(5)
-    
-    async def _scan_beacons(self):
-        """扫描信标（SSE流）"""
-        params = {
-            'filter_rssi': -90,  # RSSI阈值
-            'active': 1,         # 主动扫描
-            'event': 1           # SSE模式
-        }
-        
-        # 本地API端点
-        url = f"{self.base_url}/gap/nodes"
-        
-        # 认证配置
-        auth = None
-        if self.username and self.password:
-            auth = aiohttp.BasicAuth(self.username, self.password)
-        
-        timeout = aiohttp.ClientTimeout(total=None)
-        
+        """异步扫描循环（断线和停滞由连接管理器按退避策略重连）"""
         try:
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with sse_client_async.EventSource(
-                    url, 
-                    params=params, 
-                    session=session,
-                    auth=auth
-                ) as evts:
-                    async for event in evts:
-                        if not self.running:
-                            break
-                        
-                        try:
-                            # 解析SSE事件
-                            data = json.loads(event.data)
-                            
-                            # Cassia本地API格式
-                            if 'bdaddrs' in data and len(data['bdaddrs']) > 0:
-                                device_mac = data['bdaddrs'][0]['bdaddr']
-                                rssi = data['rssi']
-                                name = data.get('name', 'Unknown')
-                                
-                                # 更新信标数据
-                                with self.beacons_lock:
-                                    self.beacons[device_mac] = {
-                                        'rssi': rssi,
-                                        'name': name,
-                                        'last_update': time.time()
-                                    }
-                        except Exception as e:
-                            # 忽略解析错误（keep-alive等）
-                            pass
-        except Exception as e:
-            if self.running:
-                print(f"⚠ SSE连接错误: {e}")
-                raise
+            # 只入队原始数据，由接入层按批解析（keep-alive等无效事件在解析时忽略）
+            await self.connection.stream(self.ingest.submit, lambda: self.running)
+        finally:
+            # 停止时写入剩余事件
+            self.ingest.flush()
+    
+    def is_connection_healthy(self):
+        """SSE连接是否正常（已连接且空闲超时内有数据）"""
+        return self.running and self.connection.is_healthy()
+    
+    def connection_down_for(self):
+        """SSE连接已断开的时长（秒），客户端未运行时返回None"""
+        return self.connection.disconnected_for() if self.running else None
+    
+    def get_connection_stats(self):
+        """连接与重连耗时指标"""
+        return self.connection.metrics.summary()
     
     def get_beacons(self, max_age=5.0):
         """
@@ -129,23 +102,10 @@ class CassiaLocalClient:
         Args:
             max_age: 最大数据年龄（秒）
         Returns:
-            list of {'mac': x, 'rssi': x, 'name': x, 'distance': x}
+            list of {'mac': x, 'rssi': x(平滑后), 'raw_rssi': x, 'name': x, 'distance': x}
+            （字典为共享快照，只读使用）
         """
-        current_time = time.time()
-        beacons = []
-        
-        with self.beacons_lock:
-            for mac, info in self.beacons.items():
-                if current_time - info['last_update'] < max_age:
-                    distance = self.rssi_to_distance(info['rssi'])
-                    beacons.append({
-                        'mac': mac,
-                        'rssi': info['rssi'],
-                        'name': info['name'],
-                        'distance': distance
-                    })
-        
-        return beacons
+        return self.ingest.get_beacons(max_age)
     
     def rssi_to_distance(self, rssi):
         """
@@ -158,8 +118,7 @@ class CassiaLocalClient:
         Returns:
             distance: 距离（米）
         """
-        distance = 10 ** ((self.tx_power - rssi) / (10 * self.path_loss_exponent))
-        return distance
+        return self.ingest.rssi_to_distance(rssi)
     
     def find_nearest_beacon(self, target_distance, tolerance=2.0):
         """
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Cassia SSE模拟服务器
+在本地模拟Cassia路由器的 /gap/nodes 扫描流（本地模式和AC模式的 /api 前缀均支持），
+可配置事件速率、信标数量和按连接顺序的故障模式，用于离线测试重连速度和接入吞吐。
+
+故障模式（按连接顺序依次使用，用完后保持正常）：
+    ok          正常推送
+    refuse      返回503
+    drop:N      推送N条事件后断开
+    stall:S     推送少量事件后保持连接但S秒不发送任何数据，然后断开
+    garbage     正常推送，并夹杂无法解析的数据
+
+用法:
+    python cassia_sim_server.py --port 8080 --rate 500 --beacons 50 --faults refuse,drop:200,stall:20
+    python cassia_sim_server.py --rate 1000 --with-client 30    # 同时运行CassiaLocalClient并输出指标
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import urlparse
+
+
+def parse_fault(spec: str):
+    """
+    解析单个故障模式
+
+    Args:
+        spec: 如 'drop:50'
+
+    Returns:
+        tuple: (模式, 参数)
+    """
+    mode, _, arg = spec.strip().partition(':')
+    mode = mode or 'ok'
+    if mode not in ('ok', 'refuse', 'drop', 'stall', 'garbage'):
+        raise ValueError(f"未知故障模式: {spec}")
+    return mode, float(arg) if arg else None
+
+
+class CassiaSimServer:
+    """模拟Cassia /gap/nodes SSE流的本地HTTP服务器"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, rate: float = 100.0,
+                 num_beacons: int = 20, faults: Optional[List[str]] = None,
+                 keepalive_interval: float = 5.0, seed: int = 0):
+        """
+        初始化模拟服务器
+
+        Args:
+            host: 监听地址
+            port: 监听端口（0表示自动分配）
+            rate: 每个连接的事件速率（条/秒）
+            num_beacons: 模拟信标数量
+            faults: 按连接顺序的故障模式列表
+            keepalive_interval: 无事件时发送keep-alive注释的间隔（秒）
+            seed: 随机种子
+        """
+        self.rate = rate
+        self.keepalive_interval = keepalive_interval
+        self.faults = [parse_fault(f) for f in (faults or [])]
+        self.rng = random.Random(seed)
+        self.beacons = [
+            (f"AC:23:3F:{i >> 16 & 0xFF:02X}:{i >> 8 & 0xFF:02X}:{i & 0xFF:02X}",
+             self.rng.uniform(-85, -50))
+            for i in range(num_beacons)
+        ]
+
+        self.lock = threading.Lock()
+        self.connections = 0  # 已接受的扫描连接数（含被拒绝的）
+        self.connection_times = []
+        self.events_sent = 0
+        self.running = False
+
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def address(self) -> str:
+        """host:port，可直接作为CassiaLocalClient的router_ip"""
+        host, port = self.httpd.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.address}"
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self.running = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """停止服务并断开所有流"""
+        self.running = False
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def _next_fault(self):
+        """登记新连接并取出其故障模式"""
+        with self.lock:
+            index = self.connections
+            self.connections += 1
+            self.connection_times.append(time.time())
+        if index < len(self.faults):
+            return self.faults[index]
+        return 'ok', None
+
+    def make_event(self, garbage: bool = False) -> bytes:
+        """生成一条SSE事件"""
+        if garbage:
+            return b"data: {not-json\n\n"
+        mac, base_rssi = self.beacons[self.rng.randrange(len(self.beacons))]
+        event = {
+            'bdaddrs': [{'bdaddr': mac, 'bdaddrType': 'public'}],
+            'rssi': int(round(base_rssi + self.rng.gauss(0, 3))),
+            'name': 'SimBeacon',
+            'evt_type': 0,
+        }
+        return b"data: " + json.dumps(event).encode() + b"\n\n"
+
+    def _stream(self, wfile, mode, arg):
+        """按速率推送事件，直到连接断开、服务停止或触发故障"""
+        limit = int(arg) if mode == 'drop' else (5 if mode == 'stall' else None)
+        start = time.monotonic()
+        last_write = start
+        sent = 0
+        while self.running:
+            now = time.monotonic()
+            due = int((now - start) * self.rate) - sent
+            if limit is not None:
+                due = min(due, limit - sent)
+            chunk = []
+            for _ in range(max(0, due)):
+                chunk.append(self.make_event())
+                if mode == 'garbage' and self.rng.random() < 0.1:
+                    chunk.append(self.make_event(garbage=True))
+            if not chunk and now - last_write >= self.keepalive_interval:
+                chunk.append(b": keep-alive\n\n")
+            if chunk:
+                wfile.write(b''.join(chunk))
+                wfile.flush()
+                last_write = now
+                sent += max(0, due)
+                with self.lock:
+                    self.events_sent += max(0, due)
+
+            if limit is not None and sent >= limit:
+                if mode == 'stall':
+                    # 保持连接但不再发送任何数据
+                    deadline = time.monotonic() + arg
+                    while self.running and time.monotonic() < deadline:
+                        time.sleep(0.05)
+                return
+            time.sleep(0.005)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # 避免刷屏
+
+            def _send_json(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                if path.endswith('/oauth2/token'):
+                    length = int(self.headers.get('Content-Length', 0))
+                    self.rfile.read(length)
+                    self._send_json(200, {'access_token': 'sim-token', 'expires_in': 3600})
+                else:
+                    self._send_json(404, {'error': 'not found'})
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path.startswith('/api/'):
+                    path = path[4:]
+                if path != '/gap/nodes':
+                    self._send_json(404, {'error': 'not found'})
+                    return
+
+                mode, arg = server._next_fault()
+                if mode == 'refuse':
+                    self._send_json(503, {'error': 'service unavailable'})
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                try:
+                    server._stream(self.wfile, mode, arg)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 客户端断开
+                self.close_connection = True
+
+        return Handler
+
+
+def _run_with_client(server, seconds, connection_config):
+    """启动CassiaLocalClient连接模拟服务器，运行指定时间后输出重连和吞吐指标"""
+    from cassia_local_client import CassiaLocalClient
+
+    client = CassiaLocalClient(server.address, connection_config=connection_config)
+    client.start()
+    start = time.time()
+    try:
+        while time.time() - start < seconds:
+            time.sleep(1.0)
+            stats = client.get_connection_stats()
+            print(f"  {time.time() - start:5.1f}s 信标={len(client.get_beacons())} "
+                  f"事件={client.ingest.events_parsed} 连接={stats['connects']} 停滞={stats['stalls']}")
+    finally:
+        client.stop()
+
+    elapsed = time.time() - start
+    stats = client.get_connection_stats()
+    print(f"\n📊 接入吞吐: {client.ingest.events_parsed / elapsed:.0f} 条/秒 "
+          f"（服务器发送 {server.events_sent} 条，批次 {client.ingest.batches}）")
+    if stats['reconnect_latency_avg'] is not None:
+        print(f"📊 重连耗时: 平均 {stats['reconnect_latency_avg']:.2f}s, 最大 {stats['reconnect_latency_max']:.2f}s "
+              f"（断开 {stats['disconnects']} 次，停滞 {stats['stalls']} 次，失败 {stats['failures']} 次）")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Cassia SSE模拟服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--rate', type=float, default=100.0, help='事件速率（条/秒）')
+    parser.add_argument('--beacons', type=int, default=20, help='模拟信标数量')
+    parser.add_argument('--faults', default='', help='按连接顺序的故障模式，逗号分隔，如 refuse,drop:200,stall:20')
+    parser.add_argument('--keepalive', type=float, default=5.0, help='keep-alive间隔（秒）')
+    parser.add_argument('--with-client', type=float, default=0, metavar='SECONDS',
+                        help='同时运行CassiaLocalClient指定秒数并输出指标')
+    parser.add_argument('--idle-timeout', type=float, default=3.0, help='客户端空闲超时（秒，配合--with-client）')
+    args = parser.parse_args()
+
+    faults = [f for f in args.faults.split(',') if f.strip()]
+    server = CassiaSimServer(args.host, args.port, rate=args.rate, num_beacons=args.beacons,
+                             faults=faults, keepalive_interval=args.keepalive).start()
+    print(f"✓ Cassia模拟服务器已启动: {server.url}/gap/nodes （{args.rate:.0f} 条/秒, {args.beacons} 个信标）")
+
+    try:
+        if args.with_client > 0:
+            _run_with_client(server, args.with_client, {
+                'idle_timeout': args.idle_timeout,
+                'backoff': {'initial': 0.2, 'max': 5.0},
+            })
+        else:
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"\n已停止（连接 {server.connections} 次，发送 {server.events_sent} 条事件）")
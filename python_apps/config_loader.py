@@ -242,18 +242,19 @@ class ConfigLoader:
         """获取云端配置"""
         return self.config.get('cloud', {})
     
-    def resolve_path(self, path_key: str, base_dir: Optional[str] = None) -> str:
+    def resolve_path(self, path_key: str, base_dir: Optional[str] = None, default: Optional[str] = None) -> str:
         """
         解析文件路径（支持相对路径和绝对路径）
         
         Args:
             path_key: 路径配置键，如 'paths.model_path'
             base_dir: 基础目录（用于相对路径），如果为None则使用项目根目录
+            default: 未配置时使用的路径
         
         Returns:
             解析后的绝对路径
         """
-        path = self.get(path_key)
+        path = self.get(path_key, default)
         if not path:
             return ""
         
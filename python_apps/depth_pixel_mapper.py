@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+彩色→深度像素映射表模块
+检测框位于彩色图像坐标系，而深度图的分辨率/视场可能与彩色图不同。
+在相机启动时根据流配置和标定内参预先计算查找表，深度查询时只需一次索引即可
+得到对应的深度像素，无需每次调用重复做坐标换算。
+"""
+
+import os
+import re
+
+import numpy as np
+
+
+class ColorDepthMapper:
+    """彩色像素到深度像素的查找表"""
+
+    def __init__(self, color_size, depth_size, color_intrinsic=None, depth_intrinsic=None):
+        """
+        构建映射表
+
+        Args:
+            color_size: 彩色图尺寸 (width, height)
+            depth_size: 深度图尺寸 (width, height)
+            color_intrinsic: 彩色相机内参 (fx, fy, cx, cy)，None表示按尺寸等比缩放
+            depth_intrinsic: 深度相机内参 (fx, fy, cx, cy)，None表示按尺寸等比缩放
+
+        说明:
+            有标定内参时使用针孔模型换算（忽略两相机基线，车辆距离远大于基线）：
+                u_d = (u_c - cx_c) * fx_d / fx_c + cx_d
+            该换算在x/y方向可分离，因此只需两张一维查找表。
+        """
+        self.color_size = (int(color_size[0]), int(color_size[1]))
+        self.depth_size = (int(depth_size[0]), int(depth_size[1]))
+
+        color_w, color_h = self.color_size
+        depth_w, depth_h = self.depth_size
+
+        # 彩色像素中心坐标
+        u_c = np.arange(color_w, dtype=np.float64) + 0.5
+        v_c = np.arange(color_h, dtype=np.float64) + 0.5
+
+        if color_intrinsic is not None and depth_intrinsic is not None:
+            fx_c, fy_c, cx_c, cy_c = [float(v) for v in color_intrinsic]
+            fx_d, fy_d, cx_d, cy_d = [float(v) for v in depth_intrinsic]
+            u_d = (u_c - cx_c) * (fx_d / fx_c) + cx_d
+            v_d = (v_c - cy_c) * (fy_d / fy_c) + cy_d
+            self.source = 'intrinsic'
+        else:
+            # 已对齐（D2C）或无标定数据：按尺寸等比缩放
+            u_d = u_c * (depth_w / color_w)
+            v_d = v_c * (depth_h / color_h)
+            self.source = 'scale'
+
+        self.x_lut = np.clip(np.floor(u_d), 0, depth_w - 1).astype(np.int32)
+        self.y_lut = np.clip(np.floor(v_d), 0, depth_h - 1).astype(np.int32)
+
+    @classmethod
+    def from_arrays(cls, color_size, depth_size, x_lut, y_lut, source='cache'):
+        """
+        从已有查找表数组构建（用于磁盘缓存加载）
+
+        Args:
+            color_size: 彩色图尺寸 (width, height)
+            depth_size: 深度图尺寸 (width, height)
+            x_lut: x方向查找表（长度为彩色图宽度）
+            y_lut: y方向查找表（长度为彩色图高度）
+            source: 来源标记
+
+        Returns:
+            ColorDepthMapper实例
+        """
+        mapper = cls.__new__(cls)
+        mapper.color_size = (int(color_size[0]), int(color_size[1]))
+        mapper.depth_size = (int(depth_size[0]), int(depth_size[1]))
+        mapper.x_lut = np.asarray(x_lut, dtype=np.int32)
+        mapper.y_lut = np.asarray(y_lut, dtype=np.int32)
+        mapper.source = source
+        if len(mapper.x_lut) != mapper.color_size[0] or len(mapper.y_lut) != mapper.color_size[1]:
+            raise ValueError("查找表长度与彩色图尺寸不一致")
+        return mapper
+
+    def map_point(self, x, y):
+        """
+        彩色像素坐标 -> 深度像素坐标
+
+        Args:
+            x: 彩色图x坐标
+            y: 彩色图y坐标
+
+        Returns:
+            tuple: (depth_x, depth_y)
+        """
+        color_w, color_h = self.color_size
+        xi = min(max(int(x), 0), color_w - 1)
+        yi = min(max(int(y), 0), color_h - 1)
+        return int(self.x_lut[xi]), int(self.y_lut[yi])
+
+    def map_bbox(self, bbox):
+        """
+        彩色图bbox -> 深度图bbox
+
+        Args:
+            bbox: [x1, y1, x2, y2]（彩色图坐标）
+
+        Returns:
+            tuple: (x1, y1, x2, y2)（深度图坐标，x2/y2为开区间上界）
+        """
+        x1, y1, x2, y2 = bbox
+        dx1, dy1 = self.map_point(x1, y1)
+        # 右下角取最后一个被覆盖的像素，再+1作为切片上界
+        dx2, dy2 = self.map_point(x2 - 1, y2 - 1)
+        return dx1, dy1, dx2 + 1, dy2 + 1
+
+    def save(self, path):
+        """
+        保存查找表到磁盘
+
+        Args:
+            path: .npz文件路径
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 先写临时文件再替换，避免中途崩溃留下损坏的缓存
+        tmp_path = path + '.tmp.npz'
+        np.savez(
+            tmp_path,
+            color_size=np.array(self.color_size, dtype=np.int32),
+            depth_size=np.array(self.depth_size, dtype=np.int32),
+            x_lut=self.x_lut,
+            y_lut=self.y_lut,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        从磁盘加载查找表
+
+        Args:
+            path: .npz文件路径
+
+        Returns:
+            ColorDepthMapper实例，失败返回None
+        """
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return cls.from_arrays(
+                    tuple(data['color_size']),
+                    tuple(data['depth_size']),
+                    data['x_lut'],
+                    data['y_lut'],
+                )
+        except Exception as e:
+            print(f"⚠ 加载深度映射表缓存失败: {e}")
+            return None
+
+
+def make_mapping_cache_key(serial, color_profile, depth_profile, align_mode):
+    """
+    生成映射表缓存键（设备序列号 + 流配置 + 对齐模式）
+
+    Args:
+        serial: 设备序列号
+        color_profile: 彩色流配置 (width, height, format)
+        depth_profile: 深度流配置 (width, height, format)
+        align_mode: 对齐模式字符串
+
+    Returns:
+        str: 可用作文件名的缓存键
+    """
+    cw, ch, cfmt = color_profile
+    dw, dh, dfmt = depth_profile
+    key = f"{serial}_c{cw}x{ch}_{cfmt}_d{dw}x{dh}_{dfmt}_{align_mode}"
+    return re.sub(r'[^0-9A-Za-z_.-]', '_', key)
+
+
+def load_or_build_mapper(cache_dir, cache_key, color_size, depth_size,
+                         color_intrinsic=None, depth_intrinsic=None):
+    """
+    优先从磁盘缓存加载映射表，缓存缺失或不匹配时重新构建并写回缓存
+
+    Args:
+        cache_dir: 缓存目录（None表示不使用磁盘缓存）
+        cache_key: 缓存键（见make_mapping_cache_key）
+        color_size: 彩色图尺寸 (width, height)
+        depth_size: 深度图尺寸 (width, height)
+        color_intrinsic: 彩色相机内参 (fx, fy, cx, cy)
+        depth_intrinsic: 深度相机内参 (fx, fy, cx, cy)
+
+    Returns:
+        ColorDepthMapper实例
+    """
+    cache_path = None
+    if cache_dir and cache_key:
+        cache_path = os.path.join(os.path.expanduser(cache_dir), cache_key + '.npz')
+        mapper = ColorDepthMapper.load(cache_path)
+        if (mapper is not None and
+                mapper.color_size == tuple(int(v) for v in color_size) and
+                mapper.depth_size == tuple(int(v) for v in depth_size)):
+            return mapper
+
+    mapper = ColorDepthMapper(color_size, depth_size, color_intrinsic, depth_intrinsic)
+
+    if cache_path:
+        try:
+            mapper.save(cache_path)
+        except Exception as e:
+            print(f"⚠ 保存深度映射表缓存失败: {e}")
+
+    return mapper
@@ -5,7 +5,7 @@
 """
 
 import numpy as np
-from typing import Optional, Dict
+from typing import Optional, Dict, Iterable, Sequence
 from collections import defaultdict
 
 
@@ -116,9 +116,228 @@ class TrackDepthSmoother:
         """清空所有历史"""
         self.track_depths.clear()
         self.track_smoothed.clear()
+    
+    def cleanup(self, active_track_ids: Iterable[int]):
+        """清理已结束track的历史"""
+        active_track_ids = set(active_track_ids)
+        for track_id in set(self.track_depths.keys()) - active_track_ids:
+            self.reset(track_id)
+
+
+class MultiTrackDepthSmoother:
+    """
+    数组化的多目标深度平滑器（结构数组）
+    
+    每个track占用一个槽位，所有状态保存在预分配的numpy数组中：
+    环形历史缓冲区、已采样数、平滑值、卡尔曼方差等。update_batch一次
+    向量化更新本帧所有目标，track结束时释放槽位复用，稳态下不产生内存分配。
+    
+    支持的方法:
+        - 'ema': 指数移动平均（前min_samples个值的中位数作为初始值）
+        - 'median': 最近window_size个值的滑动中位数
+        - 'kalman': 一维卡尔曼滤波（匀速度为0的位置模型）
+    """
+    
+    METHODS = ('ema', 'median', 'kalman')
+    
+    def __init__(self, method='ema', alpha=0.7, window_size=5, min_samples=3,
+                 capacity=64, process_noise=0.01, measurement_noise=0.1):
+        """
+        初始化深度平滑器
+        
+        Args:
+            method: 平滑方法 'ema' / 'median' / 'kalman'
+            alpha: EMA系数 (0-1)，值越大对新值权重越高
+            window_size: 滑动窗口大小（用于median方法）
+            min_samples: 最小样本数，达到此数量后才开始平滑
+            capacity: 初始槽位数（不足时自动翻倍扩容）
+            process_noise: 卡尔曼过程噪声方差（米²/帧）
+            measurement_noise: 卡尔曼观测噪声方差（米²）
+        """
+        if method not in self.METHODS:
+            print(f"⚠ 未知深度平滑方法 {method}，使用 ema")
+            method = 'ema'
+        self.method = method
+        self.alpha = alpha
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        
+        # median需要最近window_size个值；ema只需前min_samples个值计算初始值
+        self.history_len = max(1, window_size if method == 'median' else min_samples)
+        
+        self.slot_of: Dict[int, int] = {}  # track_id -> 槽位
+        self._allocate(max(1, int(capacity)))
+    
+    def _allocate(self, capacity: int):
+        """分配（或扩容）槽位数组"""
+        old_capacity = getattr(self, 'capacity', 0)
+        
+        history = np.full((capacity, self.history_len), np.nan, dtype=np.float64)
+        head = np.zeros(capacity, dtype=np.int32)  # 环形缓冲区下一个写入位置
+        count = np.zeros(capacity, dtype=np.int64)  # 累计有效样本数
+        smoothed = np.full(capacity, np.nan, dtype=np.float64)  # 平滑值（nan表示尚未平滑）
+        variance = np.zeros(capacity, dtype=np.float64)  # 卡尔曼估计方差
+        
+        if old_capacity:
+            history[:old_capacity] = self.history
+            head[:old_capacity] = self.head
+            count[:old_capacity] = self.count
+            smoothed[:old_capacity] = self.smoothed
+            variance[:old_capacity] = self.variance
+        
+        self.history = history
+        self.head = head
+        self.count = count
+        self.smoothed = smoothed
+        self.variance = variance
+        # 空闲槽位栈（倒序，优先复用低编号槽位）
+        new_free = list(range(capacity - 1, old_capacity - 1, -1))
+        self.free_slots = new_free + getattr(self, 'free_slots', [])
+        self.capacity = capacity
+    
+    def _acquire_slot(self, track_id: int) -> int:
+        """获取track的槽位（新track分配空闲槽位）"""
+        slot = self.slot_of.get(track_id)
+        if slot is None:
+            if not self.free_slots:
+                self._allocate(self.capacity * 2)
+            slot = self.free_slots.pop()
+            self.slot_of[track_id] = slot
+        return slot
+    
+    def update(self, track_id: int, raw_depth: Optional[float]) -> Optional[float]:
+        """
+        更新单个track的深度值并返回平滑后的结果
+        
+        Args:
+            track_id: 跟踪ID
+            raw_depth: 原始深度值（米），如果无效则为None
+        
+        Returns:
+            平滑后的深度值（米）；样本不足时返回原始值；无效时返回上一次平滑值或None
+        """
+        result = self.update_batch([track_id], [raw_depth])[0]
+        return None if np.isnan(result) else float(result)
+    
+    def update_batch(self, track_ids: Sequence[int], raw_depths: Sequence[Optional[float]]) -> np.ndarray:
+        """
+        向量化更新多个track的深度值（同一批内track_id不应重复）
+        
+        Args:
+            track_ids: 跟踪ID列表
+            raw_depths: 对应的原始深度值列表（米），None表示无效
+        
+        Returns:
+            np.ndarray: 平滑后的深度值，无效位置为nan
+        """
+        n = len(track_ids)
+        if n == 0:
+            return np.empty(0, dtype=np.float64)
+        
+        slots = np.fromiter((self._acquire_slot(tid) for tid in track_ids), dtype=np.intp, count=n)
+        raw = np.array([np.nan if d is None else d for d in raw_depths], dtype=np.float64)
+        valid = ~np.isnan(raw)
+        
+        # 无效深度：不记录，返回上一次平滑值（可能为nan）
+        result = self.smoothed[slots].copy()
+        if not valid.any():
+            return result
+        
+        vs = slots[valid]
+        vraw = raw[valid]
+        
+        # 写入环形历史缓冲区
+        self.history[vs, self.head[vs]] = vraw
+        self.head[vs] = (self.head[vs] + 1) % self.history_len
+        self.count[vs] += 1
+        count = self.count[vs]
+        
+        if self.method == 'median':
+            smoothed = np.nanmedian(self.history[vs], axis=1)
+        elif self.method == 'kalman':
+            smoothed = self._kalman_step(vs, vraw)
+        else:
+            smoothed = self._ema_step(vs, vraw, count)
+        
+        ready = count >= self.min_samples
+        if self.method != 'kalman':
+            # kalman在_kalman_step中已更新状态；其余方法样本足够后才保存平滑值
+            self.smoothed[vs[ready]] = smoothed[ready]
+        
+        # 样本不足时返回原始值
+        result[valid] = np.where(ready, smoothed, vraw)
+        return result
+    
+    def _ema_step(self, slots: np.ndarray, raw: np.ndarray, count: np.ndarray) -> np.ndarray:
+        """指数移动平均（向量化）"""
+        previous = self.smoothed[slots]
+        smoothed = self.alpha * raw + (1 - self.alpha) * previous
+        # 首次达到min_samples（或平滑值被重置）：使用前min_samples个值的中位数作为初始值
+        init = np.isnan(previous) & (count >= self.min_samples)
+        if init.any():
+            smoothed[init] = np.nanmedian(self.history[slots[init]], axis=1)
+        return smoothed
+    
+    def _kalman_step(self, slots: np.ndarray, raw: np.ndarray) -> np.ndarray:
+        """一维卡尔曼滤波（向量化）"""
+        x = self.smoothed[slots]
+        p = self.variance[slots]
+        
+        # 首个样本：以观测值初始化
+        init = np.isnan(x)
+        x = np.where(init, raw, x)
+        p = np.where(init, self.measurement_noise, p + self.process_noise)
+        
+        # 观测更新（首个样本跳过）
+        gain = np.where(init, 0.0, p / (p + self.measurement_noise))
+        x = x + gain * (raw - x)
+        p = (1.0 - gain) * p
+        
+        self.smoothed[slots] = x
+        self.variance[slots] = p
+        return x
+    
+    def reset(self, track_id: int):
+        """重置指定track并释放其槽位"""
+        slot = self.slot_of.pop(track_id, None)
+        if slot is None:
+            return
+        self.history[slot] = np.nan
+        self.head[slot] = 0
+        self.count[slot] = 0
+        self.smoothed[slot] = np.nan
+        self.variance[slot] = 0.0
+        self.free_slots.append(slot)
+    
+    def release(self, track_ids: Iterable[int]):
+        """批量释放已结束track的槽位"""
+        for track_id in track_ids:
+            self.reset(track_id)
+    
+    def cleanup(self, active_track_ids: Iterable[int]):
+        """释放不在活跃集合中的track槽位"""
+        active_track_ids = set(active_track_ids)
+        expired = [tid for tid in self.slot_of if tid not in active_track_ids]
+        self.release(expired)
+    
+    def get_smoothed(self, track_id: int) -> Optional[float]:
+        """获取track当前平滑值"""
+        slot = self.slot_of.get(track_id)
+        if slot is None or np.isnan(self.smoothed[slot]):
+            return None
+        return float(self.smoothed[slot])
+    
+    def clear(self):
+        """清空所有track"""
+        self.release(list(self.slot_of.keys()))
+    
+    def __len__(self):
+        return len(self.slot_of)
 
 
-def create_depth_smoother(config: dict) -> Optional[TrackDepthSmoother]:
+def create_depth_smoother(config: dict):
     """
     根据配置创建深度平滑器
     
@@ -126,7 +345,7 @@ def create_depth_smoother(config: dict) -> Optional[TrackDepthSmoother]:
         config: 配置字典，包含smoothing相关配置
     
     Returns:
-        TrackDepthSmoother实例，如果未启用则返回None
+        MultiTrackDepthSmoother实例（backend='list'时为TrackDepthSmoother），如果未启用则返回None
     """
     smoothing_cfg = config.get('smoothing', {})
     if not smoothing_cfg.get('enabled', False):
@@ -137,10 +356,21 @@ def create_depth_smoother(config: dict) -> Optional[TrackDepthSmoother]:
     window_size = smoothing_cfg.get('window_size', 5)
     min_samples = smoothing_cfg.get('min_samples', 3)
     
-    return TrackDepthSmoother(
+    if smoothing_cfg.get('backend', 'array') == 'list':
+        return TrackDepthSmoother(
+            method=method,
+            alpha=alpha,
+            window_size=window_size,
+            min_samples=min_samples
+        )
+    
+    return MultiTrackDepthSmoother(
         method=method,
         alpha=alpha,
         window_size=window_size,
-        min_samples=min_samples
+        min_samples=min_samples,
+        capacity=smoothing_cfg.get('capacity', 64),
+        process_noise=smoothing_cfg.get('process_noise', 0.01),
+        measurement_noise=smoothing_cfg.get('measurement_noise', 0.1)
     )
 
@@ -18,7 +18,15 @@ import threading
 
 class DetectionDatabase:
     """检测结果数据库"""
-    
+
+    _INSERT_SQL = """
+        INSERT INTO detections (
+            timestamp, track_id, vehicle_type, detected_class, status,
+            beacon_mac, plate_number, company, distance, confidence,
+            bbox_x1, bbox_y1, bbox_x2, bbox_y2, snapshot_path, metadata
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
     def __init__(self, db_path: str = "detection_results.db"):
         """
         初始化数据库
@@ -111,23 +119,43 @@ class DetectionDatabase:
             
             snapshot_path = detection.get('snapshot_path')
             metadata = json.dumps(detection.get('metadata', {}))
-            
-            cursor.execute("""
-                INSERT INTO detections (
-                    timestamp, track_id, vehicle_type, detected_class, status,
-                    beacon_mac, plate_number, company, distance, confidence,
-                    bbox_x1, bbox_y1, bbox_x2, bbox_y2, snapshot_path, metadata
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+
+            cursor.execute(self._INSERT_SQL, (
                 timestamp, track_id, vehicle_type, detected_class, status,
                 beacon_mac, plate_number, company, distance, confidence,
                 bbox_x1, bbox_y1, bbox_x2, bbox_y2, snapshot_path, metadata
             ))
-            
+
             record_id = cursor.lastrowid
             conn.commit()
             conn.close()
-            
+
+            return record_id
+
+    def insert_event(self, event) -> int:
+        """
+        插入报警事件（直接读取 AlertEvent 的字段，不再构造中间字典）
+
+        Args:
+            event: AlertEvent实例
+
+        Returns:
+            插入记录的ID
+        """
+        bbox = event.bbox or (None, None, None, None)
+        with self.lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute(self._INSERT_SQL, (
+                event.timestamp.isoformat(), event.track_id, event.vehicle_type, event.detected_class,
+                event.status, event.beacon_mac, event.plate_number, event.company, event.distance,
+                event.confidence, bbox[0], bbox[1], bbox[2], bbox[3], event.image_path,
+                json.dumps(event.metadata or {})
+            ))
+            record_id = cursor.lastrowid
+            conn.commit()
+            conn.close()
+
             return record_id
     
     def query_detections(
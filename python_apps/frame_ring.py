@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+共享帧环形缓冲区（引用计数）
+
+最佳帧选取等按track保存状态的模块原先各自复制一份车辆ROI，每个track常驻
+数百KB到数MB；工程车辆批处理列表和快照也各自持有整帧。这里由主循环把最近N帧
+完整图像（采集线程每帧解码出的新数组，不复制）放入环形缓冲区，按track只保存
+(frame_seq, bbox, score)，需要像素时（提交识别、保存快照）再按需裁剪。
+被引用的帧在移出环形缓冲区后仍保留，直到引用释放；这些帧占用的内存有上限
+（多个track引用同一帧只计一次），超出时丢弃最旧的，持有者裁剪时得到None。
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class FrameRing:
+    """最近N帧的共享缓冲区，支持按帧序号引用计数"""
+
+    def __init__(self, capacity: int = 4, max_pinned_bytes: int = 128 * 1024 * 1024):
+        """
+        初始化帧缓冲区
+
+        Args:
+            capacity: 环形缓冲区保存的最近帧数
+            max_pinned_bytes: 移出环形缓冲区后仍因被引用而保留的帧最多占用的字节数
+        """
+        self.capacity = max(1, int(capacity))
+        self.max_pinned_bytes = max(0, int(max_pinned_bytes))
+        self._frames = OrderedDict()  # seq -> frame（最近capacity帧）
+        self._pinned = OrderedDict()  # seq -> frame（已移出但仍被引用）
+        self._pinned_bytes = 0
+        self._refs = {}  # seq -> 引用计数
+        self._lock = Lock()
+
+        self.crops = 0
+        self.misses = 0  # 裁剪时帧已不可用
+        self.dropped_pinned = 0
+
+    def put(self, seq: int, frame: np.ndarray):
+        """
+        放入新帧（保存引用，不复制；调用方之后不得原地修改该帧）
+
+        Args:
+            seq: 帧序号
+            frame: 完整图像
+        """
+        with self._lock:
+            self._frames[seq] = frame
+            self._frames.move_to_end(seq)
+            while len(self._frames) > self.capacity:
+                old_seq, old_frame = self._frames.popitem(last=False)
+                if self._refs.get(old_seq, 0) > 0:
+                    self._pinned[old_seq] = old_frame
+                    self._pinned_bytes += old_frame.nbytes
+            while self._pinned and self._pinned_bytes > self.max_pinned_bytes:
+                old_seq, old_frame = self._pinned.popitem(last=False)
+                self._pinned_bytes -= old_frame.nbytes
+                self._refs.pop(old_seq, None)
+                self.dropped_pinned += 1
+
+    def acquire(self, seq: int) -> bool:
+        """
+        引用一帧（引用期间帧移出环形缓冲区后仍保留）
+
+        Args:
+            seq: 帧序号
+
+        Returns:
+            bool: 帧是否可用
+        """
+        with self._lock:
+            if seq not in self._frames and seq not in self._pinned:
+                return False
+            self._refs[seq] = self._refs.get(seq, 0) + 1
+            return True
+
+    def release(self, seq: int):
+        """
+        释放一次引用，引用计数归零且已移出环形缓冲区的帧被丢弃
+
+        Args:
+            seq: 帧序号
+        """
+        with self._lock:
+            count = self._refs.get(seq, 0) - 1
+            if count > 0:
+                self._refs[seq] = count
+                return
+            self._refs.pop(seq, None)
+            frame = self._pinned.pop(seq, None)
+            if frame is not None:
+                self._pinned_bytes -= frame.nbytes
+
+    def clear(self):
+        """丢弃所有帧和引用（相机重建后帧序号从头开始时调用）"""
+        with self._lock:
+            self._frames.clear()
+            self._pinned.clear()
+            self._pinned_bytes = 0
+            self._refs.clear()
+
+    def get(self, seq: int) -> Optional[np.ndarray]:
+        """
+        获取完整帧（只读）
+
+        Args:
+            seq: 帧序号
+
+        Returns:
+            np.ndarray: 帧图像，不可用时返回None
+        """
+        with self._lock:
+            frame = self._frames.get(seq)
+            return frame if frame is not None else self._pinned.get(seq)
+
+    def crop(self, seq: int, bbox: Tuple[float, float, float, float], margin: float = 0.0,
+             convert: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        按需裁剪区域（返回独立数组）
+
+        Args:
+            seq: 帧序号
+            bbox: 边界框 (x1, y1, x2, y2)
+            margin: 四周扩展比例（相对bbox宽高）
+            convert: cv2颜色转换码（如cv2.COLOR_RGB2BGR），None表示不转换
+
+        Returns:
+            np.ndarray: 裁剪结果，帧不可用或区域为空时返回None
+        """
+        frame = self.get(seq)
+        if frame is None:
+            self.misses += 1
+            return None
+        self.crops += 1
+        return crop_frame(frame, bbox, margin, convert)
+
+    def get_stats(self) -> dict:
+        """
+        获取缓冲区统计
+
+        Returns:
+            dict: frames, pinned, refs, bytes, pinned_bytes, crops, misses, dropped_pinned
+        """
+        with self._lock:
+            return {
+                'frames': len(self._frames),
+                'pinned': len(self._pinned),
+                'refs': sum(self._refs.values()),
+                'bytes': sum(frame.nbytes for frame in self._frames.values()) + self._pinned_bytes,
+                'pinned_bytes': self._pinned_bytes,
+                'crops': self.crops,
+                'misses': self.misses,
+                'dropped_pinned': self.dropped_pinned,
+            }
+
+    def __contains__(self, seq) -> bool:
+        with self._lock:
+            return seq in self._frames or seq in self._pinned
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._frames) + len(self._pinned)
+
+
+def crop_frame(frame: np.ndarray, bbox: Tuple[float, float, float, float], margin: float = 0.0,
+               convert: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    从帧中裁剪区域
+
+    Args:
+        frame: 完整图像
+        bbox: 边界框 (x1, y1, x2, y2)
+        margin: 四周扩展比例（相对bbox宽高）
+        convert: cv2颜色转换码，None表示不转换
+
+    Returns:
+        np.ndarray: 裁剪结果（独立数组），区域为空时返回None
+    """
+    h, w = frame.shape[:2]
+    x1, y1, x2, y2 = bbox
+    margin_x = int((x2 - x1) * margin)
+    margin_y = int((y2 - y1) * margin)
+    x1 = max(0, int(x1) - margin_x)
+    y1 = max(0, int(y1) - margin_y)
+    x2 = min(w, int(x2) + margin_x)
+    y2 = min(h, int(y2) + margin_y)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    region = frame[y1:y2, x1:x2]
+    if convert is not None:
+        return cv2.cvtColor(region, convert)
+    return region.copy()
+
+
+def create_frame_ring(config: Optional[dict] = None) -> FrameRing:
+    """
+    从配置创建帧缓冲区
+
+    Args:
+        config: performance.frame_ring 配置字典
+
+    Returns:
+        FrameRing实例
+    """
+    config = config or {}
+    return FrameRing(
+        capacity=config.get('capacity', 4),
+        max_pinned_bytes=int(config.get('max_pinned_mb', 128) * 1024 * 1024),
+    )
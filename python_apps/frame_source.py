@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+帧源与帧等待策略模块
+采集线程发布新帧时通过条件变量唤醒消费者，主循环无需固定sleep轮询，
+新帧就绪即可立即处理。等待方式可在延迟与CPU占用之间按配置取舍。
+"""
+
+import threading
+import time
+
+
+class FrameSource:
+    """帧源基类：维护单调递增的帧序号，新帧到达时通知等待的消费者"""
+
+    def __init__(self, lock=None):
+        """
+        初始化帧源
+
+        Args:
+            lock: 与帧数据共用的锁（None表示新建）
+        """
+        self.frame_lock = lock if lock is not None else threading.Lock()
+        self.frame_cond = threading.Condition(self.frame_lock)
+        self.frame_seq = 0  # 帧序号（单调递增）
+        self.latest_frame = None  # 最新帧
+        self.frame_source_closed = False
+
+    def publish_frame(self, frame):
+        """
+        发布新帧并唤醒所有等待者（由采集线程调用）
+
+        Args:
+            frame: 新帧数据
+
+        Returns:
+            int: 新帧序号
+        """
+        with self.frame_cond:
+            self.latest_frame = frame
+            self.frame_seq += 1
+            self.frame_cond.notify_all()
+            return self.frame_seq
+
+    def open_frames(self):
+        """标记帧源已启动"""
+        with self.frame_cond:
+            self.frame_source_closed = False
+
+    def close_frames(self):
+        """标记帧源已停止，并唤醒所有等待者"""
+        with self.frame_cond:
+            self.frame_source_closed = True
+            self.frame_cond.notify_all()
+
+    def is_frame_source_active(self):
+        """帧源是否仍在产出帧"""
+        return not self.frame_source_closed
+
+    def get_latest_frame(self):
+        """
+        获取最新帧及其序号
+
+        Returns:
+            tuple: (seq, frame)，尚无帧时返回 (0, None)
+        """
+        with self.frame_lock:
+            return self.frame_seq, self.latest_frame
+
+    def get_next_frame(self, since_seq=0, timeout=None):
+        """
+        阻塞等待比since_seq更新的帧
+
+        Args:
+            since_seq: 调用方已处理的最后一帧序号
+            timeout: 最长等待时间（秒），None表示一直等待直到帧源停止
+
+        Returns:
+            tuple: (seq, frame)，超时或帧源停止时返回 (since_seq, None)
+        """
+        with self.frame_cond:
+            self.frame_cond.wait_for(
+                lambda: self.frame_seq > since_seq or self.frame_source_closed,
+                timeout=timeout
+            )
+            if self.frame_seq <= since_seq or self.latest_frame is None:
+                return since_seq, None
+            return self.frame_seq, self.latest_frame
+
+
+class FrameWaitPolicy:
+    """
+    主循环等待新帧的策略
+
+    - spin: 忙轮询，延迟最低，但占满一个CPU核
+    - block: 条件变量阻塞，直到新帧到达或帧源停止（CPU占用最低，不做超时检测）
+    - block_timeout: 条件变量阻塞，超时返回None（默认，可配合连续失败计数触发相机恢复）
+    """
+
+    MODES = ('spin', 'block', 'block_timeout')
+
+    def __init__(self, mode='block_timeout', timeout=0.1):
+        """
+        初始化等待策略
+
+        Args:
+            mode: 等待模式 spin/block/block_timeout
+            timeout: 超时时间（秒，spin和block_timeout模式有效）
+        """
+        if mode not in self.MODES:
+            print(f"⚠ 未知帧等待模式 {mode}，使用 block_timeout")
+            mode = 'block_timeout'
+        self.mode = mode
+        self.timeout = timeout
+
+    def wait(self, source, since_seq):
+        """
+        等待帧源产出新帧
+
+        Args:
+            source: FrameSource实例
+            since_seq: 已处理的最后一帧序号
+
+        Returns:
+            tuple: (seq, frame)，无新帧时返回 (since_seq, None)
+        """
+        if not source.is_frame_source_active():
+            # 帧源已停止（如正在恢复），避免空转
+            time.sleep(self.timeout)
+            return since_seq, None
+
+        if self.mode == 'spin':
+            deadline = time.monotonic() + self.timeout
+            while time.monotonic() < deadline:
+                seq, frame = source.get_latest_frame()
+                if seq > since_seq and frame is not None:
+                    return seq, frame
+                time.sleep(0)  # 让出GIL给采集线程
+            return since_seq, None
+
+        if self.mode == 'block':
+            return source.get_next_frame(since_seq, timeout=None)
+
+        return source.get_next_frame(since_seq, timeout=self.timeout)
+
+
+def create_frame_wait_policy(config):
+    """
+    从配置创建帧等待策略
+
+    Args:
+        config: performance配置字典
+
+    Returns:
+        FrameWaitPolicy实例
+    """
+    wait_cfg = config.get('frame_wait', {}) if config else {}
+    return FrameWaitPolicy(
+        mode=wait_cfg.get('mode', 'block_timeout'),
+        timeout=wait_cfg.get('timeout', 0.1)
+    )
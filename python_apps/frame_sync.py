@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+RGB/深度帧时间同步模块
+采集线程分别收到彩色帧和深度帧，若各自覆盖最新值，第N帧彩色图上的检测
+可能读到第N+3帧的深度。这里用小型环形缓冲区保存带时间戳的彩色/深度帧，
+深度查询按检测所在彩色帧序号取时间戳最接近的深度帧，超过最大时间差则视为无效。
+彩色帧只记录 (序号, 时间戳)，保存的帧数远多于深度帧，检测较慢时仍能按时间戳
+做同样的时间差检查；连彩色时间戳也已淘汰时无法判断时间差，视为无效（计入统计）。
+"""
+
+from collections import deque
+
+
+class FramePairBuffer:
+    """带时间戳的彩色/深度帧环形缓冲区（非线程安全，调用方持锁）"""
+
+    def __init__(self, capacity=8, max_skew_ms=50.0, color_capacity=256):
+        """
+        初始化缓冲区
+
+        Args:
+            capacity: 缓冲的深度帧数量
+            max_skew_ms: 彩色帧与深度帧允许的最大时间差（毫秒）
+            color_capacity: 记录时间戳的彩色帧数量（只存序号和时间戳，不少于capacity）
+        """
+        self.capacity = max(1, int(capacity))
+        self.max_skew_ms = max_skew_ms
+        self.color_entries = deque(maxlen=max(self.capacity, int(color_capacity)))  # (seq, timestamp_ms)
+        self.depth_entries = deque(maxlen=self.capacity)  # (timestamp_ms, depth_item)
+        # 查询统计
+        self.synced = 0  # 按时间戳配对成功
+        self.skew_rejected = 0  # 最接近的深度帧超过最大时间差
+        self.color_evicted = 0  # 彩色帧时间戳已淘汰，无法判断时间差
+
+    def add_depth(self, timestamp_ms, depth_item):
+        """
+        加入深度帧
+
+        Args:
+            timestamp_ms: 深度帧时间戳（毫秒）
+            depth_item: 深度帧数据（原样保存，不复制）
+        """
+        self.depth_entries.append((timestamp_ms, depth_item))
+
+    def add_color(self, seq, timestamp_ms):
+        """
+        记录彩色帧序号及时间戳
+
+        Args:
+            seq: 彩色帧序号（单调递增且连续）
+            timestamp_ms: 彩色帧时间戳（毫秒）
+        """
+        self.color_entries.append((seq, timestamp_ms))
+
+    def get_color_timestamp(self, seq):
+        """
+        查询彩色帧时间戳
+
+        Args:
+            seq: 彩色帧序号
+
+        Returns:
+            float: 时间戳（毫秒），帧已移出缓冲区时返回None
+        """
+        if not self.color_entries:
+            return None
+        # 序号连续，直接按偏移索引
+        offset = seq - self.color_entries[0][0]
+        if 0 <= offset < len(self.color_entries):
+            entry_seq, timestamp_ms = self.color_entries[offset]
+            if entry_seq == seq:
+                return timestamp_ms
+        for entry_seq, timestamp_ms in self.color_entries:
+            if entry_seq == seq:
+                return timestamp_ms
+        return None
+
+    def get_depth_for(self, seq):
+        """
+        获取与彩色帧时间最接近的深度帧
+
+        Args:
+            seq: 彩色帧序号
+
+        Returns:
+            tuple: (depth_item, skew_ms)，无满足最大时间差的深度帧时返回 (None, skew_ms)；
+                   彩色帧时间戳已淘汰或未记录时返回 (None, None)
+        """
+        if not self.depth_entries:
+            return None, None
+        color_ts = self.get_color_timestamp(seq)
+        if color_ts is None:
+            if self.color_entries and seq < self.color_entries[0][0]:
+                self.color_evicted += 1
+            return None, None
+
+        best_item = None
+        best_skew = None
+        for depth_ts, depth_item in self.depth_entries:
+            skew = abs(depth_ts - color_ts)
+            if best_skew is None or skew < best_skew:
+                best_item = depth_item
+                best_skew = skew
+
+        if best_skew is None or best_skew > self.max_skew_ms:
+            self.skew_rejected += 1
+            return None, best_skew
+        self.synced += 1
+        return best_item, best_skew
+
+    def latest_depth(self):
+        """
+        获取最新深度帧
+
+        Returns:
+            最新的depth_item，缓冲区为空时返回None
+        """
+        if not self.depth_entries:
+            return None
+        return self.depth_entries[-1][1]
+
+    def get_stats(self):
+        """
+        获取查询统计
+
+        Returns:
+            dict: synced, skew_rejected, color_evicted
+        """
+        return {
+            'synced': self.synced,
+            'skew_rejected': self.skew_rejected,
+            'color_evicted': self.color_evicted,
+        }
+
+    def clear(self):
+        """清空缓冲区"""
+        self.color_entries.clear()
+        self.depth_entries.clear()
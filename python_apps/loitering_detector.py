@@ -3,21 +3,113 @@
 
 实现车辆徘徊判定，减少路过车辆的误报。
 只对"未备案"车辆应用徘徊判定，已备案车辆立即报警。
+
+每帧为所有track一次性（向量化）更新：
+- 每个track只保存最近N个采样的定长数组（中心点、画面占比），移动/占比判定为O(1)
+- 整幅画面的占用网格累计各单元的停留时间（按半衰期衰减），同时作为场地热力图
+- 已报警位置按网格单元记录报警时间和报警bbox，"该位置是否已报警"为一次网格查询加一次IoU比较
 """
 
+import json
+import os
 import numpy as np
-from typing import Optional, Dict, Tuple
-from collections import defaultdict
-from dataclasses import dataclass
+from typing import Optional, Dict, List, Tuple
 import time
 
+from alert_dedup import bbox_iou
+
+
+class OccupancyGrid:
+    """
+    画面占用网格（停留时间热力图 + 已报警位置）
+
+    坐标使用归一化画面坐标（0-1），与分辨率无关。
+    """
+
+    def __init__(self, cols: int = 64, rows: int = 36, half_life: float = 600.0):
+        """
+        初始化占用网格
+
+        Args:
+            cols: 水平方向单元数
+            rows: 垂直方向单元数
+            half_life: 停留时间衰减半衰期（秒），<=0表示不衰减
+        """
+        self.cols = max(1, int(cols))
+        self.rows = max(1, int(rows))
+        self.half_life = half_life
+        self.dwell = np.zeros((self.rows, self.cols), dtype=np.float32)  # 衰减后的累计停留时间（秒）
+        self.alert_time = np.full((self.rows, self.cols), -np.inf)  # 单元最近一次报警时间
+        self.alert_box = np.zeros((self.rows, self.cols, 4), dtype=np.float32)  # 单元最近一次报警的归一化bbox
+        self.last_update: Optional[float] = None
+
+    def cells(self, x, y):
+        """
+        归一化坐标所在单元（支持numpy数组）
+
+        Returns:
+            tuple: (row, col)
+        """
+        col = np.clip((np.asarray(x) * self.cols).astype(np.int64), 0, self.cols - 1)
+        row = np.clip((np.asarray(y) * self.rows).astype(np.int64), 0, self.rows - 1)
+        return row, col
+
+    def accumulate(self, centers: np.ndarray, dt: np.ndarray, current_time: float):
+        """
+        累计停留时间（所有track一次完成）
+
+        Args:
+            centers: (N, 2) 归一化中心点
+            dt: (N,) 各track距上次采样的时间（秒）
+            current_time: 当前时间戳
+        """
+        if self.half_life > 0 and self.last_update is not None and current_time > self.last_update:
+            self.dwell *= np.float32(0.5 ** ((current_time - self.last_update) / self.half_life))
+        self.last_update = current_time if self.last_update is None else max(self.last_update, current_time)
+        if len(centers):
+            row, col = self.cells(centers[:, 0], centers[:, 1])
+            np.add.at(self.dwell, (row, col), dt.astype(np.float32))
+
+    def mark_region(self, box: Tuple[float, float, float, float], current_time: float):
+        """
+        记录报警区域：bbox覆盖的单元保存报警时间和bbox本身
+        （与其IoU超过阈值的bbox中心点必然落在其中），查询时再按IoU判断是否同一位置，
+        框内其他位置的车辆不受影响
+
+        Args:
+            box: 归一化 [x1, y1, x2, y2]
+            current_time: 报警时间
+        """
+        (r1, r2), (c1, c2) = self.cells([box[0], box[2]], [box[1], box[3]])
+        self.alert_time[r1:r2 + 1, c1:c2 + 1] = current_time
+        self.alert_box[r1:r2 + 1, c1:c2 + 1] = box
+
+    def alerted_at(self, x: float, y: float) -> Tuple[float, Tuple[float, float, float, float]]:
+        """
+        归一化坐标所在单元最近一次报警
+
+        Returns:
+            tuple: (报警时间（无则为-inf）, 归一化bbox)
+        """
+        row, col = self.cells(x, y)
+        return float(self.alert_time[row, col]), tuple(float(v) for v in self.alert_box[row, col])
+
+    def get_heatmap(self) -> dict:
+        """
+        导出热力图
 
-@dataclass
-class TrackPosition:
-    """跟踪位置信息"""
-    timestamp: float
-    bbox_center: Tuple[float, float]  # (x, y)
-    area: float  # 画面占比 (0-1)
+        Returns:
+            dict: rows, cols, max_dwell（秒）, updated_at, cells（按最大值归一化的行列表）
+        """
+        peak = float(self.dwell.max())
+        normalized = self.dwell / peak if peak > 0 else self.dwell
+        return {
+            'rows': self.rows,
+            'cols': self.cols,
+            'max_dwell': round(peak, 2),
+            'updated_at': self.last_update,
+            'cells': np.round(normalized, 3).tolist(),
+        }
 
 
 class LoiteringDetector:
@@ -34,7 +126,13 @@ class LoiteringDetector:
         self,
         min_duration: float = 10.0,
         min_area_ratio: float = 0.05,
-        min_movement_ratio: float = 0.1
+        min_movement_ratio: float = 0.1,
+        history_size: int = 10,
+        grid_cols: int = 64,
+        grid_rows: int = 36,
+        heatmap_half_life: float = 600.0,
+        position_dedup_time_window: float = 3600.0,
+        position_dedup_iou_threshold: float = 0.5
     ):
         """
         初始化徘徊检测器
@@ -43,106 +141,138 @@ class LoiteringDetector:
             min_duration: 最少停留时间（秒）
             min_area_ratio: 最小画面占比（0-1），太小可能是边缘路过
             min_movement_ratio: 最小移动比例（归一化，0-1），小于此值认为是徘徊
+            history_size: 每个track保留的最近采样数（移动/占比判定使用）
+            grid_cols: 占用网格水平单元数
+            grid_rows: 占用网格垂直单元数
+            heatmap_half_life: 停留时间热力图衰减半衰期（秒）
+            position_dedup_time_window: 位置去重时间窗口（秒），默认1小时
+            position_dedup_iou_threshold: 与已报警bbox的IoU超过此值视为同一位置
         """
         self.min_duration = min_duration
         self.min_area_ratio = min_area_ratio
         self.min_movement_ratio = min_movement_ratio
+        self.history_size = max(2, int(history_size))
         
-        # 为每个track_id维护位置历史
+        # 为每个track_id维护最近history_size个采样 [center_x, center_y, area_ratio]（定长环形数组）
         self.track_enter_time: Dict[int, float] = {}  # {track_id: enter_timestamp}
-        self.track_positions: Dict[int, list] = defaultdict(list)  # {track_id: [TrackPosition, ...]}
+        self.track_history: Dict[int, np.ndarray] = {}  # {track_id: (history_size, 3)}
+        self.track_samples: Dict[int, int] = {}  # {track_id: 累计采样数}
+        self.track_last_time: Dict[int, float] = {}  # {track_id: 最近采样时间}
         
         # 记录已报警的track（避免重复报警）
         self.alerted_tracks: Dict[int, float] = {}  # {track_id: alert_timestamp}
         
-        # 记录已报警的位置区域（避免track_id变化时重复报警）
-        # 格式: [(bbox_center_x, bbox_center_y, bbox_width, bbox_height, alert_timestamp), ...]
-        self.alerted_positions: list = []
+        # 占用网格：停留时间热力图 + 已报警位置（避免track_id变化时重复报警）
+        self.grid = OccupancyGrid(grid_cols, grid_rows, heatmap_half_life)
+        self.position_dedup_time_window = position_dedup_time_window
+        self.position_dedup_iou_threshold = position_dedup_iou_threshold
+        self.frame_size: Optional[Tuple[int, int]] = None  # (width, height)
         
-        # 位置去重参数
-        self.position_dedup_iou_threshold = 0.5  # 位置重叠IoU阈值
-        self.position_dedup_time_window = 3600.0  # 位置去重时间窗口（秒），默认1小时
+        # 两次采样间隔上限（秒），避免卡顿后一次计入过长停留时间
+        self.max_sample_gap = 1.0
+    
+    def update_frame(
+        self,
+        tracks: Dict[int, Tuple[float, float, float, float]],
+        frame_shape: Tuple[int, int, int],
+        current_time: Optional[float] = None
+    ):
+        """
+        为本帧所有track一次性更新位置历史和占用网格
         
-        # 最大保留位置数量（防止内存无限增长）
-        self.max_positions = 100
+        Args:
+            tracks: {track_id: 边界框 [x1, y1, x2, y2]}（原图坐标）
+            frame_shape: 帧形状 (height, width, channels)
+            current_time: 当前时间戳（秒），如果为None则使用time.time()
+        """
+        track_ids = list(tracks.keys())
+        boxes = np.asarray([tracks[track_id] for track_id in track_ids], dtype=np.float64).reshape(-1, 4)
+        self.update_arrays(track_ids, boxes, frame_shape, current_time)
     
-    def update(
+    def update_arrays(
         self,
-        track_id: int,
-        bbox: Tuple[float, float, float, float],
+        track_ids: List[int],
+        boxes: np.ndarray,
         frame_shape: Tuple[int, int, int],
         current_time: Optional[float] = None
     ):
         """
-        更新跟踪信息
+        同update_frame，输入为已按track排列的bbox数组（来自状态存储的向量化结果）
         
         Args:
-            track_id: 跟踪ID
-            bbox: 边界框 [x1, y1, x2, y2]
+            track_ids: 跟踪ID列表
+            boxes: (N, 4) 边界框（原图坐标），与track_ids一一对应
             frame_shape: 帧形状 (height, width, channels)
             current_time: 当前时间戳（秒），如果为None则使用time.time()
         """
         if current_time is None:
             current_time = time.time()
+        if not len(track_ids):
+            return
         
         h, w = frame_shape[:2]
-        x1, y1, x2, y2 = bbox
+        self.frame_size = (w, h)
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
         
-        # 计算中心点和面积
-        center_x, center_y = (x1 + x2) / 2, (y1 + y2) / 2
-        bbox_area = (x2 - x1) * (y2 - y1)
+        # 计算中心点和画面占比
+        samples = np.empty((len(track_ids), 3))
+        samples[:, 0] = (boxes[:, 0] + boxes[:, 2]) / 2
+        samples[:, 1] = (boxes[:, 1] + boxes[:, 3]) / 2
         frame_area = w * h
-        area_ratio = bbox_area / frame_area if frame_area > 0 else 0.0
-        
-        # 记录进入时间
-        if track_id not in self.track_enter_time:
-            self.track_enter_time[track_id] = current_time
-            self.track_positions[track_id] = []
-        
-        # 添加位置信息
-        position = TrackPosition(
-            timestamp=current_time,
-            bbox_center=(center_x, center_y),
-            area=area_ratio
-        )
-        self.track_positions[track_id].append(position)
-        
-        # 限制历史长度
-        if len(self.track_positions[track_id]) > self.max_positions:
-            self.track_positions[track_id].pop(0)
+        samples[:, 2] = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]) / frame_area if frame_area > 0 else 0.0
+        
+        dt = np.zeros(len(track_ids))
+        for i, track_id in enumerate(track_ids):
+            last_time = self.track_last_time.get(track_id)
+            if last_time is None:
+                # 记录进入时间
+                self.track_enter_time.setdefault(track_id, current_time)
+                self.track_history[track_id] = np.zeros((self.history_size, 3))
+                self.track_samples[track_id] = 0
+            else:
+                dt[i] = min(max(current_time - last_time, 0.0), self.max_sample_gap)
+            self.track_last_time[track_id] = current_time
+            count = self.track_samples[track_id]
+            self.track_history[track_id][count % self.history_size] = samples[i]
+            self.track_samples[track_id] = count + 1
+        
+        if w > 0 and h > 0:
+            self.grid.accumulate(samples[:, :2] / (w, h), dt, current_time)
     
-    def _compute_bbox_iou(self, box1: Tuple[float, float, float, float], box2: Tuple[float, float, float, float]) -> float:
+    def update(
+        self,
+        track_id: int,
+        bbox: Tuple[float, float, float, float],
+        frame_shape: Tuple[int, int, int],
+        current_time: Optional[float] = None
+    ):
         """
-        计算两个bbox的IoU
+        更新单个跟踪信息（每帧多个track时使用update_frame）
         
         Args:
-            box1: [x1, y1, x2, y2]
-            box2: [x1, y1, x2, y2]
-        
-        Returns:
-            float: IoU值 (0-1)
+            track_id: 跟踪ID
+            bbox: 边界框 [x1, y1, x2, y2]
+            frame_shape: 帧形状 (height, width, channels)
+            current_time: 当前时间戳（秒），如果为None则使用time.time()
         """
-        x1_min, y1_min, x1_max, y1_max = box1
-        x2_min, y2_min, x2_max, y2_max = box2
-        
-        # 计算交集区域
-        inter_x_min = max(x1_min, x2_min)
-        inter_y_min = max(y1_min, y2_min)
-        inter_x_max = min(x1_max, x2_max)
-        inter_y_max = min(y1_max, y2_max)
-        
-        if inter_x_max <= inter_x_min or inter_y_max <= inter_y_min:
-            return 0.0
-        
-        inter_area = (inter_x_max - inter_x_min) * (inter_y_max - inter_y_min)
-        box1_area = (x1_max - x1_min) * (y1_max - y1_min)
-        box2_area = (x2_max - x2_min) * (y2_max - y2_min)
-        union_area = box1_area + box2_area - inter_area
-        
-        if union_area <= 0:
-            return 0.0
-        
-        return inter_area / union_area
+        self.update_frame({track_id: bbox}, frame_shape, current_time)
+    
+    def _normalized_bbox(self, bbox: Tuple[float, float, float, float]) -> Optional[Tuple[float, float, float, float]]:
+        """bbox的归一化坐标（尚无帧尺寸时返回None）"""
+        if not self.frame_size or not self.frame_size[0] or not self.frame_size[1]:
+            return None
+        w, h = self.frame_size
+        return bbox[0] / w, bbox[1] / h, bbox[2] / w, bbox[3] / h
+    
+    def _position_alerted(self, bbox: Tuple[float, float, float, float], current_time: float) -> bool:
+        """bbox中心点所在单元在时间窗口内报警过，且与该次报警的bbox IoU超过阈值"""
+        box = self._normalized_bbox(bbox)
+        if box is None:
+            return False
+        alert_time, alert_box = self.grid.alerted_at((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
+        if current_time - alert_time >= self.position_dedup_time_window:
+            return False
+        return bbox_iou(box, alert_box) > self.position_dedup_iou_threshold
     
     def is_loitering(
         self,
@@ -172,19 +302,9 @@ class LoiteringDetector:
         if track_id in self.alerted_tracks:
             return False
         
-        # 清理过期的位置记录
-        self.alerted_positions = [
-            pos for pos in self.alerted_positions
-            if current_time - pos[4] < self.position_dedup_time_window
-        ]
-        
-        # 如果提供了bbox，检查位置是否已报警（处理track_id变化的情况）
-        if bbox is not None:
-            for pos_bbox, pos_timestamp in [(pos[:4], pos[4]) for pos in self.alerted_positions]:
-                iou = self._compute_bbox_iou(bbox, pos_bbox)
-                if iou > self.position_dedup_iou_threshold:
-                    # 位置重叠且未过期，认为是同一位置，不再报警
-                    return False
+        # 如果提供了bbox，检查该位置是否在时间窗口内报警过（处理track_id变化的情况）
+        if bbox is not None and self._position_alerted(bbox, current_time):
+            return False
         
         # 检查停留时间
         duration = current_time - self.track_enter_time[track_id]
@@ -192,37 +312,27 @@ class LoiteringDetector:
             return False  # 停留时间不足
         
         # 检查位置历史
-        positions = self.track_positions[track_id]
-        if len(positions) < 10:
+        if self.track_samples.get(track_id, 0) < self.history_size:
             return False  # 位置历史不足
+        history = self.track_history[track_id]
         
         # 检查画面占比（太小可能是边缘路过）
-        recent_areas = [pos.area for pos in positions[-10:]]
-        avg_area = np.mean(recent_areas)
+        avg_area = float(history[:, 2].mean())
         if avg_area < self.min_area_ratio:
             return False  # 画面占比太小，可能是路过
         
         # 检查移动距离（如果移动距离很小，说明是徘徊）
-        recent_positions = [pos.bbox_center for pos in positions[-10:]]
-        positions_array = np.array(recent_positions)
-        
-        # 计算最大移动距离（归一化）
-        if len(positions_array) > 1:
-            movement_x = np.max(positions_array[:, 0]) - np.min(positions_array[:, 0])
-            movement_y = np.max(positions_array[:, 1]) - np.min(positions_array[:, 1])
-            max_movement = np.sqrt(movement_x**2 + movement_y**2)
-            
-            # 归一化：使用frame宽度作为参考（假设frame宽度约为1920像素）
-            # 如果最大移动距离小于frame宽度的min_movement_ratio倍，认为是徘徊
-            # 例如：frame宽度1920，min_movement_ratio=0.1，则移动距离<192像素认为是徘徊
-            frame_width_ref = 1920.0  # 参考frame宽度
-            normalized_movement = max_movement / frame_width_ref if frame_width_ref > 0 else 0.0
-            
-            # 如果移动距离很小，说明是徘徊
-            if normalized_movement < self.min_movement_ratio:
-                return True
-        
-        return False
+        movement_x, movement_y = np.ptp(history[:, :2], axis=0)
+        max_movement = np.sqrt(movement_x**2 + movement_y**2)
+        
+        # 归一化：使用frame宽度作为参考（假设frame宽度约为1920像素）
+        # 如果最大移动距离小于frame宽度的min_movement_ratio倍，认为是徘徊
+        # 例如：frame宽度1920，min_movement_ratio=0.1，则移动距离<192像素认为是徘徊
+        frame_width_ref = 1920.0  # 参考frame宽度
+        normalized_movement = max_movement / frame_width_ref
+        
+        # 如果移动距离很小，说明是徘徊
+        return bool(normalized_movement < self.min_movement_ratio)
     
     def mark_alerted(self, track_id: int, bbox: Optional[Tuple[float, float, float, float]] = None, current_time: Optional[float] = None):
         """
@@ -239,10 +349,10 @@ class LoiteringDetector:
         # 标记track已报警
         self.alerted_tracks[track_id] = current_time
         
-        # 如果提供了bbox，记录位置（用于track_id变化时的去重）
-        if bbox is not None:
-            x1, y1, x2, y2 = bbox
-            self.alerted_positions.append((x1, y1, x2, y2, current_time))
+        # 如果提供了bbox，在其覆盖的网格单元记录报警时间和bbox（用于track_id变化时的去重）
+        box = self._normalized_bbox(bbox) if bbox is not None else None
+        if box is not None:
+            self.grid.mark_region(box, current_time)
     
     def reset(self, track_id: int):
         """
@@ -251,12 +361,9 @@ class LoiteringDetector:
         Args:
             track_id: 跟踪ID
         """
-        if track_id in self.track_enter_time:
-            del self.track_enter_time[track_id]
-        if track_id in self.track_positions:
-            del self.track_positions[track_id]
-        if track_id in self.alerted_tracks:
-            del self.alerted_tracks[track_id]
+        for state in (self.track_enter_time, self.track_history, self.track_samples,
+                      self.track_last_time, self.alerted_tracks):
+            state.pop(track_id, None)
     
     def cleanup(self, active_track_ids: set):
         """
@@ -266,14 +373,37 @@ class LoiteringDetector:
             active_track_ids: 当前活跃的track ID集合
         """
         # 清理位置历史
-        expired_tracks = (
-            set(self.track_enter_time.keys()) |
-            set(self.track_positions.keys())
-        ) - active_track_ids
+        expired_tracks = set(self.track_enter_time.keys()) - active_track_ids
         
         for track_id in expired_tracks:
             self.reset(track_id)
     
+    def get_heatmap(self) -> dict:
+        """
+        获取场地停留时间热力图
+        
+        Returns:
+            dict: 占用网格导出（见OccupancyGrid.get_heatmap），附带当前跟踪数
+        """
+        heatmap = self.grid.get_heatmap()
+        heatmap['active_tracks'] = len(self.track_enter_time)
+        return heatmap
+    
+    def save_heatmap(self, path: str):
+        """
+        保存热力图到JSON文件（先写临时文件再替换，供API服务读取）
+        
+        Args:
+            path: 文件路径
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.get_heatmap(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
     def get_duration(self, track_id: int, current_time: Optional[float] = None) -> float:
         """
         获取指定track的停留时间
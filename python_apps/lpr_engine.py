@@ -0,0 +1,1152 @@
+#!/usr/bin/env python3
+"""
+车牌识别引擎（多进程）
+HyperLPR推理和识别前的图像增强（双边滤波、锐化、CLAHE）都是CPU密集型操作，
+放在线程池中会与检测主循环争抢GIL。这里用独立的工作进程执行识别：
+ROI通过共享内存槽位传给工作进程（不经过pickle），每个工作进程只加载一次模型，
+结果经队列返回并由收集线程写入Future，提交方用法与ThreadPoolExecutor一致。
+"""
+
+import heapq
+import importlib
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+    SHARED_MEMORY_AVAILABLE = True
+except ImportError:
+    SHARED_MEMORY_AVAILABLE = False
+
+
+# 识别前ROI尺寸范围（高, 宽）
+MIN_ROI_SIZE = (120, 320)
+MAX_ROI_SIZE = (400, 1000)
+
+_SHARPEN_KERNEL = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
+
+
+def preprocess_plate_roi(roi_bgr: np.ndarray) -> np.ndarray:
+    """
+    识别前的ROI预处理：尺寸归一化 + 去噪、锐化、CLAHE增强
+
+    Args:
+        roi_bgr: 车辆ROI（BGR格式）
+
+    Returns:
+        增强后的BGR图像
+    """
+    min_height, min_width = MIN_ROI_SIZE
+    if roi_bgr.shape[0] < min_height or roi_bgr.shape[1] < min_width:
+        scale = max(min_height / roi_bgr.shape[0], min_width / roi_bgr.shape[1])
+        new_width = int(roi_bgr.shape[1] * scale)
+        new_height = int(roi_bgr.shape[0] * scale)
+        roi_bgr = cv2.resize(roi_bgr, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+
+    max_height, max_width = MAX_ROI_SIZE
+    if roi_bgr.shape[0] > max_height or roi_bgr.shape[1] > max_width:
+        scale = min(max_height / roi_bgr.shape[0], max_width / roi_bgr.shape[1])
+        new_width = int(roi_bgr.shape[1] * scale)
+        new_height = int(roi_bgr.shape[0] * scale)
+        roi_bgr = cv2.resize(roi_bgr, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+
+    denoised = cv2.bilateralFilter(roi_bgr, 9, 75, 75)
+    sharpened = cv2.filter2D(denoised, -1, _SHARPEN_KERNEL)
+    lab = cv2.cvtColor(sharpened, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+    l = clahe.apply(l)
+    return cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
+
+
+def parse_plate_result(results) -> Tuple[Optional[str], float]:
+    """
+    解析HyperLPR3的返回值（Plate对象、字符串、字典或列表）
+
+    Returns:
+        tuple: (plate_number, confidence) 或 (None, 0.0)
+    """
+    if not results or len(results) == 0:
+        return None, 0.0
+    plate = results[0]
+    if isinstance(plate, str):
+        return plate, 1.0
+    elif hasattr(plate, 'code'):
+        return plate.code, getattr(plate, 'confidence', 0.0)
+    elif isinstance(plate, dict):
+        return plate.get('code', plate.get('plate', '')), plate.get('confidence', 0.0)
+    elif isinstance(plate, (list, tuple)) and len(plate) > 0:
+        first_item = plate[0]
+        if isinstance(first_item, str):
+            return first_item, 1.0
+        elif hasattr(first_item, 'code'):
+            return first_item.code, 1.0
+        else:
+            return str(first_item), 1.0
+    return str(plate), 0.5
+
+
+def locate_plate_regions(roi_bgr: np.ndarray, work_width: int = 320,
+                         max_candidates: int = 3) -> List[Tuple[int, int, int, int]]:
+    """
+    在缩小的车辆ROI上粗定位车牌区域
+
+    车牌字符笔画产生密集的竖直边缘，且国内车牌底色为蓝/黄/绿。在宽度不超过
+    work_width的缩略图上用Sobel-x边缘 + 底色掩码做水平闭运算，按长宽比、
+    面积、边缘密度和底色占比筛选候选框。
+
+    Args:
+        roi_bgr: 车辆ROI（BGR格式）
+        work_width: 定位时使用的缩略图宽度
+        max_candidates: 最多返回的候选数
+
+    Returns:
+        list: 原ROI坐标系下的候选框 [(x1, y1, x2, y2), ...]，按得分从高到低（已外扩边距）
+    """
+    h, w = roi_bgr.shape[:2]
+    if h < 8 or w < 16:
+        return []
+    scale = min(1.0, work_width / w)
+    small = cv2.resize(roi_bgr, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else roi_bgr
+    sh, sw = small.shape[:2]
+
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    grad = cv2.convertScaleAbs(cv2.Sobel(gray, cv2.CV_16S, 1, 0, ksize=3))
+    _, edges = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    color = cv2.inRange(hsv, (100, 80, 50), (124, 255, 255))        # 蓝牌
+    color |= cv2.inRange(hsv, (15, 80, 80), (34, 255, 255))         # 黄牌
+    color |= cv2.inRange(hsv, (35, 60, 80), (85, 255, 255))         # 新能源绿牌
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, sw // 24), 3))
+    mask = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel) | cv2.morphologyEx(color, cv2.MORPH_CLOSE, kernel)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    candidates = []
+    small_area = float(sh * sw)
+    for contour in contours:
+        x, y, cw, ch = cv2.boundingRect(contour)
+        if ch < 6 or cw < 20:
+            continue
+        aspect = cw / ch
+        area_ratio = cw * ch / small_area
+        if not 1.8 <= aspect <= 7.0 or not 0.002 <= area_ratio <= 0.3:
+            continue
+        edge_density = float(edges[y:y + ch, x:x + cw].mean()) / 255.0
+        color_ratio = float(color[y:y + ch, x:x + cw].mean()) / 255.0
+        if edge_density < 0.08:
+            continue
+        # 车牌通常位于车辆下半部分
+        score = edge_density + 0.5 * color_ratio + 0.2 * (y + ch / 2) / sh
+        candidates.append((score, x, y, cw, ch))
+
+    candidates.sort(reverse=True)
+    boxes = []
+    for _, x, y, cw, ch in candidates[:max_candidates]:
+        pad_x, pad_y = cw * 0.15, ch * 0.5
+        boxes.append((
+            max(0, int((x - pad_x) / scale)),
+            max(0, int((y - pad_y) / scale)),
+            min(w, int((x + cw + pad_x) / scale) + 1),
+            min(h, int((y + ch + pad_y) / scale) + 1),
+        ))
+    return boxes
+
+
+def measure_crop_quality(image_bgr: np.ndarray) -> Dict[str, float]:
+    """
+    测量车牌裁剪图的质量指标（用于选择增强步骤）
+
+    Returns:
+        dict: sharpness(拉普拉斯方差), contrast(灰度标准差), brightness(灰度均值), noise(高频残差均值)
+    """
+    gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY) if image_bgr.ndim == 3 else image_bgr
+    mean, std = cv2.meanStdDev(gray)
+    residual = cv2.absdiff(gray, cv2.medianBlur(gray, 3))
+    return {
+        'sharpness': float(cv2.Laplacian(gray, cv2.CV_32F).var()),
+        'contrast': float(std[0][0]),
+        'brightness': float(mean[0][0]),
+        'noise': float(residual.mean()),
+    }
+
+
+def enhance_plate_crop(crop_bgr: np.ndarray, target_height: int = 96,
+                       sharpness_threshold: float = 200.0, contrast_threshold: float = 40.0,
+                       noise_threshold: float = 6.0) -> Tuple[np.ndarray, List[str]]:
+    """
+    按实测质量自适应增强车牌裁剪图（只做需要的步骤）
+
+    Args:
+        crop_bgr: 车牌区域裁剪图
+        target_height: 缩放到的高度
+        sharpness_threshold: 清晰度低于该值时锐化
+        contrast_threshold: 对比度低于该值（或过暗/过亮）时做CLAHE
+        noise_threshold: 噪声高于该值时去噪
+
+    Returns:
+        tuple: (增强后的图像, 执行的步骤列表)
+    """
+    h, w = crop_bgr.shape[:2]
+    scale = target_height / h
+    interpolation = cv2.INTER_CUBIC if scale > 1.0 else cv2.INTER_AREA
+    image = cv2.resize(crop_bgr, (max(1, int(w * scale)), target_height), interpolation=interpolation)
+
+    quality = measure_crop_quality(image)
+    steps = []
+    if quality['noise'] > noise_threshold:
+        image = cv2.bilateralFilter(image, 5, 50, 50)
+        steps.append('denoise')
+    if quality['contrast'] < contrast_threshold or not 60.0 <= quality['brightness'] <= 190.0:
+        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+        l, a, b = cv2.split(lab)
+        l = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4)).apply(l)
+        image = cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
+        steps.append('clahe')
+    if quality['sharpness'] < sharpness_threshold:
+        image = cv2.filter2D(image, -1, _SHARPEN_KERNEL)
+        steps.append('sharpen')
+    return image, steps
+
+
+def recognize_plate_region_first(lpr_detector, roi_bgr: np.ndarray,
+                                 max_candidates: int = 3) -> Tuple[Optional[str], float]:
+    """
+    两步识别：缩略图上定位车牌，只对车牌裁剪图做增强和识别
+
+    Returns:
+        tuple: (plate_number, confidence)，所有候选都未识别出时返回 (None, 0.0)
+    """
+    for x1, y1, x2, y2 in locate_plate_regions(roi_bgr, max_candidates=max_candidates):
+        enhanced, _ = enhance_plate_crop(roi_bgr[y1:y2, x1:x2])
+        plate_number, confidence = parse_plate_result(lpr_detector(enhanced))
+        if plate_number:
+            return plate_number, confidence
+    return None, 0.0
+
+
+def recognize_plate(lpr_detector, roi_bgr: np.ndarray, max_retries: int = 3,
+                    retry_delay: float = 0.5, strategy: str = 'full',
+                    fallback_full: bool = False, raise_errors: bool = False) -> Tuple[Optional[str], float]:
+    """
+    预处理并识别车牌（同步）
+
+    Args:
+        lpr_detector: HyperLPR检测器（可调用对象）
+        roi_bgr: 车辆ROI（BGR格式）
+        max_retries: 识别异常时的最大重试次数
+        retry_delay: 重试延迟（秒）
+        strategy: full=整车ROI增强后识别；plate_first=先定位车牌，只处理车牌区域
+        fallback_full: plate_first未识别出车牌时是否再按full识别一次
+        raise_errors: 重试用尽后是否抛出异常（由调用方调度重试时使用，否则返回 (None, 0.0)）
+
+    Returns:
+        tuple: (plate_number, confidence) 或 (None, 0.0)
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            if strategy == 'plate_first':
+                plate_number, confidence = recognize_plate_region_first(lpr_detector, roi_bgr)
+                if plate_number or not fallback_full:
+                    return plate_number, confidence
+            return parse_plate_result(lpr_detector(preprocess_plate_roi(roi_bgr)))
+        except Exception:
+            if attempt < max_retries:
+                time.sleep(retry_delay)
+            elif raise_errors:
+                raise
+    return None, 0.0
+
+
+def recognize_plate_batch(lpr_detector, rois: List[np.ndarray], max_retries: int = 3,
+                          retry_delay: float = 0.5, strategy: str = 'full', fallback_full: bool = False,
+                          raise_errors: bool = False) -> List[Tuple[Optional[str], float]]:
+    """
+    批量识别车牌
+
+    检测器提供 recognize_batch(images) 时，整批预处理后只调用一次模型；
+    否则逐个调用recognize_plate（仍然只占用一次任务调度/进程间往返）。
+
+    Returns:
+        list: 与rois一一对应的 (plate_number, confidence)
+    """
+    batch_fn = getattr(lpr_detector, 'recognize_batch', None)
+    if batch_fn is None:
+        return [recognize_plate(lpr_detector, roi, max_retries, retry_delay, strategy, fallback_full,
+                                raise_errors) for roi in rois]
+
+    for attempt in range(max_retries + 1):
+        try:
+            results = [(None, 0.0)] * len(rois)
+            todo = list(range(len(rois)))
+            if strategy == 'plate_first':
+                images, owners = [], []
+                for i in todo:
+                    boxes = locate_plate_regions(rois[i], max_candidates=1)
+                    if boxes:
+                        x1, y1, x2, y2 = boxes[0]
+                        images.append(enhance_plate_crop(rois[i][y1:y2, x1:x2])[0])
+                        owners.append(i)
+                for i, output in zip(owners, batch_fn(images) if images else []):
+                    results[i] = parse_plate_result(output)
+                todo = [i for i in todo if not results[i][0]] if fallback_full else []
+            if todo:
+                outputs = batch_fn([preprocess_plate_roi(rois[i]) for i in todo])
+                for i, output in zip(todo, outputs):
+                    results[i] = parse_plate_result(output)
+            return results
+        except Exception:
+            if attempt < max_retries:
+                time.sleep(retry_delay)
+            elif raise_errors:
+                raise
+    return [(None, 0.0)] * len(rois)
+
+
+def create_hyperlpr_detector():
+    """创建HyperLPR3检测器（CPU推理，工作进程中调用）"""
+    import hyperlpr3 as lpr3
+    return lpr3.LicensePlateCatcher(
+        inference=lpr3.INFER_ONNX_RUNTIME,
+        detect_level=lpr3.DETECT_LEVEL_LOW
+    )
+
+
+def _resolve_factory(factory: Union[str, Callable]) -> Callable:
+    """解析检测器工厂（'模块:函数' 字符串或可调用对象）"""
+    if callable(factory):
+        return factory
+    module_name, _, func_name = factory.partition(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _lpr_worker_main(shm_name, slot_bytes, task_queue, result_queue, factory,
+                     max_retries, retry_delay, cv_threads, strategy, fallback_full, raise_errors):
+    """
+    LPR工作进程主循环：加载一次模型，逐批处理共享内存中的ROI
+
+    任务: (task_id, [(slot, shape), ...])，None表示退出
+    开始处理: ('start', pid, task_id)（进程异常退出或卡住时据此回收其任务的槽位）
+    结果: (task_id, slots, [(plate_number, confidence), ...], elapsed, error)
+    """
+    cv2.setNumThreads(cv_threads)
+    # 子进程与主进程共用resource_tracker，连接已有共享内存不会重复登记
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        try:
+            detector = _resolve_factory(factory)()
+            result_queue.put(('ready', os.getpid(), None))
+        except Exception as e:
+            result_queue.put(('ready', os.getpid(), f"{type(e).__name__}: {e}"))
+            return
+
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            task_id, items = task
+            result_queue.put(('start', os.getpid(), task_id))
+            slots = [slot for slot, _ in items]
+            start = time.perf_counter()
+            try:
+                rois = [np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+                        for slot, shape in items]
+                results = recognize_plate_batch(detector, rois, max_retries, retry_delay,
+                                                strategy, fallback_full, raise_errors)
+                del rois  # 释放对共享内存的引用
+                result_queue.put((task_id, slots, results, time.perf_counter() - start, None))
+            except Exception as e:
+                result_queue.put((task_id, slots, None, time.perf_counter() - start,
+                                  f"{type(e).__name__}: {e}"))
+    finally:
+        shm.close()
+
+
+@contextmanager
+def _without_main_module():
+    """
+    启动spawn子进程时不重新执行主脚本
+
+    主程序在导入时初始化CUDA（pycuda.autoinit）并加载TensorRT，子进程重新导入
+    主模块会在每个工作进程中再创建一个CUDA上下文。工作进程入口都在本模块中，
+    不需要主模块的内容。
+    """
+    main_module = sys.modules.get('__main__')
+    main_file = getattr(main_module, '__file__', None)
+    main_spec = getattr(main_module, '__spec__', None)
+    if main_file is not None:
+        del main_module.__file__
+    if main_spec is not None:
+        main_module.__spec__ = None
+    try:
+        yield
+    finally:
+        if main_file is not None:
+            main_module.__file__ = main_file
+        if main_spec is not None:
+            main_module.__spec__ = main_spec
+
+
+class LPRProcessPool:
+    """多进程车牌识别池：共享内存传ROI，每个进程加载一次模型"""
+
+    def __init__(self, num_workers: int = 2, max_pending: int = 8,
+                 slot_size: Tuple[int, int] = (720, 1280),
+                 detector_factory: Union[str, Callable] = 'lpr_engine:create_hyperlpr_detector',
+                 max_retries: int = 3, retry_delay: float = 0.5, task_timeout: float = 10.0,
+                 start_method: str = 'spawn', cv_threads: int = 1, startup_timeout: float = 60.0,
+                 strategy: str = 'full', fallback_full: bool = False, raise_errors: bool = False,
+                 respawn_interval: float = 5.0):
+        """
+        初始化并启动工作进程
+
+        Args:
+            num_workers: 工作进程数
+            max_pending: 共享内存槽位数（同时在途的识别任务上限，满时拒绝提交）
+            slot_size: 单个槽位可容纳的最大ROI尺寸（高, 宽），更大的ROI先按比例缩小
+            detector_factory: 检测器工厂（'模块:函数' 或模块级函数），在每个工作进程中调用一次
+            max_retries: 识别异常时的最大重试次数
+            retry_delay: 重试延迟（秒）
+            task_timeout: 任务超时（秒），超时的任务以TimeoutError结束；
+                          正在处理它的工作进程视为卡住，被终止并重启后回收槽位
+            start_method: 进程启动方式（spawn/forkserver/fork；主进程已初始化CUDA时不要用fork）
+            cv_threads: 工作进程中OpenCV线程数（避免多进程×多线程超额占用CPU）
+            startup_timeout: 等待工作进程加载模型的最长时间（秒）
+            strategy: 识别策略 full/plate_first（见recognize_plate）
+            fallback_full: plate_first未识别出车牌时是否按full再识别
+            raise_errors: 识别异常（重试用尽后）是否以异常结束Future（由LPRBatchDispatcher调度重试时使用）
+            respawn_interval: 同一个工作进程两次重启之间的最短间隔（秒，避免模型加载失败时反复重启）
+        """
+        if not SHARED_MEMORY_AVAILABLE:
+            raise ImportError("multiprocessing.shared_memory不可用（需要Python 3.8+）")
+        self.num_workers = max(1, int(num_workers))
+        self.num_slots = max(1, int(max_pending))
+        self.slot_shape = (int(slot_size[0]), int(slot_size[1]), 3)
+        self.slot_bytes = int(np.prod(self.slot_shape))
+        self.task_timeout = task_timeout
+        self.respawn_interval = respawn_interval
+
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.num_slots)
+        self._free_slots = list(range(self.num_slots))
+        self._inflight = {}  # task_id -> (Future, slots, submit_time, single)
+        self._task_slots = {}  # task_id -> slots，槽位回收前的所有任务（含已超时的）
+        self._started = {}  # task_id -> 处理该任务的工作进程pid（尚未返回结果）
+        self._task_ids = itertools.count()
+        self.lock = threading.Lock()
+        self._closed = False
+
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0  # 槽位已满被拒绝的提交
+        self.failed = 0
+        self.timed_out = 0
+        self.respawned = 0  # 异常退出或卡住后重启的工作进程数
+        self.total_latency = 0.0
+        self.total_work_time = 0.0
+
+        self._ctx = mp.get_context(start_method)
+        self._task_queue = self._ctx.Queue()
+        self._result_queue = self._ctx.Queue()
+        self._worker_args = (self._shm.name, self.slot_bytes, self._task_queue, self._result_queue,
+                             detector_factory, max_retries, retry_delay, cv_threads,
+                             strategy, fallback_full, raise_errors)
+        self.workers = []
+        self._spawn_times = []
+        try:
+            for i in range(self.num_workers):
+                self.workers.append(self._spawn_worker(i))
+                self._spawn_times.append(time.monotonic())
+            self._wait_ready(startup_timeout)
+        except Exception:
+            self._stop_workers()
+            self._release_shared_memory()
+            raise
+
+        self._collector = threading.Thread(target=self._collect_results, name="lpr-collector", daemon=True)
+        self._collector.start()
+
+    def _spawn_worker(self, index: int):
+        """启动一个工作进程"""
+        with _without_main_module():
+            worker = self._ctx.Process(target=_lpr_worker_main, args=self._worker_args,
+                                       name=f"lpr-worker-{index}", daemon=True)
+            worker.start()
+        return worker
+
+    def _wait_ready(self, timeout: float):
+        """等待所有工作进程加载完模型"""
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < self.num_workers:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"LPR工作进程启动超时（{ready}/{self.num_workers}就绪）")
+            try:
+                tag, pid, error = self._result_queue.get(timeout=min(remaining, 0.5))
+            except queue.Empty:
+                if not any(w.is_alive() for w in self.workers):
+                    raise RuntimeError("LPR工作进程启动失败")
+                continue
+            if error:
+                raise RuntimeError(f"LPR工作进程加载模型失败: {error}")
+            ready += 1
+
+    def _fit_roi(self, roi_bgr: np.ndarray) -> np.ndarray:
+        """超出槽位尺寸的ROI按比例缩小（识别前本来也会缩小到MAX_ROI_SIZE以内）"""
+        if roi_bgr.ndim == 2:
+            roi_bgr = cv2.cvtColor(roi_bgr, cv2.COLOR_GRAY2BGR)
+        h, w = roi_bgr.shape[:2]
+        max_h, max_w = self.slot_shape[:2]
+        if h > max_h or w > max_w:
+            scale = min(max_h / h, max_w / w)
+            roi_bgr = cv2.resize(roi_bgr, (max(1, int(w * scale)), max(1, int(h * scale))),
+                                 interpolation=cv2.INTER_AREA)
+        if roi_bgr.dtype != np.uint8:
+            roi_bgr = roi_bgr.astype(np.uint8)
+        return roi_bgr
+
+    def submit(self, roi_bgr: np.ndarray) -> Optional[Future]:
+        """
+        提交识别任务（ROI复制到共享内存槽位，调用方可立即复用原图）
+
+        Args:
+            roi_bgr: 车辆ROI（BGR格式）
+
+        Returns:
+            Future: 结果为 (plate_number, confidence)；槽位已满或池已关闭时返回None
+        """
+        if roi_bgr is None or roi_bgr.size == 0:
+            return None
+        return self._submit([roi_bgr], single=True)
+
+    def submit_batch(self, rois: List[np.ndarray]) -> Optional[Future]:
+        """
+        提交一批ROI，由同一个工作进程一次处理
+
+        Args:
+            rois: 车辆ROI列表（BGR格式，非空）
+
+        Returns:
+            Future: 结果为与rois对应的 [(plate_number, confidence), ...]；
+                    空闲槽位不足以容纳整批或池已关闭时返回None
+        """
+        if not rois or any(roi is None or roi.size == 0 for roi in rois):
+            return None
+        return self._submit(rois, single=False)
+
+    def _submit(self, rois, single):
+        rois = [self._fit_roi(roi) for roi in rois]
+        with self.lock:
+            if self._closed or len(self._free_slots) < len(rois):
+                self.rejected += 1
+                return None
+            slots = [self._free_slots.pop() for _ in rois]
+            task_id = next(self._task_ids)
+            future = Future()
+            self._inflight[task_id] = (future, slots, time.perf_counter(), single)
+            self._task_slots[task_id] = slots
+            self.submitted += 1
+
+        items = []
+        for slot, roi in zip(slots, rois):
+            view = np.ndarray(roi.shape, dtype=np.uint8, buffer=self._shm.buf,
+                              offset=slot * self.slot_bytes)
+            view[...] = roi
+            del view
+            items.append((slot, roi.shape))
+        self._task_queue.put((task_id, items))
+        return future
+
+    def _collect_results(self):
+        """收集线程：把工作进程返回的结果写入Future并回收槽位"""
+        while True:
+            try:
+                item = self._result_queue.get(timeout=0.5)
+            except queue.Empty:
+                item = None
+            except (EOFError, OSError):
+                break
+            if item is not None:
+                if item[0] == 'ready':
+                    if item[2]:
+                        print(f"⚠ LPR工作进程 {item[1]} 加载模型失败: {item[2]}")
+                    continue
+                if item[0] == 'start':
+                    self._on_started(item[1], item[2])
+                else:
+                    self._complete(*item)
+            self._expire_tasks()
+            self._check_workers()
+            with self.lock:
+                if self._closed and not self._inflight:
+                    break
+
+    def _on_started(self, pid, task_id):
+        """记录任务由哪个工作进程处理"""
+        with self.lock:
+            if task_id in self._task_slots:
+                self._started[task_id] = pid
+
+    def _complete(self, task_id, slots, results, elapsed, error):
+        with self.lock:
+            self._started.pop(task_id, None)
+            if self._task_slots.pop(task_id, None) is None:
+                return  # 工作进程已被判定退出，槽位已回收
+            self._free_slots.extend(slots)
+            entry = self._inflight.pop(task_id, None)
+            if entry is None:
+                return  # 已超时处理，只回收槽位
+            future, _, submit_time, single = entry
+            self.completed += 1
+            self.total_latency += time.perf_counter() - submit_time
+            self.total_work_time += elapsed
+            if error:
+                self.failed += 1
+        if error:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(results[0] if single else results)
+
+    def _expire_tasks(self):
+        """
+        超时任务以TimeoutError结束
+
+        已开始处理的任务：处理它的工作进程视为卡住并终止，槽位在_check_workers中回收。
+        仍在排队的任务：槽位在之后某个工作进程处理完返回结果时回收。
+        """
+        now = time.perf_counter()
+        expired = []
+        stuck_pids = set()
+        with self.lock:
+            for task_id, (future, _, submit_time, _) in list(self._inflight.items()):
+                if now - submit_time > self.task_timeout:
+                    del self._inflight[task_id]
+                    expired.append(future)
+                    self.timed_out += 1
+                    if task_id in self._started:
+                        stuck_pids.add(self._started[task_id])
+        for future in expired:
+            future.set_exception(TimeoutError("LPR任务超时"))
+        for worker in self.workers:
+            if worker.pid in stuck_pids and worker.is_alive():
+                print(f"⚠ LPR工作进程 {worker.pid} 处理超时，终止")
+                worker.terminate()
+                worker.join(timeout=1.0)
+
+    def _check_workers(self):
+        """
+        回收已退出工作进程的任务槽位并重启进程
+
+        退出进程正在处理的任务以RuntimeError结束，其槽位可以安全复用（不会再被写入）。
+        """
+        if self._closed:
+            return
+        alive_pids = {w.pid for w in self.workers if w.is_alive()}
+        failed = []
+        with self.lock:
+            for task_id, pid in list(self._started.items()):
+                if pid in alive_pids:
+                    continue
+                del self._started[task_id]
+                self._free_slots.extend(self._task_slots.pop(task_id))
+                entry = self._inflight.pop(task_id, None)
+                if entry is not None:
+                    failed.append(entry[0])
+                    self.failed += 1
+        for future in failed:
+            future.set_exception(RuntimeError("LPR工作进程异常退出"))
+
+        now = time.monotonic()
+        for index, worker in enumerate(self.workers):
+            if worker.is_alive() or now - self._spawn_times[index] < self.respawn_interval:
+                continue
+            try:
+                self.workers[index] = self._spawn_worker(index)
+            except Exception as e:
+                print(f"⚠ LPR工作进程重启失败: {e}")
+                continue
+            self._spawn_times[index] = now
+            self.respawned += 1
+            print(f"⚠ LPR工作进程 {worker.pid} 已退出 (exitcode={worker.exitcode})，已重启")
+
+    def is_healthy(self) -> bool:
+        """所有工作进程都在运行"""
+        return not self._closed and all(w.is_alive() for w in self.workers)
+
+    def get_stats(self) -> dict:
+        """运行统计"""
+        with self.lock:
+            completed = self.completed
+            return {
+                'workers': self.num_workers,
+                'alive_workers': sum(1 for w in self.workers if w.is_alive()),
+                'slots': self.num_slots,
+                'inflight': len(self._inflight),
+                'submitted': self.submitted,
+                'completed': completed,
+                'rejected': self.rejected,
+                'failed': self.failed,
+                'timed_out': self.timed_out,
+                'respawned': self.respawned,
+                'avg_latency': self.total_latency / completed if completed else None,
+                'avg_work_time': self.total_work_time / completed if completed else None,
+            }
+
+    def _stop_workers(self, timeout: float = 5.0):
+        for _ in self.workers:
+            try:
+                self._task_queue.put(None)
+            except Exception:
+                pass
+        for worker in self.workers:
+            worker.join(timeout=timeout)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join(timeout=1.0)
+
+    def _release_shared_memory(self):
+        try:
+            self._shm.close()
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def shutdown(self, wait: bool = True):
+        """
+        关闭识别池
+
+        Args:
+            wait: 是否等待在途任务完成
+        """
+        with self.lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._stop_workers(timeout=self.task_timeout if wait else 0.5)
+        self._collector.join(timeout=2.0)
+        with self.lock:
+            pending = list(self._inflight.values())
+            self._inflight.clear()
+        for future, _, _, _ in pending:
+            if not future.done():
+                future.cancel()
+        self._task_queue.close()
+        self._result_queue.close()
+        self._release_shared_memory()
+
+
+class _LPRRequest:
+    """调度器中的一条识别请求"""
+
+    __slots__ = ('key', 'roi', 'future', 'priority', 'submit_time', 'ready_time',
+                 'deadline', 'attempts', 'seq', 'cancelled', 'queued')
+
+    def __init__(self, key, roi, future, priority, submit_time, deadline, seq):
+        self.key = key
+        self.roi = roi
+        self.future = future
+        self.priority = priority
+        self.submit_time = submit_time
+        self.ready_time = submit_time  # 进入就绪队列的时间（重试时推迟）
+        self.deadline = deadline
+        self.attempts = 0
+        self.seq = seq
+        self.cancelled = False
+        self.queued = True  # 在就绪/重试队列中
+
+
+class LPRBatchDispatcher:
+    """
+    LPR微批调度器
+
+    多辆车同时进入画面时，各track的识别请求在一个短时间窗口内汇集成一批，
+    交给后端一次处理（一个线程池任务或一次进程间往返），结果再按key分发。
+    就绪请求按优先级（帧质量分数）出队；超过截止时间的请求直接以TimeoutError
+    结束；失败的请求延迟后重新入队（不占用后端线程/进程等待）；track结束时
+    可按key取消。
+    """
+
+    def __init__(self, run_batch: Callable[[List[np.ndarray]], Optional[Future]],
+                 max_batch_size: int = 4, max_wait: float = 0.02, max_pending: int = 16,
+                 busy_retry_interval: float = 0.005, deadline: Optional[float] = None,
+                 max_retries: int = 0, retry_delay: float = 0.5, max_inflight: Optional[int] = None):
+        """
+        初始化调度器
+
+        Args:
+            run_batch: 后端批处理函数，参数为ROI列表，返回结果列表的Future；后端繁忙时返回None
+            max_batch_size: 每批最多的请求数
+            max_wait: 批内第一个请求最长等待时间（秒），超时即使未满也发出
+            max_pending: 排队请求上限（满时拒绝提交）
+            busy_retry_interval: 后端繁忙时重试间隔（秒）
+            deadline: 默认截止时间（提交后秒数，None表示不限）
+            max_retries: 后端失败时的最大重试次数
+            retry_delay: 重试前的延迟（秒）
+            max_inflight: 同时在后端执行的批数上限（通常为工作进程/线程数），
+                          超出的请求留在本地队列按优先级等待，而不是进入后端的FIFO队列
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait
+        self.max_pending = max(1, int(max_pending))
+        self.busy_retry_interval = busy_retry_interval
+        self.default_deadline = deadline
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_inflight = max_inflight
+
+        self._ready = []    # 堆: (-priority, seq, request)
+        self._delayed = []  # 堆: (ready_time, seq, request)，等待重试
+        self._by_key = {}   # key -> set(request)，含在途请求
+        self._queued = 0    # 就绪+等待重试的有效请求数
+        self._inflight_batches = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = True
+
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.backend_busy = 0
+        self.expired = 0
+        self.cancelled = 0
+        self.retried = 0
+        self.batch_size_counts = {}  # {批大小: 次数}
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+        self._thread = threading.Thread(target=self._dispatch_loop, name="lpr-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, key, roi_bgr: np.ndarray, priority: float = 0.0,
+               deadline: Optional[float] = None) -> Optional[Future]:
+        """
+        提交识别请求（只保存ROI引用，不复制；调用方提交后不得原地修改该数组）
+
+        Args:
+            key: 请求标识（如track_id），用于取消
+            roi_bgr: 车辆ROI（BGR格式，调用方独占的数组，如cvtColor的输出）
+            priority: 优先级（帧质量分数，越大越先处理）
+            deadline: 截止时间（提交后秒数，None使用默认值）
+
+        Returns:
+            Future: 结果为 (plate_number, confidence)；队列已满或已关闭时返回None
+        """
+        if roi_bgr is None or roi_bgr.size == 0:
+            return None
+        deadline = self.default_deadline if deadline is None else deadline
+        with self._cond:
+            if not self._running or self._queued >= self.max_pending:
+                self.rejected += 1
+                return None
+            now = time.perf_counter()
+            request = _LPRRequest(key, roi_bgr, Future(), priority, now,
+                                  now + deadline if deadline is not None else None, next(self._seq))
+            heapq.heappush(self._ready, (-priority, request.seq, request))
+            self._by_key.setdefault(key, set()).add(request)
+            self._queued += 1
+            self._cond.notify()
+            return request.future
+
+    def cancel(self, key) -> int:
+        """
+        取消某个key的所有请求（track结束时调用）
+
+        排队中的请求立即取消；在途请求的结果被丢弃且不再重试。
+
+        Returns:
+            int: 取消的请求数
+        """
+        with self._cond:
+            requests = self._by_key.pop(key, ())
+            for request in requests:
+                request.cancelled = True
+                if request.queued:
+                    request.queued = False  # 出队时跳过
+                    self._queued -= 1
+                    if not request.future.cancel():
+                        request.future.set_exception(CancelledError())  # 等待重试中的请求
+                self.cancelled += 1
+            return len(requests)
+
+    def _forget(self, request):
+        """请求结束后从key索引中移除（调用方持锁）"""
+        requests = self._by_key.get(request.key)
+        if requests is not None:
+            requests.discard(request)
+            if not requests:
+                del self._by_key[request.key]
+
+    def _next_batch(self):
+        """等待凑满一批或最早就绪的请求超过max_wait，按优先级返回本批请求"""
+        with self._cond:
+            while self._running:
+                now = time.perf_counter()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, seq, request = heapq.heappop(self._delayed)
+                    if not request.cancelled:
+                        heapq.heappush(self._ready, (-request.priority, seq, request))
+
+                live = [entry[2] for entry in self._ready if not entry[2].cancelled]
+                backend_full = self.max_inflight is not None and self._inflight_batches >= self.max_inflight
+                timeout = None
+                if live and not backend_full:
+                    age = now - min(request.ready_time for request in live)
+                    if len(live) >= self.max_batch_size or age >= self.max_wait:
+                        batch = self._pop_batch(now)
+                        if batch:
+                            self._inflight_batches += 1
+                        return batch
+                    timeout = self.max_wait - age
+                if self._delayed:
+                    until_retry = self._delayed[0][0] - now
+                    timeout = until_retry if timeout is None else min(timeout, until_retry)
+                self._cond.wait(timeout)
+            return None
+
+    def _pop_batch(self, now):
+        """按优先级取出最多max_batch_size个有效请求（调用方持锁）"""
+        batch = []
+        while self._ready and len(batch) < self.max_batch_size:
+            _, _, request = heapq.heappop(self._ready)
+            if request.cancelled:
+                continue
+            request.queued = False
+            self._queued -= 1
+            if request.deadline is not None and now > request.deadline:
+                self.expired += 1
+                self._forget(request)
+                if request.attempts or request.future.set_running_or_notify_cancel():
+                    request.future.set_exception(TimeoutError("LPR请求已超过截止时间"))
+                continue
+            if request.attempts == 0 and not request.future.set_running_or_notify_cancel():
+                continue
+            batch.append(request)
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            if not batch:
+                continue
+
+            batch_future = None
+            while batch_future is None:
+                batch_future = self.run_batch([request.roi for request in batch])
+                if batch_future is None:
+                    self.backend_busy += 1
+                    if not self._running:
+                        break
+                    time.sleep(self.busy_retry_interval)
+            if batch_future is None:
+                with self._cond:
+                    self._inflight_batches -= 1
+                for request in batch:
+                    request.future.set_exception(RuntimeError("LPR调度器已关闭"))
+                continue
+
+            now = time.perf_counter()
+            with self._cond:
+                self.batches += 1
+                self.items += len(batch)
+                self.batch_size_counts[len(batch)] = self.batch_size_counts.get(len(batch), 0) + 1
+                for request in batch:
+                    wait = now - request.ready_time
+                    self.total_wait += wait
+                    self.max_wait_seen = max(self.max_wait_seen, wait)
+            batch_future.add_done_callback(lambda f, requests=batch: self._fan_out(f, requests))
+
+    def _fan_out(self, batch_future: Future, batch):
+        """把批结果按请求分发；失败的请求延迟后重新入队"""
+        try:
+            results = batch_future.result()
+            error = None
+        except BaseException as e:
+            results, error = [None] * len(batch), e
+
+        finished = []
+        with self._cond:
+            self._inflight_batches -= 1
+            now = time.perf_counter()
+            for request, result in zip(batch, results):
+                if request.cancelled:
+                    self._forget(request)
+                    finished.append((request, None, CancelledError()))
+                    continue
+                if error is not None and request.attempts < self.max_retries and self._running and \
+                        (request.deadline is None or now + self.retry_delay < request.deadline):
+                    request.attempts += 1
+                    request.ready_time = now + self.retry_delay
+                    request.queued = True
+                    heapq.heappush(self._delayed, (request.ready_time, request.seq, request))
+                    self._queued += 1
+                    self.retried += 1
+                    continue
+                self._forget(request)
+                finished.append((request, result, error))
+            self._cond.notify()
+        for request, result, exc in finished:
+            if exc is not None:
+                request.future.set_exception(exc)
+            else:
+                request.future.set_result(result)
+
+    @property
+    def pending_count(self) -> int:
+        return self._queued
+
+    def get_stats(self) -> dict:
+        """批大小、等待时间、超时/取消/重试统计"""
+        with self._cond:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'pending': self._queued,
+                'inflight_batches': self._inflight_batches,
+                'rejected': self.rejected,
+                'backend_busy': self.backend_busy,
+                'expired': self.expired,
+                'cancelled': self.cancelled,
+                'retried': self.retried,
+                'avg_batch_size': self.items / self.batches if self.batches else None,
+                'batch_size_counts': dict(self.batch_size_counts),
+                'avg_wait': self.total_wait / self.items if self.items else None,
+                'max_wait': self.max_wait_seen,
+            }
+
+    def shutdown(self):
+        """停止调度，未发出的请求被取消"""
+        with self._cond:
+            self._running = False
+            pending = [entry[2] for entry in self._ready + self._delayed]
+            self._ready.clear()
+            self._delayed.clear()
+            self._queued = 0
+            self._cond.notify_all()
+        for request in pending:
+            if not request.future.cancel() and not request.future.done():
+                request.future.set_exception(CancelledError())
+        self._thread.join(timeout=2.0)
+
+
+def create_lpr_process_pool(config: Optional[dict] = None, **overrides) -> LPRProcessPool:
+    """
+    从配置创建多进程识别池
+
+    Args:
+        config: lpr.engine 配置字典
+        overrides: 覆盖配置的参数（如测试用detector_factory）
+    """
+    config = config or {}
+    slot_size = config.get('max_roi_size', [720, 1280])
+    params = dict(
+        num_workers=config.get('workers', 2),
+        max_pending=config.get('max_pending', 8),
+        slot_size=(slot_size[0], slot_size[1]),
+        max_retries=config.get('max_retries', 3),
+        retry_delay=config.get('retry_delay', 0.5),
+        task_timeout=config.get('task_timeout', 10.0),
+        start_method=config.get('start_method', 'spawn'),
+        cv_threads=config.get('cv_threads', 1),
+        strategy=config.get('strategy', 'full'),
+        fallback_full=config.get('fallback_full', False),
+        respawn_interval=config.get('respawn_interval', 5.0),
+    )
+    params.update(overrides)
+    return LPRProcessPool(**params)
+
+
+def _bench(snapshot_dir, limit, use_hyperlpr):
+    """对快照目录中的车辆图片比较full与plate_first两种预处理（及识别）的耗时"""
+    import glob
+
+    paths = sorted(glob.glob(os.path.join(snapshot_dir, '**', '*.jpg'), recursive=True))[:limit]
+    if not paths:
+        print(f"⚠ 目录中没有快照: {snapshot_dir}")
+        return
+    detector = create_hyperlpr_detector() if use_hyperlpr else None
+
+    full_times, region_times, miss_region_times, miss_times, steps_count = [], [], [], [], {}
+    located = agree = full_hits = region_hits = fallback_hits = 0
+    for path in paths:
+        roi = cv2.imread(path)
+        if roi is None:
+            continue
+
+        start = time.process_time()
+        enhanced = preprocess_plate_roi(roi)
+        full_result = parse_plate_result(detector(enhanced)) if detector else (None, 0.0)
+        full_times.append(time.process_time() - start)
+
+        start = time.process_time()
+        boxes = locate_plate_regions(roi)
+        region_result = (None, 0.0)
+        for x1, y1, x2, y2 in boxes:
+            crop, steps = enhance_plate_crop(roi[y1:y2, x1:x2])
+            for step in steps:
+                steps_count[step] = steps_count.get(step, 0) + 1
+            if detector is None:
+                break
+            region_result = parse_plate_result(detector(crop))
+            if region_result[0]:
+                break
+        region_times.append(time.process_time() - start)
+        # plate_first未命中（未定位到车牌或未识别出）的快照：记录开启fallback_full时的总耗时
+        if not boxes or (detector and not region_result[0]):
+            miss_region_times.append(region_times[-1])
+            miss_times.append(region_times[-1] + full_times[-1])
+            fallback_hits += bool(full_result[0])
+
+        located += bool(boxes)
+        full_hits += bool(full_result[0])
+        region_hits += bool(region_result[0])
+        agree += bool(full_result[0]) and full_result[0] == region_result[0]
+
+    def _fmt(samples):
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return f"平均 {sum(ordered) / len(ordered) * 1000:.2f}ms, P95 {p95 * 1000:.2f}ms"
+
+    total = len(full_times)
+    print(f"\n📊 快照 {total} 张（{'含HyperLPR识别' if detector else '仅预处理'}，CPU时间）")
+    print(f"  full:        {_fmt(full_times)}")
+    print(f"  plate_first: {_fmt(region_times)}（定位到车牌 {located}/{total}，增强步骤 {steps_count}）")
+    print(f"  加速比: {sum(full_times) / max(sum(region_times), 1e-9):.1f}x")
+    if miss_times:
+        # 未命中路径：plate_first本身的耗时 + 回退整车识别的耗时
+        fallback_avg = (sum(region_times) + sum(miss_times) - sum(miss_region_times)) / total
+        print(f"  plate_first未命中 {len(miss_times)}/{total}: 不回退 {_fmt(miss_region_times)}, "
+              f"+fallback_full {_fmt(miss_times)}")
+        print(f"  plate_first+fallback_full 全部快照平均 {fallback_avg * 1000:.2f}ms")
+    if detector:
+        print(f"  识别出车牌: full {full_hits}, plate_first {region_hits}, "
+              f"plate_first+fallback_full {region_hits + fallback_hits}, 结果一致 {agree}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='车牌识别引擎工具')
+    sub = parser.add_subparsers(dest='command', required=True)
+    bench_parser = sub.add_parser('bench', help='在快照图片上比较full与plate_first的CPU耗时')
+    bench_parser.add_argument('snapshot_dir', nargs='?', default='/tmp/vehicle_snapshots')
+    bench_parser.add_argument('--limit', type=int, default=500, help='最多处理的快照数')
+    bench_parser.add_argument('--hyperlpr', action='store_true', help='同时运行HyperLPR识别并比较结果')
+    args = parser.parse_args()
+
+    _bench(args.snapshot_dir, args.limit, args.hyperlpr)
@@ -8,7 +8,6 @@ from __future__ import annotations
 
 import time
 import socket
-import subprocess
 import threading
 from typing import Optional, Callable
 from datetime import datetime
@@ -23,7 +22,11 @@ class NetworkRecovery:
         cassia_recovery: Optional[Callable] = None,
         check_interval: float = 30.0,
         retry_interval: float = 5.0,
-        max_retries: int = 10
+        max_retries: int = 10,
+        cassia_down_for: Optional[Callable[[], Optional[float]]] = None,
+        cassia_max_down: float = 60.0,
+        cassia_port: int = 80,
+        probe_timeout: float = 2.0
     ):
         """
         初始化网络恢复管理器
@@ -34,9 +37,17 @@ class NetworkRecovery:
             check_interval: 网络检查间隔（秒）
             retry_interval: 重试间隔（秒）
             max_retries: 最大重试次数（0表示无限重试）
+            cassia_down_for: 返回Cassia SSE连接已断开时长（秒）的函数（None表示未知）
+            cassia_max_down: SSE连接断开超过该时长（秒）才重建客户端（应大于最长重连退避）
+            cassia_port: TCP探测端口（Cassia本地API端口）
+            probe_timeout: TCP探测超时（秒）
         """
         self.cassia_ip = cassia_ip
         self.cassia_recovery = cassia_recovery
+        self.cassia_down_for = cassia_down_for
+        self.cassia_max_down = cassia_max_down
+        self.cassia_port = cassia_port
+        self.probe_timeout = probe_timeout
         self.check_interval = check_interval
         self.retry_interval = retry_interval
         self.max_retries = max_retries
@@ -52,21 +63,36 @@ class NetworkRecovery:
     
     def check_cassia_connectivity(self) -> bool:
         """
-        检查Cassia路由器连通性
+        检查Cassia路由器连通性（对Cassia API端口做一次TCP连接探测）
         
         Returns:
             True表示连通，False表示不通
         """
         try:
-            # 使用ping检查
-            result = subprocess.run(
-                ['ping', '-c', '1', '-W', '2', self.cassia_ip],
-                capture_output=True,
-                timeout=5
-            )
-            return result.returncode == 0
+            with socket.create_connection((self.cassia_ip, self.cassia_port), timeout=self.probe_timeout):
+                return True
+        except OSError:
+            return False
+    
+    def needs_cassia_recovery(self) -> bool:
+        """
+        是否需要重建Cassia客户端
+        
+        路由器不可达时需要重建；可达时只有SSE连接断开超过cassia_max_down才重建。
+        空闲停滞、短暂断线由连接管理器自行退避重连，不在此处理。
+        
+        Returns:
+            True表示需要重建
+        """
+        if not self.check_cassia_connectivity():
+            return True
+        if self.cassia_down_for is None:
+            return False
+        try:
+            down_for = self.cassia_down_for()
         except Exception:
             return False
+        return down_for is not None and down_for > self.cassia_max_down
     
     def check_internet_connectivity(self) -> bool:
         """
@@ -136,9 +162,7 @@ class NetworkRecovery:
         while True:
             try:
                 # 检查Cassia连通性
-                cassia_connected = self.check_cassia_connectivity()
-                
-                if not cassia_connected:
+                if self.needs_cassia_recovery():
                     # 检查是否需要重试
                     should_retry = True
                     with self.lock:
@@ -8,6 +8,10 @@ import numpy as np
 import threading
 import time
 
+from depth_pixel_mapper import ColorDepthMapper, make_mapping_cache_key, load_or_build_mapper
+from frame_source import FrameSource
+from frame_sync import FramePairBuffer
+
 try:
     import pyorbbecsdk as ob
     ORBBEC_AVAILABLE = True
@@ -16,10 +20,11 @@ except ImportError:
     print("⚠ pyorbbecsdk未安装，深度功能不可用")
 
 
-class OrbbecDepthCamera:
-    """Orbbec深度相机管理类"""
+class OrbbecDepthCamera(FrameSource):
+    """Orbbec深度相机管理类（彩色帧作为FrameSource发布）"""
     
-    def __init__(self, invalid_min=0, invalid_max=65535, prefer_uncompressed_format=True):
+    def __init__(self, invalid_min=0, invalid_max=65535, prefer_uncompressed_format=True,
+                 mapping_cache_dir="~/.cache/orbbec_depth_lut", pair_buffer_size=8, max_pair_skew_ms=50.0):
         """
         初始化Orbbec相机
         
@@ -29,14 +34,20 @@ class OrbbecDepthCamera:
             prefer_uncompressed_format: 是否优先选择未压缩格式（RGB/BGR而非MJPEG）
                                        True: 优先RGB/BGR（图像质量更好，适合LPR识别）
                                        False: 只考虑分辨率（可能选择MJPEG压缩格式）
+            mapping_cache_dir: 彩色→深度像素映射表的磁盘缓存目录（None表示不缓存）
+            pair_buffer_size: 彩色/深度帧同步环形缓冲区大小
+            max_pair_skew_ms: 按帧序号查询深度时允许的最大彩色/深度时间差（毫秒）
         """
         if not ORBBEC_AVAILABLE:
             raise ImportError("pyorbbecsdk未安装")
         
         self.pipeline = None
-        self.depth_frame = None
+        self.depth_image = None  # 最新深度图（uint16副本，不引用SDK帧缓冲区）
         self.color_frame = None
         self.depth_lock = threading.Lock()
+        # 新帧通知与depth_lock共用同一把锁；latest_frame为采集线程解码后的RGB图像
+        FrameSource.__init__(self, lock=self.depth_lock)
+        self.frame_source_closed = True  # start()成功后才开始产出帧
         self.running = False
         self.capture_thread = None
         self.depth_scale = 1.0
@@ -44,6 +55,12 @@ class OrbbecDepthCamera:
         self.invalid_max = invalid_max
         self.align_mode = None  # 记录对齐模式
         self.prefer_uncompressed_format = prefer_uncompressed_format  # 格式偏好
+        self.mapping_cache_dir = mapping_cache_dir
+        self.pixel_mapper = None  # 彩色→深度像素映射表（start时构建）
+        self.color_profile_info = None  # (width, height, format)
+        # 彩色/深度帧时间同步缓冲区（depth_lock保护）
+        self.frame_pairs = FramePairBuffer(pair_buffer_size, max_pair_skew_ms)
+        self.depth_profile_info = None  # (width, height, format)
         
     def _select_highest_resolution_profile(self, profile_list, sensor_type_name="流", prefer_uncompressed=True):
         """
@@ -144,6 +161,8 @@ class OrbbecDepthCamera:
             
             # 配置流
             config = ob.Config()
+            depth_profile = None
+            color_profile = None
             
             # 启用深度流（选择最高分辨率）
             depth_profile_list = self.pipeline.get_stream_profile_list(ob.OBSensorType.DEPTH_SENSOR)
@@ -295,8 +314,12 @@ class OrbbecDepthCamera:
                 # 参数设置失败不影响相机使用
                 pass
             
+            # 构建彩色→深度像素映射表（每个流配置组合只需构建一次）
+            self._build_pixel_mapper(color_profile, depth_profile)
+            
             # 启动后台采集线程
             self.running = True
+            self.open_frames()
             self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
             self.capture_thread.start()
             
@@ -307,9 +330,117 @@ class OrbbecDepthCamera:
             print(f"✗ Orbbec相机启动失败: {e}")
             return False
     
+    @staticmethod
+    def _profile_info(profile):
+        """
+        提取流配置信息
+        
+        Args:
+            profile: StreamProfile或VideoStreamProfile
+        
+        Returns:
+            tuple: (width, height, format)，失败返回None
+        """
+        if profile is None:
+            return None
+        try:
+            if hasattr(profile, 'as_video_stream_profile'):
+                profile = profile.as_video_stream_profile()
+            return (profile.get_width(), profile.get_height(), str(profile.get_format()))
+        except Exception:
+            return None
+    
+    def _build_pixel_mapper(self, color_profile, depth_profile):
+        """
+        根据流配置和标定内参构建彩色→深度像素映射表，并按设备序列号+流配置缓存到磁盘
+        
+        Args:
+            color_profile: 已启用的彩色流配置
+            depth_profile: 已启用的深度流配置
+        """
+        self.color_profile_info = self._profile_info(color_profile)
+        self.depth_profile_info = self._profile_info(depth_profile)
+        if self.color_profile_info is None or self.depth_profile_info is None:
+            self.pixel_mapper = None
+            return
+        
+        color_size = self.color_profile_info[:2]
+        depth_size = self.depth_profile_info[:2]
+        color_intrinsic = None
+        depth_intrinsic = None
+        
+        if self.align_mode in ('HW_MODE', 'SW_MODE'):
+            # D2C对齐后深度图已在彩色相机坐标系下，按输出尺寸等比映射即可
+            depth_size = color_size
+        else:
+            try:
+                camera_param = self.pipeline.get_camera_param()
+                rgb = camera_param.rgb_intrinsic
+                depth = camera_param.depth_intrinsic
+                color_intrinsic = (rgb.fx, rgb.fy, rgb.cx, rgb.cy)
+                depth_intrinsic = (depth.fx, depth.fy, depth.cx, depth.cy)
+            except Exception as e:
+                print(f"  ⚠ 无法读取相机内参，使用尺寸等比映射: {e}")
+        
+        serial = 'unknown'
+        try:
+            serial = self.pipeline.get_device().get_device_info().get_serial_number()
+        except Exception:
+            pass
+        
+        cache_key = make_mapping_cache_key(
+            serial, self.color_profile_info, self.depth_profile_info, self.align_mode
+        )
+        self.pixel_mapper = load_or_build_mapper(
+            self.mapping_cache_dir, cache_key, color_size, depth_size,
+            color_intrinsic, depth_intrinsic
+        )
+        print(f"✓ 彩色→深度映射表就绪: {color_size[0]}x{color_size[1]} -> "
+              f"{self.pixel_mapper.depth_size[0]}x{self.pixel_mapper.depth_size[1]} ({self.pixel_mapper.source})")
+    
+    def _get_pixel_mapper(self, depth_width, depth_height):
+        """
+        获取与当前深度帧尺寸匹配的映射表（需在depth_lock内调用）
+        
+        深度帧实际输出尺寸与配置不一致时（如对齐模式改变了输出分辨率），
+        按实际尺寸重建一次映射表。
+        
+        Args:
+            depth_width: 当前深度帧宽度
+            depth_height: 当前深度帧高度
+        
+        Returns:
+            ColorDepthMapper实例，无法构建时返回None（按深度图坐标直接索引）
+        """
+        mapper = self.pixel_mapper
+        if mapper is not None and mapper.depth_size == (depth_width, depth_height):
+            return mapper
+        
+        color_size = None
+        if mapper is not None:
+            color_size = mapper.color_size
+        elif self.color_profile_info is not None:
+            color_size = self.color_profile_info[:2]
+        elif self.color_frame is not None:
+            color_size = (self.color_frame.get_width(), self.color_frame.get_height())
+        if color_size is None:
+            return None
+        
+        self.pixel_mapper = ColorDepthMapper(color_size, (depth_width, depth_height))
+        return self.pixel_mapper
+    
+    def _map_point(self, x, y, width, height):
+        """彩色图坐标 -> 深度图坐标（需在depth_lock内调用）"""
+        mapper = self._get_pixel_mapper(width, height)
+        if mapper is None:
+            return int(np.clip(x, 0, width - 1)), int(np.clip(y, 0, height - 1))
+        return mapper.map_point(x, y)
+    
     def stop(self):
         """停止相机"""
         self.running = False
+        # 唤醒所有等待新帧的消费者
+        self.close_frames()
         if self.capture_thread:
             self.capture_thread.join(timeout=2)
         if self.pipeline:
@@ -328,97 +459,200 @@ class OrbbecDepthCamera:
                 if frames is None:
                     continue
                 
-                # 获取深度帧
+                # 获取深度帧：复制为自有的uint16深度图后释放SDK帧，带时间戳存入同步缓冲区
                 depth_frame = frames.get_depth_frame()
                 if depth_frame:
-                    with self.depth_lock:
-                        self.depth_frame = depth_frame
-                        self.depth_scale = depth_frame.get_depth_scale()
-                
-                # 获取彩色帧
+                    depth_scale = depth_frame.get_depth_scale()
+                    depth_ts = self._frame_timestamp_ms(depth_frame)
+                    depth_image = self._copy_depth_image(depth_frame)
+                    if depth_image is not None:
+                        with self.depth_lock:
+                            self.depth_image = depth_image
+                            self.depth_scale = depth_scale
+                            # 无设备时间戳的深度帧不参与配对
+                            if depth_ts is not None:
+                                self.frame_pairs.add_depth(depth_ts, (depth_image, depth_scale))
+                
+                # 获取彩色帧（在采集线程中解码一次，之后所有消费者共享结果）
                 color_frame = frames.get_color_frame()
                 if color_frame:
+                    color_image = self._decode_color_frame(color_frame)
+                    color_ts = self._frame_timestamp_ms(color_frame)
                     with self.depth_lock:
                         self.color_frame = color_frame
+                        if color_image is not None:
+                            # 采集线程是唯一的发布者，先登记时间戳再发布，
+                            # 保证消费者拿到序号时即可按序号查询配对深度；
+                            # 无设备时间戳的彩色帧不登记，按序号查询时视为无同步深度
+                            if color_ts is not None:
+                                self.frame_pairs.add_color(self.frame_seq + 1, color_ts)
+                    if color_image is not None:
+                        self.publish_frame(color_image)
                 
             except Exception as e:
                 if self.running:
                     print(f"⚠ 采集错误: {e}")
                 time.sleep(0.1)
     
+    @staticmethod
+    def _frame_timestamp_ms(frame):
+        """
+        获取帧时间戳（毫秒，彩色/深度帧使用同一设备时钟）
+        
+        Args:
+            frame: pyorbbecsdk帧
+        
+        Returns:
+            float: 时间戳（毫秒），读取失败返回None（主机时钟与设备时钟不可比，不用于配对）
+        """
+        try:
+            if hasattr(frame, 'get_timestamp_us'):
+                return frame.get_timestamp_us() / 1000.0
+            return float(frame.get_timestamp())
+        except Exception:
+            return None
+    
+    @staticmethod
+    def _copy_depth_image(depth_frame):
+        """
+        将SDK深度帧复制为自有的uint16深度图（在采集线程中调用，之后不再引用SDK帧）
+        
+        Args:
+            depth_frame: pyorbbecsdk深度帧
+        
+        Returns:
+            numpy数组 (H, W) uint16，无效返回None
+        """
+        try:
+            width = depth_frame.get_width()
+            height = depth_frame.get_height()
+            depth_data = np.frombuffer(depth_frame.get_data(), dtype=np.uint16)
+            return depth_data.reshape((height, width)).copy()
+        except Exception as e:
+            print(f"⚠ 复制深度帧失败: {e}")
+            return None
+    
+    def _resolve_depth_image(self, frame_seq=None):
+        """
+        获取与彩色帧时间同步的深度图（需在depth_lock内调用）
+        
+        Args:
+            frame_seq: 检测所在彩色帧序号，None表示使用最新深度图
+        
+        Returns:
+            tuple: (depth_image, depth_scale)，无时间同步的深度图时返回 (None, None)
+        """
+        if frame_seq is None:
+            return self.depth_image, self.depth_scale
+        depth_item, _ = self.frame_pairs.get_depth_for(frame_seq)
+        if depth_item is None:
+            return None, None
+        return depth_item
+    
+    def get_sync_stats(self):
+        """
+        获取彩色/深度帧时间同步统计
+        
+        Returns:
+            dict: synced, skew_rejected, color_evicted（见FramePairBuffer.get_stats）
+        """
+        with self.depth_lock:
+            return self.frame_pairs.get_stats()
+    
+    def get_depth_image(self, frame_seq=None):
+        """
+        获取深度图（uint16，单位为原始深度值）
+        
+        采集线程保存的深度图副本，多个消费者共享同一数组，调用方不应原地修改。
+        
+        Args:
+            frame_seq: 彩色帧序号，None表示最新深度帧
+        
+        Returns:
+            numpy数组 (H, W)，无效返回None
+        """
+        with self.depth_lock:
+            depth_image, _ = self._resolve_depth_image(frame_seq)
+            return depth_image
+    
+    def _decode_color_frame(self, color_frame):
+        """
+        将SDK彩色帧解码为RGB图像（在采集线程中调用，不持有锁）
+        
+        Args:
+            color_frame: pyorbbecsdk彩色帧
+        
+        Returns:
+            numpy数组 (H, W, 3) RGB格式，如果无效返回None
+        """
+        try:
+            width = color_frame.get_width()
+            height = color_frame.get_height()
+            format_type = color_frame.get_format()
+            
+            # 获取数据
+            color_data = np.frombuffer(color_frame.get_data(), dtype=np.uint8)
+            
+            # 根据格式处理
+            if format_type == ob.OBFormat.MJPG:
+                # MJPEG压缩格式，需要解码
+                import cv2
+                image = cv2.imdecode(color_data, cv2.IMREAD_COLOR)
+                if image is not None:
+                    # BGR -> RGB
+                    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                return image
+            elif format_type == ob.OBFormat.BGR:
+                # BGR格式
+                import cv2
+                image = color_data.reshape((height, width, 3))
+                return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            else:
+                # RGB格式（其他格式也尝试作为RGB处理）
+                # 复制一份，避免SDK回收帧缓冲区后数据失效
+                return color_data.reshape((height, width, 3)).copy()
+                
+        except Exception as e:
+            print(f"⚠ 解码彩色帧失败: {e}")
+            return None
+    
     def get_color_frame(self):
         """
         获取最新的彩色帧（RGB格式）
         
+        图像已在采集线程中解码，多个消费者共享同一数组，调用方不应原地修改。
+        
         Returns:
             numpy数组 (H, W, 3) RGB格式，如果无效返回None
         """
         with self.depth_lock:
-            if self.color_frame is None:
-                return None
-            
-            try:
-                width = self.color_frame.get_width()
-                height = self.color_frame.get_height()
-                format_type = self.color_frame.get_format()
-                
-                # 获取数据
-                color_data = np.frombuffer(self.color_frame.get_data(), dtype=np.uint8)
-                
-                # 根据格式处理
-                if format_type == ob.OBFormat.MJPG:
-                    # MJPEG压缩格式，需要解码
-                    import cv2
-                    image = cv2.imdecode(color_data, cv2.IMREAD_COLOR)
-                    if image is not None:
-                        # BGR -> RGB
-                        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                        return image
-                elif format_type == ob.OBFormat.RGB:
-                    # RGB格式
-                    return color_data.reshape((height, width, 3))
-                elif format_type == ob.OBFormat.BGR:
-                    # BGR格式
-                    import cv2
-                    image = color_data.reshape((height, width, 3))
-                    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                else:
-                    # 尝试作为RGB处理
-                    return color_data.reshape((height, width, 3))
-                    
-            except Exception as e:
-                print(f"⚠ 获取彩色帧失败: {e}")
-                return None
+            return self.latest_frame
     
-    def get_depth_at_point(self, x, y):
+    def get_depth_at_point(self, x, y, frame_seq=None):
         """
         获取指定点的深度
         
         Args:
             x: 图像x坐标（像素）
             y: 图像y坐标（像素）
+            frame_seq: 检测所在彩色帧序号（按时间戳取同步深度帧），None表示最新深度帧
         
         Returns:
             depth: 深度值（米），如果无效返回None
         """
         with self.depth_lock:
-            if self.depth_frame is None:
+            depth_image, depth_scale = self._resolve_depth_image(frame_seq)
+            if depth_image is None:
                 return None
             
             try:
-                width = self.depth_frame.get_width()
-                height = self.depth_frame.get_height()
+                height, width = depth_image.shape
                 
-                # 边界检查
-                x = int(np.clip(x, 0, width - 1))
-                y = int(np.clip(y, 0, height - 1))
-                
-                # 获取深度数据
-                depth_data = np.frombuffer(self.depth_frame.get_data(), dtype=np.uint16)
-                depth_image = depth_data.reshape((height, width))
+                # 彩色图坐标 -> 深度图坐标（查表）
+                x, y = self._map_point(x, y, width, height)
                 
                 # 读取深度值
-                depth_mm = depth_image[y, x] * self.depth_scale
+                depth_mm = depth_image[y, x] * depth_scale
                 
                 # 无效深度过滤
                 if depth_mm <= 0 or depth_mm > 10000:  # 0-10m有效范围
@@ -432,12 +666,13 @@ class OrbbecDepthCamera:
                 print(f"⚠ 获取深度失败: {e}")
                 return None
     
-    def get_depth_at_bbox_bottom(self, bbox):
+    def get_depth_at_bbox_bottom(self, bbox, frame_seq=None):
         """
         获取bbox底边中点的深度
         
         Args:
             bbox: [x1, y1, x2, y2]
+            frame_seq: 检测所在彩色帧序号（按时间戳取同步深度帧），None表示最新深度帧
         
         Returns:
             depth: 深度值（米），如果无效返回None
@@ -448,15 +683,16 @@ class OrbbecDepthCamera:
         bottom_center_x = int((x1 + x2) / 2)
         bottom_center_y = int(y2)
         
-        return self.get_depth_at_point(bottom_center_x, bottom_center_y)
+        return self.get_depth_at_point(bottom_center_x, bottom_center_y, frame_seq=frame_seq)
     
-    def get_depth_region_stats(self, bbox, method='median'):
+    def get_depth_region_stats(self, bbox, method='median', frame_seq=None):
         """
         获取bbox区域的深度统计值（比单点更稳定）
         
         Args:
             bbox: [x1, y1, x2, y2]
             method: 'mean', 'median', 'min'
+            frame_seq: 检测所在彩色帧序号（按时间戳取同步深度帧），None表示最新深度帧
         
         Returns:
             tuple: (depth, confidence) 或 (None, 0.0)
@@ -466,28 +702,28 @@ class OrbbecDepthCamera:
         x1, y1, x2, y2 = bbox
         
         with self.depth_lock:
-            if self.depth_frame is None:
-                return None
+            depth_image, depth_scale = self._resolve_depth_image(frame_seq)
+            if depth_image is None:
+                return None, 0.0
             
             try:
-                width = self.depth_frame.get_width()
-                height = self.depth_frame.get_height()
+                height, width = depth_image.shape
                 
-                # 边界检查
-                x1 = int(np.clip(x1, 0, width - 1))
-                y1 = int(np.clip(y1, 0, height - 1))
-                x2 = int(np.clip(x2, 0, width - 1))
-                y2 = int(np.clip(y2, 0, height - 1))
+                # 彩色图bbox -> 深度图bbox（查表）
+                mapper = self._get_pixel_mapper(width, height)
+                if mapper is not None:
+                    x1, y1, x2, y2 = mapper.map_bbox((x1, y1, x2, y2))
+                else:
+                    x1 = int(np.clip(x1, 0, width - 1))
+                    y1 = int(np.clip(y1, 0, height - 1))
+                    x2 = int(np.clip(x2, 0, width - 1))
+                    y2 = int(np.clip(y2, 0, height - 1))
                 
                 if x2 <= x1 or y2 <= y1:
                     return None, 0.0
                 
-                # 获取深度数据
-                depth_data = np.frombuffer(self.depth_frame.get_data(), dtype=np.uint16)
-                depth_image = depth_data.reshape((height, width))
-                
                 # 提取区域
-                region = depth_image[y1:y2, x1:x2] * self.depth_scale
+                region = depth_image[y1:y2, x1:x2] * depth_scale
                 
                 # 过滤无效值（使用配置的invalid_min和invalid_max）
                 valid_depths = region[(region > self.invalid_min) & (region < self.invalid_max)]
@@ -516,13 +752,14 @@ class OrbbecDepthCamera:
             except Exception as e:
                 return None, 0.0
     
-    def get_average_depth_at_bbox_bottom(self, bbox, radius=5):
+    def get_average_depth_at_bbox_bottom(self, bbox, radius=5, frame_seq=None):
         """
         获取bbox底边中点周围区域的平均深度（更稳定）
         
         Args:
             bbox: [x1, y1, x2, y2]
             radius: 采样半径
+            frame_seq: 检测所在彩色帧序号（按时间戳取同步深度帧），None表示最新深度帧
         
         Returns:
             depth: 平均深度值（米），如果无效返回None
@@ -534,16 +771,15 @@ class OrbbecDepthCamera:
         center_y = int(y2)
         
         with self.depth_lock:
-            if self.depth_frame is None:
+            depth_image, depth_scale = self._resolve_depth_image(frame_seq)
+            if depth_image is None:
                 return None
             
             try:
-                width = self.depth_frame.get_width()
-                height = self.depth_frame.get_height()
+                height, width = depth_image.shape
                 
-                # 获取深度数据
-                depth_data = np.frombuffer(self.depth_frame.get_data(), dtype=np.uint16)
-                depth_image = depth_data.reshape((height, width))
+                # 彩色图坐标 -> 深度图坐标（查表）
+                center_x, center_y = self._map_point(center_x, center_y, width, height)
                 
                 # 采样区域
                 y_min = max(0, center_y - radius)
@@ -552,7 +788,7 @@ class OrbbecDepthCamera:
                 x_max = min(width, center_x + radius + 1)
                 
                 # 提取区域
-                region = depth_image[y_min:y_max, x_min:x_max] * self.depth_scale
+                region = depth_image[y_min:y_max, x_min:x_max] * depth_scale
                 
                 # 过滤无效值（使用配置的invalid_min和invalid_max）
                 valid_depths = region[(region > self.invalid_min) & (region < self.invalid_max)]
@@ -570,7 +806,7 @@ class OrbbecDepthCamera:
                 print(f"⚠ 获取平均深度失败: {e}")
                 return None
     
-    def get_depth_at_bbox_bottom_robust(self, bbox, window_size=5, outlier_threshold=2.0):
+    def get_depth_at_bbox_bottom_robust(self, bbox, window_size=5, outlier_threshold=2.0, frame_seq=None):
         """
         获取bbox底边中点的鲁棒深度（小窗口中位数+离群值过滤）
         
@@ -578,6 +814,7 @@ class OrbbecDepthCamera:
             bbox: [x1, y1, x2, y2]
             window_size: 采样窗口大小（像素，默认5，即5×5窗口）
             outlier_threshold: 离群值阈值（标准差倍数，默认2.0）
+            frame_seq: 检测所在彩色帧序号（按时间戳取同步深度帧），None表示最新深度帧
         
         Returns:
             tuple: (depth, confidence) 或 (None, 0.0)
@@ -591,20 +828,15 @@ class OrbbecDepthCamera:
         center_y = int(y2)
         
         with self.depth_lock:
-            if self.depth_frame is None:
+            depth_image, depth_scale = self._resolve_depth_image(frame_seq)
+            if depth_image is None:
                 return None, 0.0
             
             try:
-                width = self.depth_frame.get_width()
-                height = self.depth_frame.get_height()
-                
-                # 边界检查
-                center_x = int(np.clip(center_x, 0, width - 1))
-                center_y = int(np.clip(center_y, 0, height - 1))
+                height, width = depth_image.shape
                 
-                # 获取深度数据
-                depth_data = np.frombuffer(self.depth_frame.get_data(), dtype=np.uint16)
-                depth_image = depth_data.reshape((height, width))
+                # 彩色图坐标 -> 深度图坐标（查表）
+                center_x, center_y = self._map_point(center_x, center_y, width, height)
                 
                 # 采样窗口
                 half_window = window_size // 2
@@ -614,7 +846,7 @@ class OrbbecDepthCamera:
                 x_max = min(width, center_x + half_window + 1)
                 
                 # 提取窗口区域
-                window = depth_image[y_min:y_max, x_min:x_max] * self.depth_scale
+                window = depth_image[y_min:y_max, x_min:x_max] * depth_scale
                 total_pixels = window.size
                 
                 # 过滤无效值
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+多帧车牌融合
+
+同一辆车在不同帧上的识别结果可能各错一两个字符。这里对每个track的多次
+识别结果做字符级投票：先按加权票数确定车牌长度，再逐位选出得票最高的字符，
+权重为识别置信度 × 帧质量。当融合结果在每一位上的领先幅度都超过阈值时
+判定为"已确定"，调用方不再为该track安排识别，减少每辆车的LPR调用次数。
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from bounded_cache import create_bounded_cache
+
+
+class _TrackVotes:
+    """单个track的识别记录与融合结果"""
+
+    __slots__ = ('readings', 'attempts', 'plate', 'confidence', 'margin', 'settled')
+
+    def __init__(self):
+        self.readings: List[Tuple[str, float, float]] = []  # (plate, confidence, weight)
+        self.attempts = 0
+        self.plate: Optional[str] = None
+        self.confidence = 0.0
+        self.margin = 0.0
+        self.settled = False
+
+
+def fuse_plate_readings(readings: List[Tuple[str, float, float]]) -> Tuple[Optional[str], float, float]:
+    """
+    字符级加权投票融合
+
+    Args:
+        readings: [(plate, confidence, weight), ...]
+
+    Returns:
+        tuple: (plate, confidence, margin)
+               confidence为各位得票占比的最小值 × 同长度结果的加权平均置信度；
+               margin为各位中"第一名与第二名得票差 / 该位总票数"的最小值
+    """
+    readings = [r for r in readings if r[0] and r[2] > 0]
+    if not readings:
+        return None, 0.0, 0.0
+
+    length_votes = defaultdict(float)
+    for plate, _, weight in readings:
+        length_votes[len(plate)] += weight
+    length = max(length_votes, key=length_votes.get)
+    same_length = [r for r in readings if len(r[0]) == length]
+
+    chars = []
+    agreement = 1.0
+    margin = 1.0
+    for i in range(length):
+        votes = defaultdict(float)
+        for plate, _, weight in same_length:
+            votes[plate[i]] += weight
+        ranked = sorted(votes.values(), reverse=True)
+        total = sum(ranked)
+        best_char = max(votes, key=votes.get)
+        chars.append(best_char)
+        agreement = min(agreement, ranked[0] / total)
+        margin = min(margin, (ranked[0] - (ranked[1] if len(ranked) > 1 else 0.0)) / total)
+
+    # 长度投票本身的领先幅度同样计入
+    length_ranked = sorted(length_votes.values(), reverse=True)
+    length_total = sum(length_ranked)
+    if len(length_ranked) > 1:
+        margin = min(margin, (length_ranked[0] - length_ranked[1]) / length_total)
+        agreement = min(agreement, length_ranked[0] / length_total)
+
+    weight_sum = sum(weight for _, _, weight in same_length)
+    mean_confidence = sum(conf * weight for _, conf, weight in same_length) / weight_sum
+    return ''.join(chars), agreement * mean_confidence, margin
+
+
+class PlateFusion:
+    """按track融合多次车牌识别结果，达到领先幅度后提前终止识别"""
+
+    def __init__(self, min_votes: int = 2, margin: float = 0.5, min_confidence: float = 0.6,
+                 max_attempts: int = 5, min_weight: float = 0.05, cache_config: Optional[dict] = None):
+        """
+        初始化融合器
+
+        Args:
+            min_votes: 判定确定前至少需要的有效识别次数
+            margin: 每一位（含长度）第一名领先第二名的最小得票占比
+            min_confidence: 判定确定所需的最小融合置信度
+            max_attempts: 每个track最多识别次数（含未识别出车牌的次数），达到后不再安排识别
+            min_weight: 单次识别的最小权重（避免帧质量为0时票数丢失）
+            cache_config: 按track状态的缓存配置 {'capacity', 'ttl'}
+        """
+        self.min_votes = max(1, int(min_votes))
+        self.margin = margin
+        self.min_confidence = min_confidence
+        self.max_attempts = max(1, int(max_attempts))
+        self.min_weight = min_weight
+        self.tracks = create_bounded_cache(cache_config, '车牌融合')  # {track_id: _TrackVotes}
+
+        self.readings_total = 0
+        self.settled_total = 0
+        self.early_stops = 0  # 在max_attempts之前就确定的track数
+
+    def add(self, track_id, plate_number: Optional[str], confidence: float,
+            quality: float = 1.0) -> Tuple[Optional[str], float]:
+        """
+        加入一次识别结果并返回融合结果
+
+        Args:
+            track_id: 跟踪ID
+            plate_number: 识别到的车牌号（未识别出为None）
+            confidence: 识别置信度
+            quality: 帧质量分数（0-1）
+
+        Returns:
+            tuple: 融合后的 (plate_number, confidence)，尚无有效结果时为 (None, 0.0)
+        """
+        votes = self.tracks.get(track_id)
+        if votes is None:
+            votes = _TrackVotes()
+            self.tracks[track_id] = votes
+        if votes.settled:
+            return votes.plate, votes.confidence
+
+        votes.attempts += 1
+        self.readings_total += 1
+        if plate_number:
+            weight = max(self.min_weight, float(confidence or 0.0) * max(0.0, float(quality)))
+            votes.readings.append((plate_number, float(confidence or 0.0), weight))
+            votes.plate, votes.confidence, votes.margin = fuse_plate_readings(votes.readings)
+
+        if (len(votes.readings) >= self.min_votes and votes.margin >= self.margin
+                and votes.confidence >= self.min_confidence):
+            votes.settled = True
+            self.settled_total += 1
+            if votes.attempts < self.max_attempts:
+                self.early_stops += 1
+        elif votes.attempts >= self.max_attempts:
+            votes.settled = True
+            self.settled_total += 1
+        return votes.plate, votes.confidence
+
+    def get(self, track_id) -> Tuple[Optional[str], float]:
+        """
+        获取当前融合结果
+
+        Returns:
+            tuple: (plate_number, confidence)，无结果时为 (None, 0.0)
+        """
+        votes = self.tracks.get(track_id)
+        if votes is None:
+            return None, 0.0
+        return votes.plate, votes.confidence
+
+    def is_settled(self, track_id) -> bool:
+        """融合结果是否已确定（不再需要识别）"""
+        votes = self.tracks.get(track_id)
+        return votes is not None and votes.settled
+
+    def reset(self, track_id):
+        """清除指定track的融合状态"""
+        self.tracks.pop(track_id)
+
+    def get_stats(self) -> Dict:
+        """
+        获取融合统计
+
+        Returns:
+            dict: tracks, readings, settled, early_stops, readings_per_settled
+        """
+        return {
+            'tracks': len(self.tracks),
+            'readings': self.readings_total,
+            'settled': self.settled_total,
+            'early_stops': self.early_stops,
+            'readings_per_settled': self.readings_total / self.settled_total if self.settled_total else 0.0,
+        }
+
+
+def create_plate_fusion(config: Optional[dict] = None,
+                        cache_config: Optional[dict] = None) -> Optional[PlateFusion]:
+    """
+    从配置创建融合器
+
+    Args:
+        config: lpr.fusion 配置字典
+        cache_config: lpr.result_cache 配置字典
+
+    Returns:
+        PlateFusion实例，禁用时返回None
+    """
+    config = config or {}
+    if not config.get('enabled', True):
+        return None
+    return PlateFusion(
+        min_votes=config.get('min_votes', 2),
+        margin=config.get('margin', 0.5),
+        min_confidence=config.get('min_confidence', 0.6),
+        max_attempts=config.get('max_attempts', 5),
+        cache_config=cache_config,
+    )
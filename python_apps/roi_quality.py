@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+统一的ROI质量评分
+
+原先质量在多处分别计算：异步LPR在全分辨率ROI上持锁计算float64拉普拉斯方差，
+最佳帧选取只看几何（面积/置信度/位置/距离）。这里每帧把整幅图缩小并转灰度一次，
+在缩小的uint8灰度图上为所有track计算清晰度，与几何/深度分数合成总分，
+按 (track_id, frame_seq) 缓存，最佳帧选取和识别调度优先级读取同一个分数。
+
+缩小后的拉普拉斯方差与全分辨率的比值随纹理和模糊程度变化（模糊ROI缩小后方差可升高
+数十倍），无法用一个换算系数对应原先的门限，因此提交识别前的清晰度门限仍在全分辨率ROI上
+判断（is_sharp，uint8/CV_16S计算，只在提交时计算一次）。
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from best_frame_lpr import calculate_frame_quality
+from bounded_cache import create_bounded_cache
+
+
+@dataclass
+class RoiQuality:
+    """单个track在某一帧上的质量分数"""
+    total: float = 0.0  # 合成分数（0-1）
+    geometry: float = 0.0  # 几何/置信度/距离分数（calculate_frame_quality）
+    sharpness: float = 0.0  # 缩小灰度ROI的拉普拉斯方差（用于排序，不与min_sharpness比较）
+
+
+def measure_sharpness(gray: np.ndarray) -> float:
+    """
+    uint8灰度图的拉普拉斯方差（CV_16S计算，避免float64中间结果）
+
+    Args:
+        gray: uint8灰度图
+
+    Returns:
+        float: 方差，图像过小时返回0
+    """
+    if gray is None or gray.ndim != 2 or min(gray.shape) < 3:
+        return 0.0
+    laplacian = cv2.Laplacian(gray, cv2.CV_16S)
+    _, std = cv2.meanStdDev(laplacian)
+    return float(std[0, 0]) ** 2
+
+
+def roi_sharpness(roi: np.ndarray, scale: float = 1.0, color_code: int = cv2.COLOR_BGR2GRAY) -> float:
+    """
+    单个ROI的清晰度（先缩小再转灰度）
+
+    拉普拉斯方差随缩放比例变化，与整帧批量评分比较时须使用相同的缩放比例。
+
+    Args:
+        roi: 车辆ROI
+        scale: 缩放比例（<=1）
+        color_code: 彩色转灰度的cv2转换码
+
+    Returns:
+        float: 拉普拉斯方差
+    """
+    if roi is None or roi.size == 0:
+        return 0.0
+    h, w = roi.shape[:2]
+    if scale < 1.0:
+        roi = cv2.resize(roi, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(roi, color_code) if roi.ndim == 3 else roi
+    return measure_sharpness(gray)
+
+
+class RoiQualityScorer:
+    """按帧批量计算所有track的ROI质量，并按 (track_id, frame_seq) 缓存"""
+
+    def __init__(self, work_width: int = 640, min_sharpness: float = 100.0, sharpness_ref: float = 1000.0,
+                 sharpness_weight: float = 0.3, color_code: int = cv2.COLOR_RGB2GRAY,
+                 cache_config: Optional[dict] = None):
+        """
+        初始化评分器
+
+        Args:
+            work_width: 整帧缩小后的宽度（像素），清晰度在此尺度上计算
+            min_sharpness: 清晰度门限（全分辨率ROI上的拉普拉斯方差，低于此值不提交识别）
+            sharpness_ref: 清晰度归一化参考值（达到此值记满分）
+            sharpness_weight: 清晰度在总分中的权重（其余为几何分数）
+            color_code: 帧转灰度的cv2转换码（相机帧为RGB）
+            cache_config: 分数缓存配置 {'capacity', 'ttl'}
+        """
+        self.work_width = max(32, int(work_width))
+        self.min_sharpness = min_sharpness
+        self.sharpness_ref = max(1e-6, sharpness_ref)
+        self.sharpness_weight = min(max(sharpness_weight, 0.0), 1.0)
+        self.color_code = color_code
+        self.scores = create_bounded_cache(cache_config or {'capacity': 512, 'ttl': None}, 'ROI质量')
+        self.scale = 1.0  # 最近一帧的缩放比例（单独评估ROI时沿用，保证分数可比）
+
+        self.frames_scored = 0
+        self.rois_scored = 0
+
+    def combine(self, geometry: float, sharpness: float) -> RoiQuality:
+        """合成几何分数与清晰度"""
+        sharp_score = min(sharpness / self.sharpness_ref, 1.0)
+        total = (1.0 - self.sharpness_weight) * geometry + self.sharpness_weight * sharp_score
+        return RoiQuality(total=total, geometry=geometry, sharpness=sharpness)
+
+    def score_frame(self, frame_seq: int, frame: np.ndarray,
+                    tracks: Dict[int, Tuple[Tuple[float, float, float, float], float, Optional[float]]]
+                    ) -> Dict[int, RoiQuality]:
+        """
+        一次计算本帧所有track的质量（整帧只缩小、转灰度一次）
+
+        Args:
+            frame_seq: 帧序号
+            frame: 完整图像
+            tracks: {track_id: (bbox原图坐标, 检测置信度, 距离或None)}
+
+        Returns:
+            dict: {track_id: RoiQuality}
+        """
+        results = {}
+        pending = {}
+        for track_id, item in tracks.items():
+            cached = self.scores.get((track_id, frame_seq))
+            if cached is not None:
+                results[track_id] = cached
+            else:
+                pending[track_id] = item
+        if not pending:
+            return results
+
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.work_width / w)
+        self.scale = scale
+        small = frame if scale >= 1.0 else cv2.resize(
+            frame, (self.work_width, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, self.color_code) if small.ndim == 3 else small
+
+        for track_id, (bbox, confidence, distance) in pending.items():
+            x1, y1, x2, y2 = bbox
+            region = gray[max(0, int(y1 * scale)):max(0, int(y2 * scale)),
+                          max(0, int(x1 * scale)):max(0, int(x2 * scale))]
+            geometry = calculate_frame_quality(bbox, confidence, frame.shape, distance)
+            quality = self.combine(geometry, measure_sharpness(region))
+            self.scores[(track_id, frame_seq)] = quality
+            results[track_id] = quality
+
+        self.frames_scored += 1
+        self.rois_scored += len(pending)
+        return results
+
+    def sharpness_of(self, roi: np.ndarray, color_code: int = cv2.COLOR_BGR2GRAY) -> float:
+        """
+        单独评估一个ROI的清晰度（与整帧批量评分使用相同缩放比例）
+
+        Args:
+            roi: 车辆ROI（原图分辨率）
+            color_code: 彩色转灰度的cv2转换码
+
+        Returns:
+            float: 拉普拉斯方差
+        """
+        return roi_sharpness(roi, self.scale, color_code)
+
+    def is_sharp(self, roi: np.ndarray, color_code: int = cv2.COLOR_BGR2GRAY) -> bool:
+        """
+        清晰度门限：全分辨率ROI的拉普拉斯方差是否超过min_sharpness
+
+        Args:
+            roi: 车辆ROI（原图分辨率）
+            color_code: 彩色转灰度的cv2转换码
+
+        Returns:
+            bool: 是否足够清晰
+        """
+        return roi_sharpness(roi, 1.0, color_code) > self.min_sharpness
+
+    def get(self, track_id: int, frame_seq: Optional[int]) -> Optional[RoiQuality]:
+        """
+        读取已计算的分数
+
+        Args:
+            track_id: 跟踪ID
+            frame_seq: 帧序号
+
+        Returns:
+            RoiQuality，本帧未计算时返回None
+        """
+        if frame_seq is None:
+            return None
+        return self.scores.get((track_id, frame_seq))
+
+    def get_stats(self) -> dict:
+        """
+        获取评分统计
+
+        Returns:
+            dict: frames_scored, rois_scored, cache（缓存统计）
+        """
+        return {
+            'frames_scored': self.frames_scored,
+            'rois_scored': self.rois_scored,
+            'cache': self.scores.get_stats(),
+        }
+
+
+def create_roi_quality_scorer(config: Optional[dict] = None) -> RoiQualityScorer:
+    """
+    从配置创建评分器
+
+    Args:
+        config: lpr.roi_quality 配置字典
+
+    Returns:
+        RoiQualityScorer实例
+    """
+    config = config or {}
+    return RoiQualityScorer(
+        work_width=config.get('work_width', 640),
+        min_sharpness=config.get('min_sharpness', 100.0),
+        sharpness_ref=config.get('sharpness_ref', 1000.0),
+        sharpness_weight=config.get('sharpness_weight', 0.3),
+        cache_config={'capacity': config.get('cache_capacity', 512), 'ttl': None},
+    )
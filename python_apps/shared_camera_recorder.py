@@ -220,18 +220,9 @@ class SharedCameraRecorder:
                 
                 # 获取并写入深度帧（可选）
                 if self.record_depth and self.depth_writer:
-                    with self.depth_camera.depth_lock:
-                        depth_frame = self.depth_camera.depth_frame
-                    if depth_frame is not None:
+                    depth_image = self.depth_camera.get_depth_image()
+                    if depth_image is not None:
                         try:
-                            width = depth_frame.get_width()
-                            height = depth_frame.get_height()
-                            depth_data = np.frombuffer(
-                                depth_frame.get_data(),
-                                dtype=np.uint16
-                            )
-                            depth_image = depth_data.reshape((height, width))
-                            
                             # 转换为8位灰度图
                             valid_mask = (depth_image > 0) & (depth_image < 65535)
                             if valid_mask.any():
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+跟踪生命周期事件总线
+
+原先主循环每帧构造活跃track集合，各个按track保存状态的模块（信标匹配、
+深度平滑、最佳帧、徘徊检测、异步LPR）各自对全部状态做集合差来清理，
+开销与状态总量成正比。跟踪器本身准确知道track何时创建、确认、丢失和移除，
+这里由跟踪器发布事件，各模块订阅需要的事件，清理开销只与变化数量有关。
+
+事件（回调参数为track_id，在跟踪器update所在线程中同步调用）：
+- created: 分配了新的track_id
+- confirmed: 连续匹配次数达到确认阈值
+- lost: 本帧未匹配（跟踪器可能仍保留该track）
+- removed: track被跟踪器移除，之后不会再出现
+"""
+
+from typing import Callable, Dict, List, Optional
+
+TRACK_CREATED = 'created'
+TRACK_CONFIRMED = 'confirmed'
+TRACK_LOST = 'lost'
+TRACK_REMOVED = 'removed'
+TRACK_EVENTS = (TRACK_CREATED, TRACK_CONFIRMED, TRACK_LOST, TRACK_REMOVED)
+
+
+class TrackEventBus:
+    """进程内同步事件总线"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable]] = {event: [] for event in TRACK_EVENTS}
+        self.counts: Dict[str, int] = {event: 0 for event in TRACK_EVENTS}
+        self.errors = 0
+
+    def subscribe(self, event: str, callback: Callable[[int], None]):
+        """
+        订阅事件
+
+        Args:
+            event: 事件名（TRACK_EVENTS之一）
+            callback: 回调函数 callback(track_id)
+        """
+        if event not in self._subscribers:
+            raise ValueError(f"未知的跟踪事件: {event}")
+        self._subscribers[event].append(callback)
+
+    def unsubscribe(self, event: str, callback: Callable[[int], None]):
+        """取消订阅（未订阅时忽略）"""
+        try:
+            self._subscribers[event].remove(callback)
+        except (KeyError, ValueError):
+            pass
+
+    def emit(self, event: str, track_id: int):
+        """
+        发布事件（回调异常不影响跟踪器和其他订阅者）
+
+        Args:
+            event: 事件名
+            track_id: 跟踪ID
+        """
+        self.counts[event] += 1
+        for callback in self._subscribers[event]:
+            try:
+                callback(track_id)
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠ 跟踪事件回调失败 ({event}, track {track_id}): {e}")
+
+    def get_stats(self) -> dict:
+        """
+        获取事件统计
+
+        Returns:
+            dict: 各事件发布次数、subscribers（订阅数）、errors
+        """
+        stats = dict(self.counts)
+        stats['subscribers'] = sum(len(callbacks) for callbacks in self._subscribers.values())
+        stats['errors'] = self.errors
+        return stats
+
+
+def emit_event(bus: Optional[TrackEventBus], event: str, track_id: int):
+    """未配置总线时不做任何事的发布辅助函数（供跟踪器使用）"""
+    if bus is not None:
+        bus.emit(event, track_id)
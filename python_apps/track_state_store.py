@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+按track的结构数组状态存储
+
+原先每帧跟踪器为每个track新建一个字典返回，各模块再按track_id做多次哈希查找。
+这里每个track在创建时分配一个稳定的槽位，状态保存在按列预分配的numpy数组中
+（bbox、类别、置信度、平滑深度等），按槽位读写：
+- 跟踪器每帧按槽位批量写入本帧所有track的bbox/置信度等列，深度平滑后写入深度列
+- 每帧的热点循环（bbox缩放、徘徊检测、质量评分）直接对活跃槽位做向量化运算，
+  质量评分按列读取各track的平滑深度
+- TrackTable/TrackView 提供与原 {track_id: {...}} 字典兼容的只读映射与行视图，
+  行视图按槽位预先创建并复用，每帧不再分配按track的字典
+槽位在track被移除时释放复用；容量不足时按倍数扩容，已分配的槽位号不变。
+"""
+
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 列名 -> (dtype, 每个槽位的形状, 初始值)
+COLUMNS = {
+    'bbox': (np.float64, (4,), 0.0),
+    'class_id': (np.int32, (), 0),
+    'score': (np.float64, (), 0.0),
+    'hits': (np.int32, (), 0),
+    'last_seen': (np.int64, (), 0),
+    'processed': (np.bool_, (), False),
+    'depth': (np.float64, (), np.nan),  # 平滑后的相机深度（米），NaN为未知
+}
+
+# 与原track字典兼容的键 -> 列名
+_FIELD_ALIASES = {
+    'class': 'class_id',
+    'confidence': 'score',
+}
+
+
+class TrackView:
+    """单个槽位的行视图（兼容原track字典的读写方式）"""
+
+    __slots__ = ('_store', 'slot')
+
+    def __init__(self, store: 'TrackStateStore', slot: int):
+        self._store = store
+        self.slot = slot
+
+    def __getitem__(self, key):
+        column = _FIELD_ALIASES.get(key, key)
+        if column not in COLUMNS:
+            raise KeyError(key)
+        value = getattr(self._store, column)[self.slot]
+        if column == 'bbox':
+            return value.copy()
+        if column == 'depth':
+            return None if np.isnan(value) else float(value)
+        return value.item()
+
+    def __setitem__(self, key, value):
+        column = _FIELD_ALIASES.get(key, key)
+        if column not in COLUMNS:
+            raise KeyError(key)
+        getattr(self._store, column)[self.slot] = value
+
+    def __contains__(self, key) -> bool:
+        return _FIELD_ALIASES.get(key, key) in COLUMNS
+
+    def get(self, key, default=None):
+        """同dict.get"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    @property
+    def track_id(self) -> int:
+        return int(self._store.track_id[self.slot])
+
+
+class TrackStateStore:
+    """按槽位保存所有track状态的结构数组"""
+
+    def __init__(self, capacity: int = 64):
+        """
+        初始化状态存储
+
+        Args:
+            capacity: 初始槽位数（不足时自动扩容）
+        """
+        self.capacity = 0
+        self.track_id = np.empty(0, dtype=np.int64)  # 槽位 -> track_id（-1为空闲）
+        self.active = np.empty(0, dtype=np.bool_)  # 本帧是否被跟踪器输出
+        for column, (dtype, shape, _) in COLUMNS.items():
+            setattr(self, column, np.empty((0,) + shape, dtype=dtype))
+        self.slot_of: Dict[int, int] = {}
+        self.free_slots: List[int] = []
+        self._views: List[TrackView] = []
+        self._grow(max(1, int(capacity)))
+
+        self.allocations = 0
+        self.grows = 0
+
+    def _grow(self, new_capacity: int):
+        """扩容到new_capacity（已分配槽位号不变）"""
+        old = self.capacity
+        extra = new_capacity - old
+        self.track_id = np.concatenate([self.track_id, np.full(extra, -1, dtype=np.int64)])
+        self.active = np.concatenate([self.active, np.zeros(extra, dtype=np.bool_)])
+        for column, (dtype, shape, initial) in COLUMNS.items():
+            setattr(self, column, np.concatenate(
+                [getattr(self, column), np.full((extra,) + shape, initial, dtype=dtype)]))
+        self._views.extend(TrackView(self, slot) for slot in range(old, new_capacity))
+        # 空闲槽位从小到大分配
+        self.free_slots = list(range(new_capacity - 1, old - 1, -1)) + self.free_slots
+        self.capacity = new_capacity
+
+    def allocate(self, track_id: int) -> int:
+        """
+        为track分配槽位（已分配时直接返回）
+
+        Args:
+            track_id: 跟踪ID
+
+        Returns:
+            int: 槽位号
+        """
+        slot = self.slot_of.get(track_id)
+        if slot is not None:
+            return slot
+        if not self.free_slots:
+            self._grow(self.capacity * 2)
+            self.grows += 1
+        slot = self.free_slots.pop()
+        self.slot_of[track_id] = slot
+        self.track_id[slot] = track_id
+        self.allocations += 1
+        return slot
+
+    def release(self, track_id: int):
+        """
+        释放track的槽位并恢复各列初始值（可直接订阅跟踪器的removed事件）
+
+        Args:
+            track_id: 跟踪ID
+        """
+        slot = self.slot_of.pop(track_id, None)
+        if slot is None:
+            return
+        self.track_id[slot] = -1
+        self.active[slot] = False
+        for column, (_, _, initial) in COLUMNS.items():
+            getattr(self, column)[slot] = initial
+        self.free_slots.append(slot)
+
+    def slot(self, track_id: int) -> Optional[int]:
+        """track的槽位号，未分配返回None"""
+        return self.slot_of.get(track_id)
+
+    def slots(self, track_ids: Iterable[int]) -> np.ndarray:
+        """一组track的槽位号（均须已分配）"""
+        return np.fromiter((self.slot_of[track_id] for track_id in track_ids), dtype=np.int64)
+
+    def view(self, track_id: int) -> TrackView:
+        """track的行视图（复用，不分配新对象）"""
+        return self._views[self.slot_of[track_id]]
+
+    def set_active(self, slots: np.ndarray):
+        """设置本帧活跃槽位"""
+        self.active[:] = False
+        self.active[slots] = True
+
+    def active_slots(self) -> np.ndarray:
+        """本帧活跃槽位"""
+        return np.flatnonzero(self.active)
+
+    def update(self, track_id: int, **columns) -> bool:
+        """
+        写入单个track的若干列
+
+        Args:
+            track_id: 跟踪ID
+            **columns: 列名=值
+
+        Returns:
+            bool: track是否存在（不存在时忽略）
+        """
+        slot = self.slot_of.get(track_id)
+        if slot is None:
+            return False
+        for column, value in columns.items():
+            if column not in COLUMNS:
+                raise KeyError(column)
+            getattr(self, column)[slot] = np.nan if value is None and column == 'depth' else value
+        return True
+
+    def write_batch(self, column: str, track_ids: Sequence[int], values) -> int:
+        """
+        批量写入一列（忽略未分配槽位的track）
+
+        Args:
+            column: 列名
+            track_ids: 跟踪ID序列
+            values: 与track_ids等长的值
+
+        Returns:
+            int: 写入的track数
+        """
+        if column not in COLUMNS:
+            raise KeyError(column)
+        pairs = [(self.slot_of[track_id], i) for i, track_id in enumerate(track_ids) if track_id in self.slot_of]
+        if not pairs:
+            return 0
+        slots, indices = (np.array(part, dtype=np.int64) for part in zip(*pairs))
+        values = np.asarray(values, dtype=COLUMNS[column][0] if column == 'depth' else None)
+        getattr(self, column)[slots] = values[indices]
+        return len(pairs)
+
+    def get_stats(self) -> dict:
+        """
+        获取存储统计
+
+        Returns:
+            dict: capacity, used, active, allocations, grows
+        """
+        return {
+            'capacity': self.capacity,
+            'used': len(self.slot_of),
+            'active': int(self.active.sum()),
+            'allocations': self.allocations,
+            'grows': self.grows,
+        }
+
+    def __contains__(self, track_id) -> bool:
+        return track_id in self.slot_of
+
+    def __len__(self) -> int:
+        return len(self.slot_of)
+
+
+class TrackTable(Mapping):
+    """本帧跟踪结果：{track_id: TrackView} 只读映射，附带按槽位的向量化访问"""
+
+    def __init__(self, store: TrackStateStore, track_ids: List[int], slots: np.ndarray):
+        """
+        Args:
+            store: 状态存储
+            track_ids: 本帧输出的track（跟踪器顺序）
+            slots: 与track_ids对应的槽位
+        """
+        self.store = store
+        self.track_ids = track_ids
+        self.slots = slots
+        self._ids = set(track_ids)
+
+    def __getitem__(self, track_id) -> TrackView:
+        if track_id not in self._ids:
+            raise KeyError(track_id)
+        return self.store.view(track_id)
+
+    def __contains__(self, track_id) -> bool:
+        return track_id in self._ids
+
+    def __iter__(self):
+        return iter(self.track_ids)
+
+    def __len__(self) -> int:
+        return len(self.track_ids)
+
+    def column(self, name: str) -> np.ndarray:
+        """本帧track的一列（按track_ids顺序，返回副本）"""
+        return getattr(self.store, _FIELD_ALIASES.get(name, name))[self.slots]
+
+
+def track_arrays(tracks) -> Tuple[List[int], np.ndarray, np.ndarray]:
+    """
+    取本帧所有track的ID、bbox和置信度数组
+
+    TrackTable直接按槽位切片；原 {track_id: {...}} 字典（如Simple IoU跟踪器）逐个取值。
+
+    Args:
+        tracks: TrackTable 或 {track_id: track字典}
+
+    Returns:
+        tuple: (track_ids, bboxes (N, 4) float64, scores (N,) float64)
+    """
+    if isinstance(tracks, TrackTable):
+        return tracks.track_ids, tracks.column('bbox'), tracks.column('score')
+    track_ids = list(tracks.keys())
+    bboxes = np.array([tracks[track_id]['bbox'] for track_id in track_ids], dtype=np.float64).reshape(-1, 4)
+    scores = np.array([tracks[track_id].get('confidence', tracks[track_id].get('score', 0.0))
+                       for track_id in track_ids], dtype=np.float64)
+    return track_ids, bboxes, scores
+
+
+def track_depths(tracks, fallback: Optional[Callable[[int], Optional[float]]] = None) -> np.ndarray:
+    """
+    取本帧所有track的平滑深度（与track_arrays同序，NaN为未知）
+
+    TrackTable直接按槽位切片深度列；原 {track_id: {...}} 字典没有深度列，逐个调用fallback
+    （如深度平滑器的get_smoothed），未提供时全部为NaN。
+
+    Args:
+        tracks: TrackTable 或 {track_id: track字典}
+        fallback: track_id -> 深度或None
+
+    Returns:
+        np.ndarray: (N,) float64
+    """
+    if isinstance(tracks, TrackTable):
+        return tracks.column('depth')
+    depths = np.full(len(tracks), np.nan)
+    if fallback is not None:
+        for i, track_id in enumerate(tracks):
+            depth = fallback(track_id)
+            if depth is not None:
+                depths[i] = depth
+    return depths
@@ -19,20 +19,30 @@ import tensorrt as trt
 import pycuda.driver as cuda
 import pycuda.autoinit
 from PIL import Image, ImageDraw, ImageFont
-from concurrent.futures import ThreadPoolExecutor, Future
-from queue import Queue
-import threading
 
 # 导入自定义模块
 from cassia_local_client import CassiaLocalClient
+from ble_scan_recorder import BleScanRecorder, BleReplayClient
 from orbbec_depth import OrbbecDepthCamera
 from depth_smoothing import create_depth_smoother
-from best_frame_lpr import BestFrameLPR, TrackInfo
+from frame_source import create_frame_wait_policy
+from best_frame_lpr import BestFrameLPR, calculate_frame_quality
+from lpr_engine import create_lpr_process_pool
+from async_lpr import (AsyncLPRProcessor, CIVILIAN_ALERT_TYPES, apply_plate_results, awaiting_plate,
+                       release_track, submit_track_roi)
+from frame_ring import create_frame_ring
+from roi_quality import create_roi_quality_scorer
+from alert_dedup import create_alert_dedup_index, bbox_iou
+from alert_event import AlertEvent, create_alert_sink
+from alert_history import create_alert_history
 from loitering_detector import LoiteringDetector
 from beacon_filter import BeaconFilter
 from beacon_match_tracker import BeaconMatchTracker
 from config_loader import get_config
 from byte_tracker import ByteTracker
+from track_events import (TRACK_CONFIRMED, TRACK_CREATED, TRACK_LOST, TRACK_REMOVED,
+                          TrackEventBus, emit_event)
+from track_state_store import track_arrays, track_depths
 from hardware_recovery import HardwareRecovery
 from network_recovery import NetworkRecovery
 
@@ -41,7 +51,6 @@ try:
     import sys
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'jetson-client'))
     from main_integration import SentinelIntegration
-    from detection_result import DetectionResult
     from config import CloudConfig
     CLOUD_AVAILABLE = True
 except ImportError as e:
@@ -91,206 +100,6 @@ COLORS = {
 }
 
 
-class AsyncLPRProcessor:
-    """异步车牌识别处理器"""
-    
-    def __init__(self, lpr_detector, max_workers=2, max_queue_size=10):
-        """
-        初始化异步LPR处理器
-        
-        Args:
-            lpr_detector: HyperLPR检测器
-            max_workers: 线程池最大工作线程数
-            max_queue_size: 任务队列最大大小
-        """
-        self.lpr_detector = lpr_detector
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
-        self.task_queue = Queue(maxsize=max_queue_size)
-        self.pending_tasks = {}  # {track_id: Future}
-        self.last_recognition_time = {}  # {track_id: timestamp}
-        self.recognition_results = {}  # {track_id: (plate_number, confidence)}
-        self.lock = threading.Lock()
-        
-        # 配置
-        self.min_recognition_interval = 1.0  # 每个track_id最小识别间隔（秒）
-        self.max_retries = 3  # 最大重试次数
-        self.retry_delay = 0.5  # 重试延迟（秒）
-        
-    def _check_roi_quality(self, roi):
-        """
-        检查ROI质量（清晰度）
-        
-        Args:
-            roi: 车辆ROI图像
-            
-        Returns:
-            bool: 是否通过质量检查
-        """
-        if roi is None or roi.size == 0:
-            return False
-        
-        # 使用拉普拉斯方差评估清晰度
-        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if len(roi.shape) == 3 else roi
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        
-        # 清晰度阈值（可调整）
-        clarity_threshold = 100.0
-        
-        return laplacian_var > clarity_threshold
-    
-    def _recognize_plate(self, roi_bgr, track_id, retry_count=0):
-        """
-        识别车牌（同步方法，在线程池中执行）
-        
-        Args:
-            roi_bgr: 车辆ROI（BGR格式）
-            track_id: 跟踪ID
-            retry_count: 当前重试次数
-            
-        Returns:
-            tuple: (plate_number, confidence) 或 (None, 0.0)
-        """
-        try:
-            # 图像预处理
-            min_height = 120
-            min_width = 320
-            if roi_bgr.shape[0] < min_height or roi_bgr.shape[1] < min_width:
-                scale = max(min_height / roi_bgr.shape[0], min_width / roi_bgr.shape[1])
-                new_width = int(roi_bgr.shape[1] * scale)
-                new_height = int(roi_bgr.shape[0] * scale)
-                roi_bgr = cv2.resize(roi_bgr, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
-            
-            max_height = 400
-            max_width = 1000
-            if roi_bgr.shape[0] > max_height or roi_bgr.shape[1] > max_width:
-                scale = min(max_height / roi_bgr.shape[0], max_width / roi_bgr.shape[1])
-                new_width = int(roi_bgr.shape[1] * scale)
-                new_height = int(roi_bgr.shape[0] * scale)
-                roi_bgr = cv2.resize(roi_bgr, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
-            
-            # 增强预处理
-            denoised = cv2.bilateralFilter(roi_bgr, 9, 75, 75)
-            kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-            sharpened = cv2.filter2D(denoised, -1, kernel)
-            lab = cv2.cvtColor(sharpened, cv2.COLOR_BGR2LAB)
-            l, a, b = cv2.split(lab)
-            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-            l = clahe.apply(l)
-            enhanced_bgr = cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
-            
-            # 识别
-            results = self.lpr_detector(enhanced_bgr)
-            
-            if results and len(results) > 0:
-                plate = results[0]
-                # 处理不同的返回格式
-                if isinstance(plate, str):
-                    return plate, 1.0
-                elif hasattr(plate, 'code'):
-                    return plate.code, getattr(plate, 'confidence', 0.0)
-                elif isinstance(plate, dict):
-                    return plate.get('code', plate.get('plate', '')), plate.get('confidence', 0.0)
-                elif isinstance(plate, (list, tuple)) and len(plate) > 0:
-                    first_item = plate[0]
-                    if isinstance(first_item, str):
-                        return first_item, 1.0
-                    elif hasattr(first_item, 'code'):
-                        return first_item.code, 1.0
-                    else:
-                        return str(first_item), 1.0
-                else:
-                    return str(plate), 0.5
-            
-            return None, 0.0
-            
-        except Exception as e:
-            # 识别失败，如果还有重试次数，稍后重试
-            if retry_count < self.max_retries:
-                time.sleep(self.retry_delay)
-                return self._recognize_plate(roi_bgr, track_id, retry_count + 1)
-            return None, 0.0
-    
-    def submit_recognition(self, track_id, roi_bgr, class_name):
-        """
-        提交车牌识别任务
-        
-        Args:
-            track_id: 跟踪ID
-            roi_bgr: 车辆ROI（BGR格式）
-            class_name: 车辆类别名称
-            
-        Returns:
-            bool: 是否成功提交
-        """
-        # 仅对特定车型触发（car和truck）
-        if class_name not in ['car', 'truck']:
-            return False
-        
-        # 检查识别频率限制
-        current_time = time.time()
-        with self.lock:
-            if track_id in self.last_recognition_time:
-                elapsed = current_time - self.last_recognition_time[track_id]
-                if elapsed < self.min_recognition_interval:
-                    return False  # 频率限制
-            
-            # 检查是否已有待处理任务
-            if track_id in self.pending_tasks:
-                return False  # 已有待处理任务
-            
-            # 检查ROI质量
-            if not self._check_roi_quality(roi_bgr):
-                return False  # ROI质量不足
-            
-            # 提交任务
-            try:
-                future = self.executor.submit(self._recognize_plate, roi_bgr.copy(), track_id)
-                self.pending_tasks[track_id] = future
-                self.last_recognition_time[track_id] = current_time
-                return True
-            except Exception as e:
-                print(f"  ⚠ 提交LPR任务失败: {e}")
-                return False
-    
-    def get_result(self, track_id):
-        """
-        获取识别结果（非阻塞）
-        
-        Args:
-            track_id: 跟踪ID
-            
-        Returns:
-            tuple: (plate_number, confidence) 或 (None, None) 如果未完成
-        """
-        with self.lock:
-            if track_id not in self.pending_tasks:
-                # 检查是否有缓存结果
-                if track_id in self.recognition_results:
-                    return self.recognition_results[track_id]
-                return None, None
-            
-            future = self.pending_tasks[track_id]
-            if future.done():
-                try:
-                    plate_number, confidence = future.result()
-                    # 缓存结果
-                    self.recognition_results[track_id] = (plate_number, confidence)
-                    # 移除待处理任务
-                    del self.pending_tasks[track_id]
-                    return plate_number, confidence
-                except Exception as e:
-                    print(f"  ⚠ LPR任务执行失败: {e}")
-                    del self.pending_tasks[track_id]
-                    return None, None
-            else:
-                # 任务还在执行中
-                return None, None
-    
-    def shutdown(self):
-        """关闭处理器"""
-        self.executor.shutdown(wait=True)
-
-
 class MultiFrameValidator:
     """多帧验证器：减少假阳性检测"""
     
@@ -817,18 +626,23 @@ class TensorRTInference:
 class VehicleTracker:
     """车辆跟踪器"""
     
-    def __init__(self, iou_threshold=0.3, max_age=30):
+    def __init__(self, iou_threshold=0.3, max_age=30, confirm_hits=3, event_bus=None):
         """
         初始化跟踪器
         
         Args:
             iou_threshold: 跟踪匹配的IoU阈值
             max_age: 跟踪消失的最大帧数
+            confirm_hits: 发布confirmed事件所需的匹配次数
+            event_bus: 跟踪生命周期事件总线（可选）
         """
         self.iou_threshold = iou_threshold
         self.tracks = {}  # {track_id: {'bbox': ..., 'class': ..., 'last_seen': ..., 'processed': False, 'class_history': [...]}}
         self.next_id = 1
         self.max_age = max_age
+        self.confirm_hits = confirm_hits
+        self.event_bus = event_bus
+        self.lost_ids = set()  # 未匹配但仍保留的track
     
     def compute_iou(self, box1, box2):
         """计算IoU"""
@@ -855,6 +669,7 @@ class VehicleTracker:
         current_tracks = {}
         matched = set()
         new_detections = []
+        events = []  # 本帧的生命周期事件，跟踪字典更新后统一发布
         
         # 如果没有提供置信度，创建默认数组
         if confidences is None:
@@ -907,8 +722,12 @@ class VehicleTracker:
                     'last_seen': frame_id,
                     'processed': track['processed'],
                     'class_history': track['class_history'],
-                    'confidence_history': track['confidence_history']
+                    'confidence_history': track['confidence_history'],
+                    'hits': track.get('hits', 1) + 1
                 }
+                if current_tracks[best_track_id]['hits'] == self.confirm_hits:
+                    events.append((TRACK_CONFIRMED, best_track_id))
+                self.lost_ids.discard(best_track_id)
                 matched.add(i)
             else:
                 new_detections.append((box, class_id, confidence))
@@ -927,16 +746,28 @@ class VehicleTracker:
                 'last_seen': frame_id,
                 'processed': False,  # 新车辆，未处理
                 'class_history': [class_id],  # 初始化类别历史
-                'confidence_history': [confidence]  # 初始化置信度历史
+                'confidence_history': [confidence],  # 初始化置信度历史
+                'hits': 1
             }
+            events.append((TRACK_CREATED, self.next_id))
             self.next_id += 1
         
         # 保留最近见过的tracks
         for track_id, track in self.tracks.items():
-            if track_id not in current_tracks and frame_id - track['last_seen'] < self.max_age:
+            if track_id in current_tracks:
+                continue
+            if frame_id - track['last_seen'] < self.max_age:
                 current_tracks[track_id] = track
+                if track_id not in self.lost_ids:
+                    self.lost_ids.add(track_id)
+                    events.append((TRACK_LOST, track_id))
+            else:
+                self.lost_ids.discard(track_id)
+                events.append((TRACK_REMOVED, track_id))
         
         self.tracks = current_tracks
+        for event, track_id in events:
+            emit_event(self.event_bus, event, track_id)
         return self.tracks
     
     def _get_stable_class(self, class_history):
@@ -953,7 +784,8 @@ class RealtimeVehicleDetection:
     """实时车辆检测系统"""
     
     def __init__(self, config_path=None, engine_path=None, cassia_router_ip=None, 
-                 use_depth=True, camera_id=None, no_display=False):
+                 use_depth=True, camera_id=None, no_display=False,
+                 ble_replay=None, ble_replay_speed=1.0):
         """
         初始化
         
@@ -964,6 +796,8 @@ class RealtimeVehicleDetection:
             use_depth: 是否使用深度相机
             camera_id: 摄像头ID（如果为None则从配置文件读取）
             no_display: 是否禁用显示（无头模式）
+            ble_replay: BLE扫描录制文件路径（指定时用回放代替Cassia实时扫描）
+            ble_replay_speed: 回放倍速
         """
         # 加载配置
         self.config = get_config(config_path)
@@ -977,6 +811,11 @@ class RealtimeVehicleDetection:
         
         self.engine_path = engine_path or self.config.resolve_path('detection.model_path')
         self.cassia_router_ip = cassia_router_ip or network_cfg['cassia_ip']
+        self.cassia_ingest_cfg = network_cfg.get('cassia_ingest', {})
+        self.cassia_connection_cfg = network_cfg.get('cassia_connection', {})
+        self.ble_replay = ble_replay
+        self.ble_replay_speed = ble_replay_speed
+        self.ble_recorder = None
         self.camera_id = camera_id or network_cfg['camera_id']
         self.use_depth = use_depth
         self.no_display = no_display
@@ -1020,13 +859,17 @@ class RealtimeVehicleDetection:
         # 车辆跟踪
         print("\n【2. 初始化跟踪器】")
         tracker_type = tracking_cfg.get('tracker_type', 'simple_iou')
+        # 跟踪生命周期事件总线：按track保存状态的模块订阅removed事件清理自身状态
+        self.track_events = TrackEventBus()
         if tracker_type == 'bytetrack':
             # Phase 2优化: 使用优化后的默认值
             self.tracker = ByteTracker(
                 track_thresh=tracking_cfg.get('track_thresh', 0.5),
                 high_thresh=tracking_cfg.get('high_thresh', 0.6),
                 match_thresh=tracking_cfg.get('match_thresh', 0.4),  # Phase 2: 降低到0.4以提高跟踪稳定性
-                track_buffer=tracking_cfg.get('track_buffer', 200)   # Phase 2: 增大到200以防止ID丢失
+                track_buffer=tracking_cfg.get('track_buffer', 200),  # Phase 2: 增大到200以防止ID丢失
+                confirm_hits=tracking_cfg.get('confirm_hits', 3),
+                event_bus=self.track_events
             )
             print(f"✓ ByteTrack跟踪器初始化完成 (Phase 2优化)")
             print(f"  跟踪阈值: {tracking_cfg.get('track_thresh', 0.5)}")
@@ -1036,17 +879,34 @@ class RealtimeVehicleDetection:
         else:
             self.tracker = VehicleTracker(
                 iou_threshold=tracking_cfg['iou_threshold'],
-                max_age=tracking_cfg['max_age']
+                max_age=tracking_cfg['max_age'],
+                confirm_hits=tracking_cfg.get('confirm_hits', 3),
+                event_bus=self.track_events
             )
             print(f"✓ Simple IoU跟踪器初始化完成")
         self.tracker_type = tracker_type
+        # 按track的结构数组状态存储（ByteTrack跟踪器提供；Simple IoU跟踪器仍返回字典）
+        self.track_store = getattr(self.tracker, 'store', None)
         
         # Cassia蓝牙客户端
         print("\n【3. 连接Cassia蓝牙路由器】")
+        recording_cfg = network_cfg.get('cassia_recording', {})
+        if recording_cfg.get('enabled', False) and not self.ble_replay:
+            try:
+                self.ble_recorder = BleScanRecorder(
+                    output_dir=recording_cfg.get('output_dir', 'recordings'),
+                    compress=recording_cfg.get('compress', True)
+                )
+                print(f"✓ BLE扫描录制: {self.ble_recorder.path}")
+            except Exception as e:
+                print(f"⚠ BLE扫描录制初始化失败: {e}")
         try:
-            self.beacon_client = CassiaLocalClient(self.cassia_router_ip)
+            self.beacon_client = self._create_beacon_client()
             self.beacon_client.start()  # 正确的方法名
-            print(f"✓ Cassia客户端启动成功: {self.cassia_router_ip}")
+            if self.ble_replay:
+                print(f"✓ BLE扫描回放启动成功: {self.ble_replay}")
+            else:
+                print(f"✓ Cassia客户端启动成功: {self.cassia_router_ip}")
             
             # 等待Cassia建立连接并开始扫描
             print("  等待Cassia建立连接...")
@@ -1080,11 +940,17 @@ class RealtimeVehicleDetection:
                     cloud_whitelist_manager = BeaconWhitelistManager(
                         api_base_url=cloud_cfg.get('api_base_url', 'http://your-server-ip:8000'),
                         api_key=cloud_cfg.get('api_key', 'your-api-key-here'),
-                        update_interval=cloud_cfg.get('beacon_whitelist_update_interval', 300)  # 默认5分钟
+                        update_interval=cloud_cfg.get('beacon_whitelist_update_interval', 300),  # 默认5分钟
+                        cache_path=self.config.resolve_path('cloud.beacon_whitelist_cache') or None,
+                        use_delta=cloud_cfg.get('beacon_whitelist_delta', True)
                     )
-                    # 启动时立即获取一次白名单
+                    if cloud_whitelist_manager.loaded_from_cache:
+                        print(f"  📂 已加载本地缓存白名单: {len(cloud_whitelist_manager.whitelist)} 个信标")
+                    # 启动时立即获取一次白名单（有缓存时为条件请求，无变化只返回304）
                     if cloud_whitelist_manager.fetch_whitelist():
                         print(f"  ✅ 云端白名单管理器初始化成功")
+                    elif cloud_whitelist_manager.whitelist:
+                        print(f"  ⚠️  云端白名单获取失败，使用上次缓存的白名单")
                     else:
                         print(f"  ⚠️  云端白名单获取失败，将使用本地配置")
                         cloud_whitelist_manager = None
@@ -1117,10 +983,15 @@ class RealtimeVehicleDetection:
                 invalid_min = depth_cfg.get('invalid_min', 0)
                 invalid_max = depth_cfg.get('invalid_max', 65535)
                 prefer_uncompressed = depth_cfg.get('prefer_uncompressed_format', True)
+                mapping_cache_dir = depth_cfg.get('mapping_cache_dir', '~/.cache/orbbec_depth_lut')
+                pairing_cfg = depth_cfg.get('frame_pairing', {})
                 self.depth_camera = OrbbecDepthCamera(
                     invalid_min=invalid_min,
                     invalid_max=invalid_max,
-                    prefer_uncompressed_format=prefer_uncompressed
+                    prefer_uncompressed_format=prefer_uncompressed,
+                    mapping_cache_dir=mapping_cache_dir,
+                    pair_buffer_size=pairing_cfg.get('buffer_size', 8),
+                    max_pair_skew_ms=pairing_cfg.get('max_skew_ms', 50.0)
                 )
                 self.depth_camera.start()
                 print("✓ Orbbec相机启动成功")
@@ -1131,6 +1002,12 @@ class RealtimeVehicleDetection:
             self.depth_camera = None
             print("ℹ 深度相机已禁用")
         
+        # 统一ROI质量评分：每帧为所有track批量计算一次，按(track, 帧序号)缓存供各处读取
+        self.roi_quality = create_roi_quality_scorer(self.config.get('lpr', {}).get('roi_quality', {}))
+        
+        # 共享帧缓冲区：主循环放入每帧，最佳帧、识别请求和快照按帧序号引用，需要像素时再裁剪
+        self.frame_ring = create_frame_ring(self.config.get_performance().get('frame_ring', {}))
+        
         # HyperLPR
         print("\n【6. 初始化车牌识别】")
         if LPR_AVAILABLE:
@@ -1138,17 +1015,39 @@ class RealtimeVehicleDetection:
             # inference: 0=ONNX Runtime, 1=MNN
             # detect_level: 0=LOW (快速), 1=HIGH (精确)
             # 注意: 当前使用CPU推理，GPU资源专注于YOLOv11
-            self.lpr_detector = lpr3.LicensePlateCatcher(
-                inference=lpr3.INFER_ONNX_RUNTIME,
-                detect_level=lpr3.DETECT_LEVEL_LOW
-            )
-            print("✓ HyperLPR初始化成功 (CPU推理)")
+            engine_cfg = self.config.get('lpr', {}).get('engine', {})
+            lpr_engine = None
+            if engine_cfg.get('backend', 'process') == 'process':
+                # 多进程识别：每个工作进程加载一次模型，主进程不再加载
+                try:
+                    # 重试由AsyncLPRProcessor的调度器延迟重新入队，工作进程内不重试
+                    lpr_engine = create_lpr_process_pool(engine_cfg, max_retries=0, raise_errors=True)
+                    print(f"✓ HyperLPR多进程识别池启动成功 ({lpr_engine.num_workers} 个进程, {lpr_engine.num_slots} 个共享内存槽位)")
+                except Exception as e:
+                    print(f"⚠ LPR多进程识别池启动失败: {e}，使用线程池")
+            
+            if lpr_engine is None:
+                self.lpr_detector = lpr3.LicensePlateCatcher(
+                    inference=lpr3.INFER_ONNX_RUNTIME,
+                    detect_level=lpr3.DETECT_LEVEL_LOW
+                )
+                print("✓ HyperLPR初始化成功 (CPU推理)")
+            else:
+                self.lpr_detector = None
             
             # 初始化异步LPR处理器
             self.async_lpr = AsyncLPRProcessor(
                 self.lpr_detector,
-                max_workers=2,
-                max_queue_size=10
+                max_workers=engine_cfg.get('workers', 2),
+                max_queue_size=10,
+                engine=lpr_engine,
+                strategy=engine_cfg.get('strategy', 'full'),
+                fallback_full=engine_cfg.get('fallback_full', False),
+                batch_config=engine_cfg.get('batch', {}),
+                scheduler_config=engine_cfg.get('scheduler', {}),
+                cache_config=self.config.get('lpr', {}).get('result_cache', {}),
+                fusion_config=self.config.get('lpr', {}).get('fusion', {}),
+                quality_scorer=self.roi_quality
             )
             print("✓ 异步LPR处理器初始化成功")
             
@@ -1158,7 +1057,9 @@ class RealtimeVehicleDetection:
                 self.best_frame_lpr = BestFrameLPR(
                     quality_threshold=lpr_cfg.get('quality_threshold', 0.6),
                     max_wait_frames=lpr_cfg.get('max_wait_frames', 30),
-                    reuse_result=lpr_cfg.get('reuse_result', True)
+                    reuse_result=lpr_cfg.get('reuse_result', True),
+                    cache_config=self.config.get('lpr', {}).get('result_cache', {}),
+                    frame_ring=self.frame_ring
                 )
                 print(f"✓ LPR最佳帧选择器初始化成功 (质量阈值={lpr_cfg.get('quality_threshold', 0.6)}, 最大等待帧数={lpr_cfg.get('max_wait_frames', 30)})")
             else:
@@ -1172,11 +1073,23 @@ class RealtimeVehicleDetection:
         # Phase 2优化: 初始化徘徊检测器
         alert_cfg = self.config.get('alert', {}).get('loitering', {})
         if alert_cfg.get('enabled', True):
+            heatmap_cfg = alert_cfg.get('heatmap', {})
             self.loitering_detector = LoiteringDetector(
                 min_duration=alert_cfg.get('min_duration', 10.0),
                 min_area_ratio=alert_cfg.get('min_area_ratio', 0.05),
-                min_movement_ratio=alert_cfg.get('min_movement_ratio', 0.1)
+                min_movement_ratio=alert_cfg.get('min_movement_ratio', 0.1),
+                grid_cols=heatmap_cfg.get('grid_cols', 64),
+                grid_rows=heatmap_cfg.get('grid_rows', 36),
+                heatmap_half_life=heatmap_cfg.get('half_life', 600.0),
+                position_dedup_time_window=alert_cfg.get('position_dedup_time_window', 3600.0),
+                position_dedup_iou_threshold=alert_cfg.get('position_dedup_iou_threshold', 0.5)
             )
+            # 热力图定期写入文件，由API服务（/api/heatmap）读取，不增加每帧开销
+            # 相对路径按项目根目录解析，与API服务读取同一文件
+            self.heatmap_path = self.config.resolve_path('alert.loitering.heatmap.path',
+                                                         default='logs/occupancy_heatmap.json')
+            self.heatmap_save_interval = heatmap_cfg.get('save_interval', 10.0)
+            self.last_heatmap_save = 0.0
             apply_to_unregistered_only = alert_cfg.get('apply_to_unregistered_only', True)
             self.loitering_apply_to_unregistered_only = apply_to_unregistered_only
             print(f"✓ 徘徊检测器初始化成功 (最少停留时间={alert_cfg.get('min_duration', 10.0)}s, 最小画面占比={alert_cfg.get('min_area_ratio', 0.05)}, 只对未备案车辆应用={apply_to_unregistered_only})")
@@ -1197,16 +1110,19 @@ class RealtimeVehicleDetection:
         
         # 统计
         self.frame_count = 0
+        self.current_frame_seq = None  # 当前处理帧的相机序号（深度查询按此取时间同步的深度帧）
         self.fps = 0
-        self.alerts = []  # 报警记录
+        # 报警记录：内存只保留最近N条 + 按类型/状态累计计数，更早的记录在检测数据库中
+        self.alerts = create_alert_history(self.config.get('alert', {}).get('history', {}))
         
         # 警报去重机制：记录最近处理的车辆位置，防止重复警报
-        self.recent_alerts = []  # [(track_id, bbox, timestamp, class_name), ...]
         # 从配置文件读取去重参数（Phase 1优化：移除硬编码）
         alert_dedup_cfg = self.config.get('alert_dedup', {})
         self.alert_dedup_time_window = alert_dedup_cfg.get('time_window', 30.0)
         self.alert_dedup_iou_threshold = alert_dedup_cfg.get('iou_threshold', 0.5)
         self.alert_dedup_position_time_window = alert_dedup_cfg.get('position_time_window', 10.0)
+        # 最近警报按时间分桶的空间哈希索引（过期整桶丢弃，查询只看覆盖的网格单元）
+        self.recent_alerts = create_alert_dedup_index(alert_dedup_cfg)
         
         # 跟踪最小置信度阈值（Phase 1优化：移除硬编码0.7）
         self.min_track_confidence = tracking_cfg.get('min_track_confidence', 0.7)
@@ -1449,12 +1365,11 @@ class RealtimeVehicleDetection:
                 self.beacon_client.stop()
                 time.sleep(1)
                 # 重新初始化
-                self.beacon_client = CassiaLocalClient(self.cassia_router_ip)
+                self.beacon_client = self._create_beacon_client()
                 self.beacon_client.start()
                 time.sleep(3)  # 等待建立连接
-                # 验证恢复是否成功
-                test_beacons = self.beacon_client.get_beacons()
-                return test_beacons is not None
+                # 验证恢复是否成功（get_beacons()断线时也返回空列表，以SSE连接状态为准）
+                return self.beacon_client.is_connection_healthy()
             except Exception as e:
                 print(f"[硬件恢复] Cassia恢复异常: {e}")
                 return False
@@ -1473,7 +1388,10 @@ class RealtimeVehicleDetection:
                     invalid_max = depth_cfg.get('invalid_max', 65535)
                     self.depth_camera = OrbbecDepthCamera(
                         invalid_min=invalid_min,
-                        invalid_max=invalid_max
+                        invalid_max=invalid_max,
+                        mapping_cache_dir=depth_cfg.get('mapping_cache_dir', '~/.cache/orbbec_depth_lut'),
+                        pair_buffer_size=depth_cfg.get('frame_pairing', {}).get('buffer_size', 8),
+                        max_pair_skew_ms=depth_cfg.get('frame_pairing', {}).get('max_skew_ms', 50.0)
                     )
                     self.depth_camera.start()
                     # 验证恢复是否成功
@@ -1504,219 +1422,154 @@ class RealtimeVehicleDetection:
             cassia_recovery=cassia_recovery_func,
             check_interval=30.0,
             retry_interval=5.0,
-            max_retries=10
+            max_retries=10,
+            # 路由器可达时，SSE连接断开超过最长退避（加连接超时）才重建客户端
+            cassia_down_for=lambda: self.beacon_client.connection_down_for() if self.beacon_client else None,
+            cassia_max_down=(self.cassia_connection_cfg.get('backoff', {}).get('max', 30.0)
+                             + self.cassia_connection_cfg.get('connect_timeout', 5.0))
         )
         print("✓ 网络恢复管理器初始化完成")
         
+        # 报警扇出投递：同一个AlertEvent投递到数据库、云端上传队列、本地报警日志和API事件流
+        self.alert_sink = create_alert_sink(self.config, database=self.detection_db,
+                                            cloud_integration=self.cloud_integration,
+                                            base_dir=os.path.dirname(os.path.abspath(__file__)))
+        print(f"✓ 报警投递目标: {', '.join(self.alert_sink.get_stats()['targets']) or '无'}")
+        
+        # Phase 1 & 2优化：track被跟踪器移除时清理各模块的按track状态（只处理变化的track）
+        if self.beacon_match_tracker:
+            self.track_events.subscribe(TRACK_REMOVED, self.beacon_match_tracker.on_track_removed)
+        if self.depth_smoother:
+            # 释放深度平滑器槽位
+            self.track_events.subscribe(TRACK_REMOVED, self.depth_smoother.reset)
+        if self.best_frame_lpr:
+            self.track_events.subscribe(TRACK_REMOVED, self.best_frame_lpr.reset)
+        if self.loitering_detector:
+            self.track_events.subscribe(TRACK_REMOVED, self.loitering_detector.reset)
+        
         print("\n" + "="*70)
         print("✓ 系统初始化完成！")
         print("="*70)
     
-    def _save_snapshot_and_upload(self, alert: dict, frame: np.ndarray, bbox: tuple) -> None:
+    def _set_track_state(self, track_id, **columns):
         """
-        保存快照并上传到云端
+        写入track在状态存储中的列（平滑深度等；未使用状态存储时忽略）
+        
+        Args:
+            track_id: 跟踪ID
+            **columns: 列名=值
+        """
+        if self.track_store is not None:
+            self.track_store.update(track_id, **columns)
+    
+    def _create_beacon_client(self):
+        """
+        创建信标客户端（Cassia实时扫描或录制文件回放），启用录制时挂载录制器
+        
+        Returns:
+            信标客户端（未启动）
+        """
+        if self.ble_replay:
+            return BleReplayClient(
+                self.ble_replay,
+                speed=self.ble_replay_speed,
+                ingest_config=self.cassia_ingest_cfg
+            )
+        client = CassiaLocalClient(
+            self.cassia_router_ip,
+            ingest_config=self.cassia_ingest_cfg,
+            connection_config=self.cassia_connection_cfg
+        )
+        if self.ble_recorder:
+            self.ble_recorder.attach(client)
+        return client
+    
+    def _save_snapshot(self, alert: dict, frame_seq: int, bbox: tuple):
+        """
+        保存车辆快照（启用云端上传时，从共享帧缓冲区按需裁剪）
         
         Args:
             alert: 警报字典
-            frame: 原始帧（RGB格式，来自Orbbec相机）
+            frame_seq: 帧序号（帧为RGB格式，来自Orbbec相机）
             bbox: 边界框 (x1, y1, x2, y2)
+            
+        Returns:
+            快照路径，未保存时返回None
         """
-        # #region agent log
-        try:
-            import json
-            with open('/home/liubo/Download/deepstream-vehicle-detection/.cursor/debug.log', 'a') as f:
-                f.write(json.dumps({
-                    'id': f'log_{int(time.time() * 1000)}',
-                    'timestamp': int(time.time() * 1000),
-                    'location': 'test_system_realtime.py:_save_snapshot_and_upload',
-                    'message': 'Function entry',
-                    'data': {
-                        'track_id': alert.get('track_id'),
-                        'vehicle_type': alert.get('type'),
-                        'class_name': alert.get('detected_class'),
-                        'has_cloud_integration': self.cloud_integration is not None,
-                        'hypothesisId': 'A'
-                    },
-                    'sessionId': 'debug-session',
-                    'runId': 'run1'
-                }) + '\n')
-        except: pass
-        # #endregion
-        
         if not self.cloud_integration:
-            # #region agent log
-            try:
-                import json
-                with open('/home/liubo/Download/deepstream-vehicle-detection/.cursor/debug.log', 'a') as f:
-                    f.write(json.dumps({
-                        'id': f'log_{int(time.time() * 1000)}',
-                        'timestamp': int(time.time() * 1000),
-                        'location': 'test_system_realtime.py:_save_snapshot_and_upload',
-                        'message': 'cloud_integration is None, returning early',
-                        'data': {'hypothesisId': 'A'},
-                        'sessionId': 'debug-session',
-                        'runId': 'run1'
-                    }) + '\n')
-            except: pass
-            # #endregion
-            return
+            return None
+        frame = self.frame_ring.get(frame_seq)
+        if frame is None:
+            print(f"⚠ 快照帧已不在缓冲区: Track#{alert.get('track_id', 'unknown')} (帧 {frame_seq})")
+            return None
         
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        snapshot_path = os.path.join(
+            self.snapshot_dir,
+            f"snapshot_{alert.get('track_id', 'unknown')}_{timestamp}.jpg"
+        )
+        
+        # 裁剪车辆区域（带边界扩展）
+        x1, y1, x2, y2 = bbox
+        h, w = frame.shape[:2]
+        # 扩展边界（20%，增加更多上下文）
+        margin_x = int((x2 - x1) * 0.2)
+        margin_y = int((y2 - y1) * 0.2)
+        x1 = max(0, int(x1) - margin_x)
+        y1 = max(0, int(y1) - margin_y)
+        x2 = min(w, int(x2) + margin_x)
+        y2 = min(h, int(y2) + margin_y)
+        
+        # 裁剪快照区域（视图即可：后续缩放/颜色转换都会生成新数组）
+        snapshot = frame[y1:y2, x1:x2]
+        
+        # 确保最小分辨率（至少640x480，提高前端显示质量）
+        min_width, min_height = 640, 480
+        if snapshot.shape[0] < min_height or snapshot.shape[1] < min_width:
+            # 如果裁剪区域太小，按比例放大到最小尺寸
+            scale = max(min_width / snapshot.shape[1], min_height / snapshot.shape[0])
+            new_width = int(snapshot.shape[1] * scale)
+            new_height = int(snapshot.shape[0] * scale)
+            snapshot = cv2.resize(snapshot, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+        
+        # 确保最大分辨率（不超过2560，保持宽高比，支持更高分辨率）
+        max_dimension = 2560
+        if snapshot.shape[0] > max_dimension or snapshot.shape[1] > max_dimension:
+            scale = min(max_dimension / snapshot.shape[1], max_dimension / snapshot.shape[0])
+            new_width = int(snapshot.shape[1] * scale)
+            new_height = int(snapshot.shape[0] * scale)
+            snapshot = cv2.resize(snapshot, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
+        
+        # frame来自Orbbec相机，始终是RGB格式，需要转换为BGR保存（OpenCV imwrite需要BGR）
+        if len(snapshot.shape) == 3 and snapshot.shape[2] == 3:
+            # RGB -> BGR
+            snapshot_bgr = cv2.cvtColor(snapshot, cv2.COLOR_RGB2BGR)
+            # 使用高质量JPEG保存（quality=95）
+            cv2.imwrite(snapshot_path, snapshot_bgr, [cv2.IMWRITE_JPEG_QUALITY, 95])
+        else:
+            # 灰度图或其他格式，直接保存
+            cv2.imwrite(snapshot_path, snapshot)
+        return snapshot_path
+    
+    def _publish_alert(self, alert: dict, frame_seq: int, bbox: tuple) -> None:
+        """
+        保存快照，构造一次AlertEvent并扇出投递到数据库、云端上传队列、本地报警日志和API事件流
+        
+        Args:
+            alert: 警报字典
+            frame_seq: 帧序号（快照从共享帧缓冲区裁剪）
+            bbox: 边界框 (x1, y1, x2, y2)
+        """
         try:
-            # 保存快照
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-            snapshot_path = os.path.join(
-                self.snapshot_dir,
-                f"snapshot_{alert.get('track_id', 'unknown')}_{timestamp}.jpg"
-            )
-            
-            # 裁剪车辆区域（带边界扩展）
-            x1, y1, x2, y2 = bbox
-            h, w = frame.shape[:2]
-            # 扩展边界（20%，增加更多上下文）
-            margin_x = int((x2 - x1) * 0.2)
-            margin_y = int((y2 - y1) * 0.2)
-            x1 = max(0, int(x1) - margin_x)
-            y1 = max(0, int(y1) - margin_y)
-            x2 = min(w, int(x2) + margin_x)
-            y2 = min(h, int(y2) + margin_y)
-            
-            # 裁剪快照区域
-            snapshot = frame[y1:y2, x1:x2].copy()
-            
-            # 确保最小分辨率（至少640x480，提高前端显示质量）
-            min_width, min_height = 640, 480
-            if snapshot.shape[0] < min_height or snapshot.shape[1] < min_width:
-                # 如果裁剪区域太小，按比例放大到最小尺寸
-                scale = max(min_width / snapshot.shape[1], min_height / snapshot.shape[0])
-                new_width = int(snapshot.shape[1] * scale)
-                new_height = int(snapshot.shape[0] * scale)
-                snapshot = cv2.resize(snapshot, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
-            
-            # 确保最大分辨率（不超过2560，保持宽高比，支持更高分辨率）
-            max_dimension = 2560
-            if snapshot.shape[0] > max_dimension or snapshot.shape[1] > max_dimension:
-                scale = min(max_dimension / snapshot.shape[1], max_dimension / snapshot.shape[0])
-                new_width = int(snapshot.shape[1] * scale)
-                new_height = int(snapshot.shape[0] * scale)
-                snapshot = cv2.resize(snapshot, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
-            
-            # frame来自Orbbec相机，始终是RGB格式，需要转换为BGR保存（OpenCV imwrite需要BGR）
-            if len(snapshot.shape) == 3 and snapshot.shape[2] == 3:
-                # RGB -> BGR
-                snapshot_bgr = cv2.cvtColor(snapshot, cv2.COLOR_RGB2BGR)
-                # 使用高质量JPEG保存（quality=95）
-                cv2.imwrite(snapshot_path, snapshot_bgr, [cv2.IMWRITE_JPEG_QUALITY, 95])
-            else:
-                # 灰度图或其他格式，直接保存
-                cv2.imwrite(snapshot_path, snapshot)
-            
-            # 创建检测结果并上传
-            # 确保detected_class字段存在（优先使用detected_class，其次detected_type，最后class_name）
-            # 注意：alert字典中可能使用detected_class、detected_type或class_name字段
-            detected_class_value = (alert.get('detected_class') or 
-                                  alert.get('detected_type') or 
-                                  alert.get('class_name') or
-                                  'unknown')
-            # #region agent log
-            try:
-                import json
-                with open('/home/liubo/Download/deepstream-vehicle-detection/.cursor/debug.log', 'a') as f:
-                    f.write(json.dumps({
-                        'id': f'log_{int(time.time() * 1000)}',
-                        'timestamp': int(time.time() * 1000),
-                        'location': 'test_system_realtime.py:_save_snapshot_and_upload',
-                        'message': 'Creating DetectionResult',
-                        'data': {
-                            'track_id': alert.get('track_id'),
-                            'detected_class_value': detected_class_value,
-                            'alert_keys': list(alert.keys()),
-                            'has_detected_class': 'detected_class' in alert,
-                            'has_detected_type': 'detected_type' in alert,
-                            'has_class_name': 'class_name' in alert,
-                            'hypothesisId': 'C'
-                        },
-                        'sessionId': 'debug-session',
-                        'runId': 'run1'
-                    }) + '\n')
-            except: pass
-            # #endregion
-            detection_result = DetectionResult(
-                vehicle_type=alert.get('type', 'Unknown'),
-                detected_class=detected_class_value,
-                status=alert.get('status'),
-                confidence=alert.get('confidence', 0.0),
-                plate_number=alert.get('plate_number') or alert.get('plate'),
-                timestamp=datetime.now(),
-                image_path=snapshot_path,
-                bbox=bbox,
-                track_id=alert.get('track_id'),
-                distance=alert.get('distance'),
-                is_registered=(alert.get('status') == 'registered'),
-                beacon_mac=alert.get('beacon_mac'),
-                company=alert.get('company'),
-                environment_code=alert.get('environment_code'),  # 添加环境编码
-                metadata={
-                    'rssi': alert.get('rssi'),
-                    'match_cost': alert.get('match_cost')
-                } if alert.get('rssi') is not None or alert.get('match_cost') is not None else None
-            )
-            
-            # #region agent log
-            try:
-                import json
-                with open('/home/liubo/Download/deepstream-vehicle-detection/.cursor/debug.log', 'a') as f:
-                    f.write(json.dumps({
-                        'id': f'log_{int(time.time() * 1000)}',
-                        'timestamp': int(time.time() * 1000),
-                        'location': 'test_system_realtime.py:_save_snapshot_and_upload',
-                        'message': 'Before calling on_detection',
-                        'data': {
-                            'track_id': detection_result.track_id,
-                            'vehicle_type': detection_result.vehicle_type,
-                            'snapshot_path': snapshot_path,
-                            'hypothesisId': 'C'
-                        },
-                        'sessionId': 'debug-session',
-                        'runId': 'run1'
-                    }) + '\n')
-            except: pass
-            # #endregion
-            
-            self.cloud_integration.on_detection(detection_result)
-            
-            # #region agent log
-            try:
-                import json
-                with open('/home/liubo/Download/deepstream-vehicle-detection/.cursor/debug.log', 'a') as f:
-                    f.write(json.dumps({
-                        'id': f'log_{int(time.time() * 1000)}',
-                        'timestamp': int(time.time() * 1000),
-                        'location': 'test_system_realtime.py:_save_snapshot_and_upload',
-                        'message': 'After calling on_detection',
-                        'data': {'track_id': detection_result.track_id, 'hypothesisId': 'C'},
-                        'sessionId': 'debug-session',
-                        'runId': 'run1'
-                    }) + '\n')
-            except: pass
-            # #endregion
-            
+            snapshot_path = self._save_snapshot(alert, frame_seq, bbox)
         except Exception as e:
-            # #region agent log
-            try:
-                import json
-                with open('/home/liubo/Download/deepstream-vehicle-detection/.cursor/debug.log', 'a') as f:
-                    f.write(json.dumps({
-                        'id': f'log_{int(time.time() * 1000)}',
-                        'timestamp': int(time.time() * 1000),
-                        'location': 'test_system_realtime.py:_save_snapshot_and_upload',
-                        'message': 'Exception in _save_snapshot_and_upload',
-                        'data': {'error': str(e), 'hypothesisId': 'C'},
-                        'sessionId': 'debug-session',
-                        'runId': 'run1'
-                    }) + '\n')
-            except: pass
-            # #endregion
-            print(f"⚠ 保存快照或上传失败: {e}")
+            print(f"⚠ 保存快照失败: {e}")
+            snapshot_path = None
+        
+        event = AlertEvent.from_alert(alert, bbox, image_path=snapshot_path)
+        self.alert_sink.publish(event)
+        if event.db_id is not None:
+            alert['db_id'] = event.db_id
     
     def _is_duplicate_alert(self, track_id, bbox, current_time, class_name=None):
         """
@@ -1731,34 +1584,18 @@ class RealtimeVehicleDetection:
         Returns:
             bool: 如果是重复警报返回True
         """
-        # 清理过期记录（超过时间窗口的记录）
-        self.recent_alerts = [
-            (tid, b, t, cls) for tid, b, t, cls in self.recent_alerts
-            if current_time - t < self.alert_dedup_time_window
-        ]
+        # 过期记录整桶丢弃；同一track_id或同类别位置重叠（跟踪ID切换导致）视为重复
+        duplicate = self.recent_alerts.find_duplicate(track_id, bbox, current_time, class_name)
+        if duplicate is None:
+            # 不在这里记录，而是在成功创建alert并上传后才记录（避免批量处理时被误判为重复）
+            return False
         
-        # 检查是否有重叠的警报（基于位置和类别）
-        for existing_track_id, existing_bbox, existing_time, existing_class in self.recent_alerts:
-            # 如果是同一个track_id，直接返回True（已处理过）
-            if existing_track_id == track_id:
-                return True
-            
-            # 如果类别不同，不认为是重复（允许不同类别的车辆在同一位置）
-            if class_name and existing_class and class_name != existing_class:
-                continue
-            
-            # 如果位置重叠且时间接近，认为是同一辆车（跟踪ID切换导致）
-            iou = self._compute_bbox_iou(bbox, existing_bbox)
-            time_diff = current_time - existing_time
-            
-            if iou > self.alert_dedup_iou_threshold and time_diff < self.alert_dedup_position_time_window:
-                # 位置重叠且时间接近（Phase 1优化：使用配置值），可能是跟踪ID切换导致的重复
-                print(f"  ⚠ 检测到重复警报：Track#{track_id} ({class_name}) 与 Track#{existing_track_id} ({existing_class}) 位置重叠（IoU={iou:.2f}，时间差={time_diff:.1f}s）")
-                return True
-        
-        # 不在这里记录，而是在成功创建alert并上传后才记录（避免批量处理时被误判为重复）
-        # self.recent_alerts.append((track_id, bbox, current_time, class_name))
-        return False
+        existing, iou = duplicate
+        if existing.track_id != track_id:
+            # 位置重叠且时间接近（Phase 1优化：使用配置值），可能是跟踪ID切换导致的重复
+            time_diff = current_time - existing.timestamp
+            print(f"  ⚠ 检测到重复警报：Track#{track_id} ({class_name}) 与 Track#{existing.track_id} ({existing.class_name}) 位置重叠（IoU={iou:.2f}，时间差={time_diff:.1f}s）")
+        return True
     
     def _compute_bbox_iou(self, box1, box2):
         """
@@ -1771,36 +1608,20 @@ class RealtimeVehicleDetection:
         Returns:
             float: IoU值
         """
-        x1_min, y1_min, x1_max, y1_max = box1
-        x2_min, y2_min, x2_max, y2_max = box2
-        
-        inter_x_min = max(x1_min, x2_min)
-        inter_y_min = max(y1_min, y2_min)
-        inter_x_max = min(x1_max, x2_max)
-        inter_y_max = min(y1_max, y2_max)
-        
-        if inter_x_max < inter_x_min or inter_y_max < inter_y_min:
-            return 0.0
-        
-        inter_area = (inter_x_max - inter_x_min) * (inter_y_max - inter_y_min)
-        box1_area = (x1_max - x1_min) * (y1_max - y1_min)
-        box2_area = (x2_max - x2_min) * (y2_max - y2_min)
-        union_area = box1_area + box2_area - inter_area
-        
-        return inter_area / union_area if union_area > 0 else 0.0
+        return bbox_iou(box1, box2)
     
-    def process_new_vehicle(self, track_id, vehicle_type, bbox, image, class_name=None, detection_confidence=0.0):
-        """处理新检测到的车辆"""
+    def process_new_vehicle(self, track_id, vehicle_type, bbox, frame_seq, class_name=None, detection_confidence=0.0):
+        """处理新检测到的车辆（frame_seq为共享帧缓冲区中的帧序号，需要像素时再裁剪）"""
         if vehicle_type == 'construction':
             # 工程车辆：检查蓝牙信标
-            return self.check_construction_vehicle(track_id, bbox, image, detected_class=class_name, detection_confidence=detection_confidence)
+            return self.check_construction_vehicle(track_id, bbox, frame_seq, detected_class=class_name, detection_confidence=detection_confidence)
         elif vehicle_type == 'civilian':
             # 社会车辆：识别车牌（社会车辆不使用检测置信度，使用车牌识别置信度）
-            return self.check_civilian_vehicle(track_id, bbox, image)
+            return self.check_civilian_vehicle(track_id, bbox, frame_seq)
         return None
     
     def _create_construction_alert(
-        self, track_id, bbox, image, detected_class, beacon_info, match_cost=None, detection_confidence=0.0
+        self, track_id, bbox, frame_seq, detected_class, beacon_info, match_cost=None, detection_confidence=0.0
     ):
         """
         从匹配结果创建工程车辆alert
@@ -1808,7 +1629,7 @@ class RealtimeVehicleDetection:
         Args:
             track_id: 跟踪ID
             bbox: 边界框
-            image: 图像
+            frame_seq: 帧序号（快照从共享帧缓冲区裁剪）
             detected_class: 检测到的类别
             beacon_info: 信标信息（可能为None，表示无匹配）
             match_cost: 匹配代价
@@ -1823,11 +1644,11 @@ class RealtimeVehicleDetection:
         distance = None
         if self.depth_camera:
             distance, _ = self.depth_camera.get_depth_at_bbox_bottom_robust(
-                bbox, window_size=5, outlier_threshold=2.0
+                bbox, window_size=5, outlier_threshold=2.0, frame_seq=self.current_frame_seq
             )
             if distance is None:
                 depth_method = self.depth_config.get('method', 'median')
-                distance, _ = self.depth_camera.get_depth_region_stats(bbox, method=depth_method)
+                distance, _ = self.depth_camera.get_depth_region_stats(bbox, method=depth_method, frame_seq=self.current_frame_seq)
         
         # 如果没有信标信息，标记为未备案
         if beacon_info is None:
@@ -1891,7 +1712,7 @@ class RealtimeVehicleDetection:
         
         return alert
     
-    def check_construction_vehicle(self, track_id, bbox, image, detected_class=None, detection_confidence=0.0):
+    def check_construction_vehicle(self, track_id, bbox, frame_seq, detected_class=None, detection_confidence=0.0):
         """检查工程车辆（使用智能过滤器）"""
         x1, y1, x2, y2 = bbox
         cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
@@ -1907,17 +1728,17 @@ class RealtimeVehicleDetection:
         if self.depth_camera:
             # 优先使用鲁棒方法（小窗口中位数+离群值过滤）
             distance, depth_confidence = self.depth_camera.get_depth_at_bbox_bottom_robust(
-                bbox, window_size=5, outlier_threshold=2.0
+                bbox, window_size=5, outlier_threshold=2.0, frame_seq=self.current_frame_seq
             )
             
             # 如果鲁棒方法失败，尝试使用bbox区域平均（使用配置的方法）
             if distance is None:
                 depth_method = self.depth_config.get('method', 'median')
-                distance, depth_confidence = self.depth_camera.get_depth_region_stats(bbox, method=depth_method)
+                distance, depth_confidence = self.depth_camera.get_depth_region_stats(bbox, method=depth_method, frame_seq=self.current_frame_seq)
             
             # 如果还是失败，使用中心点作为最后备用
             if distance is None:
-                distance = self.depth_camera.get_depth_at_point(int(cx), int(cy))
+                distance = self.depth_camera.get_depth_at_point(int(cx), int(cy), frame_seq=self.current_frame_seq)
                 if distance:
                     depth_confidence = 1.0  # 单点测量，假设置信度为1.0
             
@@ -1926,6 +1747,7 @@ class RealtimeVehicleDetection:
                 smoothed_distance = self.depth_smoother.update(track_id, distance)
                 if smoothed_distance is not None:
                     distance = smoothed_distance
+                    self._set_track_state(track_id, depth=smoothed_distance)
                     print(f"  📏 相机深度: {distance:.2f} m (平滑后, 置信度: {depth_confidence:.1%})")
                 else:
                     print(f"  📏 相机深度: {distance:.2f} m (原始, 置信度: {depth_confidence:.1%})")
@@ -1973,12 +1795,6 @@ class RealtimeVehicleDetection:
         elif not self.beacon_filter:
             print(f"  ✗ 信标过滤器未初始化")
         
-        # Phase 2优化: 更新徘徊检测器（为所有车辆更新，用于后续判定）
-        if self.loitering_detector:
-            import time
-            current_time = time.time()
-            self.loitering_detector.update(track_id, bbox, image.shape, current_time)
-        
         # 判断备案状态
         if beacon_info:
             # 验证车辆类型是否匹配
@@ -2083,9 +1899,16 @@ class RealtimeVehicleDetection:
         print(f"{'='*70}\n")
         return alert
     
-    def check_civilian_vehicle(self, track_id, bbox, image, class_name=None):
-        """检查社会车辆（异步车牌识别）"""
+    def check_civilian_vehicle(self, track_id, bbox, frame_seq, class_name=None):
+        """检查社会车辆（异步车牌识别，ROI从共享帧缓冲区按需裁剪）"""
         x1, y1, x2, y2 = bbox
+        frame = self.frame_ring.get(frame_seq)
+        if frame is None:
+            print(f"  ⚠ 帧已不在缓冲区，跳过车牌识别: Track#{track_id} (帧 {frame_seq})")
+            return None
+        frame_shape = frame.shape
+        roi_h = min(int(y2), frame_shape[0]) - max(int(y1), 0)
+        roi_w = min(int(x2), frame_shape[1]) - max(int(x1), 0)
         
         print(f"\n{'='*70}")
         print(f"🚗 检查社会车辆 Track#{track_id}")
@@ -2105,12 +1928,10 @@ class RealtimeVehicleDetection:
                 return {'track_id': track_id, 'plate_number': plate_number, 'confidence': confidence}
         
         if self.async_lpr:
-            # 裁剪车辆区域
-            vehicle_roi = image[int(y1):int(y2), int(x1):int(x2)]
-            
-            if vehicle_roi.size > 0 and vehicle_roi.shape[0] > 20 and vehicle_roi.shape[1] > 20:
-                # 转换为BGR
-                vehicle_roi_bgr = cv2.cvtColor(vehicle_roi, cv2.COLOR_RGB2BGR)
+            # 车辆区域足够大时才识别（触发时才裁剪）
+            if roi_h > 20 and roi_w > 20:
+                # 本帧的统一质量评分（主循环已批量计算）
+                roi_quality = self.roi_quality.get(track_id, frame_seq)
                 
                 # Phase 2优化: 使用最佳帧选择器
                 if self.best_frame_lpr:
@@ -2118,21 +1939,25 @@ class RealtimeVehicleDetection:
                     distance = None
                     detection_confidence = 0.0
                     if self.depth_camera:
-                        distance, _ = self.depth_camera.get_depth_at_bbox_bottom_robust(bbox, window_size=5, outlier_threshold=2.0)
+                        distance, _ = self.depth_camera.get_depth_at_bbox_bottom_robust(bbox, window_size=5, outlier_threshold=2.0, frame_seq=frame_seq)
                     
-                    # 检查是否应该触发识别
+                    # 检查是否应该触发识别（只记录帧序号和bbox，触发时裁剪最佳帧）
                     should_trigger, best_roi = self.best_frame_lpr.should_trigger_lpr(
                         track_id=track_id,
+                        frame_seq=frame_seq,
                         bbox=bbox,
-                        roi_bgr=vehicle_roi_bgr,
                         confidence=detection_confidence,
-                        frame_shape=image.shape,
-                        distance=distance
+                        frame_shape=frame_shape,
+                        distance=distance,
+                        quality=roi_quality.total if roi_quality else None
                     )
                     
                     if should_trigger and best_roi is not None:
-                        # 使用最佳帧进行识别
-                        submitted = self.async_lpr.submit_recognition(track_id, best_roi, class_name or 'car')
+                        # 使用最佳帧进行识别（首次检查时最佳帧即本帧）
+                        best_quality = roi_quality.total if roi_quality else calculate_frame_quality(
+                            bbox, detection_confidence, frame_shape, distance)
+                        submitted = self.async_lpr.submit_recognition(
+                            track_id, best_roi, class_name or 'car', priority=best_quality)
                         if submitted:
                             print(f"  📤 已提交车牌识别任务（最佳帧，异步）")
                         else:
@@ -2140,16 +1965,22 @@ class RealtimeVehicleDetection:
                             plate_number, confidence = self.async_lpr.get_result(track_id)
                             if plate_number:
                                 print(f"  ✓ 车牌号: {plate_number} (置信度: {confidence:.2f})")
-                                self.best_frame_lpr.on_lpr_complete(track_id, plate_number, confidence)
+                                # 融合结果确定后才复用，之前继续按最佳帧识别积累投票
+                                if self.async_lpr.is_settled(track_id):
+                                    self.best_frame_lpr.on_lpr_complete(track_id, plate_number, confidence)
                             else:
                                 print(f"  ⚠ 未提交识别任务（可能因频率限制或ROI质量不足）")
                     else:
                         # 等待最佳帧
-                        print(f"  ⏳ 等待最佳帧出现... (当前帧数: {self.best_frame_lpr.track_queue.get(track_id, TrackInfo()).frame_count if track_id in self.best_frame_lpr.track_queue else 0})")
+                        info = self.best_frame_lpr.track_queue.get(track_id)
+                        print(f"  ⏳ 等待最佳帧出现... (当前帧数: {info.frame_count if info else 0})")
                         submitted = False  # 未触发识别
                 else:
                     # 原有逻辑（不使用最佳帧选择器）
-                    submitted = self.async_lpr.submit_recognition(track_id, vehicle_roi_bgr, class_name or 'car')
+                    vehicle_roi_bgr = self.frame_ring.crop(frame_seq, bbox, convert=cv2.COLOR_RGB2BGR)
+                    quality = roi_quality.total if roi_quality else calculate_frame_quality(bbox, 0.0, frame_shape)
+                    submitted = vehicle_roi_bgr is not None and self.async_lpr.submit_recognition(
+                        track_id, vehicle_roi_bgr, class_name or 'car', priority=quality)
                 
                 if submitted:
                     print(f"  📤 已提交车牌识别任务（异步）")
@@ -2163,14 +1994,21 @@ class RealtimeVehicleDetection:
         elif self.lpr_detector:
             # 回退到同步处理（旧方法）
             print(f"  ⚠ 使用同步LPR处理（异步处理器未初始化）")
-            # 裁剪车辆区域
-            vehicle_roi = image[int(y1):int(y2), int(x1):int(x2)]
-            print(f"  📐 车辆ROI尺寸: {vehicle_roi.shape}")
+            print(f"  📐 车辆ROI尺寸: ({roi_h}, {roi_w})")
             
-            if vehicle_roi.size > 0 and vehicle_roi.shape[0] > 20 and vehicle_roi.shape[1] > 20:
+            if roi_h > 20 and roi_w > 20:
                 try:
-                    # 转换为BGR（HyperLPR需要BGR）
-                    vehicle_roi_bgr = cv2.cvtColor(vehicle_roi, cv2.COLOR_RGB2BGR)
+                    # 裁剪车辆区域并转换为BGR（HyperLPR需要BGR）：有最佳帧选择器时取其最佳帧，帧已被丢弃时用当前帧
+                    vehicle_roi_bgr = None
+                    if self.best_frame_lpr:
+                        roi_quality = self.roi_quality.get(track_id, frame_seq)
+                        quality = roi_quality.total if roi_quality else calculate_frame_quality(bbox, 0.0, frame_shape)
+                        self.best_frame_lpr.update(track_id, frame_seq, bbox, quality)
+                        vehicle_roi_bgr, _ = self.best_frame_lpr.take_best_roi(track_id)
+                    if vehicle_roi_bgr is None:
+                        vehicle_roi_bgr = self.frame_ring.crop(frame_seq, bbox, convert=cv2.COLOR_RGB2BGR)
+                    if vehicle_roi_bgr is None:
+                        raise ValueError(f"帧 {frame_seq} 已不在缓冲区")
                     
                     # 图像预处理：大幅提升车牌识别性能
                     # 1. 提高最小尺寸以改善识别率
@@ -2366,10 +2204,9 @@ class RealtimeVehicleDetection:
                         
                         # 从云端获取最新白名单
                         if self.cloud_whitelist_manager.fetch_whitelist():
-                            # 更新BeaconFilter中的白名单（强制刷新）
-                            if self.beacon_filter:
+                            # 无变化（304/空增量）时不做任何处理；有变化时BeaconFilter只应用变化的条目
+                            if self.cloud_whitelist_manager.last_changed_count and self.beacon_filter:
                                 self.beacon_filter.refresh_whitelist(force_update=False)  # 已经fetch了，不需要再次fetch
-                            print(f"  ✅ 白名单已自动更新: {len(self.cloud_whitelist_manager.whitelist)} 个信标")
                         else:
                             print(f"  ⚠️  白名单自动更新失败，使用缓存数据")
                     except Exception as e:
@@ -2390,6 +2227,10 @@ class RealtimeVehicleDetection:
         fps_frame_count = 0
         
         alerts_dict = {}  # {track_id: alert_info}
+        # track被移除后不会再出现，丢弃其当前报警（历史报警见self.alerts和检测数据库）并取消识别；
+        # 识别仍在排队/执行的社会车辆报警保留到结果融合（或超时），由apply_plate_results移除
+        self.track_events.subscribe(TRACK_REMOVED,
+                                    lambda track_id: release_track(self.async_lpr, alerts_dict, track_id))
         self.tracks = {}  # 初始化tracks字典，供stats回调使用
         
         # 更新统计信息回调函数（包含tracks信息）
@@ -2430,8 +2271,8 @@ class RealtimeVehicleDetection:
             )
             print("[硬件恢复] 硬件监控线程已启动")
         
-        # 启动网络监控线程
-        if self.network_recovery and self.beacon_client:
+        # 启动网络监控线程（BLE回放时不连接Cassia，无需监控）
+        if self.network_recovery and self.beacon_client and not self.ble_replay:
             network_monitor_thread = self.network_recovery.start_monitoring(
                 self.beacon_client,
                 daemon=True
@@ -2441,11 +2282,22 @@ class RealtimeVehicleDetection:
         try:
             consecutive_failures = 0
             max_consecutive_failures = 10
+            last_frame_seq = 0  # 已处理的最后一帧序号（避免重复处理同一相机帧）
+            # 帧等待策略（spin/block/block_timeout，新帧就绪即唤醒，无需固定sleep）
+            frame_wait_policy = create_frame_wait_policy(self.config.get_performance())
+            frame_source = self.depth_camera  # 硬件恢复会重建相机对象，此时序号从0重新开始
             
             while True:
-                # 从Orbbec相机获取帧
+                # 从Orbbec相机获取帧（等待采集线程发布新帧，已解码为RGB）
                 if self.depth_camera:
-                    frame = self.depth_camera.get_color_frame()
+                    if self.depth_camera is not frame_source:
+                        frame_source = self.depth_camera
+                        last_frame_seq = 0
+                        # 旧相机的帧序号不再有效，丢弃缓冲的帧和各track记录的最佳帧
+                        if self.best_frame_lpr:
+                            self.best_frame_lpr.clear_frames()
+                        self.frame_ring.clear()
+                    frame_seq, frame = frame_wait_policy.wait(self.depth_camera, last_frame_seq)
                     if frame is None:
                         consecutive_failures += 1
                         if consecutive_failures >= max_consecutive_failures:
@@ -2453,27 +2305,23 @@ class RealtimeVehicleDetection:
                             if self.hardware_recovery:
                                 self.hardware_recovery.recover_camera()
                             consecutive_failures = 0
-                        time.sleep(0.1)  # 失败时等待更长时间
+                        # 等待策略内部已阻塞/超时，无需额外sleep
                         continue
                     else:
                         consecutive_failures = 0  # 重置失败计数
+                        last_frame_seq = frame_seq
+                        self.current_frame_seq = frame_seq
+                        # 放入共享帧缓冲区（采集线程每帧发布新数组，这里只保存引用），需要像素时按帧序号裁剪
+                        self.frame_ring.put(frame_seq, frame)
                     
                     # 保存帧到共享缓冲区（供录制脚本使用）
                     if self.enable_frame_sharing:
                         try:
                             np.save(self.shared_frame_file, frame)
-                            # 同时保存深度帧（如果可用）
-                            with self.depth_camera.depth_lock:
-                                if self.depth_camera.depth_frame is not None:
-                                    depth_frame = self.depth_camera.depth_frame
-                                    width = depth_frame.get_width()
-                                    height = depth_frame.get_height()
-                                    depth_data = np.frombuffer(
-                                        depth_frame.get_data(),
-                                        dtype=np.uint16
-                                    )
-                                    depth_image = depth_data.reshape((height, width))
-                                    np.save(self.shared_depth_file, depth_image)
+                            # 同时保存与该彩色帧时间同步的深度帧（如果可用）
+                            depth_image = self.depth_camera.get_depth_image(frame_seq)
+                            if depth_image is not None:
+                                np.save(self.shared_depth_file, depth_image)
                         except Exception as e:
                             pass  # 忽略保存错误，不影响主程序运行
                 else:
@@ -2554,22 +2402,38 @@ class RealtimeVehicleDetection:
                 # 更新self.tracks供stats回调使用
                 self.tracks = tracks
                 
-                # Phase 1 & 2优化：清理已结束track的状态
-                if self.beacon_match_tracker or self.depth_smoother or self.best_frame_lpr or self.loitering_detector:
-                    active_track_ids = set(tracks.keys())
-                    if self.beacon_match_tracker:
-                        self.beacon_match_tracker.cleanup(active_track_ids)
-                    if self.depth_smoother:
-                        # 清理深度平滑器中已结束的track
-                        expired_tracks = set(self.depth_smoother.track_depths.keys()) - active_track_ids
-                        for track_id in expired_tracks:
-                            self.depth_smoother.reset(track_id)
-                    if self.best_frame_lpr:
-                        # 清理最佳帧选择器中已结束的track
-                        self.best_frame_lpr.cleanup(active_track_ids)
-                    if self.loitering_detector:
-                        # 清理徘徊检测器中已结束的track
-                        self.loitering_detector.cleanup(active_track_ids)
+                # 已结束track的状态由跟踪器在update中发布removed事件清理（见__init__中的订阅）
+                
+                # 本帧所有track的bbox一次向量化缩放到原图（ByteTrack直接按槽位切片状态存储）
+                h, w = frame.shape[:2]
+                input_h, input_w = self.inference.input_shape[2], self.inference.input_shape[3]
+                frame_track_ids, frame_bboxes, frame_scores = track_arrays(tracks)
+                frame_bboxes *= (w / input_w, h / input_h, w / input_w, h / input_h)
+                
+                # Phase 2优化: 本帧所有车辆一次性更新徘徊检测器（位置历史 + 占用网格）
+                if self.loitering_detector:
+                    now = time.time()
+                    self.loitering_detector.update_arrays(frame_track_ids, frame_bboxes, frame.shape, now)
+                    if self.heatmap_path and now - self.last_heatmap_save >= self.heatmap_save_interval:
+                        self.last_heatmap_save = now
+                        try:
+                            self.loitering_detector.save_heatmap(self.heatmap_path)
+                        except OSError as e:
+                            print(f"⚠ 保存热力图失败: {e}")
+                
+                # 本帧所有track的ROI质量一次批量计算（整帧缩小转灰度一次），
+                # 最佳帧选取、识别优先级和清晰度门限按(track, 帧序号)读取同一分数
+                if self.async_lpr and tracks:
+                    # 平滑深度按列从状态存储读取（无状态存储时逐个查询深度平滑器）
+                    frame_depths = track_depths(tracks, getattr(self.depth_smoother, 'get_smoothed', None))
+                    self.roi_quality.score_frame(self.current_frame_seq, frame, {
+                        track_id: (
+                            frame_bboxes[i],
+                            frame_scores[i],
+                            None if np.isnan(frame_depths[i]) else float(frame_depths[i])
+                        )
+                        for i, track_id in enumerate(frame_track_ids)
+                    })
                 
                 # 处理新车辆（支持多目标匹配）
                 new_construction_vehicles = []  # 收集新的工程车辆
@@ -2596,7 +2460,8 @@ class RealtimeVehicleDetection:
                 except: pass
                 # #endregion
                 
-                for track_id, track in tracks.items():
+                # tracks与track_arrays同序迭代，第i个track的原图bbox即frame_bboxes[i]
+                for i, (track_id, track) in enumerate(tracks.items()):
                     # #region agent log
                     try:
                         import json
@@ -2618,6 +2483,13 @@ class RealtimeVehicleDetection:
                             }) + '\n')
                     except: pass
                     # #endregion
+                    # 社会车辆融合结果确定前，按频率限制继续提交新的ROI参与多帧投票
+                    if self.async_lpr and awaiting_plate(self.async_lpr, track_id, alerts_dict.get(track_id)):
+                        submit_track_roi(self.async_lpr, track_id, self.frame_ring, self.current_frame_seq,
+                                         frame_bboxes[i], CUSTOM_CLASSES.get(track['class'], 'unknown'),
+                                         self.roi_quality.get(track_id, self.current_frame_seq),
+                                         frame_scores[i], best_frame=self.best_frame_lpr)
+                        continue
                     if not track['processed'] and track_id not in alerts_dict:
                         class_name = CUSTOM_CLASSES.get(track['class'], 'unknown')
                         vehicle_type = VEHICLE_CLASSES.get(class_name, 'construction')  # 默认工程车辆
@@ -2642,16 +2514,8 @@ class RealtimeVehicleDetection:
                         except: pass
                         # #endregion
                         
-                        # 缩放bbox到原图
-                        h, w = frame.shape[:2]
-                        input_h, input_w = self.inference.input_shape[2], self.inference.input_shape[3]
-                        bbox = track['bbox']
-                        bbox_scaled = [
-                            bbox[0] * w / input_w,
-                            bbox[1] * h / input_h,
-                            bbox[2] * w / input_w,
-                            bbox[3] * h / input_h
-                        ]
+                        # 原图bbox（本帧已向量化缩放）
+                        bbox_scaled = frame_bboxes[i].tolist()
                         
                         # 获取检测置信度
                         detection_confidence = track.get('confidence', track.get('score', 0.0))
@@ -2727,7 +2591,7 @@ class RealtimeVehicleDetection:
                                 'track_id': track_id,
                                 'bbox': bbox_scaled,
                                 'class_name': class_name,
-                                'image': frame,
+                                'frame_seq': self.current_frame_seq,  # 快照按需从帧缓冲区裁剪，不持有整帧
                                 'confidence': detection_confidence  # 添加检测置信度
                             })
                             # 标记为已处理，避免在单次循环中重复处理
@@ -2738,11 +2602,11 @@ class RealtimeVehicleDetection:
                         else:
                             # 社会车辆：提交异步识别任务
                             if self.async_lpr:
-                                vehicle_roi = frame[int(bbox_scaled[1]):int(bbox_scaled[3]), 
-                                                   int(bbox_scaled[0]):int(bbox_scaled[2])]
-                                if vehicle_roi.size > 0:
-                                    vehicle_roi_bgr = cv2.cvtColor(vehicle_roi, cv2.COLOR_RGB2BGR)
-                                    self.async_lpr.submit_recognition(track_id, vehicle_roi_bgr, class_name)
+                                submit_track_roi(self.async_lpr, track_id, self.frame_ring, self.current_frame_seq,
+                                                 bbox_scaled, class_name,
+                                                 self.roi_quality.get(track_id, self.current_frame_seq),
+                                                 track.get('confidence', track.get('score', 0.0)),
+                                                 best_frame=self.best_frame_lpr)
                                 
                                 # 创建初始alert（车牌号稍后更新）
                                 # 获取检测置信度（从track中获取，ByteTracker使用'score'，VehicleTracker使用'confidence'）
@@ -2759,72 +2623,33 @@ class RealtimeVehicleDetection:
                                     'color': COLORS['civilian']
                                 }
                                 alerts_dict[track_id] = alert
-                                self.alerts.append(alert)
-                                # 保存到数据库
-                                if self.detection_db:
-                                    try:
-                                        detection_data = {
-                                            'timestamp': datetime.now().isoformat(),
-                                            'track_id': alert.get('track_id'),
-                                            'type': alert.get('type'),
-                                            'detected_class': class_name,
-                                            'status': alert.get('status'),
-                                            'plate_number': alert.get('plate'),
-                                            'distance': None,
-                                            'confidence': alert.get('confidence', 0.0),  # 使用alert中的检测置信度
-                                            'bbox': bbox_scaled,
-                                            'snapshot_path': None,
-                                            'metadata': {}
-                                        }
-                                        record_id = self.detection_db.insert_detection(detection_data)
-                                        alert['db_id'] = record_id
-                                    except Exception as e:
-                                        print(f"⚠ 保存检测结果到数据库失败: {e}")
-                                    # 保存快照并上传到云端
-                                    self._save_snapshot_and_upload(alert, frame, bbox_scaled)
-                                    # 上传成功后才记录到recent_alerts，避免后续被误判为重复
-                                    current_time = time.time()
-                                    self.recent_alerts.append((track_id, bbox_scaled, current_time, class_name))
+                                self.alerts.add(alert)
+                                # 保存快照并投递（数据库、云端、报警日志、事件流）
+                                self._publish_alert(alert, self.current_frame_seq, bbox_scaled)
+                                # 投递后才记录到recent_alerts，避免后续被误判为重复
+                                current_time = time.time()
+                                self.recent_alerts.add(track_id, bbox_scaled, current_time, class_name)
                             else:
                                 # 无异步处理器，使用同步处理
                                 # 获取检测置信度（从track中获取，ByteTracker使用'score'，VehicleTracker使用'confidence'）
                                 detection_confidence = track.get('confidence', track.get('score', 0.0))
-                                alert = self.process_new_vehicle(track_id, vehicle_type, bbox_scaled, frame, class_name=class_name, detection_confidence=detection_confidence)
+                                alert = self.process_new_vehicle(track_id, vehicle_type, bbox_scaled, self.current_frame_seq, class_name=class_name, detection_confidence=detection_confidence)
                                 if alert:
                                     alerts_dict[track_id] = alert
-                                    self.alerts.append(alert)
-                                    # 保存快照并上传到云端
-                                    self._save_snapshot_and_upload(alert, frame, bbox_scaled)
+                                    self.alerts.add(alert)
+                                    # 保存快照并投递（数据库、云端、报警日志、事件流）
+                                    self._publish_alert(alert, self.current_frame_seq, bbox_scaled)
                                     # 上传成功后才记录到recent_alerts，避免后续被误判为重复
                                     current_time = time.time()
-                                    self.recent_alerts.append((track_id, bbox_scaled, current_time, class_name))
+                                    self.recent_alerts.add(track_id, bbox_scaled, current_time, class_name)
                             
                             # 标记为已处理
                             if hasattr(self.tracker, 'mark_processed'):
                                 self.tracker.mark_processed(track_id)
                 
-                # 检查异步LPR结果并更新alerts
+                # 检查异步LPR（融合）结果并更新alerts
                 if self.async_lpr:
-                    for track_id in list(alerts_dict.keys()):
-                        alert = alerts_dict.get(track_id)
-                        if alert and alert.get('type') == 'civilian' and alert.get('status') == 'identifying':
-                            plate_number, confidence = self.async_lpr.get_result(track_id)
-                            if plate_number:
-                                # Phase 2优化: 更新最佳帧选择器状态
-                                if self.best_frame_lpr:
-                                    self.best_frame_lpr.on_lpr_complete(track_id, plate_number, confidence)
-                                # 更新alert
-                                alert['status'] = 'identified'
-                                alert['plate'] = plate_number
-                                alert['message'] = f"社会车辆 {plate_number}"
-                                print(f"  ✅ Track#{track_id} 车牌识别完成: {plate_number}")
-                            elif plate_number is None and confidence is None:
-                                # 任务还在执行中，继续等待
-                                pass
-                            else:
-                                # 识别失败
-                                alert['status'] = 'failed'
-                                alert['message'] = f"社会车辆（未识别车牌）"
+                    apply_plate_results(self.async_lpr, alerts_dict, self.alerts, self.best_frame_lpr)
                 
                 # 批量处理工程车辆（使用多目标匹配）
                 # #region agent log
@@ -2875,12 +2700,12 @@ class RealtimeVehicleDetection:
                             distance = None
                             if self.depth_camera:
                                 distance, _ = self.depth_camera.get_depth_at_bbox_bottom_robust(
-                                    vehicle['bbox'], window_size=5, outlier_threshold=2.0
+                                    vehicle['bbox'], window_size=5, outlier_threshold=2.0, frame_seq=self.current_frame_seq
                                 )
                                 if distance is None:
                                     depth_method = self.depth_config.get('method', 'median')
                                     distance, _ = self.depth_camera.get_depth_region_stats(
-                                        vehicle['bbox'], method=depth_method
+                                        vehicle['bbox'], method=depth_method, frame_seq=self.current_frame_seq
                                     )
                             
                             vehicles_info.append({
@@ -2892,6 +2717,19 @@ class RealtimeVehicleDetection:
                         
                         # 使用多目标匹配
                         if len(new_construction_vehicles) > 1:
+                            # 深度时间平滑：本帧所有车辆一次向量化更新
+                            if self.depth_smoother and hasattr(self.depth_smoother, 'update_batch'):
+                                smoothed_depths = self.depth_smoother.update_batch(
+                                    [v['track_id'] for v in vehicles_info],
+                                    [v['camera_depth'] for v in vehicles_info]
+                                )
+                                for v, smoothed in zip(vehicles_info, smoothed_depths):
+                                    if not np.isnan(smoothed):
+                                        v['camera_depth'] = float(smoothed)
+                                if self.track_store is not None:
+                                    self.track_store.write_batch('depth', [v['track_id'] for v in vehicles_info],
+                                                                 smoothed_depths)
+                            
                             # 多个车辆，使用多目标匹配
                             print(f"\n  🔍 [匹配] 开始多目标匹配: {len(new_construction_vehicles)} 辆车, {len(all_beacons)} 个信标")
                             match_results = self.beacon_filter.match_multiple_targets(
@@ -2961,7 +2799,7 @@ class RealtimeVehicleDetection:
                                     alert = self._create_construction_alert(
                                         vehicle['track_id'],
                                         vehicle['bbox'],
-                                        vehicle['image'],
+                                        vehicle['frame_seq'],
                                         vehicle['class_name'],
                                         match_result['beacon_info'],
                                         match_result['cost'],
@@ -2992,7 +2830,7 @@ class RealtimeVehicleDetection:
                                     alert = self._create_construction_alert(
                                         vehicle['track_id'],
                                         vehicle['bbox'],
-                                        vehicle['image'],
+                                        vehicle['frame_seq'],
                                         vehicle['class_name'],
                                         None,  # 无信标信息
                                         None,  # match_cost
@@ -3001,38 +2839,12 @@ class RealtimeVehicleDetection:
                                 
                                 if alert:
                                     alerts_dict[vehicle['track_id']] = alert
-                                    self.alerts.append(alert)
-                                    # 保存到数据库
-                                    if self.detection_db:
-                                        try:
-                                            detection_data = {
-                                                'timestamp': datetime.now().isoformat(),
-                                                'track_id': alert.get('track_id'),
-                                                'type': alert.get('type'),
-                                                'detected_class': vehicle['class_name'],
-                                                'status': alert.get('status'),
-                                                'beacon_mac': alert.get('beacon_mac'),
-                                                'plate_number': alert.get('plate_number'),
-                                                'company': alert.get('company'),
-                                                'distance': alert.get('distance'),
-                                                'confidence': alert.get('confidence', 0.0),
-                                                'bbox': vehicle['bbox'],
-                                                'snapshot_path': None,  # 将在_save_snapshot_and_upload中更新
-                                                'metadata': {
-                                                    'rssi': alert.get('rssi'),
-                                                    'match_cost': alert.get('match_cost')
-                                                }
-                                            }
-                                            record_id = self.detection_db.insert_detection(detection_data)
-                                            # 更新alert中的数据库ID（如果需要）
-                                            alert['db_id'] = record_id
-                                        except Exception as e:
-                                            print(f"⚠ 保存检测结果到数据库失败: {e}")
-                                    # 保存快照并上传到云端
-                                    self._save_snapshot_and_upload(alert, frame, vehicle['bbox'])
+                                    self.alerts.add(alert)
+                                    # 保存快照并投递（数据库、云端、报警日志、事件流）
+                                    self._publish_alert(alert, vehicle['frame_seq'], vehicle['bbox'])
                                     # 上传成功后才记录到recent_alerts，避免后续被误判为重复
                                     current_time = time.time()
-                                    self.recent_alerts.append((vehicle['track_id'], vehicle['bbox'], current_time, vehicle['class_name']))
+                                    self.recent_alerts.add(vehicle['track_id'], vehicle['bbox'], current_time, vehicle['class_name'])
                         else:
                             # 单个车辆，使用单目标匹配
                             vehicle = new_construction_vehicles[0]
@@ -3053,70 +2865,18 @@ class RealtimeVehicleDetection:
                                 alert = self.check_construction_vehicle(
                                     vehicle['track_id'],
                                     vehicle['bbox'],
-                                    vehicle['image'],
+                                    vehicle['frame_seq'],
                                     detected_class=vehicle['class_name'],
                                     detection_confidence=vehicle.get('confidence', 0.0)  # 传递检测置信度
                                 )
                                 if alert:
                                     alerts_dict[vehicle['track_id']] = alert
-                                    self.alerts.append(alert)
-                                    # 保存到数据库
-                                    if self.detection_db:
-                                        try:
-                                            detection_data = {
-                                                'timestamp': datetime.now().isoformat(),
-                                                'track_id': alert.get('track_id'),
-                                                'type': alert.get('type'),
-                                                'detected_class': vehicle['class_name'],
-                                                'status': alert.get('status'),
-                                                'beacon_mac': alert.get('beacon_mac'),
-                                                'plate_number': alert.get('plate_number'),
-                                                'company': alert.get('company'),
-                                                'distance': alert.get('distance'),
-                                                'confidence': alert.get('confidence', 0.0),
-                                                'bbox': vehicle['bbox'],
-                                                'snapshot_path': None,
-                                                'metadata': {
-                                                    'rssi': alert.get('rssi'),
-                                                    'match_cost': alert.get('match_cost')
-                                                }
-                                            }
-                                            record_id = self.detection_db.insert_detection(detection_data)
-                                            alert['db_id'] = record_id
-                                        except Exception as e:
-                                            print(f"⚠ 保存检测结果到数据库失败: {e}")
-                                    # 保存快照并上传到云端
-                                    self._save_snapshot_and_upload(alert, frame, vehicle['bbox'])
+                                    self.alerts.add(alert)
+                                    # 保存快照并投递（数据库、云端、报警日志、事件流）
+                                    self._publish_alert(alert, vehicle['frame_seq'], vehicle['bbox'])
                                     # 上传成功后才记录到recent_alerts，避免后续被误判为重复
                                     current_time = time.time()
-                                    self.recent_alerts.append((vehicle['track_id'], vehicle['bbox'], current_time, vehicle['class_name']))
-                                # 保存到数据库
-                                if self.detection_db:
-                                    try:
-                                        detection_data = {
-                                            'timestamp': datetime.now().isoformat(),
-                                            'track_id': alert.get('track_id'),
-                                            'type': alert.get('type'),
-                                            'detected_class': vehicle['class_name'],
-                                            'status': alert.get('status'),
-                                            'beacon_mac': alert.get('beacon_mac'),
-                                            'plate_number': alert.get('plate_number'),
-                                            'company': alert.get('company'),
-                                            'distance': alert.get('distance'),
-                                            'confidence': alert.get('confidence', 0.0),
-                                            'bbox': vehicle['bbox'],
-                                            'snapshot_path': None,
-                                            'metadata': {
-                                                'rssi': alert.get('rssi'),
-                                                'match_cost': alert.get('match_cost')
-                                            }
-                                        }
-                                        record_id = self.detection_db.insert_detection(detection_data)
-                                        alert['db_id'] = record_id
-                                    except Exception as e:
-                                        print(f"⚠ 保存检测结果到数据库失败: {e}")
-                                # 保存快照并上传到云端
-                                self._save_snapshot_and_upload(alert, frame, vehicle['bbox'])
+                                    self.recent_alerts.add(vehicle['track_id'], vehicle['bbox'], current_time, vehicle['class_name'])
                         
                         # 标记所有工程车辆为已处理
                         for vehicle in new_construction_vehicles:
@@ -3137,42 +2897,17 @@ class RealtimeVehicleDetection:
                         alert = self.check_construction_vehicle(
                             vehicle['track_id'],
                             vehicle['bbox'],
-                            vehicle['image'],
+                            vehicle['frame_seq'],
                             detected_class=vehicle['class_name']
                         )
                         if alert:
                             alerts_dict[vehicle['track_id']] = alert
-                            self.alerts.append(alert)
-                            # 保存到数据库
-                            if self.detection_db:
-                                try:
-                                    detection_data = {
-                                        'timestamp': datetime.now().isoformat(),
-                                        'track_id': alert.get('track_id'),
-                                        'type': alert.get('type'),
-                                        'detected_class': vehicle['class_name'],
-                                        'status': alert.get('status'),
-                                        'beacon_mac': alert.get('beacon_mac'),
-                                        'plate_number': alert.get('plate_number'),
-                                        'company': alert.get('company'),
-                                        'distance': alert.get('distance'),
-                                        'confidence': alert.get('confidence', 0.0),
-                                        'bbox': vehicle['bbox'],
-                                        'snapshot_path': None,
-                                        'metadata': {
-                                            'rssi': alert.get('rssi'),
-                                            'match_cost': alert.get('match_cost')
-                                        }
-                                    }
-                                    record_id = self.detection_db.insert_detection(detection_data)
-                                    alert['db_id'] = record_id
-                                except Exception as e:
-                                    print(f"⚠ 保存检测结果到数据库失败: {e}")
-                            # 保存快照并上传到云端
-                            self._save_snapshot_and_upload(alert, frame, vehicle['bbox'])
+                            self.alerts.add(alert)
+                            # 保存快照并投递（数据库、云端、报警日志、事件流）
+                            self._publish_alert(alert, vehicle['frame_seq'], vehicle['bbox'])
                             # 上传成功后才记录到recent_alerts，避免后续被误判为重复
                             current_time = time.time()
-                            self.recent_alerts.append((vehicle['track_id'], vehicle['bbox'], current_time, vehicle['class_name']))
+                            self.recent_alerts.add(vehicle['track_id'], vehicle['bbox'], current_time, vehicle['class_name'])
                         if hasattr(self.tracker, 'mark_processed'):
                             self.tracker.mark_processed(vehicle['track_id'])
                         else:
@@ -3211,9 +2946,7 @@ class RealtimeVehicleDetection:
                     key = cv2.waitKey(display_cfg['wait_key_ms']) & 0xFF
                     if key == ord('q'):
                         break
-                else:
-                    # 无头模式：短暂等待，检查中断
-                    time.sleep(0.01)
+                # 无头模式：下一轮由帧等待策略阻塞到新帧到达，不再固定sleep
         
         except KeyboardInterrupt:
             print("\n中断检测...")
@@ -3230,6 +2963,8 @@ class RealtimeVehicleDetection:
                 self.depth_camera.stop()
             if self.beacon_client:
                 self.beacon_client.stop()  # 正确的方法名
+            if self.ble_recorder:
+                self.ble_recorder.close()
             
             # 打印统计
             print("\n" + "="*70)
@@ -3238,14 +2973,43 @@ class RealtimeVehicleDetection:
             print(f"总帧数: {self.frame_count}")
             print(f"总报警: {len(self.alerts)}")
             
-            construction_registered = sum(1 for a in self.alerts if a['type'] == 'construction' and a['status'] == 'registered')
-            construction_unregistered = sum(1 for a in self.alerts if a['type'] == 'construction' and a['status'] == 'unregistered')
-            civilian = sum(1 for a in self.alerts if a['type'] == 'civilian')
+            construction_registered = self.alerts.count('construction', 'registered')
+            construction_unregistered = self.alerts.count('construction', 'unregistered')
+            civilian = sum(self.alerts.count(alert_type) for alert_type in CIVILIAN_ALERT_TYPES)
             
             print(f"\n车辆统计:")
             print(f"  已备案工程车辆: {construction_registered}")
             print(f"  未备案工程车辆: {construction_unregistered}")
             print(f"  社会车辆: {civilian}")
+            
+            if self.async_lpr and self.async_lpr.fusion is not None:
+                fusion_stats = self.async_lpr.fusion.get_stats()
+                print(f"\n车牌融合: {fusion_stats['settled']} 辆车结果确定（提前终止 {fusion_stats['early_stops']}），"
+                      f"平均每辆 {fusion_stats['readings_per_settled']:.1f} 次识别")
+            
+            if self.depth_camera is not None:
+                sync_stats = self.depth_camera.get_sync_stats()
+                print(f"\n深度帧同步: 配对 {sync_stats['synced']} 次, 超出时间差 {sync_stats['skew_rejected']} 次, "
+                      f"彩色帧时间戳已淘汰 {sync_stats['color_evicted']} 次")
+
+            ring_stats = self.frame_ring.get_stats()
+            print(f"\n共享帧缓冲区: 缓存 {ring_stats['frames']} 帧, 被引用保留 {ring_stats['pinned']} 帧 "
+                  f"({ring_stats['pinned_bytes'] / 1024 / 1024:.1f} MB), 裁剪 {ring_stats['crops']} 次, "
+                  f"帧已丢弃 {ring_stats['misses']} 次, 超出内存上限丢弃 {ring_stats['dropped_pinned']} 帧")
+
+            event_stats = self.track_events.get_stats()
+            print(f"\n跟踪生命周期事件: 创建 {event_stats['created']}, 确认 {event_stats['confirmed']}, "
+                  f"丢失 {event_stats['lost']}, 移除 {event_stats['removed']}")
+
+            cache_stats = self.async_lpr.get_cache_stats() if self.async_lpr else {}
+            if self.best_frame_lpr:
+                cache_stats['最佳帧识别结果'] = self.best_frame_lpr.recognition_results.get_stats()
+            if cache_stats:
+                print(f"\nLPR缓存:")
+                for name, stats in cache_stats.items():
+                    print(f"  {name}: {stats['size']}/{stats['capacity']} 条, 命中率 {stats['hit_rate']:.1%} "
+                          f"({stats['hits']}/{stats['hits'] + stats['misses']}), "
+                          f"淘汰 {stats['evictions']}, 过期 {stats['expirations']}")
             print("="*70)
 
 
@@ -3263,6 +3027,10 @@ def main():
                         help='禁用深度相机')
     parser.add_argument('--no-display', action='store_true',
                         help='禁用显示（无头模式，适合SSH远程运行）')
+    parser.add_argument('--ble-replay', type=str, default=None,
+                        help='BLE扫描录制文件（用回放代替Cassia实时扫描）')
+    parser.add_argument('--ble-replay-speed', type=float, default=1.0,
+                        help='BLE扫描回放倍速（默认1.0实时）')
     
     args = parser.parse_args()
     
@@ -3273,7 +3041,9 @@ def main():
         cassia_router_ip=args.cassia_ip,
         use_depth=not args.no_depth,
         camera_id=args.camera_id,
-        no_display=args.no_display
+        no_display=args.no_display,
+        ble_replay=args.ble_replay,
+        ble_replay_speed=args.ble_replay_speed
     )
     
     # 检查引擎文件
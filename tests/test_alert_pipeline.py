@@ -0,0 +1,636 @@
+"""
+警报链路测试脚本
+
+测试内容：
+1. 警报去重索引规则 - 验证同一track、类别区分、位置/时间窗口及整桶过期
+2. 去重索引与原线性扫描一致性 - 随机警报序列上逐次比对判定结果
+3. 去重索引性能 - 数千条最近警报下与线性扫描的单次查询耗时对比
+4. 徘徊检测占用网格 - 批量更新、定长历史、按网格单元加IoU的位置去重及按配置路径读取的热力图API
+5. 跟踪生命周期事件 - 跟踪器发布created/confirmed/lost/removed，订阅模块按事件清理状态
+6. 按track的结构数组状态存储 - 稳定槽位、扩容、与原track字典兼容的视图及向量化读取（含深度列）
+7. 有界报警历史 - 环形缓冲定长、累计计数与完整列表一致、更早记录从检测数据库查询
+8. 报警事件扇出投递 - AlertEvent只序列化一次，投递到数据库、云端队列、报警日志和API事件流（按配置路径读取、stream_id标识重启）
+"""
+
+import sys
+import os
+import json
+import random
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_apps'))
+
+from alert_dedup import AlertDedupIndex, bbox_iou, create_alert_dedup_index
+from alert_event import AlertEvent, EventStreamTarget, create_alert_sink
+from alert_history import create_alert_history
+from loitering_detector import LoiteringDetector
+from api_server import APIServer
+from beacon_match_tracker import BeaconMatchTracker
+from byte_tracker import ByteTracker
+from depth_smoothing import MultiTrackDepthSmoother
+from detection_database import DetectionDatabase
+from track_events import (TRACK_CONFIRMED, TRACK_CREATED, TRACK_LOST, TRACK_REMOVED,
+                          TrackEventBus)
+from track_state_store import TrackStateStore, TrackTable, track_arrays, track_depths
+
+
+class _LinearDedup:
+    """原实现：每次重建列表并逐条计算IoU（用于对照）"""
+
+    def __init__(self, time_window=30.0, position_time_window=10.0, iou_threshold=0.5):
+        self.time_window = time_window
+        self.position_time_window = position_time_window
+        self.iou_threshold = iou_threshold
+        self.recent_alerts = []
+
+    def add(self, track_id, bbox, timestamp, class_name=None):
+        self.recent_alerts.append((track_id, bbox, timestamp, class_name))
+
+    def is_duplicate(self, track_id, bbox, current_time, class_name=None):
+        self.recent_alerts = [
+            (tid, b, t, cls) for tid, b, t, cls in self.recent_alerts
+            if current_time - t < self.time_window
+        ]
+        for existing_track_id, existing_bbox, existing_time, existing_class in self.recent_alerts:
+            if existing_track_id == track_id:
+                return True
+            if class_name and existing_class and class_name != existing_class:
+                continue
+            iou = bbox_iou(bbox, existing_bbox)
+            if iou > self.iou_threshold and current_time - existing_time < self.position_time_window:
+                return True
+        return False
+
+
+def _random_bbox(rng, width=1920, height=1080):
+    w = rng.uniform(80, 500)
+    h = rng.uniform(60, 400)
+    x1 = rng.uniform(0, width - w)
+    y1 = rng.uniform(0, height - h)
+    return [x1, y1, x1 + w, y1 + h]
+
+
+def _jitter(rng, bbox, amount=15.0):
+    return [v + rng.uniform(-amount, amount) for v in bbox]
+
+
+def test_1_dedup_rules():
+    """测试1: 警报去重索引规则"""
+    print("\n" + "="*60)
+    print("测试1: 警报去重索引规则")
+    print("="*60)
+
+    index = AlertDedupIndex(time_window=30.0, position_time_window=10.0, iou_threshold=0.5,
+                            cell_size=128.0, bucket_seconds=1.0)
+    box = [100, 100, 400, 300]
+    index.add(1, box, 1000.0, 'car')
+
+    # 同一track_id在时间窗口内始终视为重复（不论位置、类别）
+    entry, iou = index.find_duplicate(1, [1500, 800, 1600, 900], 1020.0, 'truck')
+    assert entry.track_id == 1 and iou == 1.0
+
+    # 跟踪ID切换：同类别位置重叠且时间接近
+    entry, iou = index.find_duplicate(2, [110, 105, 405, 310], 1005.0, 'car')
+    assert entry.track_id == 1 and iou > 0.5
+    # 类别不同不视为重复；未知类别与任何类别比较
+    assert not index.is_duplicate(3, [110, 105, 405, 310], 1005.0, 'truck')
+    assert index.is_duplicate(4, [110, 105, 405, 310], 1005.0, None)
+    # 重叠不足或超出位置检查窗口
+    assert not index.is_duplicate(5, [300, 100, 600, 300], 1005.0, 'car')
+    assert not index.is_duplicate(6, [110, 105, 405, 310], 1011.0, 'car')
+
+    # 无类别记录与任意类别的查询比较
+    index.add(7, [1000, 500, 1200, 700], 1001.5, None)
+    assert index.is_duplicate(8, [1005, 505, 1205, 705], 1003.0, 'excavator')
+
+    # 超过时间窗口后整桶丢弃
+    assert len(index) == 2
+    assert not index.is_duplicate(1, box, 1031.0, 'car')
+    assert len(index) == 1 and index.get_stats()['expired_buckets'] == 1
+    assert not index.is_duplicate(7, [1000, 500, 1200, 700], 1032.0, None)
+    assert len(index) == 0 and index.get_stats()['buckets'] == 0
+
+    # 配置创建
+    index = create_alert_dedup_index({'time_window': 5.0, 'iou_threshold': 0.3, 'cell_size': 64})
+    assert index.time_window == 5.0 and index.iou_threshold == 0.3 and index.cell_size == 64.0
+    assert index.position_time_window == 10.0
+
+    print("  ✅ 警报去重索引规则测试通过")
+    return True
+
+
+def test_2_dedup_matches_linear_scan():
+    """测试2: 去重索引与原线性扫描一致性"""
+    print("\n" + "="*60)
+    print("测试2: 去重索引与原线性扫描一致性")
+    print("="*60)
+
+    # 阈值<0.5时中心距离约束放宽，阈值<=0时退化为遍历全部网格
+    for threshold in (0.5, 0.3, 0.0):
+        rng = random.Random(7)
+        classes = ['car', 'truck', 'excavator', None]
+        index = AlertDedupIndex(time_window=30.0, position_time_window=10.0, iou_threshold=threshold,
+                                cell_size=128.0, bucket_seconds=1.0)
+        reference = _LinearDedup(30.0, 10.0, threshold)
+
+        now = 0.0
+        history = []
+        duplicates = 0
+        for step in range(3000):
+            now += rng.uniform(0.0, 0.2)
+            if history and rng.random() < 0.4:
+                # 复用旧位置（模拟跟踪ID切换）或旧track_id
+                old_track, old_box, old_class = rng.choice(history)
+                track_id = old_track if rng.random() < 0.3 else 100000 + step
+                bbox = _jitter(rng, old_box, 40.0)
+                class_name = old_class if rng.random() < 0.8 else rng.choice(classes)
+            else:
+                track_id = 100000 + step
+                bbox = _random_bbox(rng)
+                class_name = rng.choice(classes)
+
+            expected = reference.is_duplicate(track_id, bbox, now, class_name)
+            actual = index.is_duplicate(track_id, bbox, now, class_name)
+            assert actual == expected, f"阈值{threshold} 第{step}次判定不一致: 索引={actual} 线性={expected}"
+            if expected:
+                duplicates += 1
+            elif rng.random() < 0.7:
+                reference.add(track_id, bbox, now, class_name)
+                index.add(track_id, bbox, now, class_name)
+                history.append((track_id, bbox, class_name))
+
+        # 整桶过期：索引保留的记录数不少于线性实现（多出的只是尚未整桶丢弃的记录）
+        assert len(index) >= len(reference.recent_alerts)
+        assert duplicates > 100, "随机序列应包含足够多的重复"
+        stats = index.get_stats()
+        print(f"  阈值{threshold}: 3000次判定一致（重复 {duplicates} 次），"
+              f"候选 {stats['candidates_per_query']:.1f} 条/次")
+
+    print("  ✅ 去重索引一致性测试通过")
+    return True
+
+
+def test_3_dedup_benchmark():
+    """测试3: 去重索引性能"""
+    print("\n" + "="*60)
+    print("测试3: 去重索引性能")
+    print("="*60)
+
+    rng = random.Random(11)
+    classes = ['car', 'truck', 'excavator', 'dump-truck']
+    results = {}
+    for count in (1000, 5000):
+        index = AlertDedupIndex(time_window=600.0, position_time_window=600.0, iou_threshold=0.5)
+        reference = _LinearDedup(600.0, 600.0, 0.5)
+        # count条最近警报均匀分布在时间窗口内
+        for i in range(count):
+            bbox = _random_bbox(rng)
+            timestamp = i * (500.0 / count)
+            index.add(i, bbox, timestamp, classes[i % len(classes)])
+            reference.add(i, bbox, timestamp, classes[i % len(classes)])
+        queries = [(10**6 + i, _random_bbox(rng), classes[i % len(classes)]) for i in range(200)]
+        now = 500.0
+
+        start = time.perf_counter()
+        index_hits = [index.is_duplicate(tid, bbox, now, cls) for tid, bbox, cls in queries]
+        index_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+        start = time.perf_counter()
+        linear_hits = [reference.is_duplicate(tid, bbox, now, cls) for tid, bbox, cls in queries]
+        linear_us = (time.perf_counter() - start) / len(queries) * 1e6
+
+        assert index_hits == linear_hits
+        results[count] = (index_us, linear_us)
+        print(f"  {count} 条最近警报: 索引 {index_us:.1f} µs/次, 线性扫描 {linear_us:.1f} µs/次 "
+              f"(候选 {index.get_stats()['candidates_per_query']:.1f} 条/次)")
+
+    # 线性扫描随警报数线性增长，索引基本不变
+    index_small, linear_small = results[1000]
+    index_large, linear_large = results[5000]
+    assert index_large < linear_large / 5, "数千条警报时索引应明显快于线性扫描"
+    assert index_large < index_small * 4 + 50, "索引查询耗时不应随警报数线性增长"
+
+    print("  ✅ 去重索引性能测试通过")
+    return True
+
+
+def test_4_loitering_occupancy_grid():
+    """测试4: 徘徊检测占用网格"""
+    print("\n" + "="*60)
+    print("测试4: 徘徊检测占用网格")
+    print("="*60)
+
+    detector = LoiteringDetector(min_duration=5.0, min_area_ratio=0.03, min_movement_ratio=0.1,
+                                 grid_cols=64, grid_rows=36, heatmap_half_life=0.0,
+                                 position_dedup_time_window=60.0)
+    frame_shape = (1080, 1920, 3)
+    parked = (700, 300, 1220, 780)
+    start = 1000.0
+    # 停留车辆 + 横穿车辆 + 边缘小目标，每帧一次批量更新
+    for i in range(40):
+        detector.update_frame({
+            1: parked,
+            2: (100 + i * 40, 400, 300 + i * 40, 800),
+            3: (0, 0, 60, 40),
+        }, frame_shape, start + i * 0.5)
+    now = start + 20.0
+
+    assert detector.is_loitering(1, parked, now)
+    assert not detector.is_loitering(2, None, now), "移动距离大，不是徘徊"
+    assert not detector.is_loitering(3, None, now), "画面占比太小，不是徘徊"
+    # 定长历史：采样数增长但数组大小不变
+    assert detector.track_samples[1] == 40 and detector.track_history[1].shape == (detector.history_size, 3)
+
+    # 报警后同一位置换了track_id也不再报警；其他位置、超出时间窗口后不受影响
+    detector.mark_alerted(1, parked, now)
+    assert not detector.is_loitering(1, parked, now + 1)
+    # 车辆6的中心点落在已报警bbox内，但与其IoU仅约0.22，是另一辆车
+    nearby = (1000, 500, 1300, 800)
+    assert 0.2 < bbox_iou(parked, nearby) < 0.25
+    for i in range(12):
+        detector.update_frame({4: (720, 320, 1200, 760), 5: (1500, 600, 1900, 1060), 6: nearby},
+                              frame_shape, now + i * 0.5)
+    later = now + 6.0
+    assert not detector.is_loitering(4, (720, 320, 1200, 760), later), "已报警位置不应重复报警"
+    assert detector.is_loitering(5, (1500, 600, 1900, 1060), later)
+    assert detector.is_loitering(6, nearby, later), "已报警bbox内的其他车辆不应被抑制"
+    assert detector.is_loitering(4, (720, 320, 1200, 760), now + 61.0), "超出去重窗口后应可再次报警"
+
+    # 热力图：停留时间集中在停留车辆中心所在单元；各track累计时间之和守恒
+    heatmap = detector.get_heatmap()
+    cells = heatmap['cells']
+    row, col = detector.grid.cells((700 + 1220) / 2 / 1920, (300 + 780) / 2 / 1080)
+    assert cells[int(row)][int(col)] == 1.0
+    assert abs(float(detector.grid.dwell.sum()) - (3 * 39 * 0.5 + 3 * 11 * 0.5)) < 1e-3
+
+    detector.cleanup({5})
+    assert set(detector.track_enter_time) == {5} and heatmap['max_dwell'] > 0
+
+    # 热力图经API服务提供（读取检测程序定期写入的快照，路径与检测程序读取同一配置项）
+    with tempfile.TemporaryDirectory() as project_root:
+        with open(os.path.join(project_root, 'config.yaml'), 'w', encoding='utf-8') as f:
+            f.write("alert:\n  loitering:\n    heatmap:\n      path: data/heatmap.json\n")
+        detector.save_heatmap(os.path.join(project_root, 'data', 'heatmap.json'))
+        server = APIServer(host='127.0.0.1', port=0, project_root=project_root)
+        assert server.heatmap_path == os.path.join(project_root, 'data', 'heatmap.json')
+        server.start(daemon=True)
+        try:
+            port = server.server.server_address[1]
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/heatmap', timeout=5) as response:
+                served = json.loads(response.read().decode('utf-8'))
+        finally:
+            server.stop()
+            server.server.server_close()
+    assert served['rows'] == 36 and served['cols'] == 64
+    assert served['cells'][int(row)][int(col)] == 1.0 and served['age_seconds'] is not None
+    print(f"  热力图峰值单元停留 {heatmap['max_dwell']:.1f}s，API返回 {served['rows']}x{served['cols']} 网格")
+
+    print("  ✅ 徘徊检测占用网格测试通过")
+    return True
+
+
+def test_5_track_lifecycle_events():
+    """测试5: 跟踪生命周期事件"""
+    print("\n" + "="*60)
+    print("测试5: 跟踪生命周期事件")
+    print("="*60)
+
+    bus = TrackEventBus()
+    log = []
+    for event in (TRACK_CREATED, TRACK_CONFIRMED, TRACK_LOST, TRACK_REMOVED):
+        bus.subscribe(event, lambda track_id, event=event: log.append((event, track_id)))
+
+    # 订阅模块：只通过removed事件清理，不再每帧对全部状态做集合差
+    loitering = LoiteringDetector()
+    depth = MultiTrackDepthSmoother(capacity=8)
+    beacon = BeaconMatchTracker()
+    bus.subscribe(TRACK_REMOVED, loitering.reset)
+    bus.subscribe(TRACK_REMOVED, depth.reset)
+    bus.subscribe(TRACK_REMOVED, beacon.on_track_removed)
+    # 回调异常不影响跟踪器和其他订阅者
+    bus.subscribe(TRACK_LOST, lambda track_id: 1 / 0)
+
+    tracker = ByteTracker(track_thresh=0.3, high_thresh=0.5, match_thresh=0.8,
+                          track_buffer=30, confirm_hits=3, event_bus=bus)
+    box_a = [100.0, 100.0, 300.0, 250.0]
+    box_b = [800.0, 400.0, 1000.0, 600.0]
+
+    def step(frame_id, boxes):
+        tracks = tracker.update(np.array(boxes, dtype=np.float32).reshape(-1, 4),
+                                np.full(len(boxes), 0.9), np.zeros(len(boxes), dtype=int), frame_id)
+        for track_id, track in tracks.items():
+            loitering.update(track_id, track['bbox'], (1080, 1920, 3), 1000.0 + frame_id)
+            depth.update(track_id, 5.0)
+            beacon.update_match(track_id, 'AA:BB', 5.0, 0.1)
+        # 订阅模块的状态始终只包含跟踪器当前输出的track
+        assert set(loitering.track_enter_time) <= set(tracks) | {t.track_id for t in tracker.lost_stracks}
+        return tracks
+
+    for frame_id in range(1, 4):
+        tracks = step(frame_id, [box_a, box_b])
+    id_a, id_b = sorted(tracks)
+    assert log == [(TRACK_CREATED, id_a), (TRACK_CREATED, id_b),
+                   (TRACK_CONFIRMED, id_a), (TRACK_CONFIRMED, id_b)]
+
+    # b消失：本帧lost，下一帧（未重新匹配）removed，各模块只清理b
+    log.clear()
+    step(4, [box_a])
+    assert log == [(TRACK_LOST, id_b)] and bus.errors == 1
+    assert id_b in loitering.track_enter_time
+    step(5, [box_a])
+    assert log == [(TRACK_LOST, id_b), (TRACK_REMOVED, id_b)]
+    assert set(loitering.track_enter_time) == {id_a}
+    assert set(depth.slot_of) == {id_a} and set(beacon.track_matches) == {id_a}
+
+    # 全部消失
+    step(6, [])
+    step(7, [])
+    assert not loitering.track_enter_time and not depth.slot_of and not beacon.track_matches
+    stats = bus.get_stats()
+    assert stats[TRACK_CREATED] == 2 and stats[TRACK_REMOVED] == 2 and stats['subscribers'] == 8
+    print(f"  事件统计: {stats}")
+
+    # 取消订阅后不再回调
+    bus.unsubscribe(TRACK_REMOVED, loitering.reset)
+    assert bus.get_stats()['subscribers'] == 7
+    try:
+        bus.subscribe('unknown', print)
+        assert False, "未知事件应抛出ValueError"
+    except ValueError:
+        pass
+
+    print("  ✅ 跟踪生命周期事件测试通过")
+    return True
+
+
+def test_6_track_state_store():
+    """测试6: 按track的结构数组状态存储"""
+    print("\n" + "="*60)
+    print("测试6: 按track的结构数组状态存储")
+    print("="*60)
+
+    # 槽位分配、释放复用、扩容后槽位号不变
+    store = TrackStateStore(capacity=2)
+    assert [store.allocate(t) for t in (10, 11)] == [0, 1]
+    store.update(10, depth=4.5, processed=True)
+    assert store.allocate(12) == 2 and store.capacity == 4 and store.grows == 1
+    assert store.slot(10) == 0 and store.view(10)['depth'] == 4.5 and store.view(10)['processed'] is True
+    store.release(11)
+    assert store.allocate(13) == 1 and store.view(13)['depth'] is None, "复用的槽位应恢复初始值"
+    assert not store.update(99, depth=1.0), "未分配的track应被忽略"
+    assert store.write_batch('depth', [12, 99, 10], [7.0, 8.0, None]) == 2
+    assert store.view(12)['depth'] == 7.0 and store.view(10)['depth'] is None
+
+    # ByteTracker输出与原track字典字段一致，行视图按槽位复用
+    tracker = ByteTracker(track_thresh=0.3, high_thresh=0.5, match_thresh=0.8, track_buffer=30)
+    rng = np.random.default_rng(3)
+    base = np.array([[100, 100, 300, 250], [800, 400, 1000, 600], [1300, 200, 1500, 500]], dtype=np.float32)
+    views = {}
+    for frame_id in range(1, 30):
+        keep = [i for i in range(3) if not (i == 2 and 10 <= frame_id < 20)]
+        boxes = base[keep] + rng.uniform(-3, 3, (len(keep), 4)).astype(np.float32)
+        scores = rng.uniform(0.6, 0.95, len(keep))
+        tracks = tracker.update(boxes, scores, np.zeros(len(keep), dtype=int), frame_id)
+        assert isinstance(tracks, TrackTable) and len(tracks) == len(tracker.tracked_stracks)
+        for strack in tracker.tracked_stracks:
+            track = tracks[strack.track_id]
+            assert np.array_equal(track['bbox'], strack.bbox)
+            assert track['class'] == strack.class_id and track['score'] == strack.score
+            assert track.get('confidence', 0.0) == strack.score
+            assert track['hits'] == strack.hits and track['last_seen'] == frame_id
+            assert track['processed'] == strack.processed
+            if strack.track_id in views:
+                assert views[strack.track_id] is track, "同一track的视图应复用"
+            views[strack.track_id] = track
+
+        # 向量化读取与逐个读取一致；原字典格式走兼容路径
+        track_ids, bboxes, confidences = track_arrays(tracks)
+        as_dict = {tid: {'bbox': tracks[tid]['bbox'], 'score': tracks[tid]['score']} for tid in tracks}
+        dict_ids, dict_bboxes, dict_scores = track_arrays(as_dict)
+        assert track_ids == dict_ids and np.array_equal(bboxes, dict_bboxes) and np.array_equal(confidences, dict_scores)
+
+        # 深度列：质量评分按列读取平滑深度，原字典格式逐个查询
+        tracker.store.write_batch('depth', track_ids[:1], [6.5])
+        depths = track_depths(tracks)
+        assert depths[0] == 6.5
+        smoothed = {tid: tracks[tid]['depth'] for tid in track_ids}
+        assert np.array_equal(track_depths(as_dict, smoothed.get), depths, equal_nan=True)
+        assert np.isnan(track_depths(as_dict)).all()
+
+    # 已处理标记写入存储；丢失的track被移除后释放槽位
+    first = tracker.tracked_stracks[0].track_id
+    tracker.mark_processed(first)
+    assert tracker.get_tracks()[first]['processed'] is True
+    tracker.update(np.zeros((0, 4), dtype=np.float32), np.zeros(0), np.zeros(0, dtype=int), 30)
+    tracker.update(np.zeros((0, 4), dtype=np.float32), np.zeros(0), np.zeros(0, dtype=int), 31)
+    stats = tracker.store.get_stats()
+    assert stats['used'] == 0 and stats['active'] == 0 and stats['capacity'] == 64
+    print(f"  状态存储统计: {stats}（{len(views)} 个track）")
+
+    print("  ✅ 结构数组状态存储测试通过")
+    return True
+
+
+def test_7_alert_history():
+    """测试7: 有界报警历史"""
+    print("\n" + "="*60)
+    print("测试7: 有界报警历史")
+    print("="*60)
+
+    history = create_alert_history({'memory_size': 50})
+    full = []  # 原实现：完整报警列表（用于对照）
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DetectionDatabase(os.path.join(tmp, 'detections.db'))
+        for track_id in range(1000):
+            if rng.random() < 0.5:
+                alert = {'track_id': track_id, 'type': 'construction',
+                         'status': rng.choice(['registered', 'unregistered'])}
+            else:
+                alert = {'track_id': track_id, 'type': 'civilian', 'status': 'identifying'}
+            history.add(alert)
+            full.append(alert)
+            db.insert_detection({'track_id': track_id, 'type': alert['type'], 'status': alert['status']})
+            # 社会车辆随后完成或失败车牌识别
+            if alert['type'] == 'civilian' and rng.random() < 0.8:
+                history.set_status(alert, rng.choice(['identified', 'failed']))
+
+        # 内存中只保留最近N条，累计计数与完整列表一致
+        assert len(history.recent) == 50 and len(history) == len(full) == 1000
+        assert history.get_recent(3) == full[:-4:-1]
+        for alert_type in ('construction', 'civilian'):
+            for status in ('registered', 'unregistered', 'identifying', 'identified', 'failed', None):
+                expected = sum(1 for a in full if a['type'] == alert_type and (status is None or a['status'] == status))
+                assert history.count(alert_type, status) == expected, (alert_type, status)
+        assert history.count(status='identified') == sum(1 for a in full if a['status'] == 'identified')
+
+        # 更早的报警从检测数据库查询，/api/stats 使用的数据库统计与计数器一致
+        db_stats = db.get_statistics()
+        assert db_stats['total_count'] == history.count()
+        assert db_stats['by_type'] == history.get_stats()['by_type']
+        oldest = db.query_detections(limit=1000)[-1]
+        assert oldest['track_id'] == 0 and all(a['track_id'] != 0 for a in history)
+
+    print(f"  报警历史统计: {history.get_stats()}")
+    print("  ✅ 有界报警历史测试通过")
+    return True
+
+
+class _UploadQueue:
+    """云端上传队列（SentinelIntegration.on_detection 的最小替身，只记录入队事件）"""
+
+    def __init__(self):
+        self.queued = []
+
+    def on_detection(self, detection):
+        self.queued.append(detection)
+
+
+def test_8_alert_event_sink():
+    """测试8: 报警事件扇出投递"""
+    print("\n" + "="*60)
+    print("测试8: 报警事件扇出投递")
+    print("="*60)
+
+    alert = {
+        'track_id': np.int64(7), 'type': 'construction_vehicle', 'status': 'registered',
+        'detected_class': 'excavator', 'beacon_mac': 'AA:BB:CC:DD:EE:FF', 'plate_number': '京A12345',
+        'company': '某建设公司', 'distance': np.float32(6.5), 'confidence': np.float32(0.91),
+        'rssi': -63, 'match_cost': None, 'color': (0, 255, 0),
+    }
+    event = AlertEvent.from_alert(alert, np.array([100, 200, 400, 500], dtype=np.float32))
+    assert not hasattr(event, '__dict__'), "AlertEvent应为slots记录"
+
+    # 请求体字段规则与 CloudClient.send_alert 一致，序列化结果缓存
+    body = event.to_dict()
+    assert body['vehicle_type'] == 'construction_vehicle' and body['is_registered'] is True
+    assert body['bbox'] == {'x1': 100.0, 'y1': 200.0, 'x2': 400.0, 'y2': 500.0}
+    assert body['metadata'] == {'rssi': -63.0, 'match_cost': None} and body['timestamp'].endswith('Z')
+    assert body['snapshot_path'] is None and body['image_path'] is None and 'environment_code' not in body
+    assert event.to_json() is event.to_json()
+    assert json.loads(event.cloud_body('2025-01-01/a.jpg')) == dict(body, snapshot_url='2025-01-01/a.jpg')
+    assert json.loads(event.cloud_body()) == body
+
+    with tempfile.TemporaryDirectory() as project_root:
+        db = DetectionDatabase(os.path.join(project_root, 'detections.db'))
+        upload_queue = _UploadQueue()
+        alert_log = os.path.join(project_root, 'vehicle_alerts.json')
+        config = {
+            'paths': {'alert_log_file': alert_log},
+            'alert': {'event_stream': {'path': 'stream/alert_events.json', 'size': 2}},
+        }
+        # 检测程序与API服务读取同一配置项，相对路径都按项目根目录解析
+        with open(os.path.join(project_root, 'config.yaml'), 'w', encoding='utf-8') as f:
+            f.write("alert:\n  event_stream:\n    path: stream/alert_events.json\n")
+        sink = create_alert_sink(config, database=db, cloud_integration=upload_queue, base_dir=project_root)
+        assert sink.get_stats()['targets'] == ['database', 'cloud', 'alert_log', 'event_stream']
+
+        events = [event] + [AlertEvent.from_alert({'track_id': i, 'type': 'social_vehicle', 'status': 'identifying',
+                                                   'detected_class': 'car', 'confidence': 0.8}, (0, 0, 10, 10))
+                            for i in (8, 9)]
+        for item in events:
+            sink.publish(item)
+
+        # 同一个事件对象投递到所有目标
+        assert upload_queue.queued == events
+        assert [item.db_id for item in events] == [1, 2, 3]
+        record = db.query_detections(vehicle_type='construction_vehicle')[0]
+        assert record['track_id'] == 7 and record['bbox_x2'] == 400.0 and record['metadata']['rssi'] == -63.0
+        with open(alert_log, encoding='utf-8') as f:
+            assert [line.rstrip('\n') for line in f] == [item.to_json() for item in events]
+
+        # API事件流只保留最近N条，按序号增量拉取；非法since返回400
+        server = APIServer(host='127.0.0.1', port=0, project_root=project_root)
+        assert server.events_path == os.path.join(project_root, 'stream', 'alert_events.json')
+        server.start(daemon=True)
+        try:
+            port = server.server.server_address[1]
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/events?since=2', timeout=5) as response:
+                served = json.loads(response.read().decode('utf-8'))
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/api/events?since=abc', timeout=5)
+                bad_since_status = 200
+            except urllib.error.HTTPError as e:
+                bad_since_status = e.code
+        finally:
+            server.stop()
+            server.server.server_close()
+        assert served['last_seq'] == 3 and [item['seq'] for item in served['events']] == [3]
+        assert served['events'][0]['event'] == events[2].to_dict()
+        assert bad_since_status == 400
+
+        # 检测程序重启后序号从1重新开始，stream_id随之变化
+        stream_target = dict(sink.targets)['event_stream']
+        assert served['stream_id'] == stream_target.stream_id
+        restarted = EventStreamTarget(stream_target.path, size=2)
+        restarted(events[0])
+        with open(stream_target.path, encoding='utf-8') as f:
+            after_restart = json.load(f)
+        assert after_restart['last_seq'] == 1 and after_restart['stream_id'] != served['stream_id']
+
+        # 单个目标失败不影响其他目标
+        db.db_path = os.path.join(project_root, 'missing', 'detections.db')
+        sink.publish(AlertEvent(track_id=10, vehicle_type='social_vehicle'))
+        stats = sink.get_stats()
+        assert stats['errors']['database'] == 1 and len(upload_queue.queued) == 4 and stats['published'] == 4
+
+    print(f"  投递统计: {stats}")
+    print("  ✅ 报警事件扇出投递测试通过")
+    return True
+
+
+def main():
+    """主测试函数"""
+    print("\n" + "="*60)
+    print("警报链路测试套件")
+    print("="*60)
+
+    tests = [
+        ("警报去重索引规则", test_1_dedup_rules),
+        ("去重索引与原线性扫描一致性", test_2_dedup_matches_linear_scan),
+        ("去重索引性能", test_3_dedup_benchmark),
+        ("徘徊检测占用网格", test_4_loitering_occupancy_grid),
+        ("跟踪生命周期事件", test_5_track_lifecycle_events),
+        ("结构数组状态存储", test_6_track_state_store),
+        ("有界报警历史", test_7_alert_history),
+        ("报警事件扇出投递", test_8_alert_event_sink),
+    ]
+
+    results = []
+    for name, test_func in tests:
+        try:
+            results.append((name, test_func()))
+        except Exception as e:
+            print(f"  ❌ 测试失败: {e}")
+            import traceback
+            traceback.print_exc()
+            results.append((name, False))
+
+    # 汇总结果
+    print("\n" + "="*60)
+    print("测试结果汇总")
+    print("="*60)
+
+    passed = sum(1 for _, result in results if result)
+    total = len(results)
+
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+
+    print("\n" + "="*60)
+    print(f"总计: {passed}/{total} 通过")
+    print("="*60)
+
+    return 0 if passed == total else 1
+
+
+if __name__ == '__main__':
+    exit(main())
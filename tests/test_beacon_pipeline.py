@@ -0,0 +1,561 @@
+"""
+信标链路测试脚本
+
+测试内容：
+1. 信标滚动统计 - 验证Welford窗口统计与逐条计算一致
+2. 多目标匹配分配缓存 - 验证向量化代价矩阵和容差内复用分配
+3. Cassia SSE批量接入 - 验证批量解析、RSSI平滑和版本化快照
+4. Cassia连接管理与模拟服务器 - 验证退避抖动、重连指标、故障模式和连通性检查
+5. BLE扫描录制与回放 - 验证录制文件读写、截断容错及手动/加速回放
+6. 云端白名单增量同步 - 验证条件请求、增量游标、本地缓存和BeaconFilter增量应用
+"""
+
+import sys
+import os
+import json
+import random
+import socket
+import time
+import http.client
+import tempfile
+import threading
+import numpy as np
+import yaml
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_apps'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'jetson-client'))
+
+from beacon_stats import BeaconRollingStats, BeaconStatsTable
+from beacon_filter import BeaconFilter
+from beacon_ingest import BeaconIngest, parse_event_batch, create_beacon_ingest
+from cassia_connection import ReconnectBackoff, ConnectionMetrics, SSEParser, create_backoff
+from cassia_sim_server import CassiaSimServer
+from network_recovery import NetworkRecovery
+from ble_scan_recorder import BleScanRecorder, BleReplayClient, iter_scan_records, summarize_scan_file
+from beacon_whitelist import BeaconWhitelistManager
+from whitelist_sim_server import WhitelistSimServer
+
+
+def _reference_penalty(records, current_time, window):
+    """逐条遍历计算的稳定度惩罚（旧实现）"""
+    window_data = [r for r in records if current_time - r[0] <= window]
+    if len(window_data) < 2:
+        return 0.0
+    rssi_penalty = min(1.0, np.std([r[1] for r in window_data]) / 10.0)
+    dists = [r[2] for r in window_data if r[2] > 0]
+    dist_penalty = min(1.0, np.std(dists) / 2.0) if len(dists) > 1 else 0.0
+    return max(rssi_penalty, dist_penalty)
+
+
+def test_1_beacon_rolling_stats():
+    """测试1: 信标滚动统计"""
+    print("\n" + "="*60)
+    print("测试1: 信标滚动统计")
+    print("="*60)
+
+    rng = np.random.default_rng(7)
+    history_size = 20
+    window = 3.0
+    stats = BeaconRollingStats(history_size=history_size, stability_window=window)
+    records = []
+    t = 1000.0
+    query_time = t
+    for _ in range(500):
+        # 时间单调递增（观测与查询交替进行）
+        t = query_time + float(rng.uniform(0.05, 0.6))
+        rssi = float(rng.normal(-65, 6))
+        distance = 0.0 if rng.random() < 0.2 else float(rng.normal(8.0, 1.5))
+        stats.add(t, rssi, distance)
+        records.append((t, rssi, distance))
+        records = records[-history_size:]
+
+        query_time = t + float(rng.uniform(0.0, 1.0))
+        expected = _reference_penalty(records, query_time, window)
+        actual = stats.stability_penalty(query_time)
+        assert abs(actual - expected) < 1e-6, f"{actual} != {expected}"
+        assert stats.first_seen == records[0][0]
+    print("  ✅ 滚动统计与逐条计算结果一致")
+
+    table = BeaconStatsTable(history_size=10, stability_window=3.0)
+    assert table.penalty('AA:BB', 0.0) == 0.0, "无历史时不惩罚"
+    table.add('AA:BB', 0.0, -60, 5.0)
+    table.add('AA:BB', 1.0, -80, 9.0)
+    table.add('CC:DD', 1.0, -60, 5.0)
+    penalties = table.penalties(['AA:BB', 'CC:DD', 'EE:FF'], 1.5)
+    assert penalties[0] == 1.0 and penalties[1] == 0.0 and penalties[2] == 0.0
+    # 超出时间窗口后不再惩罚
+    assert table.penalty('AA:BB', 10.0) == 0.0
+    print("  ✅ 批量惩罚查询正常")
+
+    return True
+
+
+def _make_beacon_filter(tmp_dir, beacons):
+    """用临时白名单配置创建过滤器"""
+    config = {
+        'global_config': {
+            'multi_target_match': {'enabled': True, 'match_cost_threshold': 5.0, 'cache_tolerance': 0.5},
+        },
+        'cameras': {'camera_01': {'name': '测试', 'beacons': beacons}},
+    }
+    path = os.path.join(tmp_dir, 'whitelist.yaml')
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    return BeaconFilter(path, camera_id='camera_01')
+
+
+def test_2_assignment_cache():
+    """测试2: 多目标匹配分配缓存"""
+    print("\n" + "="*60)
+    print("测试2: 多目标匹配分配缓存")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        beacon_filter = _make_beacon_filter(tmp_dir, [
+            {'mac': 'AA:00:00:00:00:01', 'vehicle_type': 'excavator'},
+            {'mac': 'AA:00:00:00:00:02', 'vehicle_type': 'excavator'},
+            {'mac': 'AA:00:00:00:00:03', 'vehicle_type': 'dump-truck'},
+        ])
+        vehicles = [
+            {'track_id': 1, 'camera_depth': 4.0, 'detected_class': 'excavator'},
+            {'track_id': 2, 'camera_depth': 12.0, 'detected_class': 'excavator'},
+            {'track_id': 3, 'camera_depth': 7.0, 'detected_class': 'dump_truck'},
+            {'track_id': 4, 'camera_depth': None, 'detected_class': 'loader'},
+        ]
+        scanned = [
+            {'mac': 'aa:00:00:00:00:02', 'rssi': -60, 'distance': 11.5},
+            {'mac': 'AA:00:00:00:00:01', 'rssi': -55, 'distance': 4.5},
+            {'mac': 'AA:00:00:00:00:03', 'rssi': -65, 'distance': 7.2},
+            {'mac': 'BB:00:00:00:00:09', 'rssi': -40, 'distance': 1.0},  # 不在白名单
+        ]
+
+        results = beacon_filter.match_multiple_targets(vehicles, scanned)
+        matched = {r['track_id']: r['beacon_info']['mac'].upper() if r['matched'] else None for r in results}
+        assert matched == {1: 'AA:00:00:00:00:01', 2: 'AA:00:00:00:00:02', 3: 'AA:00:00:00:00:03', 4: None}
+        assert results[0]['beacon_info']['vehicle_type'] == 'excavator', "结果应包含白名单信息"
+        assert abs(results[0]['cost'] - 0.5) < 1e-9
+        misses = beacon_filter.assignment_cache_misses
+        print("  ✅ 按类型向量化匹配结果正确")
+
+        # 输入变化在容差内：复用分配，代价使用最新输入
+        scanned[1] = dict(scanned[1], distance=4.3)
+        results = beacon_filter.match_multiple_targets(vehicles, scanned)
+        assert beacon_filter.assignment_cache_misses == misses
+        assert beacon_filter.assignment_cache_hits >= 2
+        assert abs(results[0]['cost'] - 0.3) < 1e-9
+        print("  ✅ 容差内复用上次分配")
+
+        # 输入变化超过容差：重新求解，分配随之改变
+        vehicles[0] = dict(vehicles[0], camera_depth=11.8)
+        vehicles[1] = dict(vehicles[1], camera_depth=4.2)
+        results = beacon_filter.match_multiple_targets(vehicles, scanned)
+        assert beacon_filter.assignment_cache_misses > misses
+        assert results[0]['beacon_info']['mac'].upper() == 'AA:00:00:00:00:02'
+        assert results[1]['beacon_info']['mac'].upper() == 'AA:00:00:00:00:01'
+        print("  ✅ 超过容差时重新求解")
+
+        # 白名单更新线程与检测线程并发：更新在副本上进行后整体替换，读取方不会看到修改中的字典
+        class _ChangeFeed:
+            def __init__(self):
+                self.version = 0
+
+            def get_changes(self, since):
+                self.version += 1
+                info = None if self.version % 2 else {'vehicle_type': 'dump-truck', 'plate_number': '', 'company': ''}
+                changes = {'AA:00:00:00:00:03': info}
+                changes.update({f'CC:00:00:00:{self.version % 256:02X}:{i:02X}': info for i in range(20)})
+                return self.version, changes
+
+        beacon_filter.cloud_whitelist_manager = _ChangeFeed()
+        beacon_filter._cloud_whitelist_version = 0
+        errors = []
+
+        def _updater():
+            try:
+                for _ in range(300):
+                    assert beacon_filter._apply_cloud_changes()
+            except Exception as e:
+                errors.append(e)
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # 频繁切换线程，放大竞争窗口
+        try:
+            updater = threading.Thread(target=_updater)
+            updater.start()
+            for _ in range(300):
+                try:
+                    beacon_filter.match_multiple_targets(vehicles, scanned)
+                    beacon_filter._filter_by_whitelist(scanned)
+                except Exception as e:
+                    errors.append(e)
+                    break
+            updater.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+        assert not errors, f"并发更新白名单时出错: {errors[0]!r}"
+        print("  ✅ 白名单并发更新与匹配互不干扰")
+
+    return True
+
+
+def _cassia_event(mac, rssi, name='Beacon'):
+    """构造Cassia本地API广播事件"""
+    return json.dumps({'bdaddrs': [{'bdaddr': mac, 'bdaddrType': 'public'}], 'rssi': rssi, 'name': name})
+
+
+def test_3_cassia_ingest():
+    """测试3: Cassia SSE批量接入"""
+    print("\n" + "="*60)
+    print("测试3: Cassia SSE批量接入")
+    print("="*60)
+
+    # 批内混有keep-alive等无效事件时逐条解析，无效事件返回None
+    parsed = parse_event_batch([_cassia_event('AA:01', -60), 'keep-alive', '{"x": 1}'])
+    assert parsed[0]['rssi'] == -60 and parsed[1] is None and parsed[2] == {'x': 1}
+    print("  ✅ 批量解析正常")
+
+    ingest = BeaconIngest(method='kalman', batch_size=4, batch_interval=10.0)
+    now = 1000.0
+    # 未达到批量大小时只入队，不写入信标表
+    for i, rssi in enumerate([-60, -70, -62]):
+        assert not ingest.submit(_cassia_event('AA:01', rssi), timestamp=now + i * 0.01)
+    assert len(ingest) == 0
+    assert ingest.submit('', timestamp=now + 0.03), "达到批量大小时应一次写入"
+    assert len(ingest) == 1 and ingest.events_parsed == 3 and ingest.batches == 1
+
+    beacons = ingest.get_beacons(max_age=5.0, now=now + 1.0)
+    beacon = beacons[0]
+    assert beacon['raw_rssi'] == -62
+    assert -70 < beacon['rssi'] < -60, "平滑后的RSSI应介于观测值之间"
+    assert abs(beacon['distance'] - ingest.rssi_to_distance(ingest.tracks['AA:01'].smoothed)) < 1e-9
+    print(f"  ✅ 卡尔曼平滑 RSSI={beacon['rssi']}dBm, 距离={beacon['distance']:.2f}m")
+
+    # 数据未变化时复用快照；新数据或信标过期后重新生成
+    again = ingest.get_beacons(max_age=5.0, now=now + 2.0)
+    assert again[0] is beacon, "版本未变化时应复用快照"
+    ingest.ingest([('AA:02', -50, 'B', now + 2.0)])
+    assert len(ingest.get_beacons(max_age=5.0, now=now + 2.5)) == 2
+    assert [b['mac'] for b in ingest.get_beacons(max_age=5.0, now=now + 5.5)] == ['AA:02']
+    print("  ✅ 版本化快照正常")
+
+    # EMA：与逐条计算一致
+    ema = create_beacon_ingest({'smoothing': {'method': 'ema', 'alpha': 0.5}})
+    ema.ingest([('AA:03', rssi, 'C', now + i) for i, rssi in enumerate([-60, -70, -80])])
+    assert ema.get_beacons(max_age=5.0, now=now + 3)[0]['rssi'] == -72.5
+    print("  ✅ EMA平滑正常")
+
+    return True
+
+
+def _read_sim_stream(server, max_events, timeout=2.0):
+    """读取一次模拟服务器的SSE流"""
+    host, port = server.address.split(':')
+    conn = http.client.HTTPConnection(host, int(port), timeout=timeout)
+    conn.request('GET', '/gap/nodes?event=1')
+    resp = conn.getresponse()
+    if resp.status != 200:
+        conn.close()
+        return resp.status, []
+    parser = SSEParser()
+    events = []
+    try:
+        while len(events) < max_events:
+            line = resp.fp.readline()
+            if not line:
+                break
+            data = parser.feed_line(line.decode())
+            if data is not None:
+                events.append(data)
+    finally:
+        conn.close()
+    return resp.status, events
+
+
+def test_4_cassia_connection():
+    """测试4: Cassia连接管理与模拟服务器"""
+    print("\n" + "="*60)
+    print("测试4: Cassia连接管理与模拟服务器")
+    print("="*60)
+
+    # 指数退避：不超过上限，抖动落在 [delay*(1-jitter), delay]
+    backoff = ReconnectBackoff(initial=0.5, maximum=4.0, multiplier=2.0, jitter=0.5, rng=random.Random(1))
+    delays = [backoff.next_delay() for _ in range(6)]
+    for delay, nominal in zip(delays, [0.5, 1.0, 2.0, 4.0, 4.0, 4.0]):
+        assert nominal * 0.5 <= delay <= nominal
+    backoff.reset()
+    assert backoff.next_delay() <= 0.5
+    assert create_backoff({'backoff': {'initial': 1.0, 'max': 8.0}}).maximum == 8.0
+    print(f"  ✅ 指数退避+抖动正常: {[round(d, 2) for d in delays]}")
+
+    # SSE解析：注释行（keep-alive）不产生事件，多行data拼接
+    parser = SSEParser()
+    assert parser.feed_line(': keep-alive\n') is None and parser.feed_line('\n') is None
+    assert parser.feed_line('data: a\n') is None and parser.feed_line('data: b\n') is None
+    assert parser.feed_line('\n') == 'a\nb'
+
+    metrics = ConnectionMetrics()
+    metrics.on_connected(now=100.0)
+    metrics.on_disconnected(now=110.0)
+    metrics.on_disconnected(now=111.0)  # 重连失败不重复计数
+    metrics.on_connected(now=112.5)
+    summary = metrics.summary()
+    assert summary['disconnects'] == 1 and summary['reconnect_latency_last'] == 2.5
+    print("  ✅ SSE解析与重连耗时指标正常")
+
+    # 模拟服务器：按连接顺序注入故障
+    server = CassiaSimServer(rate=500, num_beacons=10, faults=['refuse', 'drop:20', 'garbage'], seed=3).start()
+    try:
+        assert _read_sim_stream(server, 10)[0] == 503
+        status, events = _read_sim_stream(server, 1000)
+        assert status == 200 and len(events) == 20, f"drop:20 应在20条后断开，实际 {len(events)}"
+
+        ingest = BeaconIngest(batch_size=32)
+        start = time.time()
+        status, events = _read_sim_stream(server, 300)
+        for raw in events:
+            ingest.submit(raw)
+        ingest.flush()
+        elapsed = time.time() - start
+        assert ingest.events_parsed > 0 and ingest.events_parsed < len(events), "无效数据应被忽略"
+        assert 0 < len(ingest) <= 10
+        assert server.connections == 3
+        print(f"  ✅ 故障模式正常（{len(events)} 条事件 {elapsed:.2f}s，有效 {ingest.events_parsed} 条）")
+
+        # 连通性检查：TCP探测可达时，仅SSE断开超过最长退避才需要重建客户端
+        host, port = server.address.split(':')
+        recovery = NetworkRecovery(host, cassia_port=int(port), cassia_down_for=lambda: None)
+        assert recovery.check_cassia_connectivity()
+        assert not recovery.needs_cassia_recovery()
+        assert not NetworkRecovery(host, cassia_port=int(port), cassia_down_for=lambda: 20.0,
+                                   cassia_max_down=35.0).needs_cassia_recovery(), "退避期间不应重建"
+        assert NetworkRecovery(host, cassia_port=int(port), cassia_down_for=lambda: 40.0,
+                               cassia_max_down=35.0).needs_cassia_recovery()
+    finally:
+        server.stop()
+
+    # 端口已关闭时TCP探测失败
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        closed_port = sock.getsockname()[1]
+    unreachable = NetworkRecovery('127.0.0.1', cassia_port=closed_port, probe_timeout=0.5)
+    assert not unreachable.check_cassia_connectivity() and unreachable.needs_cassia_recovery()
+    print("  ✅ 连通性检查正常（TCP探测 / SSE断开时长）")
+
+    return True
+
+
+def test_5_ble_scan_replay():
+    """测试5: BLE扫描录制与回放"""
+    print("\n" + "="*60)
+    print("测试5: BLE扫描录制与回放")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # 录制器作为接入层批次回调，记录原始事件和接收时间戳
+        ingest = BeaconIngest(batch_size=10)
+        recorder = BleScanRecorder(output_dir=tmp_dir)
+
+        class _Client:
+            pass
+        client = _Client()
+        client.ingest = ingest
+        recorder.attach(client)
+        recorder.attach(client)
+        assert len(ingest.batch_listeners) == 1, "重复挂载应被忽略"
+
+        t0 = 1700000000.0
+        events = []
+        for i in range(100):
+            mac = f'AA:00:00:00:00:{i % 4:02d}'
+            events.append((t0 + i * 0.1, _cassia_event(mac, -60 - i % 4)))
+        for ts, raw in events:
+            ingest.submit(raw, timestamp=ts)
+        ingest.flush()
+        recorder.close()
+        assert recorder.path.name.startswith('ble_scan_') and recorder.path.suffix == '.gz'
+        assert list(iter_scan_records(recorder.path)) == events
+        info = summarize_scan_file(recorder.path)
+        assert info['events'] == 100 and info['beacons'] == 4 and abs(info['duration'] - 9.9) < 1e-6
+        print(f"  ✅ 录制文件读写正常（{info['file_size']} 字节 / {info['events']} 条事件）")
+
+        # 未压缩文件末尾被截断时读到最后一条完整记录
+        plain = BleScanRecorder(path=os.path.join(tmp_dir, 'plain.blescan'))
+        plain.write_batch(events[:5])
+        plain.close()
+        with open(plain.path, 'r+b') as f:
+            f.truncate(os.path.getsize(plain.path) - 3)
+        assert list(iter_scan_records(plain.path)) == events[:4]
+        print("  ✅ 截断文件容错正常")
+
+        # 手动模式：按回放时钟推进，信标年龄按录制时间计算
+        replay = BleReplayClient(recorder.path, speed=0)
+        replay.start()
+        assert replay.get_beacons() == []
+        replay.advance(0.0)
+        assert len(replay.get_beacons()) == 1 and replay.events_replayed == 1
+        replay.advance(1.0)
+        assert {b['mac'] for b in replay.get_beacons()} == {f'AA:00:00:00:00:{i:02d}' for i in range(4)}
+        while not replay.finished:
+            replay.advance(1.0)
+        assert replay.events_replayed == 100
+        assert len(replay.get_beacons(max_age=1.0)) == 4
+        replay.advance(10.0)
+        assert replay.get_beacons(max_age=5.0) == [], "回放时间超过max_age后信标应过期"
+        print("  ✅ 手动推进回放正常")
+
+        # 加速回放：10秒录制以50倍速约0.2秒播完
+        replay = BleReplayClient(recorder.path, speed=50.0)
+        start = time.time()
+        replay.start()
+        while not replay.finished and time.time() - start < 5.0:
+            time.sleep(0.01)
+        elapsed = time.time() - start
+        replay.stop()
+        assert replay.finished and replay.events_replayed == 100
+        assert 0.1 < elapsed < 2.0, f"50倍速回放耗时异常: {elapsed:.2f}s"
+        assert replay.ingest.events_parsed == 100
+        print(f"  ✅ 加速回放正常（耗时 {elapsed:.2f}s）")
+
+    # 过期清理按观测时钟（录制时间），与墙钟无关
+    ingest = BeaconIngest(retention=60.0)
+    t0 = 1000.0  # 远早于当前墙钟的录制时间
+    ingest.ingest([('AA:00:00:00:00:01', -60, 'a', t0), ('AA:00:00:00:00:02', -62, 'b', t0)])
+    ingest.ingest([('AA:00:00:00:00:01', -61, 'a', t0 + 30)])
+    assert len(ingest.tracks) == 2, "录制时间未超过保留时间不应清理"
+    ingest.ingest([('AA:00:00:00:00:01', -61, 'a', t0 + 70)])
+    assert set(ingest.tracks) == {'AA:00:00:00:00:01'}, "只清理按录制时间过期的信标"
+    assert len(ingest.get_beacons(max_age=5.0, now=t0 + 70)) == 1
+    print("  ✅ 按观测时钟清理过期信标正常")
+
+    return True
+
+
+def test_6_whitelist_sync():
+    """测试6: 云端白名单条件请求/增量同步"""
+    print("\n" + "="*60)
+    print("测试6: 云端白名单增量同步")
+    print("="*60)
+
+    server = WhitelistSimServer(api_key="test-key").start()
+    try:
+        ids = [server.add_beacon(f"AC:23:3F:00:00:{i:02X}", machine_type="excavator")["id"]
+               for i in range(20)]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = os.path.join(tmp_dir, "whitelist_cache.json")
+            manager = BeaconWhitelistManager(server.url, "test-key", cache_path=cache_path)
+            assert not manager.loaded_from_cache
+
+            # 首次全量获取
+            assert manager.fetch_whitelist(max_retries=1)
+            assert len(manager.whitelist) == 20
+            assert manager.last_changed_count == 20
+            assert manager.etag == server.etag
+            assert server.request_counts["full"] == 1
+
+            beacon_filter = BeaconFilter(None, cloud_whitelist_manager=manager)
+            assert len(beacon_filter.whitelist) == 20
+
+            # 无变化：走增量接口，不重新下载全量
+            assert manager.fetch_whitelist(max_retries=1)
+            assert manager.last_changed_count == 0
+            assert server.request_counts == {"full": 1, "not_modified": 0, "delta": 1}
+
+            # 修改/删除/新增只传输变化的条目
+            server.update_beacon(ids[0], machine_type="bulldozer")
+            server.delete_beacon(ids[1])
+            server.add_beacon("AC:23:3F:00:01:00", machine_type="loader")
+            assert manager.fetch_whitelist(max_retries=1)
+            assert manager.last_changed_count == 3
+            assert server.request_counts["full"] == 1
+            assert "AC:23:3F:00:00:01" not in manager.whitelist
+            assert manager.whitelist["AC:23:3F:00:00:00"].machine_type == "bulldozer"
+            print(f"  增量同步: 变化 {manager.last_changed_count} 条, 服务端请求 {server.request_counts}")
+
+            # BeaconFilter只应用变化的条目
+            whitelist_obj = beacon_filter.whitelist
+            published = dict(whitelist_obj)
+            beacon_filter._get_type_index()
+            beacon_filter.refresh_whitelist(force_update=False)
+            assert whitelist_obj == published, "已发布的白名单字典不应被原地修改（检测线程可能正在读取）"
+            whitelist_now, type_index = beacon_filter._type_index_state
+            assert whitelist_now is beacon_filter.whitelist and type_index["AC:23:3F:00:00:00"] == "bulldozer"
+            assert "AC:23:3F:00:00:01" not in type_index, "类型索引应随变化增量更新"
+            assert len(beacon_filter.whitelist) == 20
+            assert beacon_filter.whitelist["AC:23:3F:00:00:00"]["vehicle_type"] == "bulldozer"
+            assert "AC:23:3F:00:00:01" not in beacon_filter.whitelist
+            assert beacon_filter.whitelist == manager.get_whitelist_dict()
+
+            # 本地缓存：重启后立即可用，并以缓存的游标继续同步
+            restarted = BeaconWhitelistManager(server.url, "test-key", cache_path=cache_path)
+            assert restarted.loaded_from_cache
+            assert restarted.get_whitelist_dict() == manager.get_whitelist_dict()
+            server.update_beacon(ids[2], equipment_owner="owner-2")
+            assert restarted.fetch_whitelist(max_retries=1)
+            assert restarted.last_changed_count == 1
+            assert server.request_counts["full"] == 1
+
+            # 服务端不支持增量接口：退回ETag条件请求，无变化返回304
+            server.delta_enabled = False
+            conditional = BeaconWhitelistManager(server.url, "test-key", cache_path=cache_path)
+            assert conditional.fetch_whitelist(max_retries=1)
+            assert not conditional.use_delta
+            assert conditional.fetch_whitelist(max_retries=1)
+            assert conditional.last_changed_count == 0
+            assert server.request_counts["not_modified"] >= 1
+            print(f"  条件请求: 服务端请求 {server.request_counts}, 发送 {server.bytes_sent} 字节")
+    finally:
+        server.stop()
+
+    print("  ✅ 云端白名单增量同步测试通过")
+    return True
+
+
+def main():
+    """主测试函数"""
+    print("\n" + "="*60)
+    print("信标链路测试套件")
+    print("="*60)
+
+    tests = [
+        ("信标滚动统计", test_1_beacon_rolling_stats),
+        ("多目标匹配分配缓存", test_2_assignment_cache),
+        ("Cassia SSE批量接入", test_3_cassia_ingest),
+        ("Cassia连接管理与模拟服务器", test_4_cassia_connection),
+        ("BLE扫描录制与回放", test_5_ble_scan_replay),
+        ("云端白名单增量同步", test_6_whitelist_sync),
+    ]
+
+    results = []
+    for name, test_func in tests:
+        try:
+            results.append((name, test_func()))
+        except Exception as e:
+            print(f"  ❌ 测试失败: {e}")
+            import traceback
+            traceback.print_exc()
+            results.append((name, False))
+
+    # 汇总结果
+    print("\n" + "="*60)
+    print("测试结果汇总")
+    print("="*60)
+
+    passed = sum(1 for _, result in results if result)
+    total = len(results)
+
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+
+    print("\n" + "="*60)
+    print(f"总计: {passed}/{total} 通过")
+    print("="*60)
+
+    return 0 if passed == total else 1
+
+
+if __name__ == '__main__':
+    exit(main())
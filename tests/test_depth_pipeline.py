@@ -0,0 +1,297 @@
+"""
+深度采集链路测试脚本
+
+测试内容：
+1. 彩色→深度像素映射表 - 验证查表映射和磁盘缓存
+2. 帧源与帧等待策略 - 验证新帧通知和spin/block/block_timeout模式
+3. RGB/深度帧时间同步 - 验证最近时间戳配对、最大时间差、旧彩色帧时间差检查及深度帧副本
+4. 数组化多目标深度平滑 - 验证与旧版结果一致、批量更新及槽位复用
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_apps'))
+
+from depth_pixel_mapper import ColorDepthMapper, make_mapping_cache_key, load_or_build_mapper
+from frame_source import FrameSource, FrameWaitPolicy, create_frame_wait_policy
+from frame_sync import FramePairBuffer
+from orbbec_depth import OrbbecDepthCamera
+from depth_smoothing import TrackDepthSmoother, MultiTrackDepthSmoother, create_depth_smoother
+
+
+def test_1_color_depth_mapper():
+    """测试1: 彩色→深度像素映射表"""
+    print("\n" + "="*60)
+    print("测试1: 彩色→深度像素映射表")
+    print("="*60)
+
+    # 等比缩放：1920x1080彩色 -> 640x360深度
+    mapper = ColorDepthMapper((1920, 1080), (640, 360))
+    assert mapper.map_point(0, 0) == (0, 0)
+    assert mapper.map_point(960, 540) == (320, 180)
+    assert mapper.map_point(5000, -10) == (639, 0), "越界坐标应被限制在图像内"
+    x1, y1, x2, y2 = mapper.map_bbox((300, 300, 600, 900))
+    assert (x1, y1, x2, y2) == (100, 100, 200, 300)
+    print("  ✅ 等比缩放映射正确")
+
+    # 内参映射：深度相机视场更大（焦距更小），彩色中心映射到深度中心
+    mapper = ColorDepthMapper(
+        (1280, 720), (640, 480),
+        color_intrinsic=(1000.0, 1000.0, 640.0, 360.0),
+        depth_intrinsic=(400.0, 400.0, 320.0, 240.0),
+    )
+    assert mapper.source == 'intrinsic'
+    assert mapper.map_point(640, 360) == (320, 240)
+    dx, _ = mapper.map_point(1279, 360)
+    assert dx < 639, "深度视场更大时彩色边缘不应映射到深度图边缘"
+    print("  ✅ 内参映射正确")
+
+    # 磁盘缓存：按设备序列号+流配置命名，再次加载得到相同查找表
+    with tempfile.TemporaryDirectory() as cache_dir:
+        key = make_mapping_cache_key('CP1234', (1280, 720, 'RGB'), (640, 480, 'Y16'), 'NONE')
+        assert '/' not in key
+        built = load_or_build_mapper(cache_dir, key, (1280, 720), (640, 480),
+                                     (1000.0, 1000.0, 640.0, 360.0), (400.0, 400.0, 320.0, 240.0))
+        assert os.path.exists(os.path.join(cache_dir, key + '.npz'))
+        loaded = load_or_build_mapper(cache_dir, key, (1280, 720), (640, 480))
+        assert loaded.source == 'cache'
+        assert np.array_equal(built.x_lut, loaded.x_lut)
+        assert np.array_equal(built.y_lut, loaded.y_lut)
+    print("  ✅ 映射表磁盘缓存正常")
+
+    return True
+
+
+def test_2_frame_source_wait():
+    """测试2: 帧源与帧等待策略"""
+    print("\n" + "="*60)
+    print("测试2: 帧源与帧等待策略")
+    print("="*60)
+
+    source = FrameSource()
+    assert source.get_next_frame(0, timeout=0.01) == (0, None), "无帧时应超时返回None"
+
+    # 采集线程发布新帧后，阻塞的消费者应立即被唤醒
+    def producer():
+        time.sleep(0.05)
+        source.publish_frame('frame-1')
+
+    thread = threading.Thread(target=producer)
+    start = time.monotonic()
+    thread.start()
+    seq, frame = source.get_next_frame(0, timeout=2.0)
+    elapsed = time.monotonic() - start
+    thread.join()
+    assert (seq, frame) == (1, 'frame-1')
+    assert elapsed < 1.0, f"应在新帧到达时被唤醒，实际等待 {elapsed:.3f}s"
+    print(f"  ✅ 新帧通知正常（等待 {elapsed*1000:.1f}ms）")
+
+    # 同一帧不会被重复取到
+    assert source.get_next_frame(seq, timeout=0.01) == (seq, None)
+
+    for mode in FrameWaitPolicy.MODES:
+        policy = FrameWaitPolicy(mode=mode, timeout=0.05)
+        source.publish_frame(f'frame-{mode}')
+        new_seq, frame = policy.wait(source, seq)
+        assert new_seq == seq + 1 and frame == f'frame-{mode}', f"{mode}模式取帧失败"
+        seq = new_seq
+        if mode != 'block':
+            assert policy.wait(source, seq) == (seq, None), f"{mode}模式应超时返回"
+    print("  ✅ spin/block/block_timeout 模式正常")
+
+    # 帧源停止时应唤醒阻塞等待者
+    waiter_result = []
+    waiter = threading.Thread(target=lambda: waiter_result.append(source.get_next_frame(seq)))
+    waiter.start()
+    time.sleep(0.02)
+    source.close_frames()
+    waiter.join(timeout=1.0)
+    assert not waiter.is_alive() and waiter_result[0] == (seq, None)
+    print("  ✅ 帧源停止时等待者被唤醒")
+
+    policy = create_frame_wait_policy({'frame_wait': {'mode': 'spin', 'timeout': 0.2}})
+    assert policy.mode == 'spin' and policy.timeout == 0.2
+    assert create_frame_wait_policy({}).mode == 'block_timeout'
+
+    return True
+
+
+def test_3_frame_pair_buffer():
+    """测试3: RGB/深度帧时间同步"""
+    print("\n" + "="*60)
+    print("测试3: RGB/深度帧时间同步")
+    print("="*60)
+
+    pairs = FramePairBuffer(capacity=4, max_skew_ms=20.0, color_capacity=6)
+    assert pairs.get_depth_for(1) == (None, None), "空缓冲区应返回None"
+
+    # 深度约30fps，彩色帧时间戳与深度帧交错
+    for i, ts in enumerate([0.0, 33.0, 66.0, 100.0]):
+        pairs.add_depth(ts, f'depth-{i}')
+    pairs.add_color(1, 35.0)
+    pairs.add_color(2, 70.0)
+    pairs.add_color(3, 150.0)
+
+    assert pairs.get_depth_for(1) == ('depth-1', 2.0)
+    assert pairs.get_depth_for(2) == ('depth-2', 4.0)
+    # 最接近的深度帧相差50ms，超过最大时间差
+    item, skew = pairs.get_depth_for(3)
+    assert item is None and skew == 50.0
+    print("  ✅ 最近时间戳配对及最大时间差过滤正常")
+
+    # 深度帧晚于彩色帧到达时，查询时仍能配对
+    pairs.add_depth(148.0, 'depth-late')
+    assert pairs.get_depth_for(3) == ('depth-late', 2.0)
+    assert pairs.latest_depth() == 'depth-late'
+
+    # 彩色时间戳保留的帧数多于深度帧：旧彩色帧仍按时间差检查，不会配到最新深度帧
+    for seq in range(4, 7):
+        pairs.add_color(seq, 200.0 + seq)
+    assert pairs.get_color_timestamp(1) == 35.0
+    for i, ts in enumerate([180.0, 210.0, 240.0]):
+        pairs.add_depth(ts, f'depth-new-{i}')
+    item, skew = pairs.get_depth_for(1)
+    assert item is None and skew == 113.0, "旧彩色帧的同步深度帧已淘汰时应视为无效"
+    # 彩色时间戳也已淘汰：无法判断时间差，视为无效并计数
+    pairs.add_color(7, 207.0)
+    assert pairs.get_color_timestamp(1) is None
+    assert pairs.get_depth_for(1) == (None, None)
+    assert pairs.get_depth_for(99) == (None, None), "未记录的新序号应视为无效"
+    assert pairs.get_stats() == {'synced': 3, 'skew_rejected': 2, 'color_evicted': 1}
+    print("  ✅ 迟到深度帧配对、旧帧时间差检查及时间戳淘汰正常")
+
+    # 采集线程存入缓冲区的是自有的uint16副本；读不到设备时间戳时不参与配对
+    class FakeDepthFrame:
+        def __init__(self, data):
+            self.data = data
+
+        def get_width(self):
+            return 4
+
+        def get_height(self):
+            return 2
+
+        def get_data(self):
+            return self.data
+
+        def get_timestamp_us(self):
+            raise RuntimeError("no timestamp")
+
+    sdk_buffer = bytearray(np.arange(8, dtype=np.uint16).tobytes())
+    depth_image = OrbbecDepthCamera._copy_depth_image(FakeDepthFrame(sdk_buffer))
+    assert depth_image.dtype == np.uint16 and depth_image.shape == (2, 4)
+    sdk_buffer[:] = bytes(len(sdk_buffer))
+    assert depth_image[1, 3] == 7, "SDK回收缓冲区后深度图不应改变"
+    assert OrbbecDepthCamera._frame_timestamp_ms(FakeDepthFrame(sdk_buffer)) is None
+    print("  ✅ 深度帧复制及时间戳缺失处理正常")
+
+    return True
+
+
+def test_4_multi_track_depth_smoother():
+    """测试4: 数组化多目标深度平滑"""
+    print("\n" + "="*60)
+    print("测试4: 数组化多目标深度平滑")
+    print("="*60)
+
+    # 与旧版按track列表实现的结果一致（含无效深度和重置）
+    rng = np.random.default_rng(42)
+    for method in ('ema', 'median'):
+        reference = TrackDepthSmoother(method=method, alpha=0.7, window_size=5, min_samples=3)
+        smoother = MultiTrackDepthSmoother(method=method, alpha=0.7, window_size=5, min_samples=3, capacity=2)
+        for _ in range(200):
+            track_id = int(rng.integers(0, 6))
+            depth = None if rng.random() < 0.1 else float(rng.normal(5.0, 0.3))
+            expected = reference.update(track_id, depth)
+            actual = smoother.update(track_id, depth)
+            if expected is None:
+                assert actual is None
+            else:
+                assert abs(actual - expected) < 1e-9, f"{method}: {actual} != {expected}"
+            if rng.random() < 0.05:
+                reference.reset(track_id)
+                smoother.reset(track_id)
+        print(f"  ✅ {method} 结果与旧版一致（槽位扩容到 {smoother.capacity}）")
+
+    # 批量更新：一次调用更新所有目标
+    smoother = MultiTrackDepthSmoother(method='median', window_size=3, min_samples=2, capacity=4)
+    smoother.update_batch([1, 2], [5.0, 8.0])
+    result = smoother.update_batch([1, 2, 3], [6.0, None, 3.0])
+    assert result[0] == 5.5, "track 1 应为滑动中位数"
+    assert np.isnan(result[1]), "track 2 样本不足且本帧无效"
+    assert result[2] == 3.0, "track 3 样本不足应返回原始值"
+    print("  ✅ 批量向量化更新正常")
+
+    # 槽位释放与复用：不再分配新内存
+    capacity = smoother.capacity
+    history = smoother.history
+    smoother.cleanup({3})
+    assert len(smoother) == 1 and smoother.get_smoothed(1) is None
+    smoother.update_batch([10, 11, 12], [1.0, 2.0, 3.0])
+    assert smoother.capacity == capacity and smoother.history is history
+    print("  ✅ 槽位释放与复用正常")
+
+    # 卡尔曼滤波：收敛到稳定观测值附近且方差减小
+    kalman = MultiTrackDepthSmoother(method='kalman', min_samples=1)
+    values = [kalman.update(1, d) for d in [5.0, 5.4, 4.8, 5.2, 5.0, 5.1, 4.9]]
+    assert abs(values[-1] - 5.0) < 0.2
+    assert np.var(values[2:]) < np.var([5.0, 5.4, 4.8, 5.2, 5.0, 5.1, 4.9])
+    print("  ✅ 卡尔曼平滑正常")
+
+    assert isinstance(create_depth_smoother({'smoothing': {'enabled': True}}), MultiTrackDepthSmoother)
+    assert isinstance(create_depth_smoother({'smoothing': {'enabled': True, 'backend': 'list'}}), TrackDepthSmoother)
+
+    return True
+
+
+def main():
+    """主测试函数"""
+    print("\n" + "="*60)
+    print("深度采集链路测试套件")
+    print("="*60)
+
+    tests = [
+        ("彩色→深度像素映射表", test_1_color_depth_mapper),
+        ("帧源与帧等待策略", test_2_frame_source_wait),
+        ("RGB/深度帧时间同步", test_3_frame_pair_buffer),
+        ("数组化多目标深度平滑", test_4_multi_track_depth_smoother),
+    ]
+
+    results = []
+    for name, test_func in tests:
+        try:
+            results.append((name, test_func()))
+        except Exception as e:
+            print(f"  ❌ 测试失败: {e}")
+            import traceback
+            traceback.print_exc()
+            results.append((name, False))
+
+    # 汇总结果
+    print("\n" + "="*60)
+    print("测试结果汇总")
+    print("="*60)
+
+    passed = sum(1 for _, result in results if result)
+    total = len(results)
+
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+
+    print("\n" + "="*60)
+    print(f"总计: {passed}/{total} 通过")
+    print("="*60)
+
+    return 0 if passed == total else 1
+
+
+if __name__ == '__main__':
+    exit(main())
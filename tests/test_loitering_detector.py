@@ -36,7 +36,7 @@ def test_loitering_detection():
         bbox = [700, 300, 1220, 780]  # 较大的固定位置
         detector.update(track_id, bbox, frame_shape, current_time + i * 0.5)
     
-    is_loitering = detector.is_loitering(track_id, current_time + 20 * 0.5)
+    is_loitering = detector.is_loitering(track_id, current_time=current_time + 20 * 0.5)
     duration = detector.get_duration(track_id, current_time + 20 * 0.5)
     
     print(f"  停留时间: {duration:.1f}s")
@@ -55,7 +55,7 @@ def test_loitering_detection():
         bbox = [x1, 400, x2, 800]
         detector.update(track_id2, bbox, frame_shape, current_time + i * 0.5)
     
-    is_loitering2 = detector.is_loitering(track_id2, current_time + 20 * 0.5)
+    is_loitering2 = detector.is_loitering(track_id2, current_time=current_time + 20 * 0.5)
     duration2 = detector.get_duration(track_id2, current_time + 20 * 0.5)
     
     print(f"  停留时间: {duration2:.1f}s")
@@ -71,7 +71,7 @@ def test_loitering_detection():
         bbox = [700, 300, 1220, 780]
         detector.update(track_id3, bbox, frame_shape, current_time + i * 0.5)
     
-    is_loitering3 = detector.is_loitering(track_id3, current_time + 5 * 0.5)
+    is_loitering3 = detector.is_loitering(track_id3, current_time=current_time + 5 * 0.5)
     duration3 = detector.get_duration(track_id3, current_time + 5 * 0.5)
     
     print(f"  停留时间: {duration3:.1f}s")
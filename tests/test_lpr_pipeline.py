@@ -0,0 +1,1001 @@
+"""
+车牌识别链路测试脚本
+
+测试内容：
+1. 多进程识别池 - 验证共享内存传ROI、结果与同步识别一致、槽位满时拒绝提交、工作进程崩溃/卡住后重启并回收槽位
+2. 车牌区域优先识别 - 验证缩略图定位车牌、按质量自适应增强及回退整车识别
+3. 微批识别调度 - 验证窗口内合并请求、一次批量调用、按请求分发结果及统计
+4. 优先级/截止时间调度 - 验证按帧质量出队、过期丢弃、延迟重试和按track取消
+5. 按track有界缓存 - 验证容量/TTL淘汰、淘汰回调、命中统计及最佳帧结果复用
+6. 多帧车牌融合 - 验证字符级加权投票纠错、领先幅度达标后提前终止及识别次数上限
+7. 识别请求与最佳帧ROI - 验证调度器不复制提交的ROI、最佳帧只引用帧缓冲区中的帧且不受后续帧覆盖
+8. 统一ROI质量评分 - 验证整帧一次批量评分、按(track, 帧序号)缓存、清晰度门限与原全分辨率门限一致
+9. 社会车辆报警多帧融合 - 按主循环逐帧提交/读取，验证未确定track被再次提交、融合确定后报警得到车牌并停止识别
+10. 已移除track的识别 - 验证track闪断被移除时排队/执行中的识别及报警保留到融合结果应用，超时后取消
+11. 共享帧缓冲区 - 验证引用的帧移出后保留、释放后丢弃、引用帧内存上限、按需裁剪及track移除时释放引用
+"""
+
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+import cv2
+import numpy as np
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'python_apps'))
+
+from lpr_engine import (
+    LPRProcessPool, preprocess_plate_roi, parse_plate_result, recognize_plate, create_lpr_process_pool,
+    locate_plate_regions, measure_crop_quality, enhance_plate_crop,
+    recognize_plate_batch, LPRBatchDispatcher
+)
+from bounded_cache import BoundedCache
+from best_frame_lpr import BestFrameLPR
+from plate_fusion import PlateFusion, fuse_plate_readings
+from roi_quality import RoiQualityScorer, roi_sharpness
+from async_lpr import AsyncLPRProcessor, apply_plate_results, awaiting_plate, release_track, submit_track_roi
+from frame_ring import FrameRing
+from track_events import TRACK_REMOVED, TrackEventBus
+from alert_history import AlertHistory
+
+
+class _FakePlateDetector:
+    """模拟HyperLPR：按图像均值返回车牌号"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def __call__(self, image):
+        if self.delay:
+            time.sleep(self.delay)
+        mean = int(image.mean())
+        if mean < 10:  # 暗图无车牌
+            return []
+        return [(f"京A{mean:05d}", 0.9, 0, [0, 0, 10, 10])]
+
+
+def _make_fake_detector():
+    """工作进程中调用的检测器工厂"""
+    return _FakePlateDetector()
+
+
+def _make_slow_detector():
+    return _FakePlateDetector(delay=0.3)
+
+
+class _FaultyPlateDetector(_FakePlateDetector):
+    """按增强后的图像均值模拟工作进程崩溃（纯色250）或卡住（纯色200，增强后均值202）"""
+
+    def __call__(self, image):
+        if image.std() == 0 and int(image.mean()) == 250:
+            os._exit(3)
+        if image.std() == 0 and int(image.mean()) == 202:
+            time.sleep(60)
+        return super().__call__(image)
+
+
+def _make_faulty_detector():
+    return _FaultyPlateDetector()
+
+
+class _FakeBatchDetector(_FakePlateDetector):
+    """支持批量调用的模拟检测器，记录每次批量调用的大小"""
+
+    def __init__(self):
+        super().__init__()
+        self.batch_calls = []
+
+    def recognize_batch(self, images):
+        self.batch_calls.append(len(images))
+        return [self(image) for image in images]
+
+
+def _make_batch_detector():
+    return _FakeBatchDetector()
+
+
+FAKE_FACTORY = 'test_lpr_pipeline:_make_fake_detector'
+SLOW_FACTORY = 'test_lpr_pipeline:_make_slow_detector'
+FAULTY_FACTORY = 'test_lpr_pipeline:_make_faulty_detector'
+BATCH_FACTORY = 'test_lpr_pipeline:_make_batch_detector'
+
+
+def _make_roi(value, shape=(240, 480)):
+    roi = np.full((shape[0], shape[1], 3), value, dtype=np.uint8)
+    roi[::8, :, :] = min(255, value + 40)  # 加入纹理
+    return roi
+
+
+def test_1_lpr_process_pool():
+    """测试1: 多进程识别池"""
+    print("\n" + "="*60)
+    print("测试1: 多进程识别池")
+    print("="*60)
+
+    # 预处理和结果解析
+    enhanced = preprocess_plate_roi(_make_roi(100, (60, 100)))
+    assert enhanced.shape[0] >= 120 and enhanced.shape[1] >= 320, "小ROI应放大"
+    enhanced = preprocess_plate_roi(_make_roi(100, (800, 2000)))
+    assert enhanced.shape[0] <= 400 and enhanced.shape[1] <= 1000, "大ROI应缩小"
+    assert parse_plate_result([]) == (None, 0.0)
+    assert parse_plate_result(["京A12345"]) == ("京A12345", 1.0)
+    assert parse_plate_result([{'code': '京B1', 'confidence': 0.8}]) == ('京B1', 0.8)
+    assert parse_plate_result([("京C1", 0.9)]) == ("京C1", 1.0)
+
+    def failing(image):
+        raise RuntimeError("boom")
+    assert recognize_plate(failing, _make_roi(50), max_retries=1, retry_delay=0.0) == (None, 0.0)
+
+    pool = LPRProcessPool(num_workers=2, max_pending=4, slot_size=(300, 600),
+                          detector_factory=FAKE_FACTORY)
+    try:
+        assert pool.is_healthy()
+        detector = _FakePlateDetector()
+        rois = [_make_roi(30 + i * 20) for i in range(4)]
+        futures = [pool.submit(roi) for roi in rois]
+        assert all(f is not None for f in futures)
+        # 提交后立即改写原图不影响识别（已复制到共享内存）
+        for roi in rois:
+            roi[...] = 0
+        results = [f.result(timeout=10) for f in futures]
+        expected = [recognize_plate(detector, _make_roi(30 + i * 20)) for i in range(4)]
+        assert results == expected, f"{results} != {expected}"
+        print(f"  多进程结果: {[r[0] for r in results]}")
+
+        # 超出槽位尺寸的ROI先缩小再传递
+        big = pool.submit(_make_roi(120, (900, 1800)))
+        plate, _ = big.result(timeout=10)
+        assert plate is not None
+
+        # 全黑ROI无车牌
+        assert pool.submit(np.zeros((200, 400, 3), np.uint8)).result(timeout=10) == (None, 0.0)
+
+        stats = pool.get_stats()
+        assert stats['completed'] == 6 and stats['inflight'] == 0 and stats['failed'] == 0
+    finally:
+        pool.shutdown()
+    assert not pool.is_healthy()
+    assert pool.submit(_make_roi(50)) is None, "关闭后不应接受任务"
+
+    # 槽位满时拒绝提交，完成后槽位回收
+    pool = create_lpr_process_pool({'workers': 1, 'max_pending': 2, 'max_roi_size': [300, 600]},
+                                   detector_factory=SLOW_FACTORY)
+    try:
+        first = [pool.submit(_make_roi(60)) for _ in range(3)]
+        assert first[0] is not None and first[1] is not None
+        assert first[2] is None, "槽位已满应拒绝提交"
+        for f in first[:2]:
+            f.result(timeout=10)
+        again = pool.submit(_make_roi(60))
+        assert again is not None, "完成后槽位应回收"
+        again.result(timeout=10)
+        stats = pool.get_stats()
+        assert stats['rejected'] == 1 and stats['completed'] == 3
+        print(f"  槽位回收: {stats}")
+    finally:
+        pool.shutdown()
+
+    # 工作进程崩溃或卡住：任务以异常结束，槽位回收，进程被重启
+    pool = LPRProcessPool(num_workers=1, max_pending=2, slot_size=(300, 600), task_timeout=1.0,
+                          detector_factory=FAULTY_FACTORY, respawn_interval=0.0)
+    try:
+        crashed = pool.submit(np.full((100, 200, 3), 250, np.uint8))
+        try:
+            crashed.result(timeout=10)
+            assert False, "崩溃的任务应以异常结束"
+        except RuntimeError:
+            pass
+        stuck = pool.submit(np.full((100, 200, 3), 200, np.uint8))
+        try:
+            stuck.result(timeout=10)
+            assert False, "卡住的任务应超时"
+        except TimeoutError:
+            pass
+        # 重启后的工作进程继续处理，全部槽位可用
+        deadline = time.time() + 20
+        while pool.get_stats()['respawned'] < 2 and time.time() < deadline:
+            time.sleep(0.1)
+        results = [f.result(timeout=20) for f in (pool.submit(_make_roi(60)), pool.submit(_make_roi(80)))]
+        assert all(plate is not None for plate, _ in results)
+        stats = pool.get_stats()
+        assert stats['respawned'] == 2 and stats['alive_workers'] == 1 and stats['rejected'] == 0, stats
+        print(f"  工作进程重启: {stats}")
+    finally:
+        pool.shutdown()
+
+    print("  ✅ 多进程识别池测试通过")
+    return True
+
+
+def _make_vehicle(plate_box=(250, 360, 390, 404), size=(480, 640), seed=0):
+    """合成车辆图：车身纹理 + 挡风玻璃 + 蓝底白字车牌"""
+    rng = np.random.default_rng(seed)
+    h, w = size
+    image = np.full((h, w, 3), (90, 95, 100), np.uint8)
+    image = cv2.add(image, rng.integers(0, 20, (h, w, 3), dtype=np.uint8))
+    cv2.rectangle(image, (60, 80), (w - 60, int(h * 0.6)), (60, 60, 60), -1)
+    x1, y1, x2, y2 = plate_box
+    cv2.rectangle(image, (x1, y1), (x2, y2), (160, 60, 10), -1)
+    for i in range(7):
+        cx = x1 + 8 + i * 19
+        cv2.rectangle(image, (cx, y1 + 8), (cx + 9, y2 - 8), (255, 255, 255), -1)
+    return image
+
+
+def test_2_plate_region_first():
+    """测试2: 车牌区域优先识别"""
+    print("\n" + "="*60)
+    print("测试2: 车牌区域优先识别")
+    print("="*60)
+
+    # 缩略图上定位车牌，返回原图坐标
+    plate_box = (250, 360, 390, 404)
+    vehicle = _make_vehicle(plate_box)
+    boxes = locate_plate_regions(vehicle)
+    assert boxes, "应定位到车牌"
+    x1, y1, x2, y2 = boxes[0]
+    assert x1 <= plate_box[0] and y1 <= plate_box[1] and x2 >= plate_box[2] and y2 >= plate_box[3], boxes[0]
+    assert (x2 - x1) * (y2 - y1) < vehicle.shape[0] * vehicle.shape[1] * 0.2, "候选框应远小于整车ROI"
+    print(f"  定位结果: {boxes[0]}")
+
+    # 无车牌的纯纹理图不应给出候选
+    blank = np.full((300, 400, 3), 100, np.uint8)
+    assert locate_plate_regions(blank) == []
+
+    # 按实测质量选择增强步骤：清晰高对比的裁剪不做处理，模糊低对比的做CLAHE+锐化
+    crop = vehicle[y1:y2, x1:x2]
+    enhanced, steps = enhance_plate_crop(crop)
+    assert enhanced.shape[0] == 96 and steps == [], steps
+    dull = cv2.GaussianBlur((crop // 4 + 90).astype(np.uint8), (9, 9), 3)
+    assert measure_crop_quality(dull)['contrast'] < measure_crop_quality(crop)['contrast']
+    _, steps = enhance_plate_crop(dull)
+    assert 'clahe' in steps and 'sharpen' in steps, steps
+
+    # plate_first只把车牌裁剪图交给识别器
+    class RecordingDetector:
+        def __init__(self, answer_on_crop=True):
+            self.shapes = []
+            self.answer_on_crop = answer_on_crop
+
+        def __call__(self, image):
+            self.shapes.append(image.shape[:2])
+            if image.shape[0] == 96 and not self.answer_on_crop:
+                return []
+            return [("京A12345", 0.95, 0, [0, 0, 1, 1])]
+
+    detector = RecordingDetector()
+    assert recognize_plate(detector, vehicle, strategy='plate_first') == ("京A12345", 1.0)
+    assert detector.shapes == [(96, detector.shapes[0][1])], detector.shapes
+
+    # 车牌区域未识别出时默认不回退整车识别（可开启）
+    detector = RecordingDetector(answer_on_crop=False)
+    assert recognize_plate(detector, vehicle, strategy='plate_first') == (None, 0.0)
+    assert all(shape[0] == 96 for shape in detector.shapes), detector.shapes
+    detector = RecordingDetector(answer_on_crop=False)
+    assert recognize_plate(detector, vehicle, strategy='plate_first', fallback_full=True)[0] == "京A12345"
+    assert detector.shapes[-1][0] > 96, "最后一次应为整车ROI"
+
+    # CPU耗时：区域优先远小于整车增强
+    rois = [_make_vehicle(plate_box, seed=i) for i in range(5)]
+    start = time.process_time()
+    for roi in rois:
+        preprocess_plate_roi(roi)
+    full_time = time.process_time() - start
+    start = time.process_time()
+    for roi in rois:
+        for bx1, by1, bx2, by2 in locate_plate_regions(roi)[:1]:
+            enhance_plate_crop(roi[by1:by2, bx1:bx2])
+    region_time = time.process_time() - start
+    print(f"  预处理CPU时间: full {full_time * 200:.1f}ms/张, plate_first {region_time * 200:.1f}ms/张")
+    assert region_time < full_time
+
+    print("  ✅ 车牌区域优先识别测试通过")
+    return True
+
+
+def test_3_batch_dispatcher():
+    """测试3: 微批识别调度"""
+    print("\n" + "="*60)
+    print("测试3: 微批识别调度")
+    print("="*60)
+
+    # 支持批量调用的检测器：整批只调用一次模型，结果与逐个识别一致
+    detector = _FakeBatchDetector()
+    rois = [_make_roi(30 + i * 20) for i in range(4)]
+    results = recognize_plate_batch(detector, rois)
+    assert detector.batch_calls == [4]
+    assert results == [recognize_plate(_FakePlateDetector(), roi) for roi in rois]
+    # plate_first：定位到车牌的裁剪一批，未识别出的整车一批
+    detector = _FakeBatchDetector()
+    vehicle = _make_vehicle()
+    results = recognize_plate_batch(detector, [vehicle, _make_roi(60)], strategy='plate_first', fallback_full=True)
+    assert detector.batch_calls == [1, 1] and all(r[0] for r in results), (detector.batch_calls, results)
+    detector = _FakeBatchDetector()
+    results = recognize_plate_batch(detector, [vehicle, _make_roi(60)], strategy='plate_first')
+    assert detector.batch_calls == [1] and results[1] == (None, 0.0), (detector.batch_calls, results)
+
+    # 线程池后端：窗口内的请求合并为一批
+    executor = ThreadPoolExecutor(max_workers=1)
+    detector = _FakeBatchDetector()
+    calls = []
+
+    def run_batch(batch_rois):
+        calls.append(len(batch_rois))
+        return executor.submit(recognize_plate_batch, detector, batch_rois)
+
+    dispatcher = LPRBatchDispatcher(run_batch, max_batch_size=4, max_wait=0.05)
+    try:
+        futures = {track_id: dispatcher.submit(track_id, _make_roi(30 + track_id * 20)) for track_id in range(4)}
+        results = {track_id: f.result(timeout=5) for track_id, f in futures.items()}
+        assert calls == [4], calls
+        for track_id, result in results.items():
+            assert result == recognize_plate(_FakePlateDetector(), _make_roi(30 + track_id * 20)), "结果应按请求分发"
+
+        # 未凑满一批时等待max_wait后发出
+        start = time.perf_counter()
+        single = dispatcher.submit(9, _make_roi(90)).result(timeout=5)
+        elapsed = time.perf_counter() - start
+        assert single[0] is not None and calls == [4, 1]
+        assert 0.04 <= elapsed < 1.0, elapsed
+
+        stats = dispatcher.get_stats()
+        assert stats['batches'] == 2 and stats['items'] == 5
+        assert stats['batch_size_counts'] == {4: 1, 1: 1}
+        assert stats['avg_batch_size'] == 2.5 and stats['max_wait'] >= 0.04
+        print(f"  调度统计: {stats}")
+    finally:
+        dispatcher.shutdown()
+        executor.shutdown()
+
+    # 后端繁忙时重试，队列满时拒绝提交
+    busy = {'count': 2}
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def busy_backend(batch_rois):
+        if busy['count'] > 0:
+            busy['count'] -= 1
+            return None
+        return executor.submit(recognize_plate_batch, _FakePlateDetector(), batch_rois)
+
+    dispatcher = LPRBatchDispatcher(busy_backend, max_batch_size=2, max_wait=0.01, max_pending=2)
+    try:
+        assert dispatcher.submit(1, _make_roi(50)).result(timeout=5)[0] is not None
+        assert dispatcher.get_stats()['backend_busy'] == 2
+    finally:
+        dispatcher.shutdown()
+        executor.shutdown()
+    assert dispatcher.submit(2, _make_roi(50)) is None, "关闭后不应接受请求"
+
+    # 多进程后端：一批只占用一次进程间往返，模型批量调用一次
+    pool = LPRProcessPool(num_workers=1, max_pending=4, slot_size=(300, 600), detector_factory=BATCH_FACTORY)
+    try:
+        assert pool.submit_batch([_make_roi(50)] * 5) is None, "槽位不足以容纳整批时应拒绝"
+        batch = pool.submit_batch([_make_roi(40), _make_roi(80), np.zeros((100, 200, 3), np.uint8)])
+        results = batch.result(timeout=10)
+        assert len(results) == 3 and results[0][0] and results[1][0] and results[2] == (None, 0.0)
+        assert pool.get_stats()['completed'] == 1 and pool.get_stats()['inflight'] == 0
+    finally:
+        pool.shutdown()
+
+    print("  ✅ 微批识别调度测试通过")
+    return True
+
+
+class _ManualBackend:
+    """手动完成的后端：记录每批ROI的像素值，由测试决定成功或失败"""
+
+    def __init__(self):
+        self.batches = []  # [(values, Future)]
+
+    def __call__(self, rois):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        # 第1行没有纹理，像素值即_make_roi的value
+        self.batches.append(([int(roi[1, 0, 0]) for roi in rois], future))
+        return future
+
+    def wait_for(self, count, timeout=2.0):
+        deadline = time.time() + timeout
+        while len(self.batches) < count and time.time() < deadline:
+            time.sleep(0.005)
+        return len(self.batches) >= count
+
+
+def test_4_priority_scheduler():
+    """测试4: 优先级/截止时间调度"""
+    print("\n" + "="*60)
+    print("测试4: 优先级/截止时间调度")
+    print("="*60)
+
+    # max_inflight=1：后端一次只执行一批，其余请求在调度器内按优先级等待
+    backend = _ManualBackend()
+    scheduler = LPRBatchDispatcher(backend, max_batch_size=1, max_wait=0.0, max_pending=10,
+                                   max_retries=2, retry_delay=0.1, max_inflight=1)
+    try:
+        # 后端忙于第一批时，后续请求按帧质量排序
+        first = scheduler.submit('t0', _make_roi(10), priority=0.1)
+        assert backend.wait_for(1)
+        futures = {value: scheduler.submit(f't{value}', _make_roi(value), priority=quality)
+                   for value, quality in ((20, 0.2), (30, 0.9), (40, 0.5))}
+        time.sleep(0.02)
+        assert len(backend.batches) == 1, "后端繁忙时不应继续派发"
+        backend.batches[0][1].set_result([("A", 1.0)])
+        assert first.result(timeout=1) == ("A", 1.0)
+        for index in range(1, 4):
+            assert backend.wait_for(index + 1)
+            value = backend.batches[index][0][0]
+            backend.batches[index][1].set_result([(f"P{value}", 0.9)])
+        order = [values[0] for values, _ in backend.batches[1:4]]
+        assert order == [30, 40, 20], f"应按帧质量从高到低出队: {order}"
+        assert futures[30].result(timeout=1) == ("P30", 0.9)
+        assert futures[20].result(timeout=1) == ("P20", 0.9)
+
+        # 失败后延迟重新入队，而不是在后端中sleep
+        retry_future = scheduler.submit('retry', _make_roi(50), priority=0.5)
+        assert backend.wait_for(5)
+        failed_at = time.perf_counter()
+        backend.batches[4][1].set_exception(RuntimeError("onnx error"))
+        assert backend.wait_for(6)
+        delay = time.perf_counter() - failed_at
+        assert 0.08 <= delay < 1.0, f"重试应在retry_delay后发出: {delay:.3f}s"
+        assert not retry_future.done()
+        backend.batches[5][1].set_result([("RETRY", 0.8)])
+        assert retry_future.result(timeout=1) == ("RETRY", 0.8)
+
+        # 重试用尽后以异常结束
+        exhausted = scheduler.submit('bad', _make_roi(60))
+        for attempt in range(3):
+            assert backend.wait_for(7 + attempt)
+            backend.batches[6 + attempt][1].set_exception(RuntimeError("still failing"))
+        try:
+            exhausted.result(timeout=1)
+            assert False, "重试用尽应抛出异常"
+        except RuntimeError:
+            pass
+
+        # track结束：排队中的请求被取消，不再发给后端
+        blocker = scheduler.submit('blocker', _make_roi(70))
+        assert backend.wait_for(10)
+        queued = scheduler.submit('gone', _make_roi(80))
+        assert scheduler.cancel('gone') == 1
+        assert queued.cancelled()
+        backend.batches[9][1].set_result([("B", 1.0)])
+        blocker.result(timeout=1)
+        time.sleep(0.05)
+        assert len(backend.batches) == 10, "已取消的请求不应再发给后端"
+
+        stats = scheduler.get_stats()
+        assert stats['retried'] == 3 and stats['cancelled'] == 1 and stats['pending'] == 0
+        print(f"  调度统计: {stats}")
+    finally:
+        scheduler.shutdown()
+
+    # 截止时间：后端繁忙期间等待过久的请求不再识别
+    backend = _ManualBackend()
+    scheduler = LPRBatchDispatcher(backend, max_batch_size=1, max_wait=0.0, deadline=0.1, max_inflight=1)
+    try:
+        busy = scheduler.submit('busy', _make_roi(10), deadline=10.0)
+        assert backend.wait_for(1)
+        stale = scheduler.submit('stale', _make_roi(20))
+        time.sleep(0.15)
+        fresh = scheduler.submit('fresh', _make_roi(30), deadline=5.0)
+        backend.batches[0][1].set_result([("X", 1.0)])
+        busy.result(timeout=1)
+        try:
+            stale.result(timeout=1)
+            assert False, "过期请求应以TimeoutError结束"
+        except TimeoutError:
+            pass
+        assert backend.wait_for(2)
+        assert backend.batches[1][0] == [30]
+        backend.batches[1][1].set_result([("F", 0.9)])
+        assert fresh.result(timeout=1) == ("F", 0.9)
+        assert scheduler.get_stats()['expired'] == 1
+    finally:
+        scheduler.shutdown()
+
+    print("  ✅ 优先级/截止时间调度测试通过")
+    return True
+
+
+def test_5_bounded_cache():
+    """测试5: 按track有界缓存"""
+    print("\n" + "="*60)
+    print("测试5: 按track有界缓存")
+    print("="*60)
+
+    evicted = []
+    cache = BoundedCache(capacity=3, on_evict=lambda key, value, reason: evicted.append((key, reason)))
+    for track_id in range(3):
+        cache[track_id] = f"P{track_id}"
+    assert cache.get(0) == "P0"  # 访问后0成为最近使用
+    cache[3] = "P3"
+    assert evicted == [(1, 'capacity')], f"应淘汰最久未使用的条目: {evicted}"
+    assert 1 not in cache and 0 in cache and len(cache) == 3
+    assert cache.get(1) is None
+    assert cache.pop(2) == "P2" and evicted == [(1, 'capacity')], "主动删除不应触发回调"
+
+    # 写入大量track后内存保持在容量内
+    for track_id in range(100, 1100):
+        cache[track_id] = "X"
+    assert len(cache) == 3
+    stats = cache.get_stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['evictions'] == 1000
+    assert abs(stats['hit_rate'] - 0.5) < 1e-9
+
+    # TTL过期
+    ttl_cache = BoundedCache(capacity=10, ttl=0.05, on_evict=lambda key, value, reason: evicted.append((key, reason)))
+    ttl_cache['a'] = 1
+    assert ttl_cache['a'] == 1
+    time.sleep(0.08)
+    assert 'a' not in ttl_cache and ttl_cache.get('a') is None
+    assert evicted[-1] == ('a', 'expired') and ttl_cache.get_stats()['expirations'] == 1
+
+    # 最佳帧选择器：识别结果复用计入命中，结果数量受容量限制
+    selector = BestFrameLPR(quality_threshold=0.1, cache_config={'capacity': 5, 'ttl': 60})
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    frame[:80, :160] = _make_roi(100, (80, 160))
+    for track_id in range(20):
+        selector.should_trigger_lpr(track_id, track_id, (0, 0, 160, 80), 0.9, frame.shape, frame=frame)
+        selector.on_lpr_complete(track_id, f"京A{track_id:05d}", 0.95)
+    assert len(selector.recognition_results) == 5
+    triggered, _ = selector.should_trigger_lpr(19, 20, (0, 0, 160, 80), 0.9, frame.shape, frame=frame)
+    assert not triggered, "已识别的track应复用结果"
+    assert selector.get_result(19) == ("京A00019", 0.95)
+    assert selector.get_result(0) is None, "超出容量的旧结果应被淘汰"
+    stats = selector.recognition_results.get_stats()
+    assert stats['hits'] == 2 and stats['evictions'] == 15
+    print(f"  最佳帧结果缓存: {stats}")
+
+    print("  ✅ 按track有界缓存测试通过")
+    return True
+
+
+def test_6_plate_fusion():
+    """测试6: 多帧车牌融合"""
+    print("\n" + "="*60)
+    print("测试6: 多帧车牌融合")
+    print("="*60)
+
+    # 每次识别错一个不同位置的字符，逐位投票后得到正确车牌
+    plate, confidence, margin = fuse_plate_readings([
+        ("京A12345", 0.90, 0.9),
+        ("京A12845", 0.85, 0.8),
+        ("京A1Z345", 0.80, 0.7),
+        ("京A12346", 0.60, 0.3),
+    ])
+    assert plate == "京A12345", f"字符级投票应纠正单字符错误: {plate}"
+    assert 0.0 < confidence < 0.9 and 0.0 < margin < 1.0
+    # 长度投票：多数为7位时忽略8位的误识别
+    plate, _, _ = fuse_plate_readings([("京A12345", 0.9, 1.0), ("京A123456", 0.9, 0.5), ("京A12345", 0.8, 1.0)])
+    assert plate == "京A12345"
+    assert fuse_plate_readings([]) == (None, 0.0, 0.0)
+
+    # 两次一致的高置信度识别即确定，不再需要更多识别
+    fusion = PlateFusion(min_votes=2, margin=0.5, min_confidence=0.6, max_attempts=5)
+    assert fusion.add(1, "沪B88888", 0.95, quality=0.8) == ("沪B88888", 0.95)
+    assert not fusion.is_settled(1), "单次识别不应直接确定"
+    fusion.add(1, "沪B88888", 0.92, quality=0.7)
+    assert fusion.is_settled(1)
+    assert fusion.add(1, "沪B00000", 0.99, quality=1.0)[0] == "沪B88888", "确定后不再接受新投票"
+
+    # 结果不一致时继续识别，高质量帧的票数更重
+    fusion.add(2, "粤C1234S", 0.85, quality=0.8)
+    fusion.add(2, "粤C12345", 0.90, quality=0.9)
+    assert fusion.get(2)[0] == "粤C12345"
+    assert not fusion.is_settled(2), "领先幅度不足时不应确定"
+    fusion.add(2, "粤C12345", 0.90, quality=0.9)
+    assert not fusion.is_settled(2)
+    fusion.add(2, "粤C12345", 0.90, quality=0.9)
+    assert fusion.is_settled(2) and fusion.get(2)[0] == "粤C12345"
+
+    # 一直未识别出车牌时达到次数上限后停止
+    for _ in range(5):
+        fusion.add(3, None, 0.0)
+    assert fusion.is_settled(3) and fusion.get(3) == (None, 0.0)
+
+    stats = fusion.get_stats()
+    assert stats['settled'] == 3 and stats['early_stops'] == 2 and stats['readings'] == 11
+    print(f"  融合统计: {stats}")
+
+    print("  ✅ 多帧车牌融合测试通过")
+    return True
+
+
+def test_7_roi_references():
+    """测试7: 识别请求与最佳帧的ROI保存"""
+    print("\n" + "="*60)
+    print("测试7: 识别请求与最佳帧的ROI保存")
+    print("="*60)
+
+    # 调度器只保存ROI引用：后端收到的就是提交的数组
+    received = []
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def run_batch(batch_rois):
+        received.extend(batch_rois)
+        return executor.submit(lambda: [(None, 0.0)] * len(batch_rois))
+
+    dispatcher = LPRBatchDispatcher(run_batch, max_batch_size=1, max_wait=0.0)
+    try:
+        roi = _make_roi(60)
+        dispatcher.submit(1, roi).result(timeout=5)
+        assert received and received[0] is roi, "提交的ROI不应被复制"
+    finally:
+        dispatcher.shutdown()
+        executor.shutdown(wait=True)
+
+    # 最佳帧选择器只记录(帧序号, bbox, 分数)并引用帧缓冲区中的帧，触发时才裁剪
+    ring = FrameRing(capacity=1)
+    selector = BestFrameLPR(quality_threshold=0.99, max_wait_frames=3, frame_ring=ring)
+    shape = (120, 160, 3)
+    boxes = {1: (60, 40, 100, 80), 2: (10, 10, 150, 110), 3: (70, 50, 90, 70)}
+    for seq, confidence in ((1, 0.3), (2, 0.5), (3, 0.3)):
+        ring.put(seq, np.full(shape, seq, dtype=np.uint8))
+        triggered, best_roi = selector.should_trigger_lpr(7, seq, boxes[seq], confidence, shape)
+        assert triggered or ring.get_stats()['refs'] == 1, "每个track只引用最佳帧"
+    assert triggered and best_roi.shape == (100, 140, 3)
+    assert best_roi[0, 0, 0] == 2, "最佳帧应不受后续帧覆盖"
+    stats = ring.get_stats()
+    assert stats['refs'] == 0 and stats['pinned'] == 0, f"触发后应释放最佳帧: {stats}"
+
+    # 每次触发开始新一轮比较：下一次识别使用触发之后的最佳帧
+    ring.put(4, np.full(shape, 4, dtype=np.uint8))
+    assert not selector.update(7, 4, boxes[3], 0.3)
+    assert selector.track_queue[7].best_frame_seq == 4 and selector.track_queue[7].frame_count == 1
+
+    print("  ✅ ROI保存测试通过")
+    return True
+
+
+def test_8_roi_quality():
+    """测试8: 统一ROI质量评分"""
+    print("\n" + "="*60)
+    print("测试8: 统一ROI质量评分")
+    print("="*60)
+
+    rng = np.random.default_rng(0)
+    frame = np.full((720, 1280, 3), 128, dtype=np.uint8)
+    texture = (rng.random((240, 320)) * 255).astype(np.uint8)
+    sharp_box, blur_box = (100, 200, 420, 440), (700, 200, 1020, 440)
+    frame[200:440, 100:420] = texture[:, :, None]
+    frame[200:440, 700:1020] = cv2.GaussianBlur(texture, (31, 31), 0)[:, :, None]
+
+    # uint8/CV_16S清晰度与原先float64计算一致
+    gray = cv2.cvtColor(frame[200:440, 100:420], cv2.COLOR_RGB2GRAY)
+    expected = cv2.Laplacian(gray, cv2.CV_64F).var()
+    assert abs(roi_sharpness(frame[200:440, 100:420], color_code=cv2.COLOR_RGB2GRAY) - expected) < 1e-3 * expected
+
+    scorer = RoiQualityScorer(work_width=640, min_sharpness=100.0, sharpness_ref=1000.0)
+    tracks = {1: (sharp_box, 0.9, 5.0), 2: (blur_box, 0.9, 5.0)}
+    scores = scorer.score_frame(42, frame, tracks)
+    assert scores[1].sharpness > scores[2].sharpness, \
+        f"模糊ROI清晰度应较低: {scores[1].sharpness:.1f} / {scores[2].sharpness:.1f}"
+    assert scores[1].total > scores[2].total
+    assert abs(scores[1].geometry - scores[2].geometry) < 0.05, "几何分数与清晰度无关"
+
+    # 同一帧的重复查询直接读缓存，不再重新计算
+    again = scorer.score_frame(42, frame, tracks)
+    assert again[1] is scores[1] and scorer.frames_scored == 1 and scorer.rois_scored == 2
+    assert scorer.get(2, 42) is scores[2] and scorer.get(2, 43) is None
+
+    # 单独评估ROI时使用与整帧相同的缩放比例，分数可比
+    single = scorer.sharpness_of(frame[200:440, 100:420], color_code=cv2.COLOR_RGB2GRAY)
+    assert abs(single - scores[1].sharpness) < 0.2 * scores[1].sharpness
+
+    # 清晰度门限与原先全分辨率float64门限一致（缩小后模糊ROI的方差会远超门限，不能用于门限判断）
+    blocks = (rng.random((40, 60)) * 255).astype(np.uint8)
+    sharp_gray = cv2.resize(blocks, (600, 400), interpolation=cv2.INTER_NEAREST)
+    blurred_gray = cv2.GaussianBlur(sharp_gray, (0, 0), 2)
+    for gray_roi, expected_sharp in ((sharp_gray, True), (blurred_gray, False)):
+        old_gate = cv2.Laplacian(gray_roi, cv2.CV_64F).var() > 100.0
+        assert old_gate == expected_sharp
+        assert scorer.is_sharp(cv2.cvtColor(gray_roi, cv2.COLOR_GRAY2BGR)) == old_gate
+    assert roi_sharpness(cv2.cvtColor(blurred_gray, cv2.COLOR_GRAY2BGR), 640 / 1920) > scorer.min_sharpness
+
+    # 最佳帧选取直接使用统一分数
+    selector = BestFrameLPR(quality_threshold=0.99, max_wait_frames=100)
+    selector.should_trigger_lpr(1, 42, sharp_box, 0.9, frame.shape, quality=scores[1].total, frame=frame)
+    assert selector.track_queue[1].best_quality == scores[1].total
+    print(f"  清晰度: 清晰 {scores[1].sharpness:.0f} / 模糊 {scores[2].sharpness:.0f}, 统计: {scorer.get_stats()}")
+
+    print("  ✅ 统一ROI质量评分测试通过")
+    return True
+
+
+def _run_civilian_frames(processor, frame, bbox, alerts_dict, history, max_frames=60):
+    """按主循环的顺序逐帧处理一个社会车辆track：首帧报警并提交，之后未确定时再次提交，每帧读取结果"""
+    track_id = 1
+    submissions = 0
+    ring = FrameRing()
+    for seq in range(max_frames):
+        ring.put(seq, frame)
+        alert = alerts_dict.get(track_id)
+        if awaiting_plate(processor, track_id, alert):
+            submissions += submit_track_roi(processor, track_id, ring, seq, bbox, 'car', detection_confidence=0.9)
+        elif alert is None:
+            submissions += submit_track_roi(processor, track_id, ring, seq, bbox, 'car', detection_confidence=0.9)
+            alert = {'track_id': track_id, 'type': 'social_vehicle', 'status': 'identifying',
+                     'plate': None, 'plate_number': None}
+            alerts_dict[track_id] = alert
+            history.add(alert)
+        apply_plate_results(processor, alerts_dict, history)
+        if processor.is_settled(track_id) and alert['status'] != 'identifying':
+            break
+        time.sleep(0.02)
+    return submissions
+
+
+def test_9_civilian_alert_fusion():
+    """测试9: 社会车辆报警多帧融合"""
+    print("\n" + "="*60)
+    print("测试9: 社会车辆报警多帧融合")
+    print("="*60)
+
+    bbox = (100, 100, 580, 340)
+    frame = np.zeros((480, 720, 3), dtype=np.uint8)
+    frame[100:340, 100:580] = _make_roi(60)
+    expected = recognize_plate(_FakePlateDetector(), cv2.cvtColor(frame[100:340, 100:580], cv2.COLOR_RGB2BGR))[0]
+
+    fusion_config = {'min_votes': 2, 'margin': 0.5, 'min_confidence': 0.6, 'max_attempts': 5}
+    processor = AsyncLPRProcessor(_FakePlateDetector(), max_workers=1, fusion_config=fusion_config)
+    processor.min_recognition_interval = 0.05
+    try:
+        alerts_dict, history = {}, AlertHistory()
+        submissions = _run_civilian_frames(processor, frame, bbox, alerts_dict, history)
+        alert = alerts_dict[1]
+        # 单次识别达不到min_votes，必须再次提交；达到后提前终止
+        assert processor.is_settled(1), "再次提交后融合结果应确定"
+        assert submissions == 2, f"确定前应正好识别min_votes次: {submissions}"
+        assert processor.fusion.get_stats()['early_stops'] == 1
+        assert alert['status'] == 'identified' and alert['plate'] == expected, alert
+        assert history.count('social_vehicle', 'identified') == 1 and history.count(status='identifying') == 0
+        # 确定后不再安排识别
+        time.sleep(0.06)
+        assert not awaiting_plate(processor, 1, alert)
+        ring = FrameRing()
+        ring.put(0, frame)
+        assert not submit_track_roi(processor, 1, ring, 0, bbox, 'car', detection_confidence=0.9)
+    finally:
+        processor.shutdown()
+
+    # 始终识别不出车牌：识别次数用尽后才标记为失败
+    processor = AsyncLPRProcessor(lambda image: [], max_workers=1,
+                                  fusion_config=dict(fusion_config, max_attempts=3))
+    processor.min_recognition_interval = 0.05
+    try:
+        alerts_dict, history = {}, AlertHistory()
+        submissions = _run_civilian_frames(processor, frame, bbox, alerts_dict, history)
+        assert submissions == 3, f"应识别到max_attempts次: {submissions}"
+        assert alerts_dict[1]['status'] == 'failed' and history.count(status='failed') == 1
+    finally:
+        processor.shutdown()
+
+    print(f"  融合后车牌: {expected}, 识别次数: 2")
+    print("  ✅ 社会车辆报警多帧融合测试通过")
+    return True
+
+
+class _GatedDetector(_FakePlateDetector):
+    """在gate放行前阻塞的检测器，模拟识别仍在进行"""
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def __call__(self, image):
+        self.gate.wait(5.0)
+        return super().__call__(image)
+
+
+def test_10_removed_track_recognition():
+    """测试10: track被移除时识别仍在进行"""
+    print("\n" + "="*60)
+    print("测试10: track被移除时识别仍在进行")
+    print("="*60)
+
+    roi = cv2.cvtColor(_make_roi(60), cv2.COLOR_RGB2BGR)
+    expected = recognize_plate(_FakePlateDetector(), roi)[0]
+
+    # 跟踪器移除track时识别在执行：保留任务，结果读取后才结束等待
+    detector = _GatedDetector()
+    processor = AsyncLPRProcessor(detector, max_workers=1)
+    try:
+        assert processor.submit_recognition(1, roi, 'car', priority=0.9)
+        processor.on_track_removed(1)
+        assert processor.is_retiring(1) and processor.pending_tasks.get(1) is not None
+        assert processor.collect_retired() == [], "结果未读取前应继续等待"
+        detector.gate.set()
+        for _ in range(100):
+            if processor.get_result(1)[0]:
+                break
+            time.sleep(0.02)
+        assert processor.get_result(1)[0] == expected
+        assert processor.collect_retired() == [1] and not processor.is_retiring(1)
+    finally:
+        detector.gate.set()
+        processor.shutdown()
+
+    # 超过removed_track_ttl仍未完成：取消任务
+    detector = _GatedDetector()
+    processor = AsyncLPRProcessor(detector, max_workers=1, scheduler_config={'removed_track_ttl': 1.0})
+    try:
+        assert processor.submit_recognition(2, roi, 'car', priority=0.9)
+        processor.on_track_removed(2)
+        assert processor.collect_retired(time.time() + 2.0) == [2]
+        assert processor.pending_tasks.get(2) is None and not processor.is_retiring(2)
+        # 无待处理任务的track被移除时立即清理
+        processor.on_track_removed(3)
+        assert not processor.is_retiring(3)
+    finally:
+        detector.gate.set()
+        processor.shutdown()
+
+    # 主循环：track闪断被移除时识别仍在进行，报警保留到结果融合后才移除
+    bbox = (100, 100, 580, 340)
+    frame = np.zeros((480, 720, 3), dtype=np.uint8)
+    frame[100:340, 100:580] = _make_roi(60)
+    ring = FrameRing()
+    ring.put(0, frame)
+    detector = _GatedDetector()
+    processor = AsyncLPRProcessor(detector, max_workers=1)
+    bus = TrackEventBus()
+    alerts_dict, history = {}, AlertHistory()
+    bus.subscribe(TRACK_REMOVED, lambda track_id: release_track(processor, alerts_dict, track_id))
+    try:
+        assert submit_track_roi(processor, 1, ring, 0, bbox, 'car', detection_confidence=0.9)
+        alert = {'track_id': 1, 'type': 'social_vehicle', 'status': 'identifying',
+                 'plate': None, 'plate_number': None}
+        alerts_dict[1] = alert
+        history.add(alert)
+        bus.emit(TRACK_REMOVED, 1)
+        assert apply_plate_results(processor, alerts_dict, history) == [] and alerts_dict[1] is alert
+        detector.gate.set()
+        changed = []
+        for _ in range(100):
+            changed += apply_plate_results(processor, alerts_dict, history)
+            if 1 not in alerts_dict:
+                break
+            time.sleep(0.02)
+        assert changed == [1] and 1 not in alerts_dict, "融合结果应用后移除报警"
+        assert alert['status'] == 'identified' and alert['plate'] == expected, alert
+        assert history.count('social_vehicle', 'identified') == 1
+        # 没有进行中识别的track被移除时立即丢弃报警
+        alerts_dict[2] = {'track_id': 2, 'type': 'construction'}
+        bus.emit(TRACK_REMOVED, 2)
+        assert 2 not in alerts_dict
+    finally:
+        detector.gate.set()
+        processor.shutdown()
+
+    print("  ✅ 已移除track的识别保留到结果读取或超时，报警在融合结果应用后移除")
+    return True
+
+
+def test_11_frame_ring():
+    """测试11: 共享帧缓冲区"""
+    print("\n" + "="*60)
+    print("测试11: 共享帧缓冲区")
+    print("="*60)
+
+    shape = (100, 100, 3)
+    frame_bytes = int(np.prod(shape))
+    frames = {seq: np.full(shape, seq, dtype=np.uint8) for seq in range(1, 10)}
+    ring = FrameRing(capacity=2, max_pinned_bytes=2 * frame_bytes)
+    ring.put(1, frames[1])
+    ring.put(2, frames[2])
+    assert ring.get(1) is frames[1], "放入时不复制帧"
+
+    # 被引用的帧移出环形缓冲区后保留，释放后丢弃；未引用的直接丢弃
+    assert ring.acquire(1) and not ring.acquire(99)
+    ring.put(3, frames[3])
+    ring.put(4, frames[4])
+    assert 1 in ring and 2 not in ring and len(ring) == 3
+    assert ring.get_stats()['pinned_bytes'] == frame_bytes
+    ring.release(1)
+    assert 1 not in ring and ring.get_stats()['pinned_bytes'] == 0
+
+    # 按需裁剪返回独立数组，支持扩展边距和颜色转换，帧已丢弃时返回None
+    crop = ring.crop(4, (10, 20, 50, 60))
+    assert crop.shape == (40, 40, 3) and crop[0, 0, 0] == 4
+    crop[:] = 0
+    assert frames[4][20, 10, 0] == 4, "裁剪结果不应与帧共享内存"
+    assert ring.crop(4, (30, 30, 70, 70), margin=0.5).shape == (80, 80, 3)
+    rgb = np.zeros(shape, dtype=np.uint8)
+    rgb[..., 0], rgb[..., 2] = 1, 9
+    ring.put(5, rgb)
+    assert ring.crop(5, (0, 0, 10, 10), convert=cv2.COLOR_RGB2BGR)[0, 0].tolist() == [9, 0, 1]
+    assert ring.crop(5, (200, 200, 300, 300)) is None
+    assert ring.crop(1, (0, 0, 10, 10)) is None and ring.get_stats()['misses'] == 1
+
+    # 被引用帧的内存有上限：超出时丢弃最旧的，引用一并失效
+    for seq in (4, 5):
+        assert ring.acquire(seq)
+    for seq in (6, 7, 8):
+        ring.put(seq, frames[seq])
+        assert ring.acquire(seq)
+    ring.put(9, frames[9])
+    stats = ring.get_stats()
+    assert stats['pinned_bytes'] <= 2 * frame_bytes and stats['dropped_pinned'] == 2, stats
+    assert 4 not in ring and 5 not in ring and 6 in ring
+    ring.clear()
+    assert len(ring) == 0 and ring.get_stats()['refs'] == 0
+
+    # 最佳帧选择器：track移除时释放对最佳帧的引用，移出缓冲区的帧随之丢弃
+    ring = FrameRing(capacity=1)
+    selector = BestFrameLPR(quality_threshold=0.99, max_wait_frames=100, frame_ring=ring)
+    bus = TrackEventBus()
+    bus.subscribe(TRACK_REMOVED, selector.reset)
+    for seq, quality in ((1, 0.8), (2, 0.3), (3, 0.5)):
+        ring.put(seq, frames[seq])
+        assert not selector.update(5, seq, (10, 10, 50, 50), quality)
+    assert selector.track_queue[5].best_frame_seq == 1 and 1 in ring
+    assert ring.get_stats()['refs'] == 1 and ring.get_stats()['pinned'] == 1
+    bus.emit(TRACK_REMOVED, 5)
+    assert 5 not in selector.track_queue and 1 not in ring
+    assert ring.get_stats()['refs'] == 0 and ring.get_stats()['pinned'] == 0
+
+    # 相机重建后帧序号重新开始：丢弃各track记录的最佳帧
+    ring.put(4, frames[4])
+    selector.update(6, 4, (10, 10, 50, 50), 0.5)
+    selector.clear_frames()
+    ring.clear()
+    assert selector.track_queue[6].best_frame_seq is None and selector.take_best_roi(6) == (None, 0.0)
+
+    print("  ✅ 共享帧缓冲区测试通过")
+    return True
+
+
+def main():
+    """主测试函数"""
+    print("\n" + "="*60)
+    print("车牌识别链路测试套件")
+    print("="*60)
+
+    tests = [
+        ("多进程识别池", test_1_lpr_process_pool),
+        ("车牌区域优先识别", test_2_plate_region_first),
+        ("微批识别调度", test_3_batch_dispatcher),
+        ("优先级/截止时间调度", test_4_priority_scheduler),
+        ("按track有界缓存", test_5_bounded_cache),
+        ("多帧车牌融合", test_6_plate_fusion),
+        ("识别请求与最佳帧ROI", test_7_roi_references),
+        ("统一ROI质量评分", test_8_roi_quality),
+        ("社会车辆报警多帧融合", test_9_civilian_alert_fusion),
+        ("已移除track的识别", test_10_removed_track_recognition),
+        ("共享帧缓冲区", test_11_frame_ring),
+    ]
+
+    results = []
+    for name, test_func in tests:
+        try:
+            results.append((name, test_func()))
+        except Exception as e:
+            print(f"  ❌ 测试失败: {e}")
+            import traceback
+            traceback.print_exc()
+            results.append((name, False))
+
+    # 汇总结果
+    print("\n" + "="*60)
+    print("测试结果汇总")
+    print("="*60)
+
+    passed = sum(1 for _, result in results if result)
+    total = len(results)
+
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+
+    print("\n" + "="*60)
+    print(f"总计: {passed}/{total} 通过")
+    print("="*60)
+
+    return 0 if passed == total else 1
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -67,7 +67,7 @@ def test_loitering_logic():
         bbox = [700, 300, 1220, 780]  # 较大的固定位置
         detector.update(track_id, bbox, frame_shape, current_time + i * 0.5)
     
-    is_loitering = detector.is_loitering(track_id, current_time + 20 * 0.5)
+    is_loitering = detector.is_loitering(track_id, current_time=current_time + 20 * 0.5)
     duration = detector.get_duration(track_id, current_time + 20 * 0.5)
     
     print(f"  停留时间: {duration:.1f}s")
@@ -83,7 +83,7 @@ def test_loitering_logic():
         bbox = [700, 300, 1220, 780]
         detector.update(track_id2, bbox, frame_shape, current_time + i * 0.5)
     
-    is_loitering2 = detector.is_loitering(track_id2, current_time + 5 * 0.5)
+    is_loitering2 = detector.is_loitering(track_id2, current_time=current_time + 5 * 0.5)
     duration2 = detector.get_duration(track_id2, current_time + 5 * 0.5)
     
     print(f"  停留时间: {duration2:.1f}s")
@@ -99,7 +99,7 @@ def test_loitering_logic():
         bbox = [10, 10, 50, 50]  # 很小的bbox，画面占比很小
         detector.update(track_id3, bbox, frame_shape, current_time + i * 0.5)
     
-    is_loitering3 = detector.is_loitering(track_id3, current_time + 20 * 0.5)
+    is_loitering3 = detector.is_loitering(track_id3, current_time=current_time + 20 * 0.5)
     duration3 = detector.get_duration(track_id3, current_time + 20 * 0.5)
     
     print(f"  停留时间: {duration3:.1f}s")
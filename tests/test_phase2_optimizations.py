@@ -169,9 +169,10 @@ def test_4_best_frame_lpr():
         frame_shape = (1080, 1920, 3)
         track_id = 1
         
-        # 创建模拟ROI
-        def create_roi():
-            return np.zeros((200, 400, 3), dtype=np.uint8)
+        # 创建模拟帧（放入选择器的帧缓冲区，触发时才裁剪ROI）
+        frame_seqs = iter(range(1, 100))
+        def create_frame():
+            return np.zeros(frame_shape, dtype=np.uint8)
         
         # 测试1: 低质量帧 -> 应该等待
         print("\n  测试1: 低质量帧序列...")
@@ -179,7 +180,8 @@ def test_4_best_frame_lpr():
         should_trigger, best_roi = best_frame_lpr.should_trigger_lpr(
             track_id=track_id,
             bbox=bbox_low,
-            roi_bgr=create_roi(),
+            frame_seq=next(frame_seqs),
+            frame=create_frame(),
             confidence=0.5,
             frame_shape=frame_shape,
             distance=8.0
@@ -194,7 +196,8 @@ def test_4_best_frame_lpr():
             should_trigger, best_roi = best_frame_lpr.should_trigger_lpr(
                 track_id=track_id,
                 bbox=bbox_high,
-                roi_bgr=create_roi(),
+                frame_seq=next(frame_seqs),
+                frame=create_frame(),
                 confidence=0.9,
                 frame_shape=frame_shape,
                 distance=4.0
@@ -212,7 +215,8 @@ def test_4_best_frame_lpr():
         should_trigger_again, _ = best_frame_lpr.should_trigger_lpr(
             track_id=track_id,
             bbox=bbox_high,
-            roi_bgr=create_roi(),
+            frame_seq=next(frame_seqs),
+            frame=create_frame(),
             confidence=0.9,
             frame_shape=frame_shape,
             distance=4.0
@@ -237,7 +241,8 @@ def test_4_best_frame_lpr():
             should_trigger, best_roi = best_frame_lpr2.should_trigger_lpr(
                 track_id=track_id2,
                 bbox=bbox_low,
-                roi_bgr=create_roi(),
+                frame_seq=next(frame_seqs),
+                frame=create_frame(),
                 confidence=0.7,
                 frame_shape=frame_shape,
                 distance=6.0